@@ -0,0 +1,77 @@
+import os
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from typing import Dict
+from typing import Optional
+from typing import Tuple
+
+from munch import munchify
+
+from viktor import UserException
+
+from .constants import CLASSIFICATION_PARAMS
+from .constants import GEF_FILE_ENCODING
+from .cpt import GEFFile
+from .cpt import IMBROFile
+from .cpt.cached_cpt_file import CachedCPTFile
+from .soil_layout_conversion_functions import Classification
+
+CPT_FILE_EXTENSIONS = (".gef", ".xml")
+
+
+def classify_cpt_file_content(file_content: bytes) -> dict:
+    """Parses and classifies the raw content of a GEF or IMBRO xml file, returning the params of a CPT entity.
+    This is the same result as the `process_file` of the CPT controller, and it is defined at module level so that it
+    can be sent to a worker process."""
+    classification = Classification(munchify(CLASSIFICATION_PARAMS))
+    # It is assumed that xml file always starts with the character '<', this way we can discriminate gef and xml
+    if file_content[:1] == b"<":
+        cpt_file = IMBROFile(file_content)
+    else:
+        cpt_file = GEFFile(file_content.decode(GEF_FILE_ENCODING))
+    cached_cpt_file = CachedCPTFile(cpt_file)
+    cpt_params = classification.classify_cpt_file(cached_cpt_file)
+    cpt_params["file_hash"] = cached_cpt_file.file_hash
+    return cpt_params
+
+
+def classify_cpt_files(
+    files: Dict[str, bytes], max_workers: Optional[int] = None
+) -> Tuple[Dict[str, dict], Dict[str, str]]:
+    """Parses and classifies many CPT files in parallel in a process pool. A file that cannot be parsed or classified
+    is skipped, such that one bad file does not abort the import of the others.
+
+    :param files: dictionary linking the file names with their raw content
+    :param max_workers: number of worker processes, defaults to the number of CPUs
+    :return: dictionary linking the file names with the params of the CPT entity, in the order of the input files, and
+        a dictionary linking the names of the skipped files with their error message
+    """
+    if not files:
+        return {}, {}
+    max_workers = min(max_workers or os.cpu_count() or 1, len(files))
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            file_name: executor.submit(classify_cpt_file_content, file_content)
+            for file_name, file_content in files.items()
+        }
+        cpt_params, errors = {}, {}
+        for file_name, future in futures.items():
+            try:
+                cpt_params[file_name] = future.result()
+            except Exception as e:  # pylint: disable=broad-except
+                errors[file_name] = str(e) or type(e).__name__
+    return cpt_params, errors
+
+
+def read_cpt_files_from_zip(zip_content: bytes) -> Dict[str, bytes]:
+    """Returns the raw content of all GEF and xml files inside a zip archive, keyed by file name without extension"""
+    files = {}
+    with zipfile.ZipFile(BytesIO(zip_content)) as archive:
+        for file_path in sorted(archive.namelist()):
+            file_name = os.path.basename(file_path)
+            if file_name.lower().endswith(CPT_FILE_EXTENSIONS):
+                files[os.path.splitext(file_name)[0]] = archive.read(file_path)
+    if not files:
+        raise UserException("Geen GEF of XML bestanden gevonden in het zip bestand")
+    return files
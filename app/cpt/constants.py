@@ -13,6 +13,8 @@ ADDITIONAL_COLUMNS = ["corrected_depth", "fs", "u2", "inclination", "inclination
 
 GEF_FILE_ENCODING = "ISO-8859-1"
 
+MAX_CPT_TRACE_POINTS = 2000  # Line traces of CPT measurements with more points are decimated before plotting
+
 DEFAULT_SOIL_NAMES = [
     OptionListElement("Grind, zwak siltig, los"),
     OptionListElement("Grind, zwak siltig, matig"),
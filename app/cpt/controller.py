@@ -22,6 +22,7 @@ from .constants import CLASSIFICATION_PARAMS
 from .constants import GEF_FILE_ENCODING
 from .cpt import GEFFile
 from .cpt import IMBROFile
+from .cpt.cached_cpt_file import CachedCPTFile
 from .cpt.imbro_file import _is_xml
 from .model import CPT
 from .parametrization import Parametrization
@@ -53,7 +54,10 @@ class Controller(ViktorController):
             cpt_file = IMBROFile(file.getvalue_binary())
         else:
             cpt_file = GEFFile(file.getvalue(self.encoding))
-        return classification.classify_cpt_file(cpt_file)
+        cached_cpt_file = CachedCPTFile(cpt_file)
+        cpt_params = classification.classify_cpt_file(cached_cpt_file)
+        cpt_params["file_hash"] = cached_cpt_file.file_hash
+        return cpt_params
 
     @WebView("GEF", duration_guess=3)
     def visualize(self, params: Munch, entity_id: int, **kwargs) -> WebResult:
@@ -0,0 +1,186 @@
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Union
+
+import numpy as np
+
+from .cpt_data import CPTData
+from .gef_file import GEFFile
+from .imbro_file import IMBROFile
+
+CPT_CACHE_DIRECTORY = Path(tempfile.gettempdir()) / "parsed_cpt_cache"
+# Number of parsed CPT files kept in the cache, the least recently used entries are removed beyond it
+CPT_CACHE_MAX_ENTRIES = 2000
+# Fraction of the maximum number of entries that is kept when the cache is full, such that the cache directory is only
+# scanned once per this many stores instead of on every store
+CPT_CACHE_EVICTION_LEVEL = 0.9
+
+
+def get_file_hash(
+    file_content: Union[str, bytes], additional_columns: Optional[List[str]] = None, encoding: str = "ISO-8859-1"
+) -> str:
+    """Returns the SHA-256 hash of the raw file content and the parsed columns, used as key of the parsed CPT cache"""
+    if isinstance(file_content, str):
+        file_content = file_content.encode(encoding)
+    file_hash = hashlib.sha256(file_content)
+    file_hash.update(",".join(sorted(additional_columns or [])).encode())
+    return file_hash.hexdigest()
+
+
+def measurement_data_to_arrays(measurement_data: Dict[str, list]) -> Dict[str, np.ndarray]:
+    """Converts the measurement lists of a parsed CPT to float64 arrays, missing values (None) become NaN"""
+    return {
+        signal: np.array([np.nan if value is None else value for value in values], dtype=np.float64)
+        for signal, values in measurement_data.items()
+    }
+
+
+def arrays_to_measurement_data(arrays: Dict[str, np.ndarray]) -> Dict[str, list]:
+    """Converts float64 measurement arrays back to the lists of a parsed CPT, NaN becomes None"""
+    measurement_data = {}
+    for signal, values in arrays.items():
+        values_list = values.astype(float).tolist()
+        measurement_data[signal] = [None if np.isnan(value) else value for value in values_list]
+    return measurement_data
+
+
+def _write_atomically(path: Path, mode: str, write: Callable, encoding: Optional[str] = None) -> None:
+    """Writes a file to a temporary name in the same directory and moves it in place. The temporary file is removed
+    when the writing fails."""
+    with tempfile.NamedTemporaryFile(
+        mode, dir=path.parent, suffix=".tmp", delete=False, encoding=encoding
+    ) as temporary_file:
+        try:
+            write(temporary_file)
+        except BaseException:
+            temporary_file.close()
+            os.remove(temporary_file.name)
+            raise
+    os.replace(temporary_file.name, path)
+
+
+class ParsedCPTCache:
+    """File based cache of parsed CPT files. The headers are stored as json, the measurement data (depth, qc, fs, Rf,
+    u2, ...) as float64 arrays in a npz file. Both are keyed by the hash of the raw file content, so the cache can be
+    shared between processes. When more than max_entries files are stored, the least recently used entries are removed
+    until a fraction (eviction_level) of max_entries is left."""
+
+    def __init__(
+        self,
+        cache_directory: Union[str, Path] = CPT_CACHE_DIRECTORY,
+        max_entries: int = CPT_CACHE_MAX_ENTRIES,
+        eviction_level: float = CPT_CACHE_EVICTION_LEVEL,
+    ):
+        self.cache_directory = Path(cache_directory)
+        self.max_entries = max_entries
+        self.eviction_level = eviction_level
+        self._n_entries: Optional[int] = None  # counted on the first store, the directory is not scanned before
+
+    def _paths(self, file_hash: str):
+        return self.cache_directory / f"{file_hash}.json", self.cache_directory / f"{file_hash}.npz"
+
+    def load_measurement_arrays(self, file_hash: str) -> Optional[Dict[str, np.ndarray]]:
+        """Returns the float64 measurement arrays if present in the cache, else None. Missing values are NaN."""
+        _, measurements_path = self._paths(file_hash)
+        try:
+            with np.load(measurements_path) as arrays:
+                measurement_arrays = dict(arrays)
+        except FileNotFoundError:
+            return None
+        # the modification time of the measurements marks the last use of the entry
+        measurements_path.touch()
+        return measurement_arrays
+
+    def load(self, file_hash: str) -> Optional[dict]:
+        """Returns the parsed CPT dictionary if present in the cache, else None"""
+        headers_path, _ = self._paths(file_hash)
+        if not headers_path.exists():
+            return None
+        measurement_arrays = self.load_measurement_arrays(file_hash)
+        if measurement_arrays is None:
+            return None
+        with open(headers_path, "r", encoding="utf-8") as headers_file:
+            cpt_dict = json.load(headers_file)
+        cpt_dict["measurement_data"] = arrays_to_measurement_data(measurement_arrays)
+        return cpt_dict
+
+    def store(self, file_hash: str, cpt_dict: dict) -> dict:
+        """Stores the parsed CPT dictionary. Files are written to a temporary name and moved in place, such that
+        concurrent workers never read a partially written entry. Returns the parsed CPT as it is loaded from the
+        cache."""
+        self.cache_directory.mkdir(parents=True, exist_ok=True)
+        headers_path, measurements_path = self._paths(file_hash)
+        headers = {key: value for key, value in cpt_dict.items() if key != "measurement_data"}
+
+        headers_json = json.dumps(headers)  # fails before any file is written for headers that are not json
+        arrays = measurement_data_to_arrays(cpt_dict["measurement_data"])
+        if self._n_entries is None:
+            self._n_entries = self._count_entries()
+        is_new_entry = not measurements_path.exists()
+        _write_atomically(headers_path, "w", lambda headers_file: headers_file.write(headers_json), encoding="utf-8")
+        _write_atomically(measurements_path, "wb", lambda measurements_file: np.savez(measurements_file, **arrays))
+        self._n_entries += is_new_entry
+        if self._n_entries > self.max_entries:
+            self.evict()
+        return {**json.loads(headers_json), "measurement_data": arrays_to_measurement_data(arrays)}
+
+    def _count_entries(self) -> int:
+        return sum(1 for _ in self.cache_directory.glob("*.npz"))
+
+    def evict(self) -> None:
+        """Removes the least recently used entries, until the eviction level of the maximum number of entries is left.
+        Entries stored by other processes are counted as well."""
+        entries = []
+        for measurements_path in self.cache_directory.glob("*.npz"):
+            try:
+                entries.append((measurements_path.stat().st_mtime, measurements_path))
+            except FileNotFoundError:  # removed by another process
+                continue
+        entries.sort(reverse=True)
+        n_kept = int(self.max_entries * self.eviction_level)
+        for _, measurements_path in entries[n_kept:]:
+            for path in (measurements_path.with_suffix(".json"), measurements_path):
+                try:
+                    path.unlink()
+                except FileNotFoundError:
+                    pass
+        self._n_entries = min(len(entries), n_kept)
+
+
+# Cache shared by all CPT files parsed in this process, such that the entries are only counted once
+DEFAULT_CPT_CACHE = ParsedCPTCache()
+
+
+class CachedCPTFile:
+    """Wraps a GEFFile or IMBROFile, such that the text is only parsed once for a given file content. It exposes the
+    same `parse` method, so it can be passed to `Classification.classify_cpt_file`. After parsing, `file_hash` holds
+    the key of the cached entry, which is saved in the CPT params to load the measurement arrays later on."""
+
+    def __init__(self, cpt_file: Union[GEFFile, IMBROFile], cache: Optional[ParsedCPTCache] = None):
+        self.cpt_file = cpt_file
+        self.cache = cache or DEFAULT_CPT_CACHE
+        self.file_hash: Optional[str] = None
+
+    def parse(
+        self, additional_columns: List[str], verbose: bool = False, return_gef_data_obj: bool = False
+    ) -> Union[dict, CPTData]:
+        """Returns the parsed CPT from the cache, or parses the file and stores the result. A freshly parsed file goes
+        through the same conversion as a cached one, so both return identical data."""
+        file_hash = get_file_hash(self.cpt_file.file_content, additional_columns)
+        self.file_hash = file_hash
+        cpt_dict = self.cache.load(file_hash)
+        if cpt_dict is None:
+            cpt_dict = self.cpt_file.parse(
+                additional_columns=additional_columns, verbose=verbose, return_gef_data_obj=False
+            )
+            cpt_dict = self.cache.store(file_hash, cpt_dict)
+        if return_gef_data_obj:
+            return CPTData(cpt_dict=cpt_dict)
+        return cpt_dict
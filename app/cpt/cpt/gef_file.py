@@ -25,9 +25,11 @@ class GEFFile(SDKGEFFile):
     MISSING_VALUE_STR = "MISSING_VALUE"
     NO_DEFAULT_STR = "NO_DEFAULT"
 
-    def convert_to_imbro_file_content(self, ADDITIONAL_CLASSIFICATION_COLUMNS=None) -> bytes:
-        """Converts the GEFFile data to an IMBRO XML file."""
-        cpt_dict = munchify(self.parse(additional_columns=ADDITIONAL_CLASSIFICATION_COLUMNS, return_gef_data_obj=False))
+    def convert_to_imbro_file_content(self, ADDITIONAL_CLASSIFICATION_COLUMNS=None, cpt_dict=None) -> bytes:
+        """Converts the GEFFile data to an IMBRO XML file. The file is parsed, unless the parsed cpt_dict is given."""
+        if cpt_dict is None:
+            cpt_dict = self.parse(additional_columns=ADDITIONAL_CLASSIFICATION_COLUMNS, return_gef_data_obj=False)
+        cpt_dict = munchify(cpt_dict)
         time_str = datetime.now().strftime("%Y-%m-%dT%H:%M:%S%z")
         try:
             data = {
@@ -1,9 +1,11 @@
 from io import StringIO
 from math import floor
+from typing import Dict
 from typing import List
 from typing import Tuple
 from typing import Union
 
+import numpy as np
 from munch import Munch
 from munch import munchify
 from munch import unmunchify
@@ -25,6 +27,9 @@ from viktor.views import MapLabel
 from viktor.views import MapPoint
 from viktor.views import MapPolygon
 
+from ..lib.plotly_downsampling_helper_functions import downsample_trace
+from .constants import MAX_CPT_TRACE_POINTS
+from .cpt.cached_cpt_file import DEFAULT_CPT_CACHE
 from .soil_layout_conversion_functions import convert_input_table_field_to_soil_layout
 
 
@@ -76,7 +81,9 @@ class CPT(CPTSummary):
             params = unmunchify(cpt_params)
             self.headers = munchify(params["headers"])
             self.params = params
-            self.parsed_cpt = GEFData(self.filter_nones_from_params_dict(params))
+            self.measurement_arrays = self.get_measurement_arrays(params)
+            params["measurement_data"] = {signal: values.tolist() for signal, values in self.measurement_arrays.items()}
+            self.parsed_cpt = GEFData(params)
             self.soil_layout_original = SoilLayout.from_dict(params["soil_layout_original"])
             self.bottom_of_soil_layout_user = params["bottom_of_soil_layout_user"]
             self.ground_water_level = params["ground_water_level"]
@@ -92,18 +99,64 @@ class CPT(CPTSummary):
             self.bottom_of_soil_layout_user, self._params_soil_layout, self._soils
         )
 
+    @classmethod
+    def get_measurement_arrays(cls, params: dict) -> Dict[str, np.ndarray]:
+        """Returns the measurement signals without incomplete rows. The arrays are loaded from the parsed CPT cache if
+        the file of this CPT is still cached, else they are converted from the measurement data in the params"""
+        measurement_data = params["measurement_data"]
+        file_hash = params.get("file_hash")
+        if file_hash:
+            cached_arrays = DEFAULT_CPT_CACHE.load_measurement_arrays(file_hash)
+            if cached_arrays is not None and set(cached_arrays) == set(measurement_data):
+                if all(len(cached_arrays[signal]) == len(values) for signal, values in measurement_data.items()):
+                    return cls.filter_incomplete_rows(cached_arrays)
+        return cls.filter_nones_from_measurement_data(measurement_data)
+
+    @classmethod
+    def filter_nones_from_measurement_data(cls, measurement_data: Dict[str, list]) -> Dict[str, np.ndarray]:
+        """Converts the measurement signals to float arrays and removes all rows which contain one or more None-values"""
+        measurement_arrays = {signal: np.array(values, dtype=float) for signal, values in measurement_data.items()}
+        return cls.filter_incomplete_rows(measurement_arrays)
+
     @staticmethod
-    def filter_nones_from_params_dict(raw_dict) -> dict:
+    def filter_incomplete_rows(measurement_arrays: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        """Removes all rows which contain one or more NaN-values, with a single validity mask over all signals"""
+        if not measurement_arrays:
+            return measurement_arrays
+        is_valid = np.logical_and.reduce([~np.isnan(values) for values in measurement_arrays.values()])
+        return {signal: values[is_valid] for signal, values in measurement_arrays.items()}
+
+    @classmethod
+    def filter_nones_from_params_dict(cls, raw_dict) -> dict:
         """Removes all rows which contain one or more None-values"""
-        rows_to_be_removed = []
-        for row_index, items in enumerate(zip(*raw_dict["measurement_data"].values())):
-            if None in items:
-                rows_to_be_removed.append(row_index)
-        for row in reversed(rows_to_be_removed):
-            for signal in raw_dict["measurement_data"].keys():
-                del raw_dict["measurement_data"][signal][row]
+        measurement_arrays = cls.filter_nones_from_measurement_data(raw_dict["measurement_data"])
+        raw_dict["measurement_data"] = {signal: values.tolist() for signal, values in measurement_arrays.items()}
         return raw_dict
 
+    def has_signal(self, signal: str) -> bool:
+        """Returns True if the CPT contains measurements of the signal"""
+        return signal in self.measurement_arrays and self.measurement_arrays[signal].size > 0
+
+    @property
+    def elevation_in_m(self) -> np.ndarray:
+        return self.measurement_arrays["elevation"] * 1e-3
+
+    @property
+    def friction_ratio_in_percent(self) -> np.ndarray:
+        return self.measurement_arrays["Rf"] * 100
+
+    @property
+    def sleeve_friction(self) -> np.ndarray:
+        """Returns the measured sleeve friction, or derives it from qc and Rf if it was not measured"""
+        if self.has_signal("fs"):
+            return self.measurement_arrays["fs"]
+        return self.measurement_arrays["qc"] * self.measurement_arrays["Rf"]
+
+    def get_trace(self, values: np.ndarray, max_points: int = MAX_CPT_TRACE_POINTS) -> Dict[str, list]:
+        """Returns the x (values) and y (elevation in m) of a line trace, decimated if it exceeds max_points"""
+        x, y = downsample_trace(values, self.elevation_in_m, max_points)
+        return {"x": x.tolist(), "y": y.tolist()}
+
     @property
     def coordinates(self) -> Point:
         """Returns a Point object of the x-y coordinates to be used in geographic calculations"""
@@ -119,9 +172,11 @@ class CPT(CPTSummary):
         lat, lon = RDWGSConverter.from_rd_to_wgs(self.parsed_cpt.x_y_coordinates)
         return munchify({"lat": lat, "lon": lon})
 
-    def visualize(self) -> StringIO:
+    def visualize(self, max_points: int = MAX_CPT_TRACE_POINTS) -> StringIO:
         """Creates an interactive plot using plotly, showing the same information as the static visualization"""
-        if self.parsed_cpt.u2:
+        has_u2 = self.has_signal("u2")
+        lowest_elevation = self.measurement_arrays["elevation"][-1]
+        if has_u2:
             total_columns = 4
             column_widths = [3.5, 1.5, 1, 2]
             subplot_titles = ("Cone Resistance", "Friction ratio", "u2", "Soil Layout")
@@ -146,8 +201,7 @@ class CPT(CPTSummary):
         fig.add_trace(
             go.Scatter(
                 name="Cone Resistance",
-                x=self.parsed_cpt.qc,
-                y=[el * 1e-3 for el in self.parsed_cpt.elevation],
+                **self.get_trace(self.measurement_arrays["qc"], max_points),
                 mode="lines",
                 line=dict(color="red", width=1),
                 legendgroup="Cone Resistance",
@@ -171,7 +225,7 @@ class CPT(CPTSummary):
             col=col_num,
             **standard_grid_options,
             title_text="Depth [m] w.r.t. NAP",
-            tick0=floor(self.parsed_cpt.elevation[-1] / 1e3) - 5,
+            tick0=floor(lowest_elevation / 1e3) - 5,
             dtick=1,
         )
 
@@ -180,8 +234,7 @@ class CPT(CPTSummary):
         fig.add_trace(
             go.Scatter(
                 name="Friction ratio",
-                x=[rfval * 100 if rfval else rfval for rfval in self.parsed_cpt.Rf],
-                y=[el * 1e-3 if el else el for el in self.parsed_cpt.elevation],
+                **self.get_trace(self.friction_ratio_in_percent, max_points),
                 mode="lines",
                 line=dict(color="mediumblue", width=1),
                 legendgroup="Friction ratio",
@@ -194,10 +247,7 @@ class CPT(CPTSummary):
         fig.add_trace(
             go.Scatter(
                 name="Sleeve friction",
-                x=self.parsed_cpt.fs
-                if self.parsed_cpt.fs
-                else [qc / rfval for qc, rfval in zip(self.parsed_cpt.qc, self.parsed_cpt.rfval)],
-                y=[el * 1e-3 if el else el for el in self.parsed_cpt.elevation],
+                **self.get_trace(self.sleeve_friction, max_points),
                 visible=False,
                 mode="lines",
                 line=dict(color="mediumblue", width=1),
@@ -222,17 +272,16 @@ class CPT(CPTSummary):
             col=col_num,
             **standard_line_options,
             **standard_grid_options,
-            tick0=floor(self.parsed_cpt.elevation[-1] / 1e3) - 5,
+            tick0=floor(lowest_elevation / 1e3) - 5,
             dtick=1,
         )
 
-        if self.parsed_cpt.u2:
+        if has_u2:
             col_num += 1
             fig.add_trace(
                 go.Scatter(
                     name="Water pressure u2",
-                    x=self.parsed_cpt.u2,
-                    y=[el * 1e-3 if el else el for el in self.parsed_cpt.elevation],
+                    **self.get_trace(self.measurement_arrays["u2"], max_points),
                     mode="lines",
                     line=dict(color="brown", width=1),
                     legendgroup="u2",
@@ -255,7 +304,7 @@ class CPT(CPTSummary):
                 col=col_num,
                 **standard_line_options,
                 **standard_grid_options,
-                tick0=floor(self.parsed_cpt.elevation[-1] / 1e3) - 5,
+                tick0=floor(lowest_elevation / 1e3) - 5,
                 dtick=1,
             )
 
@@ -304,7 +353,7 @@ class CPT(CPTSummary):
             row=1,
             col=col_num,
             **standard_line_options,
-            tick0=floor(self.parsed_cpt.elevation[-1] / 1e3) - 5,
+            tick0=floor(lowest_elevation / 1e3) - 5,
             dtick=1,
             showticklabels=True,
             side="right",
@@ -64,5 +64,6 @@ class Parametrization(ParametrizationBaseClass):
 
     gef.cpt_data.gef_headers = HiddenField("GEF Headers", name="headers")
     gef.cpt_data.measurement_data = HiddenField("GEF Meetdata", name="measurement_data")
+    gef.cpt_data.file_hash = HiddenField("Hash van het CPT bestand", name="file_hash")
     gef.cpt_data.soil_layout_original = HiddenField("Oorspronkelijke bodemopbouw", name="soil_layout_original")
     gef.cpt_data.soil_layout_original = HiddenField("Oorspronkelijke bodemopbouw", name="soil_layout_original")
@@ -27,6 +27,7 @@ from viktor.utils import memoize
 
 from .constants import ADDITIONAL_COLUMNS
 from .constants import DEFAULT_MIN_LAYER_THICKNESS
+from .cpt.cached_cpt_file import CachedCPTFile
 from .cpt.gef_file import GEFFile
 from .cpt.imbro_file import IMBROFile
 
@@ -293,6 +294,7 @@ def get_cpt_file_content(extension: str, file_name: str, entity_id: int) -> Unio
     If uploaded file was IMBROFile and a GEF format is required, it converts the IMBROFile to a GEFFile.
     If uploaded file was GEF XML and a IMBRO format is required, it converts the GEFFile to a IMBROFile.
 
+    The parsed GEF file is taken from the parsed CPT cache, such that it is not parsed again for every conversion.
     Note that this call can be memoized, because it only uses the OldAPI to download from S3 (immutable, because the
     file content cannot be changed after upload)
     """
@@ -303,7 +305,9 @@ def get_cpt_file_content(extension: str, file_name: str, entity_id: int) -> Unio
         file_content = file.getvalue_binary()
 
     if file_name.lower().endswith("gef") and extension.lower() == "xml":
-        file_content = GEFFile(file_content).convert_to_imbro_file_content()
+        gef_file = GEFFile(file_content)
+        cpt_dict = CachedCPTFile(gef_file).parse(additional_columns=None)
+        file_content = gef_file.convert_to_imbro_file_content(cpt_dict=cpt_dict)
     if file_name.lower().endswith("xml") and extension.lower() == "gef":
         file_content = IMBROFile(file_content).convert_to_gef_file_content()
     return file_content
@@ -1,4 +1,13 @@
+from munch import Munch
+
+from viktor import UserException
 from viktor import ViktorController
+from viktor.api_v1 import API
+from viktor.core import progress_message
+
+from ..cpt.bulk_import import classify_cpt_files
+from ..cpt.bulk_import import read_cpt_files_from_zip
+from .parametrization import CPTFolderParametrization
 
 
 class Controller(ViktorController):
@@ -9,3 +18,27 @@ class Controller(ViktorController):
     label = "CPT folder"
     children = ["CPT"]
     show_children_as = "Table"  # or 'Table'
+    parametrization = CPTFolderParametrization
+
+    def import_cpt_files(self, params: Munch, entity_id: int, **kwargs) -> None:
+        """Parse and classify all the GEF/XML files of the uploaded zip in parallel, and create a CPT entity for each of
+        them in this folder"""
+        if not params.cpt_zip:
+            raise UserException("Upload eerst een zip bestand met CPT's")
+        files = read_cpt_files_from_zip(params.cpt_zip.file.getvalue_binary())
+
+        progress_message(f"{len(files)} CPT bestanden verwerken")
+        all_cpt_params, errors = classify_cpt_files(files)
+
+        api = API()
+        for index, (cpt_name, cpt_params) in enumerate(all_cpt_params.items(), 1):
+            progress_message(f"CPT {index}/{len(all_cpt_params)} aanmaken: {cpt_name}")
+            api.create_child_entity(
+                parent_entity_id=entity_id, entity_type_name="CPT", name=cpt_name, params=cpt_params
+            )
+
+        if errors:
+            skipped_files = "\n".join(f"CPT {file_name}: {error}" for file_name, error in errors.items())
+            raise UserException(
+                f"{len(all_cpt_params)} CPT's aangemaakt, {len(errors)} bestanden overgeslagen:\n{skipped_files}"
+            )
@@ -1,25 +1,59 @@
-import numpy as np
-
-from viktor import UserException
-from viktor.api_v1 import EntityList
-
-
-class CPTFolder:
-    def __init__(self, cpt_entities: EntityList, folder_name: str):
-        self._cpt_entities = cpt_entities
-        self.name = folder_name
-
-    def closest_cpt_to_point(self, x: float, y: float):
-        if not self._cpt_entities:
-            raise UserException(f"Upload at least one cpt to the folder {self.name}")
-        min_dist = 10**9
-        closest_cpt = None
-        point = np.array([x, y])
-        for cpt in self._cpt_entities:
-            cpt_summary = cpt.last_saved_summary
-            coordinate = np.array([cpt_summary.x_coordinate["value"], cpt_summary.y_coordinate["value"]])
-            distance = np.linalg.norm(point - coordinate)
-            if distance < min_dist:
-                closest_cpt = cpt
-                min_dist = distance
-        return closest_cpt
+import hashlib
+import json
+from collections import OrderedDict
+from typing import List
+from typing import Sequence
+from typing import Tuple
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+from viktor import UserException
+from viktor.api_v1 import Entity
+from viktor.api_v1 import EntityList
+
+CPT_INDEX_CACHE_SIZE = 8
+# KD-trees over the CPT coordinates per folder revision, see CPTFolder.get_revision_key
+_cpt_indexes: "OrderedDict[Tuple[Tuple[int, ...], str], cKDTree]" = OrderedDict()
+
+
+class CPTFolder:
+    def __init__(self, cpt_entities: EntityList, folder_name: str):
+        self._cpt_entities = cpt_entities
+        self.name = folder_name
+
+    @property
+    def _cpt_list(self) -> List[Entity]:
+        if not self._cpt_entities:
+            raise UserException(f"Upload at least one cpt to the folder {self.name}")
+        return list(self._cpt_entities)
+
+    @staticmethod
+    def get_revision_key(cpt_list: List[Entity]) -> Tuple[Tuple[int, ...], str]:
+        """The ids of the CPT entities and a digest of their last saved summaries. A new revision of a CPT that moves
+        it changes its summary, such that the index is rebuilt as soon as a CPT is added, removed or moved."""
+        summaries = json.dumps([cpt.last_saved_summary for cpt in cpt_list], sort_keys=True, default=str)
+        return tuple(cpt.id for cpt in cpt_list), hashlib.sha256(summaries.encode()).hexdigest()
+
+    def _get_index(self) -> Tuple[List[Entity], cKDTree]:
+        """The CPT entities and a KD-tree over their coordinates, which is built once per revision of the folder"""
+        cpt_list = self._cpt_list
+        key = self.get_revision_key(cpt_list)
+        if key in _cpt_indexes:
+            _cpt_indexes.move_to_end(key)
+            return cpt_list, _cpt_indexes[key]
+
+        coordinates = [
+            (cpt.last_saved_summary.x_coordinate["value"], cpt.last_saved_summary.y_coordinate["value"])
+            for cpt in cpt_list
+        ]
+        _cpt_indexes[key] = cKDTree(np.array(coordinates, dtype=float))
+        while len(_cpt_indexes) > CPT_INDEX_CACHE_SIZE:
+            _cpt_indexes.popitem(last=False)
+        return cpt_list, _cpt_indexes[key]
+
+    def closest_cpts_to_points(self, points: Sequence[Tuple[float, float]]) -> List[Entity]:
+        """Return the closest CPT entity for each of the provided (x, y) points, queried in one batch."""
+        cpt_list, cpt_index = self._get_index()
+        _, indices = cpt_index.query(np.asarray(points, dtype=float).reshape(-1, 2), k=1)
+        return [cpt_list[index] for index in indices]
@@ -0,0 +1,14 @@
+from viktor.parametrization import ActionButton
+from viktor.parametrization import FileField
+from viktor.parametrization import Parametrization
+from viktor.parametrization import Section
+from viktor.parametrization import Text
+
+
+class CPTFolderParametrization(Parametrization):
+    bulk_import = Section("CPT's importeren")
+    bulk_import.text = Text(
+        "Upload een zip bestand met GEF en/of XML bestanden. Voor elk bestand wordt een CPT aangemaakt in deze folder."
+    )
+    bulk_import.cpt_zip = FileField("Zip met CPT bestanden", file_types=[".zip"], name="cpt_zip")
+    bulk_import.import_cpts = ActionButton("Importeer CPT's", method="import_cpt_files")
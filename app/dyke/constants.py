@@ -50,3 +50,6 @@ DEFAULT_MATERIAL_TABLE = [
         "d_70": None,
     },
 ]
+
+# MB, memory available for the worker processes of the piping calculations of a dike
+DEFAULT_PIPING_MEMORY_BUDGET = 2000
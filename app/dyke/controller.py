@@ -1,3 +1,4 @@
+from io import BytesIO
 from typing import Tuple
 
 from munch import Munch
@@ -6,6 +7,7 @@ from shapely.geometry import Point
 from app.lib.constants import MAP_LEGEND
 from app.lib.helper_read_files import process_dijkpalen_shape_file
 from app.lib.helper_read_files import shape_file_to_geo_poly_line
+from app.lib.rd_wgs_converter import rd_to_geo_points
 from app.lib.shapely_helper_functions import convert_linestring_to_geo_polyline
 from app.lib.shapely_helper_functions import convert_shapely_linestring_to_shapefile
 from app.lib.shapely_helper_functions import find_intersection_with_polygon_on_map
@@ -17,7 +19,6 @@ from viktor import ViktorController
 from viktor.api_v1 import API
 from viktor.api_v1 import EntityList
 from viktor.geometry import GeoPoint
-from viktor.geometry import RDWGSConverter
 from viktor.result import DownloadResult
 from viktor.result import SetParamsResult
 from viktor.views import MapLabel
@@ -28,9 +29,12 @@ from viktor.views import MapView
 from viktor.views import PlotlyResult
 from viktor.views import PlotlyView
 
+from ..dyke.constants import DEFAULT_PIPING_MEMORY_BUDGET
 from ..dyke.dyke_model import Dyke
 from ..dyke.dykeAPI import DykeAPI
 from ..dyke.parametrization import DykeParametrization
+from ..dyke.piping_run import filter_segment
+from ..dyke.piping_run import get_dike_piping_result_table
 from ..lib.helper_read_files import entry_line_to_params
 from ..lib.helper_read_files import process_ditch_shape_file
 from ..lib.map_view_helper_functions import add_2D_longitudinal_line_to_mapfeatures
@@ -46,6 +50,10 @@ from ..lib.shapely_helper_functions import create_line_by_point_and_vector
 from ..lib.shapely_helper_functions import create_perpendicular_vector_at_chainage
 from ..lib.shapely_helper_functions import create_polygon_from_linestring_offset
 from ..lib.shapely_helper_functions import get_point_from_trajectory
+from ..piping_tool.piping_result_table import filter_scenario
+from ..segment.output_excel_builder import PipingExcelBuilder
+from ..segment.output_excel_builder import write_piping_workbooks
+from ..segment.segment_model import create_segment
 
 
 class Controller(ViktorController):
@@ -140,13 +148,8 @@ class Controller(ViktorController):
             # add chainage (metrering) labels to the map)
             map_labels.extend(
                 [
-                    MapLabel(
-                        lat=RDWGSConverter.from_rd_to_wgs(point)[0],
-                        lon=RDWGSConverter.from_rd_to_wgs(point)[1],
-                        text=str(params.chainage_step * i),
-                        scale=17,
-                    )
-                    for i, point in enumerate(dyke.interpolated_trajectory().coords)
+                    MapLabel(lat=geo_point.lat, lon=geo_point.lon, text=str(params.chainage_step * i), scale=17)
+                    for i, geo_point in enumerate(rd_to_geo_points(dyke.interpolated_trajectory().coords))
                 ]
             )
 
@@ -173,7 +176,7 @@ class Controller(ViktorController):
         tno_groundmodel = self.get_api(entity_id, params).get_ground_model()
         dyke = Dyke(params, tno_groundmodel)
         fig = dyke.get_visualisation_along_trajectory()
-        return PlotlyResult(fig.to_dict())
+        return PlotlyResult(fig.to_json())
 
     def create_segments_from_dynamic_array(self, params: Munch, entity_id: int, **kwargs) -> SetParamsResult:
         dyke = Dyke(params)
@@ -218,6 +221,55 @@ class Controller(ViktorController):
 
         return DownloadResult(zipped_files=shapefiles, file_name=f"{segment_entity.name}_trajectory.zip")
 
+    def get_all_piping_results(self, params: Munch, entity_id: int, **kwargs) -> DownloadResult:
+        """
+        Calculate the piping results of all the segments of the dike at once and download them in a zip file, with an
+        Excel file per segment and scenario.
+        Note that all the necessary parameters for the piping calculation (river level, material table, etc...)
+        should be defined by the user in the segment UI.
+        """
+        api = self.get_api(entity_id, params)
+        segment_entities = api.get_children_by_entity_type("Segment", entity_id)
+        if not segment_entities:
+            raise UserException("Geen dijkvakken gevonden voor deze dijk")
+        if not params.entry_line:
+            raise UserException("Selecteer intredelijn voor de dijk.")
+
+        # the lines of the dike are computed once for all the segments
+        dyke = Dyke(params)
+        reference_line = dyke.interpolated_trajectory()
+        entry_line = dyke.entry_line
+        segments = []
+        for segment_entity in segment_entities:
+            try:
+                segment = create_segment(segment_entity.last_saved_params, dyke, reference_line, entry_line)
+            except UserException as e:
+                raise UserException(f"Dijkvak {segment_entity.name}: {e}")
+            exit_point_entities = api.get_children_by_entity_type("ExitPoint", segment_entity.id)
+            segments.append((segment_entity.name, segment, exit_point_entities))
+
+        piping_results = get_dike_piping_result_table(
+            segments,
+            reference_line,
+            entry_line,
+            memory_budget=params.downloads.memory_budget or DEFAULT_PIPING_MEMORY_BUDGET,
+        )
+
+        builders = {}
+        for segment_entity, (segment_name, segment, _) in zip(segment_entities, segments):
+            segment_params = segment_entity.last_saved_params
+            segment_results = filter_segment(piping_results, segment_name)
+            scenarios = segment.get_all_scenarios(
+                segment_params.soil_schematization.geohydrology.level2.leakage_length_array,
+                geohyromodel=segment_params.geohydrology_method,
+            )
+            for scenario in scenarios:
+                builders[f"piping_result_segment_{segment_name}_{scenario.name_of_scenario}.xlsx"] = PipingExcelBuilder(
+                    filter_scenario(segment_results, scenario.name_of_scenario), segment_params, scenario
+                )
+        excel_files = {file_name: BytesIO(content) for file_name, content in write_piping_workbooks(builders).items()}
+        return DownloadResult(zipped_files=excel_files, file_name="results.zip")
+
     @staticmethod
     def get_start_end_chainage_polyline(params: Munch, segment_entity_list: EntityList) -> Tuple[list, list]:
         """Get the start and end chainage values with corresponding names from created segment entities"""
@@ -244,27 +296,3 @@ class Controller(ViktorController):
             description_list.append(f"{segment_api.name} eind kilometrering")
 
         return polyline_list, description_list
-
-
-# TODO Update code below with new segment controller methods
-# def get_all_piping_results(self, params: Munch, entity_id, **kwargs) -> DownloadResult:
-#     """
-#     Download all the results in a zip file.
-#     Note that all the necessary parameters for the piping calculation (river level, material table, etc...)
-#     should be defined by the user in the segment UI.
-#     """
-#     excel_files = {}
-#
-#     for segment_entity in self.get_api(entity_id, params).get_children_by_entity_type("Segment", entity_id):
-#         segment_params = segment_entity.last_saved_params
-#         scenarios = SegmentController()
-#         for scenario in scenarios:
-#             file_content = (
-#                 SegmentController()
-#                 .generate_piping_results(segment_params, entity_id=segment_entity.id, scenario=scenario)
-#                 .getvalue_binary()
-#             )
-#             excel_files[f"piping_result_segment_{segment_entity.name}_{scenario.name_of_scenario}.xlsx"] = BytesIO(
-#                 file_content
-#             )
-#     return DownloadResult(zipped_files=excel_files, file_name="results.zip")
@@ -4,6 +4,7 @@ from munch import Munch
 
 from app.dyke.constants import DEFAULT_CLASSIFICATION_TABLE
 from app.dyke.constants import DEFAULT_MATERIAL_TABLE
+from app.dyke.constants import DEFAULT_PIPING_MEMORY_BUDGET
 from app.ground_model.constants import LITHOLOGY_CODE_NAME_MAPPING
 from viktor.api_v1 import API
 from viktor.parametrization import ChildEntityOptionField
@@ -194,6 +195,13 @@ class DykeParametrization(Parametrization):
     downloads.segment_select = ChildEntityOptionField("Selecteer dijkvak", entity_type_names=["Segment"])
     downloads.segment_trajectory_download = DownloadButton("Download traject", "get_segment_trajectories")
     downloads.lb2 = Text("## Results")
+    downloads.memory_budget = NumberField(
+        "Geheugenbudget berekeningen",
+        default=DEFAULT_PIPING_MEMORY_BUDGET,
+        suffix="MB",
+        min=500,
+        description="Het aantal dijkvakken dat tegelijk wordt berekend, wordt beperkt tot dit geheugen",
+    )
     downloads.all_sellmeijer_results_download = DownloadButton(
         "Download sellmeijer uitvoer voor alle dijkvaken", "get_all_piping_results"
     )
@@ -0,0 +1,123 @@
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+from typing import List
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+
+import pyarrow as pa
+import pyarrow.compute as pc
+from shapely.geometry import LineString
+
+from viktor import UserException
+from viktor.api_v1 import Entity
+from viktor.core import progress_message
+
+from ..piping_tool.piping_result_table import PIPING_RESULT_SCHEMA
+from ..segment.segment_model import Segment
+from ..segment.segment_model import SegmentPipingInput
+from ..segment.segment_model import calculate_piping_result_table
+from .constants import DEFAULT_PIPING_MEMORY_BUDGET
+
+SEGMENT_NAME = "segment_name"
+DIKE_PIPING_RESULT_SCHEMA = PIPING_RESULT_SCHEMA.insert(0, pa.field(SEGMENT_NAME, pa.string()))
+
+# MB, resident memory of a worker process before its first segment. It is the maximum resident set size of a fresh
+# interpreter after `import app.dyke.piping_run` (viktor, numpy, pandas, pyarrow, shapely), measured at 250 to 340 MB
+# depending on the library versions. Forked workers share part of it with the main process, so the lower end is used.
+WORKER_MEMORY = 250
+# Peak memory of the calculations of a segment relative to the pickled size of its piping input. The soil layouts built
+# per exit point and scenario and the collected results take a multiple of the input, this is a conservative estimate
+# rather than a measurement. Both values can be overridden in get_max_workers, and the budget is set in the dike params.
+TASK_MEMORY_FACTOR = 20
+
+# Interpolated trajectory and entry line of the dike, set once in every worker process by the pool initializer
+_dike_lines = {}
+
+
+def _init_worker(reference_line: LineString, entry_line: LineString) -> None:
+    _dike_lines["reference_line"] = reference_line
+    _dike_lines["entry_line"] = entry_line
+
+
+def _calculate_segment_piping_results(piping_input: SegmentPipingInput) -> pa.Table:
+    """Piping results of a segment in a worker process. This function is defined at module level so that it can be
+    sent to a worker process."""
+    return calculate_piping_result_table(
+        piping_input, _dike_lines["reference_line"], _dike_lines["entry_line"], report_progress=False
+    )
+
+
+def get_max_workers(
+    piping_inputs: Sequence[SegmentPipingInput],
+    memory_budget: float,
+    max_workers: Optional[int] = None,
+    worker_memory: float = WORKER_MEMORY,
+    task_memory_factor: float = TASK_MEMORY_FACTOR,
+) -> int:
+    """Number of worker processes for which the calculation of the largest segment fits in the memory budget. At least
+    one worker is used, even when a single segment exceeds the budget.
+
+    :param piping_inputs: piping input of every segment
+    :param memory_budget: memory available for the worker processes in MB
+    :param max_workers: maximum number of worker processes, defaults to the number of CPUs
+    :param worker_memory: memory of a worker process before its first segment in MB
+    :param task_memory_factor: peak memory of the calculations of a segment relative to the size of its input
+    """
+    if not piping_inputs:
+        return 1
+    largest_input = max(len(pickle.dumps(piping_input)) for piping_input in piping_inputs) / 1e6
+    workers_in_budget = int(memory_budget // (worker_memory + task_memory_factor * largest_input))
+    return max(1, min(max_workers or os.cpu_count() or 1, len(piping_inputs), workers_in_budget))
+
+
+def get_dike_piping_result_table(
+    segments: List[Tuple[str, Segment, List[Entity]]],
+    reference_line: LineString,
+    entry_line: LineString,
+    memory_budget: float = DEFAULT_PIPING_MEMORY_BUDGET,
+    max_workers: Optional[int] = None,
+) -> pa.Table:
+    """Calculate the piping results of all the segments of a dike in a process pool. The trajectory and entry line of
+    the dike are sent once to every worker process, the params of the segments and exit points are read in this
+    process and only the data needed for the calculations is sent to the workers.
+
+    :param segments: name, model and exit point entities of every segment
+    :param reference_line: interpolated trajectory of the dike
+    :param entry_line: entry line of the dike
+    :param memory_budget: memory available for the worker processes in MB, limits the number of workers
+    :param max_workers: maximum number of worker processes, defaults to the number of CPUs
+    :return: the results of all the segments in one Arrow table with the DIKE_PIPING_RESULT_SCHEMA, in the order of
+        the segments
+    """
+    piping_inputs = []
+    for name, segment, exit_points in segments:
+        progress_message(f"Voorbereiden dijkvak {name}")
+        try:
+            piping_inputs.append(segment.get_piping_input(exit_points))
+        except UserException as e:
+            raise UserException(f"Dijkvak {name}: {e}")
+    if not piping_inputs:
+        return DIKE_PIPING_RESULT_SCHEMA.empty_table()
+
+    tables = []
+    with ProcessPoolExecutor(
+        max_workers=get_max_workers(piping_inputs, memory_budget, max_workers),
+        initializer=_init_worker,
+        initargs=(reference_line, entry_line),
+    ) as executor:
+        futures = [executor.submit(_calculate_segment_piping_results, piping_input) for piping_input in piping_inputs]
+        for i, ((name, _, _), future) in enumerate(zip(segments, futures), 1):
+            try:
+                table = future.result()
+            except UserException as e:
+                raise UserException(f"Dijkvak {name}: {e}")
+            tables.append(table.add_column(0, SEGMENT_NAME, pa.array([name] * table.num_rows, type=pa.string())))
+            progress_message(f"Piping berekeningen\n\n{i}/{len(segments)} dijkvakken")
+    return pa.concat_tables(tables)
+
+
+def filter_segment(piping_results: pa.Table, segment_name: str) -> pa.Table:
+    """Return the rows of the piping result table of a dike that belong to a segment, without the segment column"""
+    return piping_results.filter(pc.equal(piping_results[SEGMENT_NAME], segment_name)).drop([SEGMENT_NAME])
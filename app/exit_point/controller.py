@@ -2,15 +2,12 @@ from pathlib import Path
 
 import plotly.graph_objects as go
 from munch import Munch
-from shapely.geometry import LineString
 from shapely.geometry import Point
 
 from app.exit_point.exit_pointAPI import ExitPointAPI
 from app.exit_point.parametrization import ExitPointParametrization
 from app.lib.shapely_helper_functions import convert_linestring_to_geo_polyline
 from app.lib.shapely_helper_functions import convert_viktor_polygon_to_shapely
-from app.lib.shapely_helper_functions import extend_line
-from app.lib.shapely_helper_functions import get_exit_point_projection_on_entry_line
 from viktor import Color
 from viktor import File
 from viktor import UserException
@@ -28,6 +25,7 @@ from viktor.views import SummaryItem
 
 from ..lib.d_geoflow.create_geolib_models import generate_dgeoflow_model
 from ..lib.d_geoflow.create_geolib_models import generate_dstability_model
+from ..lib.d_geoflow.create_geolib_models import is_river_on_the_right
 from ..lib.map_view_helper_functions import add_intersected_segment_ditches_to_map_features
 from .soil_geometry_model import SoilGeometry
 
@@ -242,39 +240,12 @@ class Controller(ViktorController):
         river_level = self.get_api(entity_id).get_river_level()
         ditch_water_level = self.get_api(entity_id).get_ditch_water_level()
 
-        exit_point = Point(params.exit_point_data.x_coordinate, params.exit_point_data.y_coordinate)
-        projected_exit_point_on_entry_line = get_exit_point_projection_on_entry_line(
-            exit_point, dyke.get_base_trajectory(), dyke.entry_line
-        )
-
-        start_point = exit_point
-        end_point = projected_exit_point_on_entry_line
-
-        cross_section_line = extend_line(
-            line=LineString([start_point, end_point]),
-            offset=params.cross_section.extension_exit_point_side,
-            side="start",
-        )
-        cross_section_line = extend_line(
-            line=cross_section_line,
-            offset=params.cross_section.extension_river_side,
-            side="end",
-        )
-
-        if params.visualisation.river_to_the_right:
-            start_point = Point(cross_section_line.coords[0])
-            end_point = Point(cross_section_line.coords[-1])
-        else:
-            start_point = Point(cross_section_line.coords[-1])
-            end_point = Point(cross_section_line.coords[0])
-
-        return SoilGeometry(
+        return SoilGeometry.from_exit_point_params(
+            params,
             detailed_1d_soil_layout,
-            start_point,
-            end_point,
+            dyke.get_base_trajectory(),
+            dyke.entry_line,
             dyke.bathymetry_points,
-            params.spatial_resolution,
-            params.cross_section.element_size,
             polder_level,
             river_level,
             ditch_water_level,
@@ -285,7 +256,8 @@ class Controller(ViktorController):
         ditch_data = self.get_api(entity_id).get_ditches()
         soil_geometry = self.create_soil_geometry(params, entity_id)
         dyke = self.get_api(entity_id).get_dyke()
-        model = generate_dgeoflow_model(soil_geometry, dyke, ditch_data)
+        river_on_the_right = is_river_on_the_right(soil_geometry, dyke.get_base_trajectory(), dyke.entry_line)
+        model = generate_dgeoflow_model(soil_geometry, river_on_the_right, ditch_data)
         file = File()
         path = Path(file.source)  # request its path. Path has an is_dir() method, which is required.
         model.serialize(path)  # let GEOLIB write to the file
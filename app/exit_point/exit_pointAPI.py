@@ -6,6 +6,7 @@ from munch import Munch
 from app.dyke.dyke_model import Dyke
 from app.lib.api.api_helper import APIHelper
 from app.segment.param_parser_functions import get_representative_soil_layouts
+from app.segment.param_parser_functions import get_segment_ditches
 from viktor import UserException
 from viktor.geo import SoilLayout
 
@@ -58,13 +59,4 @@ class ExitPointAPI(APIHelper):
 
     def get_ditches(self) -> List[dict]:
         """Return the params of the selected ditch entity"""
-        segment_params = self.get_segment_params()
-        if not segment_params.segment_dry_ditches and not segment_params.segment_ditches:
-            return []
-        if segment_params.segment_dry_ditches:
-            for ditch in segment_params.segment_dry_ditches:
-                ditch["is_wet"] = False
-        if segment_params.segment_ditches:
-            for ditch in segment_params.segment_ditches:
-                ditch["is_wet"] = True
-        return segment_params.segment_ditches + segment_params.segment_dry_ditches
+        return get_segment_ditches(self.get_segment_params())
@@ -1,18 +1,19 @@
-from typing import Dict
 from typing import List
 from typing import Optional
 from typing import Tuple
+from typing import Union
 
+from shapely.geometry import LineString
 from shapely.geometry import Point
 
 from app.ditch.model import Ditch
-from app.lib.helper_read_files import entry_line_to_params
 from app.lib.shapely_helper_functions import calc_minimum_distance
-from app.lib.shapely_helper_functions import convert_geo_polyline_to_linestring
 from viktor.geo import SoilLayout
 
-from ..dyke.dyke_model import Dyke
-from ..ground_model.model import generate_layouts_per_aquifer
+from ..ground_model.array_soil_layout import ArraySoilLayout
+from ..ground_model.array_soil_layout import as_array_soil_layout
+from ..piping_tool.constants import PipingDataFrameColumns
+from ..piping_tool.piping_result_table import PipingResultTableBuilder
 from ..piping_tool.PipingCalculationUtilities import PipingCalculation
 
 
@@ -20,15 +21,17 @@ class ExitPointProperties:
     def __init__(
         self,
         coordinates: Tuple[float, float],
-        soil_layout_piping: dict,
-        dyke: Dyke,
+        soil_layout_piping: Union[dict, SoilLayout, ArraySoilLayout],
+        reference_line: LineString,
+        entry_line: LineString,
         ditch: Optional[Ditch] = None,
         leakage_lengths: Optional = None,
     ):
         self.coordinates = coordinates
         self._uplift_parameters = {}
         self.soil_layout_piping = soil_layout_piping
-        self.dyke = dyke
+        self.reference_line = reference_line
+        self.entry_line = entry_line
         self.ditch = ditch
         self.leakage_lengths = leakage_lengths
 
@@ -58,23 +61,23 @@ class ExitPointProperties:
             parameter_dict.get("user_phi_avg_hinterland") if parameter_dict.get("overwrite_phi_avg") else None
         )
 
-    def get_exit_point_summary_piping_results(self, piping_parameters: dict) -> List[dict]:
-        """Generator to return the serialized piping calculation for both the 1st adn 2nd aquifer of an exit point
+    def get_piping_calculations(self, piping_parameters: dict) -> List[PipingCalculation]:
+        """Return the piping calculations of both the 1st and 2nd aquifer of an exit point
         :param piping_parameters: Parameters necessary for the piping calculations
-        :return:
+        :return: one calculation per aquifer
         """
         self.uplift_parameters = piping_parameters
-        self.uplift_parameters["soil_layout"] = self.soil_layout_piping
 
-        duplicated_layouts = generate_layouts_per_aquifer(SoilLayout.from_dict(self.soil_layout_piping).layers)
-        number_of_aquifers = len(duplicated_layouts)
-        if number_of_aquifers > 2:
+        # the calculation modifies the layers of the cover, so every calculation gets its own serialized layers
+        layers_per_aquifer = as_array_soil_layout(self.soil_layout_piping).serialize_layers_per_aquifer()
+        if len(layers_per_aquifer) > 2:
             raise ValueError("There cannot be more than 2 aquifers")
 
-        for i, soil_layout in enumerate(duplicated_layouts, 1):
+        calculations = []
+        for i, soil_layers in enumerate(layers_per_aquifer, 1):
             ordinal = ["zeroth", "first", "second", "third"][i]
 
-            self.uplift_parameters["soil_layout"] = [layer.serialize() for layer in soil_layout]
+            self.uplift_parameters["soil_layout"] = soil_layers
 
             self.uplift_parameters["leakage_length_hinterland"] = self.leakage_lengths.get(
                 f"leakage_length_hinterland_{ordinal}_aquifer"
@@ -82,20 +85,29 @@ class ExitPointProperties:
             self.uplift_parameters["leakage_length_foreland"] = self.leakage_lengths.get(
                 f"leakage_length_foreland_{ordinal}_aquifer"
             )
-            res_dict = self._get_results_piping_dict(piping_parameters)
-            res_dict["aquifer"] = i
-            yield res_dict
+            calculations.append(PipingCalculation.from_parameter_set(self.uplift_parameters))
+        return calculations
 
-    def _get_results_piping_dict(self, uplift_parameters: Dict):
-        self.uplift_parameters = uplift_parameters
-        return PipingCalculation.from_parameter_set(self.uplift_parameters).get_piping_summary_results()
+    def write_exit_point_summary_piping_results(
+        self, piping_parameters: dict, piping_results: PipingResultTableBuilder
+    ) -> int:
+        """Write the piping calculation of both the 1st and 2nd aquifer of an exit point into the piping result table,
+        one row per aquifer
+        :param piping_parameters: Parameters necessary for the piping calculations
+        :param piping_results: table in which the results are written
+        :return: number of rows written
+        """
+        calculations = self.get_piping_calculations(piping_parameters)
+        for i, calculation in enumerate(calculations, 1):
+            calculation.write_piping_summary_results(piping_results)
+            piping_results.add(PipingDataFrameColumns.AQUIFER, i)
+            piping_results.end_row()
+        return len(calculations)
 
     def calc_distance_from_ref_line(self) -> float:
         """Calculate distance between the exit point and the ref line"""
-        return calc_minimum_distance(Point(self.coordinates), self.dyke.interpolated_trajectory())
+        return calc_minimum_distance(Point(self.coordinates), self.reference_line)
 
     def calc_distance_exit_point_to_entry_line(self) -> float:
         """Calculate distance between the exit point and the entry line"""
-        entry_line_geopolyline = entry_line_to_params(self.dyke.params.entry_line)
-        entry_line = convert_geo_polyline_to_linestring(entry_line_geopolyline)
-        return calc_minimum_distance(Point(self.coordinates), entry_line)
+        return calc_minimum_distance(Point(self.coordinates), self.entry_line)
@@ -46,6 +46,21 @@ class ExitPointParametrization(Parametrization):
     cross_section.element_size = NumberField(
         "FEM maat", min=0.1, default=1, description="Size of the elements in DGeoflow"
     )  # TODO TRANSLATE
+    cross_section.elements_over_layer_thickness = NumberField(
+        "Elementen over laagdikte",
+        min=0,
+        default=0,
+        description="The element size of a layer is its thickness divided by this number, at least the FEM size and "
+        "at most 5 times the FEM size. With 0 all layers get the FEM size.",
+    )  # TODO TRANSLATE
+    cross_section.simplify_tolerance = NumberField(
+        "Vereenvoudigingstolerantie maaiveld",
+        suffix="m",
+        min=0,
+        default=0,
+        description="Maximum deviation of the simplified ground surface from the AHN profile. With 0 every point of "
+        "the profile is kept.",
+    )  # TODO TRANSLATE
     cross_section.lb1 = LineBreak()
     cross_section.download_stix = DownloadButton("Download stix", method="download_stix")
     cross_section.download_flox = DownloadButton("Download flox", method="download_flox")
@@ -2,8 +2,10 @@ from math import isnan
 from math import sqrt
 from typing import List
 from typing import Optional
+from typing import Tuple
 
 import pandas as pd
+from munch import Munch
 from pandas import DataFrame
 from shapely.geometry import LineString
 from shapely.geometry import MultiPoint
@@ -11,6 +13,8 @@ from shapely.geometry import Point
 from shapely.geometry import Polygon
 
 from app.lib.ahn.ahn_helper_functions import fetch_ahn_z_values
+from app.lib.shapely_helper_functions import extend_line
+from app.lib.shapely_helper_functions import get_exit_point_projection_on_entry_line
 from viktor.geo import Point as ViktorPoint
 from viktor.geo import SoilLayout
 from viktor.geo import SoilLayout2D
@@ -18,6 +22,9 @@ from viktor.geometry import Polyline as ViktorPolyline
 
 from ..ditch.model import Ditch
 
+# The adaptive element size of a layer is at most this factor times the element size of the geometry
+MAX_ELEMENT_SIZE_FACTOR = 5
+
 
 def get_all_point_coordinates_on_cross(
     start_point: Point, end_point: Point, bathymetry_points: MultiPoint, spatial_resolution: float
@@ -29,30 +36,51 @@ def get_all_point_coordinates_on_cross(
     :param bathymetry_points: bathymetry points truncated around the cross section, as a MultiPoint object
     :param spatial_resolution: spatial resolution for which the cross-section is split into equally separated points
     """
-    full_traj = LineString([start_point, end_point])
-    bathymetry_convex_hull = bathymetry_points.convex_hull
-
-    ahn_traj = full_traj.difference(bathymetry_convex_hull)
-    bathy_traj = full_traj.intersection(bathymetry_convex_hull)
-    if bathymetry_points.is_empty:
-        pass
-    if bathy_traj.is_empty:
-        ahn_df = get_xyz_df(full_traj, spatial_resolution, source="ahn")
-        bath_df = pd.DataFrame(columns=["x", "y", "z"])
-    else:
-        bath_df = get_xyz_df(bathy_traj, spatial_resolution, source="bathymetry", bathymetry_points=bathymetry_points)
-        ahn_df = get_xyz_df(ahn_traj, spatial_resolution, source="ahn")
+    return get_all_point_coordinates_on_crosses([(start_point, end_point, bathymetry_points, spatial_resolution)])[0]
 
-    # combine ahn df and bathymetry df
-    cs_point_coords_df = pd.concat([bath_df, ahn_df])
 
-    cs_point_coords_df["distance_from_start"] = cs_point_coords_df.apply(
-        lambda row: sqrt((row["x"] - start_point.x) ** 2 + (row["y"] - start_point.y) ** 2), axis=1
-    )
-    cs_point_coords_df["z"].fillna(method="ffill", inplace=True)
-    cs_point_coords_df = cs_point_coords_df.sort_values(by=["distance_from_start"])
+def get_all_point_coordinates_on_crosses(
+    cross_sections: List[Tuple[Point, Point, MultiPoint, float]]
+) -> List[DataFrame]:
+    """Get the XYZ coordinates of all the points of several cross-sections, see get_all_point_coordinates_on_cross.
+    The AHN heights of all the cross-sections are fetched at once, such that every AHN tile is only downloaded once.
+    :param cross_sections: start point, end point, bathymetry points and spatial resolution of every cross-section
+    """
+    ahn_dfs, bath_dfs = [], []
+    for i, (start_point, end_point, bathymetry_points, spatial_resolution) in enumerate(cross_sections):
+        full_traj = LineString([start_point, end_point])
+        bathymetry_convex_hull = bathymetry_points.convex_hull
+
+        ahn_traj = full_traj.difference(bathymetry_convex_hull)
+        bathy_traj = full_traj.intersection(bathymetry_convex_hull)
+        if bathy_traj.is_empty:
+            ahn_df = get_xy_df(full_traj, spatial_resolution)
+            bath_dfs.append(pd.DataFrame(columns=["x", "y", "z"]))
+        else:
+            bath_dfs.append(
+                get_xyz_df(bathy_traj, spatial_resolution, source="bathymetry", bathymetry_points=bathymetry_points)
+            )
+            ahn_df = get_xy_df(ahn_traj, spatial_resolution)
+        ahn_dfs.append(ahn_df.assign(cross_section=i))
+
+    # fetch the AHN heights of the points of all cross-sections in one go and split them per cross-section again
+    all_ahn_df = fetch_z_values(pd.concat(ahn_dfs), source="ahn")
+    ahn_df_per_cross_section = dict(list(all_ahn_df.groupby("cross_section")))
+
+    cross_sections_data = []
+    for i, ((start_point, *_), bath_df) in enumerate(zip(cross_sections, bath_dfs)):
+        ahn_df = ahn_df_per_cross_section.get(i, all_ahn_df.iloc[:0]).drop(columns="cross_section")
+
+        # combine ahn df and bathymetry df
+        cs_point_coords_df = pd.concat([bath_df, ahn_df])
+
+        cs_point_coords_df["distance_from_start"] = cs_point_coords_df.apply(
+            lambda row: sqrt((row["x"] - start_point.x) ** 2 + (row["y"] - start_point.y) ** 2), axis=1
+        )
+        cs_point_coords_df["z"].fillna(method="ffill", inplace=True)
+        cross_sections_data.append(cs_point_coords_df.sort_values(by=["distance_from_start"]))
 
-    return cs_point_coords_df
+    return cross_sections_data
 
 
 def get_xyz_df(
@@ -68,6 +96,11 @@ def get_xyz_df(
     all the bathymetry data.
     :return: return xyz coordinates as a DataFrame
     """
+    return fetch_z_values(get_xy_df(traj, spatial_resolution), source, bathymetry_points)
+
+
+def get_xy_df(traj: LineString, spatial_resolution: float) -> DataFrame:
+    """Return the DataFrame with xy coordinates of a trajectory segmented with the spatial resolution"""
     start_point, end_point = Point(traj.coords[0]), Point(traj.coords[-1])
     dx = start_point.x - end_point.x
     dy = start_point.y - end_point.y
@@ -80,9 +113,8 @@ def get_xyz_df(
         cs_points_x.append(start_point.x - i * dx / number_of_cs_points)
         cs_points_y.append(start_point.y - i * dy / number_of_cs_points)
 
-    # create dataframe of all points and fetch z values from AHN data
-    x_y_coords_df = pd.DataFrame(list(zip(cs_points_x, cs_points_y)), columns=["x", "y"])
-    return fetch_z_values(x_y_coords_df, source, bathymetry_points)
+    # create dataframe of all points
+    return pd.DataFrame(list(zip(cs_points_x, cs_points_y)), columns=["x", "y"])
 
 
 def fetch_z_values(x_y_coords_df: DataFrame, source: str, bathymetry_points: Optional[MultiPoint] = None) -> DataFrame:
@@ -124,6 +156,49 @@ def fetch_z_values(x_y_coords_df: DataFrame, source: str, bathymetry_points: Opt
         raise ValueError
 
 
+def simplify_profile(profile: ViktorPolyline, tolerance: float) -> ViktorPolyline:
+    """Simplify a profile with the Douglas-Peucker algorithm, such that no point of the profile lies further than
+    `tolerance` [m] from the simplified profile. The end points are kept and the simplified profile does not
+    intersect itself. A tolerance of 0 returns the profile as is.
+    :param profile: profile of which the points are ordered along the cross-section
+    :param tolerance: maximum deviation [m] of the simplified profile
+    """
+    if not tolerance or len(profile.points) <= 2:
+        return profile
+    line = LineString([(point.x, point.y) for point in profile.points])
+    return ViktorPolyline([ViktorPoint(x, y) for x, y in line.simplify(tolerance, preserve_topology=True).coords])
+
+
+def get_cross_section_end_points(
+    params: Munch, base_trajectory: LineString, entry_line: LineString
+) -> Tuple[Point, Point]:
+    """Return the start and end points of the cross-section of an exit point: the line from the exit point to its
+    projection on the entry line, extended on both sides and oriented according to the side of the river
+    :param params: params of the exit point
+    :param base_trajectory: base trajectory of the dike
+    :param entry_line: entry line of the dike
+    """
+    exit_point = Point(params.exit_point_data.x_coordinate, params.exit_point_data.y_coordinate)
+    projected_exit_point_on_entry_line = get_exit_point_projection_on_entry_line(
+        exit_point, base_trajectory, entry_line
+    )
+
+    cross_section_line = extend_line(
+        line=LineString([exit_point, projected_exit_point_on_entry_line]),
+        offset=params.cross_section.extension_exit_point_side,
+        side="start",
+    )
+    cross_section_line = extend_line(
+        line=cross_section_line,
+        offset=params.cross_section.extension_river_side,
+        side="end",
+    )
+
+    if params.visualisation.river_to_the_right:
+        return Point(cross_section_line.coords[0]), Point(cross_section_line.coords[-1])
+    return Point(cross_section_line.coords[-1]), Point(cross_section_line.coords[0])
+
+
 class SoilGeometry:
     def __init__(
         self,
@@ -136,7 +211,17 @@ class SoilGeometry:
         polder_level: float,
         river_level: float,
         ditch_water_level: float,
+        simplify_tolerance: float = 0,
+        elements_over_layer_thickness: float = 0,
+        cross_section_data: Optional[DataFrame] = None,
     ):
+        """
+        :param simplify_tolerance: maximum deviation [m] of the simplified ground surface, 0 keeps every point
+        :param elements_over_layer_thickness: number of elements over the thickness of a layer, that determines the
+        element size of a layer, see get_element_size. 0 gives all layers the element size.
+        :param cross_section_data: XYZ coordinates of the points of the cross-section, when they are already fetched,
+        see get_all_point_coordinates_on_crosses. Otherwise they are fetched on first use.
+        """
 
         self.all_bathymetry_points = bathymetry_geopoints
         self.spatial_resolution = spatial_resolution
@@ -148,20 +233,67 @@ class SoilGeometry:
         self.river_level = river_level
         self.ditch_water_level = ditch_water_level
         self.element_size = element_size
+        self.simplify_tolerance = simplify_tolerance
+        self.elements_over_layer_thickness = elements_over_layer_thickness
+        self._cross_section_data = cross_section_data
+
+    @classmethod
+    def from_exit_point_params(
+        cls,
+        params: Munch,
+        detailed_1d_soil_layout: SoilLayout,
+        base_trajectory: LineString,
+        entry_line: LineString,
+        bathymetry_geopoints: MultiPoint,
+        polder_level: float,
+        river_level: float,
+        ditch_water_level: float,
+    ) -> "SoilGeometry":
+        """Create the soil geometry of the cross-section of an exit point, with the cross-section settings of its
+        params"""
+        start_point, end_point = get_cross_section_end_points(params, base_trajectory, entry_line)
+        return cls(
+            detailed_1d_soil_layout,
+            start_point,
+            end_point,
+            bathymetry_geopoints,
+            params.spatial_resolution,
+            params.cross_section.element_size,
+            polder_level,
+            river_level,
+            ditch_water_level,
+            simplify_tolerance=params.cross_section.simplify_tolerance or 0,
+            elements_over_layer_thickness=params.cross_section.elements_over_layer_thickness or 0,
+        )
 
     @property
     def soil_layout_2d(self) -> SoilLayout2D:
-        """create the soil_layout2D for this geometry"""
+        """create the soil_layout2D for this geometry, with the ground surface simplified by the simplify tolerance"""
+        return self._get_soil_layout_2d(self.simplify_tolerance)
+
+    def _get_soil_layout_2d(self, simplify_tolerance: float) -> SoilLayout2D:
+        """All layers of the soil_layout2D are cut by the same simplified ground surface, such that the boundaries
+        shared by adjacent layers are the same polyline"""
+        cross_section_data = self.cross_section_data
         cover_layer_top_points = [
-            ViktorPoint(row["distance_from_start"], row["z"]) for _, row in self.cross_section_data.iterrows()
+            ViktorPoint(row["distance_from_start"], row["z"]) for _, row in cross_section_data.iterrows()
         ]
         cover_layer_top_points = [point for point in cover_layer_top_points if not isnan(point.y)]
-        cover_layer_top = ViktorPolyline(cover_layer_top_points)
+        cover_layer_top = simplify_profile(ViktorPolyline(cover_layer_top_points), simplify_tolerance)
 
         return SoilLayout2D.from_single_soil_layout(
-            self.soil_layout, 0, self.cross_section_data["distance_from_start"].max(), cover_layer_top
+            self.soil_layout, 0, cross_section_data["distance_from_start"].max(), cover_layer_top
         )
 
+    def get_element_size(self, layer_thickness: float) -> float:
+        """Element size of a layer: the layer thickness divided by the number of elements over the layer thickness,
+        bounded by the element size and MAX_ELEMENT_SIZE_FACTOR times the element size. Thick layers are meshed
+        coarser, thin layers keep the element size of the geometry."""
+        if not self.elements_over_layer_thickness:
+            return self.element_size
+        element_size = layer_thickness / self.elements_over_layer_thickness
+        return min(max(element_size, self.element_size), MAX_ELEMENT_SIZE_FACTOR * self.element_size)
+
     @property
     def local_bathymetry_points(self) -> MultiPoint:
         """Return a subset of all the bathymetry points located inside a buffer zone around the cross-section
@@ -172,21 +304,33 @@ class SoilGeometry:
         return intersected_points
 
     @property
-    def cross_section_data(self):
-        return get_all_point_coordinates_on_cross(
-            self.start_point, self.end_point, self.local_bathymetry_points, self.spatial_resolution
-        )
+    def cross_section_line(self) -> Tuple[Point, Point, MultiPoint, float]:
+        """Start point, end point, local bathymetry points and spatial resolution of the cross-section"""
+        return self.start_point, self.end_point, self.local_bathymetry_points, self.spatial_resolution
+
+    @property
+    def cross_section_data(self) -> DataFrame:
+        """XYZ coordinates of the points of the cross-section, fetched from the AHN and bathymetry once"""
+        if self._cross_section_data is None:
+            self._cross_section_data = get_all_point_coordinates_on_cross(*self.cross_section_line)
+        return self._cross_section_data
+
+    @cross_section_data.setter
+    def cross_section_data(self, cross_section_data: DataFrame):
+        self._cross_section_data = cross_section_data
 
     def soil_layout_2d_with_ditches_removed(self, ditch_data: List[dict]) -> SoilLayout2D:
-        """create the soil_layout2D for this geometry where the ditches have been removed"""
+        """create the soil_layout2D for this geometry where the ditches have been removed. The ground surface is
+        simplified after the ditches have been cut out of the original surface."""
         ditches = self.intersecting_ditches(ditch_data)
-        sl2d = self.soil_layout_2d
-        new_cover_layer = []
 
         # If no ditch intersected, return the soil_layout_2d Object directly.
         if not ditches:
             return self.soil_layout_2d
 
+        sl2d = self._get_soil_layout_2d(simplify_tolerance=0)
+        new_cover_layer = []
+
         for point in sl2d.top_profile.points:
             has_ditch = False
             for ditch in ditches:
@@ -199,7 +343,7 @@ class SoilGeometry:
             if not has_ditch:
                 new_cover_layer.append(point)
 
-        new_cover_layer = ViktorPolyline(new_cover_layer)
+        new_cover_layer = simplify_profile(ViktorPolyline(new_cover_layer), self.simplify_tolerance)
 
         return SoilLayout2D.from_single_soil_layout(self.soil_layout, 0, new_cover_layer.x_max, new_cover_layer)
 
@@ -4,18 +4,28 @@
 This module contains the primary objects that power GEOLib.
 """
 import abc
+import hashlib
 import logging
 import os
+import tempfile
+import time
 from abc import abstractmethod
 from abc import abstractproperty
+from concurrent.futures import FIRST_COMPLETED
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import wait
+from concurrent.futures.process import BrokenProcessPool
+from itertools import groupby
 from pathlib import Path
 from pathlib import PosixPath
 from pathlib import WindowsPath
-from subprocess import Popen
+from subprocess import TimeoutExpired
 from subprocess import run
 from types import CoroutineType
+from typing import Callable
 from typing import List
 from typing import Optional
+from typing import Tuple
 from typing import Type
 from typing import Union
 
@@ -90,18 +100,11 @@ class BaseModel(BaseDataClass, abc.ABC):
 
         A new model instance is returned.
         """
-        response = requests.post(
-            requests.compat.urljoin(endpoint, f"calculate/{self.__class__.__name__.lower()}"),
-            data=self.json(),
-            auth=HTTPBasicAuth(self.meta.gl_username, self.meta.gl_password),
-        )
-        if response.status_code == 200:
-            data = response.json()
-            # remove possibly invalid external metadata
-            data.get("meta", {}).pop("console_folder", None)
-            return self.__class__(**data)
-        else:
-            raise CalculationError(response.status_code, response.text)
+        client = RemoteJobClient(endpoint, self.meta.gl_username, self.meta.gl_password, timeout=self.meta.timeout)
+        models, errors = client.execute([self])
+        if errors:
+            raise CalculationError(-1, errors[0])
+        return models[0]
 
     def get_error_context(self) -> str:
         err_fn = output_filename_from_input(self, extension=".err")
@@ -193,11 +196,18 @@ class BaseModelList(BaseDataClass):
         calculation_folder: DirectoryPath,
         timeout_in_seconds: int = meta.timeout,
         nprocesses: Optional[int] = os.cpu_count(),
+        progress_callback: Optional[Callable[[int, int], None]] = None,
     ) -> "BaseModelList":
         """Execute all models in this class in parallel.
 
-        We split the list to separate folders and call a batch processes on each folder.
-        Note that the order of models will change.
+        The models are handed to a pool of at most `nprocesses` worker processes while earlier jobs are running. Every
+        worker serializes its model into a separate folder in the calculation folder, runs the console with a timeout
+        of `timeout_in_seconds` for that model and parses the output. The models that could not be calculated are left
+        out of the result and their error is added to `errors`, the order of the other models is kept. An unexpected
+        exception of a worker only fails its own model.
+
+        :param progress_callback: called with the number of finished models and the total number of models every time
+            a model is finished
         """
 
         # manual check as remote execution could result in zero models
@@ -205,89 +215,208 @@ class BaseModelList(BaseDataClass):
             raise ValueError("Can't execute with zero models.")
 
         lead_model = self.models[0]
-        processes = []
-        output_models = []
-        errors = []
-
-        # Divide the models over n processes and make sure to copy them to prevent aliasing
-        split_models = [self.models[i::nprocesses] for i in range(nprocesses)]
-        for i, models in enumerate(split_models):
-            if len(models) == 0:
-                continue
-            unique_folder = calculation_folder / str(i)
-            unique_folder.mkdir(parents=True, exist_ok=True)
-
-            for model in models:
-                fn = unique_folder / model.filename.name
-                model.serialize(fn.resolve())
-
-            executable = self.meta.console_folder / lead_model.console_path
-            if not executable.exists():
-                logger.error(
-                    f"Please make sure the `geolib.env` file points to the console folder. GEOLib now can't find it at `{executable}`"
-                )
-                raise CalculationError(-1, "Console executable not found.")
-
-            process = Popen(
-                [str(executable)] + lead_model.console_flags + [str(i)],
-                cwd=str(calculation_folder.resolve()),
+        executable = self.meta.console_folder / lead_model.console_path
+        if not executable.exists():
+            logger.error(
+                f"Please make sure the `geolib.env` file points to the console folder. GEOLib now can't find it at `{executable}`"
             )
-            processes.append(process)
-
-        # Wait for all processes to be done
-        for process in processes:
-            logger.debug(f"Executed with {process.args}")
-            process.wait(timeout=timeout_in_seconds)
-
-        # Iterate over the models
-        for i, models in enumerate(split_models):
-            for model in models:
-                model = model.copy(deep=True)  # prevent aliasing
-                output_filename = output_filename_from_input(model)
-                if output_filename.exists():
-                    try:
-                        model.parse(output_filename)
-                        output_models.append(model)
-
-                    except ValidationError:
-                        logger.warning(f"Ouput file generated but parsing of {output_filename.name} failed.")
-                        error = model.get_error_context()
-                        errors.append(error)
-                else:
-                    logger.warning(
-                        f"Model @ {output_filename.name} failed. Please check the .err file and batchlog.txt in its folder."
-                    )
-                    error = model.get_error_context()
-                    errors.append(error)
+            raise CalculationError(-1, "Console executable not found.")
 
+        calculation_folder = Path(calculation_folder).resolve()
+        calculation_folder.mkdir(parents=True, exist_ok=True)
+        max_workers = max(1, min(nprocesses or 1, len(self.models)))
+        results: List[Tuple[Optional[BaseModel], Optional[str]]] = [(None, None)] * len(self.models)
+        jobs = iter(enumerate(self.models))
+        finished = 0
+
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            running = {}
+
+            def submit_next_job():
+                for i, model in jobs:
+                    try:
+                        future = executor.submit(
+                            execute_in_job_folder, model, calculation_folder, executable, timeout_in_seconds
+                        )
+                    except BrokenProcessPool as exception:
+                        # a worker died, the pool does not accept the remaining models anymore
+                        results[i] = None, job_error(model, exception)
+                        continue
+                    running[future] = i
+                    return
+
+            # keep at most two jobs per worker in the queue, such that the models are not all pickled at once
+            for _ in range(2 * max_workers):
+                submit_next_job()
+            while running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    i = running.pop(future)
+                    try:
+                        results[i] = future.result()
+                    except Exception as exception:  # pylint: disable=broad-except
+                        logger.warning(f"Model @ {self.models[i].filename.name} raised {exception!r}.")
+                        results[i] = None, job_error(self.models[i], exception)
+                    finished += 1
+                    logger.info(f"Finished {finished} of {len(self.models)} models.")
+                    if progress_callback is not None:
+                        progress_callback(finished, len(self.models))
+                    submit_next_job()
+
+        output_models = [model for model, _ in results if model is not None]
+        errors = [error for _, error in results if error is not None]
         return self.__class__(models=output_models, errors=errors)
 
-    def execute_remote(self, endpoint: HttpUrl) -> "BaseModelList":
+    def execute_remote(self, endpoint: HttpUrl, batch_size: int = 50) -> "BaseModelList":
         """Execute all models in this class in parallel on a remote endpoint.
 
-        Note that the order of models will change.
+        The models are submitted in batches of `batch_size` models. The models that could not be calculated are left
+        out of the result and their error is added to `errors`, the order of the other models is kept.
         """
         lead_model = self.models[0]
-
-        response = requests.post(
-            requests.compat.urljoin(endpoint, f"calculate/{lead_model.__class__.__name__.lower()}s"),
-            data="[" + ",".join((model.json() for model in self.models)) + "]",
-            auth=HTTPBasicAuth(lead_model.meta.gl_username, lead_model.meta.gl_password),
+        client = RemoteJobClient(
+            endpoint,
+            lead_model.meta.gl_username,
+            lead_model.meta.gl_password,
+            batch_size=batch_size,
+            timeout=lead_model.meta.timeout,
         )
-        if response.status_code == 200:
-            models = response.json()["models"]
-            errors = response.json()["errors"]
-            stripped_models = []
-            for model in models:
+        models, errors = client.execute(self.models)
+        return self.__class__(models=models, errors=errors)
+
+
+class RemoteJobClient:
+    """Client of the job endpoints of the GEOLib webservice.
+
+    Identical models are submitted once. The models are submitted in batches, per batch the service answers with a job
+    id per model. A batch that is refused because the job queue of the service is full is submitted again after
+    `poll_interval` seconds, for at most `timeout` seconds. Every job is then polled until it is finished or until
+    `timeout` seconds have passed since the client started to wait for it.
+    """
+
+    def __init__(
+        self,
+        endpoint: HttpUrl,
+        username: str,
+        password: str,
+        batch_size: int = 50,
+        timeout: int = meta.timeout,
+        poll_interval: float = 5,
+        session: Optional[requests.Session] = None,
+    ):
+        self.endpoint = endpoint
+        self.auth = HTTPBasicAuth(username, password)
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self.session = session or requests.Session()
+
+    def execute(self, models: List[BaseModel]) -> Tuple[List[BaseModel], List[str]]:
+        """Calculate the models remotely, returns the calculated models in the order of `models` and the errors"""
+        keys = [get_model_key(model) for model in models]
+        unique_models = {}
+        for key, model in zip(keys, models):
+            unique_models.setdefault(key, model)
+        job_ids = dict(zip(unique_models, self.submit(list(unique_models.values()))))
+
+        jobs, output_models, errors = {}, [], []
+        for key, model in zip(keys, models):
+            if key not in jobs:
+                # the jobs run concurrently, the ones that finished while the client waited for others return at once
+                jobs[key] = self.wait(job_ids[key], time.monotonic() + self.timeout)
+            job = jobs[key]
+            if job["status"] == "finished":
+                output_models.append(model.__class__(**job["model"]))
+            elif job["status"] == "failed":
+                errors.append(job["message"])
+            else:
+                errors.append(f"{model.filename}\nCalculation did not finish within {self.timeout} seconds.")
+        return output_models, errors
+
+    def submit(self, models: List[BaseModel]) -> List[str]:
+        """Submit the models in batches of consecutive models of the same type, returns the job id of every model"""
+        job_ids = []
+        for _, models_of_type in groupby(models, key=lambda model: model.__class__):
+            models_of_type = list(models_of_type)
+            for i in range(0, len(models_of_type), self.batch_size):
+                batch = models_of_type[i : i + self.batch_size]
+                url = requests.compat.urljoin(self.endpoint, f"jobs/{batch[0].__class__.__name__.lower()}s")
+                data = "[" + ",".join(model.json() for model in batch) + "]"
+                deadline = time.monotonic() + self.timeout
+                response = self.session.post(url, data=data, auth=self.auth)
+                while response.status_code == 503 and time.monotonic() < deadline:
+                    time.sleep(self.poll_interval)
+                    response = self.session.post(url, data=data, auth=self.auth)
+                if response.status_code != 202:
+                    raise CalculationError(response.status_code, response.text)
+                job_ids.extend(job["job_id"] for job in response.json())
+        return job_ids
+
+    def wait(self, job_id: str, deadline: float) -> dict:
+        """Poll the job until it is finished or failed, or until the deadline has passed"""
+        url = requests.compat.urljoin(self.endpoint, f"jobs/{job_id}")
+        while True:
+            wait_in_seconds = max(0.0, min(self.poll_interval, deadline - time.monotonic()))
+            response = self.session.get(url, params={"wait": wait_in_seconds}, auth=self.auth)
+            if response.status_code != 200:
+                raise CalculationError(response.status_code, response.text)
+            job = response.json()
+            if job["status"] in ("finished", "failed") or time.monotonic() >= deadline:
                 # remove possibly invalid external metadata
-                model.get("meta", {}).pop("console_folder", None)
-                stripped_models.append(lead_model.__class__(**model))
-            return self.__class__(models=stripped_models, errors=errors)
-        else:
-            raise CalculationError(response.status_code, response.text)
+                job.get("model", {}).get("meta", {}).pop("console_folder", None)
+                return job
+
+
+def get_model_key(model: BaseModel) -> str:
+    """SHA-256 of the model type and its JSON serialized input. The metadata and filename are left out, they do not
+    change the result of the calculation."""
+    model_input = model.json(exclude={"meta", "filename"}, sort_keys=True)
+    return hashlib.sha256(f"{model.__class__.__name__}:{model_input}".encode()).hexdigest()
 
 
 def output_filename_from_input(model: BaseModel, extension: str = None) -> Path:
     if not extension:
         extension = model.parser_provider_type().output_parsers[-1].suffix_list[0]
     return model.filename.with_suffix(extension)
+
+
+def job_error(model: BaseModel, exception: Exception) -> str:
+    """Error context of a model of which the job raised an exception"""
+    return f"{model.filename.name}\nCalculation failed with {exception.__class__.__name__}: {exception}"
+
+
+def execute_in_job_folder(
+    model: BaseModel, calculation_folder: Path, executable: Path, timeout_in_seconds: int
+) -> Tuple[Optional[BaseModel], Optional[str]]:
+    """Serialize a copy of the model into a new folder in the calculation folder, run the console on it and parse the
+    output. Runs in a worker process of BaseModelList.execute.
+
+    Returns the calculated model, or None and the error context when the calculation failed or timed out.
+    """
+    model = model.copy(deep=True)  # prevent aliasing
+    job_folder = Path(tempfile.mkdtemp(prefix=f"{model.filename.stem}_", dir=calculation_folder))
+    model.serialize(job_folder / model.filename.name)
+
+    try:
+        process = run(
+            [str(executable)] + model.console_flags + [str(model.filename)],
+            timeout=timeout_in_seconds,
+            cwd=str(job_folder),
+        )
+    except TimeoutExpired:
+        logger.warning(f"Model @ {model.filename.name} exceeded the timeout of {timeout_in_seconds} seconds.")
+        return None, f"{model.filename.name}\nCalculation exceeded the timeout of {timeout_in_seconds} seconds."
+
+    output_filename = output_filename_from_input(model)
+    if output_filename.exists():
+        try:
+            model.parse(output_filename)
+            return model, None
+        except ValidationError:
+            logger.warning(f"Ouput file generated but parsing of {output_filename.name} failed.")
+    else:
+        logger.warning(
+            f"Model @ {output_filename.name} failed with exit code {process.returncode}. "
+            "Please check the .err file and batchlog.txt in its folder."
+        )
+    return None, model.get_error_context()
@@ -1,17 +1,28 @@
 from datetime import datetime
+from typing import Iterator
 
 from geolib import __version__ as glversion
 from geolib.models.serializers import BaseSerializer
 from jinja2 import Environment
 from jinja2 import PackageLoader
+from pydantic import FilePath
 
-ENV = Environment(loader=PackageLoader("geolib.models.dfoundations"), trim_blocks=True)
+# The templates are compiled once and kept in the cache of the environment, they are not checked for changes
+ENV = Environment(loader=PackageLoader("geolib.models.dfoundations"), trim_blocks=True, auto_reload=False)
 
 
 class DFoundationsInputSerializer(BaseSerializer):
     def render(self) -> str:
+        return "".join(self.generate())
+
+    def generate(self) -> Iterator[str]:
+        """Renders the input file in chunks, such that it can be written without holding the whole file in memory"""
         self.ds["input_data"].update(dict(timestamp=datetime.now()))
         self.ds["input_data"].update(dict(glversion=glversion))
         template = ENV.get_template("input.foi.j2")
 
-        return template.render(self.ds["input_data"])
+        return template.generate(self.ds["input_data"])
+
+    def write(self, filename: FilePath):
+        with open(filename, "w") as io:
+            io.writelines(self.generate())
@@ -6,8 +6,10 @@ from typing import Dict
 from typing import List
 from typing import Optional
 from typing import Set
+from typing import Tuple
 from typing import Type
 from typing import Union
+from zipfile import ZIP_DEFLATED
 
 from geolib.geometry import Point
 from geolib.models import BaseDataClass
@@ -15,6 +17,7 @@ from geolib.models import BaseModel
 from geolib.soils import Soil
 from pydantic import DirectoryPath
 from pydantic import FilePath
+from pydantic import PrivateAttr
 
 from ...utils import camel_to_snake
 from ...utils import snake_to_camel
@@ -26,6 +29,9 @@ from .internal import SoilLayerCollection
 from .serializer import DGeoflowInputSerializer
 from .serializer import DGeoflowInputZipSerializer
 
+# The indexed list of soil layers, the number of indexed soil layers and the soil layers by layer id
+SoilLayerIndex = Tuple[List[PersistableSoilLayer], int, Dict[int, PersistableSoilLayer]]
+
 
 class DGeoflowObject(BaseModel, metaclass=abc.ABCMeta):
     @abc.abstractmethod
@@ -43,6 +49,7 @@ class DGeoflowModel(BaseModel):
     current_scenario: int = -1
     datastructure: DGeoflowStructure = DGeoflowStructure()
     current_id: int = -1
+    _soil_layer_indices: Dict[int, SoilLayerIndex] = PrivateAttr(default_factory=dict)
 
     def __init__(self, *args, **data) -> None:
         super().__init__(*args, **data)
@@ -63,11 +70,26 @@ class DGeoflowModel(BaseModel):
 
     def get_layer(self, scenario_id: int, layer_id: int) -> PersistableSoilLayer:
         """Enables easy access to the soil in the internal dict-like datastructure. Also enables edit/delete for individual soils."""
-        soillayers = self.datastructure.soillayers[scenario_id]
-        for layer in soillayers.SoilLayers:
-            if int(layer.LayerId) == layer_id:
-                return layer
-        raise ValueError(f"No soil layer found with layer id {layer_id}")
+        layer = self._get_soil_layer_index(scenario_id).get(layer_id)
+        if layer is None or int(layer.LayerId) != layer_id:
+            # the soil layers were modified other than by appending layers
+            self._soil_layer_indices.pop(scenario_id, None)
+            layer = self._get_soil_layer_index(scenario_id).get(layer_id)
+        if layer is None:
+            raise ValueError(f"No soil layer found with layer id {layer_id}")
+        return layer
+
+    def _get_soil_layer_index(self, scenario_id: int) -> Dict[int, PersistableSoilLayer]:
+        """Soil layers of a scenario by layer id. The index is kept and extended with the soil layers that were
+        appended since, it is rebuilt when the list of soil layers is replaced or shortened."""
+        soillayers = self.datastructure.soillayers[scenario_id].SoilLayers
+        indexed_soillayers, n_indexed, layers_by_id = self._soil_layer_indices.get(scenario_id, (None, 0, {}))
+        if indexed_soillayers is not soillayers or n_indexed > len(soillayers):
+            n_indexed, layers_by_id = 0, {}
+        for layer in soillayers[n_indexed:]:
+            layers_by_id.setdefault(int(layer.LayerId), layer)
+        self._soil_layer_indices[scenario_id] = (soillayers, len(soillayers), layers_by_id)
+        return layers_by_id
 
     def _get_next_id(self) -> int:
         self.current_id += 1
@@ -115,10 +137,21 @@ class DGeoflowModel(BaseModel):
     #
     #     raise ValueError(f"No result found for result id {scenario_id}")
 
-    def serialize(self, location: Union[FilePath, DirectoryPath]):
-        """Support serializing to directory while developing for debugging purposes."""
+    def serialize(
+        self,
+        location: Union[FilePath, DirectoryPath],
+        compression: int = ZIP_DEFLATED,
+        compresslevel: Optional[int] = None,
+    ):
+        """Support serializing to directory while developing for debugging purposes.
+
+        The compression and compresslevel of the archive are passed to ZipFile, use ZIP_STORED for a model that is
+        only serialized to be calculated.
+        """
         if not location.is_dir():
-            serializer = DGeoflowInputZipSerializer(ds=self.datastructure)
+            serializer = DGeoflowInputZipSerializer(
+                ds=self.datastructure, compression=compression, compresslevel=compresslevel
+            )
         else:
             serializer = DGeoflowInputSerializer(ds=self.datastructure)
         serializer.write(location)
@@ -243,6 +276,64 @@ class DGeoflowModel(BaseModel):
         soillayerscollection.add_soillayer(layer_id=persistable_layer.Id, soil_id=soil.id)
         return int(persistable_layer.Id)
 
+    def add_layers(
+        self,
+        polygons: List[List[Point]],
+        soil_codes: List[str],
+        element_size: Union[float, List[float]] = 1.0,
+        scenario_id: int = None,
+    ) -> List[int]:
+        """
+        Add soil layers to the model, each with a layer activation and mesh properties. Gives the same model as
+        add_layer, add_layeractivation and add_meshproperties per layer, but checks the scenario and soil codes once
+        and allocates the layer ids in a single block.
+
+        Args:
+            polygons (List[List[Point]]): per layer the list of Point classes of its polygon, see add_layer
+            soil_codes (List[str]): per layer the code of its soil
+            element_size: size of the mesh elements of all layers or per layer, defaults to 1.0
+            scenario_id (int): scenario to add to, defaults to 0
+
+        Returns:
+            List[int]: ids of the added layers
+        """
+        if len(polygons) != len(soil_codes):
+            raise ValueError(f"Got {len(polygons)} polygons, but {len(soil_codes)} soil codes.")
+        element_sizes = element_size if isinstance(element_size, list) else [element_size] * len(polygons)
+        if len(polygons) != len(element_sizes):
+            raise ValueError(f"Got {len(polygons)} polygons, but {len(element_sizes)} element sizes.")
+        scenario_id = scenario_id if scenario_id else self.current_scenario
+
+        if not self.datastructure.has_scenario(scenario_id):
+            raise IndexError(f"scenario {scenario_id} is not available")
+        geometry = self.datastructure.geometries[scenario_id]
+        soillayerscollection = self.datastructure.soillayers[scenario_id]
+        layeractivationscollection = self.datastructure.layer_activations[scenario_id]
+        meshpropertiescollection = self.datastructure.mesh_properties[scenario_id]
+
+        # do we have these soil codes?
+        # the first soil with a code is used, as in get_soil
+        soil_ids = {persistable_soil.Code: persistable_soil.Id for persistable_soil in reversed(self.soils.Soils)}
+        for soil_code in soil_codes:
+            if soil_code not in soil_ids:
+                raise ValueError(f"The soil with code {soil_code} is not defined in the soil collection.")
+
+        first_id = self.current_id + 1
+        self.current_id += len(polygons)
+
+        layer_ids = []
+        layers = zip(range(first_id, self.current_id + 1), polygons, soil_codes, element_sizes)
+        for layer_id, points, soil_code, layer_element_size in layers:
+            # the checks on the validity of the points are done in the PersistableLayer class
+            persistable_layer = geometry.add_layer(id=str(layer_id), label="", points=points, notes="")
+            soillayerscollection.add_soillayer(layer_id=persistable_layer.Id, soil_id=soil_ids[soil_code])
+            layeractivationscollection.add_layeractivation(layer_id=persistable_layer.Id)
+            meshpropertiescollection.add_meshproperty(
+                layer_id=persistable_layer.Id, element_size=layer_element_size, label=""
+            )
+            layer_ids.append(layer_id)
+        return layer_ids
+
     def add_layeractivation(self, scenario_id: int = None, layer_id: int = None) -> int:
         """
         Add a layer activation to the model
@@ -4,7 +4,10 @@ from datetime import datetime
 from io import BytesIO
 from os import makedirs
 from typing import Dict
+from typing import Iterator
 from typing import List
+from typing import Optional
+from typing import Tuple
 from typing import Union
 from typing import _GenericAlias
 from typing import get_type_hints
@@ -18,6 +21,7 @@ from pydantic import DirectoryPath
 from pydantic import FilePath
 from zipp import Path
 
+from ..serializers import serialize_json
 from .internal import DGeoflowStructure
 
 
@@ -50,6 +54,22 @@ class DGeoflowBaseSerializer(BaseSerializer, metaclass=ABCMeta):
 
         return serialized_datastructure
 
+    def serialize_files(self) -> Iterator[Tuple[str, bytes]]:
+        """Yields the path in the archive and the compact JSON of each structure, one structure at a time."""
+        for field, fieldtype in get_filtered_type_hints(self.ds):
+            # On List types, write a file per element in a folder
+            if type(fieldtype) == _GenericAlias:  # quite hacky
+                element_type, *_ = fieldtype.__args__  # use getargs in 3.8
+
+                folder = element_type.structure_group()
+                for i, data in enumerate(getattr(self.ds, field)):
+                    suffix = f"_{i}" if i > 0 else ""
+                    yield folder + "/" + element_type.structure_name() + suffix + ".json", serialize_json(data)
+
+            # Otherwise its a single .json in the root folder
+            else:
+                yield fieldtype.structure_name() + ".json", serialize_json(getattr(self.ds, field))
+
     @abstractmethod
     def write(self, path):
         raise NotConcreteError
@@ -80,21 +100,15 @@ class DGeoflowInputSerializer(DGeoflowBaseSerializer):
 class DGeoflowInputZipSerializer(DGeoflowBaseSerializer):
     """DStabilSerializer for zipped.stix files."""
 
+    compression: int = ZIP_DEFLATED
+    compresslevel: Optional[int] = None
+
     def write(self, filepath: Union[FilePath, BytesIO]) -> Union[FilePath, BytesIO]:
-        with ZipFile(filepath, mode="w", compression=ZIP_DEFLATED) as zip:
-            serialized_datastructure = self.serialize()
-
-            for filename, data in serialized_datastructure.items():
-
-                if isinstance(data, dict):
-                    folder = filename
-                    for ffilename, fdata in data.items():
-                        fn = folder + "/" + ffilename
-                        with zip.open(fn, "w") as io:
-                            io.write(fdata.encode("utf-8"))
-                else:
-                    with zip.open(filename, "w") as io:
-                        io.write(data.encode("utf-8"))
+        """Streams the compact JSON of the structures into the archive. Use compression ZIP_STORED for files that are
+        only written to be calculated, or a compresslevel to trade the size of the archive for speed."""
+        with ZipFile(filepath, mode="w", compression=self.compression, compresslevel=self.compresslevel) as zip:
+            for filename, data in self.serialize_files():
+                zip.writestr(filename, data)
 
             for zfile in zip.filelist:
                 zfile.create_system = 0
@@ -8,9 +8,12 @@ from abc import abstractclassmethod
 from abc import abstractmethod
 from itertools import groupby
 from math import isfinite
+from typing import Any
+from typing import Callable
 from typing import Dict
 from typing import Iterable
 from typing import List
+from typing import Optional
 from typing import Tuple
 from typing import Type
 from typing import Union
@@ -18,6 +21,7 @@ from typing import _GenericAlias
 from typing import _SpecialForm
 from typing import get_type_hints
 
+import numpy as np
 from geolib.errors import ParserError
 from geolib.models import BaseDataClass as DataClass
 from geolib.models.base_model_structure import BaseModelStructure
@@ -33,6 +37,15 @@ from .utils import unpack_if_union
 
 logger = logging.getLogger(__name__)
 
+# A line such as [GROUP A] or [END OF GROUP A], the key name is captured
+KEY_LINE_PATTERN = re.compile(r"^[^\S\n]*\[([^\n]*)\][^\S\n]*$", re.MULTILINE)
+
+# Per field: the function that parses a string body and the function that parses a list of strings body
+FieldParsers = Tuple[Optional[Callable[[str], Any]], Optional[Callable[[List[str]], Any]]]
+
+# Per DSeriesStructure class: its type hints and the parsers of the fields that can be parsed further
+_FIELD_PARSERS: Dict[type, Tuple[Dict[str, Type], Dict[str, FieldParsers]]] = {}
+
 
 class DSeriesStructure(BaseModelStructure):
     def __init__(self, *args, **kwargs):
@@ -65,9 +78,10 @@ class DSeriesStructure(BaseModelStructure):
         # Remove fields that are None so defaults will be used
         kwargs = {field: value for field, value in kwargs.items() if value is not None}
 
-        if len(kwargs) > len(get_type_hints(self)):
+        type_hints, field_parsers = self.get_field_parsers()
+        if len(kwargs) > len(type_hints):
             a = set(kwargs.keys())
-            b = set(get_type_hints(self).keys())
+            b = set(type_hints.keys())
             raise ValueError(
                 f"""Got more fields than defined on model {self.__class__.__name__}:
                 parser has {a.difference(b)} fields and
@@ -75,68 +89,40 @@ class DSeriesStructure(BaseModelStructure):
                 """
             )
 
-        for field, fieldtype in get_type_hints(self).items():
+        for field, (parse_text, parse_text_list) in field_parsers.items():
+            body = kwargs.get(field)
 
             # If the body is a string, we should check
             # whether we can parse it further.
-            if field in kwargs and isinstance(kwargs[field], str):
-                body = kwargs[field]
-
-                # Optional, Union, etc.
-                if is_union(fieldtype):
-                    fieldtype, *_ = get_args(fieldtype)
-
-                if is_list(fieldtype):
-                    fieldtype, *_ = get_args(fieldtype)
-
-                if hasattr(fieldtype, "is_parseable") and fieldtype.is_parseable():
-                    logger.debug(f"Changed {field} to {fieldtype}")
-                    kwargs[field] = fieldtype.parse_text(body)
-                else:
-                    if DataClass in fieldtype.__mro__:
-                        logger.debug(f"Can't parse {fieldtype} for {field} yet")
+            if isinstance(body, str):
+                if parse_text is not None:
+                    kwargs[field] = parse_text(body)
 
             # If the body is a List[string], we should check
             # whether we can parse it further.
-            elif (
-                field in kwargs
-                and isinstance(kwargs[field], list)
-                and len(kwargs[field]) > 0
-                and isinstance(kwargs[field][0], str)
-            ):
-                body = kwargs[field]
-
-                # We need to decompose a possible Union
-                if is_union(fieldtype):
-                    fieldtype, *_ = get_args(fieldtype)
-
-                # And then the list
-                if is_list(fieldtype):
-                    fieldtype, *_ = get_args(fieldtype)
-
-                    # Check whether we can parse and if so, parse the strings
-                    if hasattr(fieldtype, "is_parseable") and fieldtype.is_parseable():
-                        logger.debug(f"Changed {field} to multiple {fieldtype}")
-                        kwargs[field] = [fieldtype.parse_text(item) for item in body]
-                    else:
-                        if DataClass in fieldtype.__mro__:
-                            logger.debug(f"Can't parse {fieldtype} for {field} yet")
-
-                else:
-                    # Check whether we can parse and if so, parse the strings
-                    if hasattr(fieldtype, "is_parseable") and fieldtype.is_parseable():
-                        logger.debug(f"Changed {field} to single {fieldtype} for list of str.")
-                        kwargs[field] = fieldtype.parse_text(body)
-                    else:
-                        if DataClass in fieldtype.__mro__:
-                            logger.debug(f"Can't parse {fieldtype} for {field} yet")
-
-            else:
-                # Ignore other fields
-                continue
+            elif isinstance(body, list) and len(body) > 0 and isinstance(body[0], str):
+                if parse_text_list is not None:
+                    kwargs[field] = parse_text_list(body)
 
         super().__init__(**kwargs)
 
+    def get_field_parsers(self) -> Tuple[Dict[str, Type], Dict[str, FieldParsers]]:
+        """Returns the type hints of this class and, per field that can be parsed further, the function that parses
+        a string body and the function that parses a list of strings body. Both are resolved once per class from the
+        type hints and stored in _FIELD_PARSERS, such that nested structures with many instances do not resolve them
+        for every instance."""
+        if self.__class__ not in _FIELD_PARSERS:
+            type_hints = get_type_hints(self)
+            field_parsers = {}
+            for field, fieldtype in type_hints.items():
+                parsers = (get_text_parser(fieldtype), get_text_list_parser(fieldtype))
+                if parsers != (None, None):
+                    field_parsers[field] = parsers
+                else:
+                    logger.debug(f"Can't parse {fieldtype} for {field} yet")
+            _FIELD_PARSERS[self.__class__] = (type_hints, field_parsers)
+        return _FIELD_PARSERS[self.__class__]
+
     @staticmethod
     def is_parseable() -> bool:
         return True
@@ -264,6 +250,8 @@ class DSeriesTableStructure(DSeriesStructure):
             else:
                 lines = [split_line_elements(line) for line in text.split("\n") if line != ""]
                 cls.validate_number_of_rows(lines)
+        if has_float_values(cls.__fields__[cls.__name__.lower()].outer_type_):
+            lines = parse_float_rows(lines)
         lines = [dict(zip(columns, parts)) for parts in lines]
 
         d = {cls.__name__.lower(): lines}
@@ -352,6 +340,8 @@ class DSerieOldTableStructure(DSeriesStructure):
                         f"Error parsing for {cls}, header indicates {count} lines, while there are {len(lines)} lines."
                     )
 
+        if has_float_values(cls.__fields__[cls.__name__.lower()].outer_type_):
+            lines = parse_float_rows(lines)
         lines = [dict(zip(columns, parts)) for parts in lines]
         d = {cls.__name__.lower(): lines}
         return cls(**d)
@@ -420,6 +410,8 @@ class DSerieMatrixStructure(DSeriesStructure):
             raise ParserError(
                 f"Error parsing for {cls}, header indicates {ncol} columns, while there are {len(lines[0])} columns."
             )
+        if has_float_values(cls.__fields__[cls.__name__.lower()].outer_type_):
+            lines = parse_float_rows(lines)
         d = {cls.__name__.lower(): lines}
         return cls(**d)
 
@@ -1144,42 +1136,39 @@ class DSerieParser(BaseParser):
         Yields:
             Iterator[Iterable[Tuple[str, str]]]: Parsed Tuple[Property name, value]
         """
+        # The key lines are found in a single scan of the text, the data of a group is sliced from the text between
+        # its key lines instead of being concatenated line by line.
         currentkey = ""
-        data = ""
-        for i, line in enumerate(text_lines.split("\n")):
-            sline = line.strip()
-            # keyline
-            if sline.startswith("[") and sline.endswith("]"):
-                # [ key name ] => key_name
-                key = make_key(sline[1:-1])
-
-                # new group
-                if currentkey == "":
-                    currentkey = key
-                    data = ""
-
-                # duplicate group before end
-                elif currentkey == key and unique_keys:
-                    raise ValueError(
-                        f"Can't parse duplicate key {key} at line {i} without first encountering and END OF."
-                    )
-
-                # end of current group
-                elif key == "end_of_" + currentkey:
-                    yield currentkey, data.strip()
-                    data = ""
-                    currentkey = ""
-
-                # sub group that is eaten for now
-                else:
-                    data += line + "\n"
-
-            # dataline
-            else:
-                if currentkey:
-                    data += line + "\n"
-                elif not currentkey and loose_properties:
-                    yield (currentkey, line)
+        data_start = 0  # start of the data of the current group
+        loose_start = 0  # start of the text after the last group
+        for match in KEY_LINE_PATTERN.finditer(text_lines):
+            # [ key name ] => key_name
+            key = make_key(match.group(1))
+
+            # new group
+            if currentkey == "":
+                if loose_properties and match.start() > loose_start:
+                    for line in text_lines[loose_start : match.start() - 1].split("\n"):
+                        yield currentkey, line
+                currentkey = key
+                data_start = loose_start = match.end() + 1
+
+            # duplicate group before end
+            elif currentkey == key and unique_keys:
+                i = text_lines.count("\n", 0, match.start())
+                raise ValueError(f"Can't parse duplicate key {key} at line {i} without first encountering and END OF.")
+
+            # end of current group
+            elif key == "end_of_" + currentkey:
+                yield currentkey, text_lines[data_start : match.start()].strip()
+                currentkey = ""
+                loose_start = match.end() + 1
+
+            # other key lines are a sub group that is eaten for now
+
+        if currentkey == "" and loose_properties and loose_start <= len(text_lines):
+            for line in text_lines[loose_start:].split("\n"):
+                yield currentkey, line
 
     @staticmethod
     def parse_list_group(
@@ -1279,6 +1268,53 @@ class DSerieParser(BaseParser):
         return parsed_dict
 
 
+def get_parse_text(fieldtype: Type) -> Optional[Callable[[str], Any]]:
+    """Returns the parse_text method of a type that can be parsed, otherwise None"""
+    if hasattr(fieldtype, "is_parseable") and fieldtype.is_parseable():
+        return fieldtype.parse_text
+    return None
+
+
+def get_text_parser(fieldtype: Type) -> Optional[Callable[[str], Any]]:
+    """Returns the function that parses a string body of a field with this type hint. The first type of an Optional
+    or Union is used, a List is parsed as a single item."""
+    if is_union(fieldtype):
+        fieldtype, *_ = get_args(fieldtype)
+    if is_list(fieldtype):
+        fieldtype, *_ = get_args(fieldtype)
+    return get_parse_text(fieldtype)
+
+
+def get_text_list_parser(fieldtype: Type) -> Optional[Callable[[List[str]], Any]]:
+    """Returns the function that parses a list of strings body of a field with this type hint. Each string is parsed
+    separately for a List field, otherwise the whole list is handed to the parser of the field type."""
+    if is_union(fieldtype):
+        fieldtype, *_ = get_args(fieldtype)
+    if not is_list(fieldtype):
+        return get_parse_text(fieldtype)
+
+    parse_item = get_parse_text(get_args(fieldtype)[0])
+    if parse_item is None:
+        return None
+    return lambda body: [parse_item(item) for item in body]
+
+
+def has_float_values(fieldtype: Type) -> bool:
+    """Whether the innermost values of a (nested) List or Dict type hint are floats, e.g. List[Dict[str, float]]"""
+    while get_args(fieldtype):
+        fieldtype = get_args(fieldtype)[-1]
+    return fieldtype is float
+
+
+def parse_float_rows(rows: List[List[str]]) -> List[List[Any]]:
+    """Converts the rows of a numeric table to floats at once. When the rows can not be converted as a whole, because
+    they differ in length or contain text, they are returned as is and validated per value by the structure."""
+    try:
+        return np.array(rows, dtype=float).tolist()
+    except ValueError:
+        return rows
+
+
 def make_key(key: str) -> str:
     return (
         key.strip()
@@ -1306,7 +1342,9 @@ def split_line_elements(text: str) -> List[str]:
     Returns:
         List[str]: List of formatted values.
     """
-    # parts = re.split(" |\t", text.strip())
+    if '"' not in text and "'" not in text and "\\" not in text:
+        # without quotes or escapes shlex splits on whitespace only
+        return text.split()
     parts = shlex.split(text.strip())
     values = list(filter(lambda part: part != "", parts))
     return values
@@ -1,17 +1,31 @@
 from datetime import datetime
+from typing import Iterator
 
 from geolib import __version__ as glversion
 from geolib.models.serializers import BaseSerializer
 from jinja2 import Environment
 from jinja2 import PackageLoader
+from pydantic import FilePath
 
-ENV = Environment(loader=PackageLoader("geolib.models.dsettlement"), trim_blocks=True)
+from ..serializers import format_table
+
+# The templates are compiled once and kept in the cache of the environment, they are not checked for changes
+ENV = Environment(loader=PackageLoader(__package__), trim_blocks=True, auto_reload=False)
+ENV.filters["format_table"] = format_table
 
 
 class DSettlementInputSerializer(BaseSerializer):
     def render(self) -> str:
+        return "".join(self.generate())
+
+    def generate(self) -> Iterator[str]:
+        """Renders the input file in chunks, such that it can be written without holding the whole file in memory"""
         self.ds.update(dict(timestamp=datetime.now()))
         self.ds.update(dict(glversion=glversion))
         template = ENV.get_template("input.sli.j2")
 
-        return template.render(self.ds)
+        return template.generate(self.ds)
+
+    def write(self, filename: FilePath):
+        with open(filename, "w") as io:
+            io.writelines(self.generate())
@@ -8,6 +8,7 @@ from typing import Optional
 from typing import Set
 from typing import Type
 from typing import Union
+from zipfile import ZIP_DEFLATED
 
 from geolib.geometry import Point
 from geolib.models import BaseDataClass
@@ -171,10 +172,21 @@ class DStabilityModel(BaseModel):
         result = self._get_result_substructure(stage_id)
         return result.get_slipplane_output()
 
-    def serialize(self, location: Union[FilePath, DirectoryPath]):
-        """Support serializing to directory while developing for debugging purposes."""
+    def serialize(
+        self,
+        location: Union[FilePath, DirectoryPath],
+        compression: int = ZIP_DEFLATED,
+        compresslevel: Optional[int] = None,
+    ):
+        """Support serializing to directory while developing for debugging purposes.
+
+        The compression and compresslevel of the archive are passed to ZipFile, use ZIP_STORED for a model that is
+        only serialized to be calculated.
+        """
         if not location.is_dir():
-            serializer = DStabilityInputZipSerializer(ds=self.datastructure)
+            serializer = DStabilityInputZipSerializer(
+                ds=self.datastructure, compression=compression, compresslevel=compresslevel
+            )
         else:
             serializer = DStabilityInputSerializer(ds=self.datastructure)
         serializer.write(location)
@@ -300,6 +312,46 @@ class DStabilityModel(BaseModel):
         soillayerscollection.add_soillayer(layer_id=persistable_layer.Id, soil_id=soil.id)
         return int(persistable_layer.Id)
 
+    def add_layers(self, polygons: List[List[Point]], soil_codes: List[str], stage_id: int = None) -> List[int]:
+        """
+        Add soil layers to the model. Gives the same model as add_layer per layer, but checks the stage and soil
+        codes once and allocates the layer ids in a single block.
+
+        Args:
+            polygons (List[List[Point]]): per layer the list of Point classes of its polygon, see add_layer
+            soil_codes (List[str]): per layer the code of its soil
+            stage_id (int): stage to add to, defaults to 0
+
+        Returns:
+            List[int]: ids of the added layers
+        """
+        if len(polygons) != len(soil_codes):
+            raise ValueError(f"Got {len(polygons)} polygons, but {len(soil_codes)} soil codes.")
+        stage_id = stage_id if stage_id else self.current_stage
+        if not self.datastructure.has_stage(stage_id):
+            raise IndexError(f"stage {stage_id} is not available")
+
+        geometry = self.datastructure.geometries[stage_id]
+        soillayerscollection = self.datastructure.soillayers[stage_id]
+
+        # do we have these soil codes?
+        # the first soil with a code is used, as in get_soil
+        soil_ids = {persistable_soil.Code: persistable_soil.Id for persistable_soil in reversed(self.soils.Soils)}
+        for soil_code in soil_codes:
+            if soil_code not in soil_ids:
+                raise ValueError(f"The soil with code {soil_code} is not defined in the soil collection.")
+
+        first_id = self.current_id + 1
+        self.current_id += len(polygons)
+
+        layer_ids = []
+        for layer_id, points, soil_code in zip(range(first_id, self.current_id + 1), polygons, soil_codes):
+            # the checks on the validity of the points are done in the PersistableLayer class
+            persistable_layer = geometry.add_layer(id=str(layer_id), label="", points=points, notes="")
+            soillayerscollection.add_soillayer(layer_id=persistable_layer.Id, soil_id=soil_ids[soil_code])
+            layer_ids.append(layer_id)
+        return layer_ids
+
     def add_head_line(
         self,
         points: List[Point],
@@ -1,7 +1,11 @@
 from typing import Any
 from typing import Dict
+from typing import Mapping
+from typing import Sequence
 
+import orjson
 from geolib.models import BaseDataClass
+from pydantic import BaseModel
 from pydantic import FilePath
 
 
@@ -17,3 +21,30 @@ class BaseSerializer(BaseDataClass):
         """Test."""
         with open(filename, "w") as io:
             io.write(self.render())
+
+
+def serialize_json(data: BaseModel) -> bytes:
+    """Compact UTF-8 JSON of a pydantic structure. The values that orjson can not encode itself are encoded by the JSON
+    encoder that pydantic caches on the class of the structure, as `data.json()` does."""
+    return orjson.dumps(data.dict(), default=data.__json_encoder__)
+
+
+def get_table_value(row: Mapping[str, Any], key: str) -> Any:
+    """Value of a table row for a key, a dotted key selects a list item or a nested field, e.g. `points.0`"""
+    value = row
+    for part in key.split("."):
+        value = value[int(part)] if isinstance(value, (list, tuple)) else value[part]
+    return value
+
+
+def format_table(rows: Sequence[Mapping[str, Any]], row_format: str, *keys: str) -> str:
+    """Formats the values of `keys` of all rows with the printf-style `row_format` in a single operation, each row is
+    followed by a newline. The values keep their type, so integers are formatted as integers.
+
+    Used as template filter for long tables, e.g. `points|format_table('%8d%15.3f', 'id', 'X')` or
+    `curves|format_table('%10d%6d', 'points.0', 'points.1')`.
+    """
+    if not rows:
+        return ""
+    values = tuple(get_table_value(row, key) for row in rows for key in keys)
+    return (row_format + "\n") * len(rows) % values
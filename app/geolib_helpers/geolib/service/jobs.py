@@ -0,0 +1,233 @@
+"""
+Asynchronous calculation jobs of the GEOLib webservice.
+
+A submitted model becomes a job in a bounded queue that is processed by a fixed number of workers, the client
+receives a job id and polls for the result. Results are cached by the hash of the model input, such that an identical
+submission is answered without running the console again. An identical model that is submitted while the first one is
+still waiting or running gets the job of the first one.
+"""
+import asyncio
+import json
+import shutil
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from dataclasses import field
+from enum import Enum
+from pathlib import Path
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Sequence
+from typing import Type
+
+from fastapi import APIRouter
+from fastapi import HTTPException
+from geolib.models import BaseModel
+from geolib.models.meta import MetaData
+from pydantic import conlist
+from starlette import status
+
+from ..models.base_model import get_model_key
+
+
+class JobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    FINISHED = "finished"
+    FAILED = "failed"
+
+
+@dataclass
+class Job:
+    job_id: str
+    key: str
+    model: Optional[BaseModel]
+    status: JobStatus = JobStatus.QUEUED
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    done: asyncio.Event = field(default_factory=asyncio.Event)
+
+    def finish(self, result: Dict[str, Any]):
+        self.model, self.result, self.status = None, result, JobStatus.FINISHED
+        self.done.set()
+
+    def fail(self, error: str):
+        self.model, self.error, self.status = None, error, JobStatus.FAILED
+        self.done.set()
+
+    def to_response(self) -> Dict[str, Any]:
+        response = {"job_id": self.job_id, "status": self.status}
+        if self.status == JobStatus.FINISHED:
+            response["model"] = self.result
+        elif self.status == JobStatus.FAILED:
+            response["message"] = self.error
+        return response
+
+
+class QueueFullError(Exception):
+    """Raised when a submission does not fit in the job queue"""
+
+
+def calculate_model(model: BaseModel, settings: MetaData) -> BaseModel:
+    """Serialize the model into a new folder in the calculation folder, execute it with the console of the service
+    and remove the folder afterwards"""
+    unique_id = str(uuid.uuid4())
+    unique_folder = Path(settings.calculation_folder / unique_id).absolute()
+    unique_folder.mkdir(parents=True, exist_ok=True)
+    ext = model.parser_provider_type().input_parsers[0].suffix_list[0]
+    model.serialize(unique_folder / f"{unique_id}{ext}")
+
+    # Override console folder from client
+    model.meta.console_folder = settings.console_folder
+    try:
+        return model.execute(timeout_in_seconds=settings.timeout)
+    finally:
+        shutil.rmtree(unique_folder, ignore_errors=True)
+
+
+class JobQueue:
+    """Queue of calculation jobs processed by `n_workers` workers. Submissions are refused when `max_queued_jobs` jobs
+    are waiting, the results of the last `max_cached_results` distinct models are kept."""
+
+    def __init__(
+        self,
+        calculate: Callable[[BaseModel], BaseModel],
+        n_workers: int = 1,
+        max_queued_jobs: int = 100,
+        max_cached_results: int = 1000,
+    ):
+        self.calculate = calculate
+        self.n_workers = n_workers
+        self.max_queued_jobs = max_queued_jobs
+        self.max_cached_results = max_cached_results
+        self.jobs: Dict[str, Job] = {}
+        self.pending_jobs: Dict[str, Job] = {}  # the queued and running job of every model key
+        self.results: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    async def start(self):
+        self._queue = asyncio.Queue(maxsize=self.max_queued_jobs)
+        self._executor = ThreadPoolExecutor(max_workers=self.n_workers)
+        self._workers = [asyncio.ensure_future(self._work()) for _ in range(self.n_workers)]
+
+    async def stop(self):
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._executor.shutdown(wait=True)
+        self._workers = []
+
+    def submit(self, models: Sequence[BaseModel]) -> List[Job]:
+        """Return a job per model. A model of which the result is cached is finished immediately, identical models
+        share a single job and the other models are queued. Either all models are accepted or a QueueFullError is
+        raised."""
+        self._forget_finished_jobs()
+        jobs, queued_jobs = [], {}
+        for model in models:
+            key = get_model_key(model)
+            job = self.pending_jobs.get(key) or queued_jobs.get(key)
+            if job is None:
+                job = Job(job_id=uuid.uuid4().hex, key=key, model=model)
+                if key not in self.results:
+                    queued_jobs[key] = job
+            jobs.append(job)
+        if self._queue.qsize() + len(queued_jobs) > self.max_queued_jobs:
+            raise QueueFullError(f"The job queue is full, {self._queue.qsize()} jobs are waiting.")
+
+        for job in jobs:
+            if job.job_id in self.jobs:
+                continue
+            self.jobs[job.job_id] = job
+            if job.key in queued_jobs:
+                self.pending_jobs[job.key] = job
+                self._queue.put_nowait(job)
+            else:
+                job.finish(self._get_cached_result(job.key))
+        return jobs
+
+    def get(self, job_id: str) -> Job:
+        return self.jobs[job_id]
+
+    def _forget_finished_jobs(self):
+        """Keep the finished jobs of at most `max_cached_results` submissions, the oldest are forgotten first"""
+        finished_job_ids = [job_id for job_id, job in self.jobs.items() if job.done.is_set()]
+        for job_id in finished_job_ids[: max(0, len(finished_job_ids) - self.max_cached_results)]:
+            del self.jobs[job_id]
+
+    def _get_cached_result(self, key: str) -> Dict[str, Any]:
+        self.results.move_to_end(key)
+        return self.results[key]
+
+    def _cache_result(self, key: str, result: Dict[str, Any]):
+        self.results[key] = result
+        if len(self.results) > self.max_cached_results:
+            self.results.popitem(last=False)
+
+    async def _work(self):
+        loop = asyncio.get_event_loop()
+        while True:
+            job = await self._queue.get()
+            try:
+                # an identical model may have been calculated while this job was waiting
+                if job.key in self.results:
+                    job.finish(self._get_cached_result(job.key))
+                    continue
+                job.status = JobStatus.RUNNING
+                try:
+                    output = await loop.run_in_executor(self._executor, self.calculate, job.model)
+                except Exception as e:  # pylint: disable=broad-except
+                    # a failed calculation must not stop the worker
+                    job.fail(str(e))
+                else:
+                    result = json.loads(output.json())
+                    # remove possibly invalid external metadata
+                    result.get("meta", {}).pop("console_folder", None)
+                    self._cache_result(job.key, result)
+                    job.finish(result)
+            finally:
+                self.pending_jobs.pop(job.key, None)
+                self._queue.task_done()
+
+
+def create_job_router(model_types: Dict[str, Type[BaseModel]], get_job_queue: Callable[[], JobQueue]) -> APIRouter:
+    """Routes to submit a model (`POST /jobs/<model name>`) or a batch of models (`POST /jobs/<model name>s`) and to
+    poll a job (`GET /jobs/<job id>`). Polling with `wait` > 0 waits at most `wait` seconds for the job to finish."""
+    router = APIRouter()
+
+    def submit(models: Sequence[BaseModel]) -> List[Dict[str, Any]]:
+        try:
+            jobs = get_job_queue().submit(models)
+        except QueueFullError as e:
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
+        return [job.to_response() for job in jobs]
+
+    for name, model_type in model_types.items():
+
+        @router.post(f"/jobs/{name}", status_code=status.HTTP_202_ACCEPTED, name=f"submit_{name}")
+        async def submit_job(model: model_type) -> Dict[str, Any]:
+            return submit([model])[0]
+
+        @router.post(f"/jobs/{name}s", status_code=status.HTTP_202_ACCEPTED, name=f"submit_{name}s")
+        async def submit_jobs(models: conlist(model_type, min_items=1)) -> List[Dict[str, Any]]:
+            return submit(models)
+
+    @router.get("/jobs/{job_id}")
+    async def get_job(job_id: str, wait: float = 0) -> Dict[str, Any]:
+        try:
+            job = get_job_queue().get(job_id)
+        except KeyError:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Unknown job {job_id}")
+        if wait > 0:
+            try:
+                await asyncio.wait_for(job.done.wait(), timeout=wait)
+            except asyncio.TimeoutError:
+                pass
+        return job.to_response()
+
+    return router
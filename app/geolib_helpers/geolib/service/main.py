@@ -1,6 +1,7 @@
 import secrets
 import shutil
 import uuid
+from functools import partial
 from pathlib import Path
 from pathlib import PosixPath
 from pathlib import WindowsPath
@@ -29,6 +30,10 @@ from pydantic import conlist
 from starlette import status
 from starlette.responses import JSONResponse
 
+from .jobs import JobQueue
+from .jobs import calculate_model
+from .jobs import create_job_router
+
 # Fixes for custom serialization
 pydantic.json.ENCODERS_BY_TYPE[Path] = str
 pydantic.json.ENCODERS_BY_TYPE[PosixPath] = str
@@ -37,6 +42,13 @@ pydantic.json.ENCODERS_BY_TYPE[WindowsPath] = str
 settings = MetaData()
 app = FastAPI()
 security = HTTPBasic()
+job_queue = JobQueue(partial(calculate_model, settings=settings), n_workers=settings.nprocesses, max_queued_jobs=100)
+MODEL_TYPES = {
+    "dsettlementmodel": DSettlementModel,
+    "dfoundationsmodel": DFoundationsModel,
+    "dsheetpilingmodel": DSheetPilingModel,
+    "dstabilitymodel": DStabilityModel,
+}
 
 
 def get_current_username(credentials: HTTPBasicCredentials = Depends(security)):
@@ -51,6 +63,19 @@ def get_current_username(credentials: HTTPBasicCredentials = Depends(security)):
     return credentials.username
 
 
+app.include_router(create_job_router(MODEL_TYPES, lambda: job_queue), dependencies=[Depends(get_current_username)])
+
+
+@app.on_event("startup")
+async def start_job_queue():
+    await job_queue.start()
+
+
+@app.on_event("shutdown")
+async def stop_job_queue():
+    await job_queue.stop()
+
+
 @app.get("/users/me")
 def read_current_user(username: str = Depends(get_current_username)):
     return {"username": username}
@@ -0,0 +1,175 @@
+from dataclasses import dataclass
+from dataclasses import replace
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+from typing import Union
+
+import numpy as np
+from munch import Munch
+
+from viktor.geo import SoilLayout
+
+LAYER_GROUPS = ("cover_layer", "first_aquifer", "intermediate", "second_aquifer")
+
+
+def _read_only(values: np.ndarray) -> np.ndarray:
+    """Return the array with the writeable flag switched off, such that a view can be shared between layouts"""
+    values.flags.writeable = False
+    return values
+
+
+@dataclass(frozen=True, eq=False)
+class ArraySoilLayout:
+    """Immutable soil layout stored column-wise: NumPy arrays with the top and bottom of the layers and an index into
+    the serialized soils. The properties of the layers are shared between the layouts derived from it and are never
+    modified, such that cutting, slicing and combining layouts does not need to copy them.
+
+    Convert to a VIKTOR SoilLayout with `to_soil_layout` only when the layout is displayed or stored.
+    """
+
+    top_of_layer: np.ndarray
+    bottom_of_layer: np.ndarray
+    soil_index: np.ndarray
+    soils: Tuple[dict, ...]
+    properties: Tuple[dict, ...]
+
+    @classmethod
+    def from_layers(
+        cls, top_of_layer, bottom_of_layer, soil_index, soils: Tuple[dict, ...], properties: Tuple[dict, ...]
+    ) -> "ArraySoilLayout":
+        return cls(
+            top_of_layer=_read_only(np.asarray(top_of_layer, dtype=float)),
+            bottom_of_layer=_read_only(np.asarray(bottom_of_layer, dtype=float)),
+            soil_index=_read_only(np.asarray(soil_index, dtype=int)),
+            soils=tuple(soils),
+            properties=tuple(properties),
+        )
+
+    @classmethod
+    def from_dict(cls, soil_layout: Union[dict, Munch]) -> "ArraySoilLayout":
+        """Build the layout from a serialized SoilLayout, the soils with the same name are stored once"""
+        soil_indices, soils = {}, []
+        top_of_layer, bottom_of_layer, soil_index, properties = [], [], [], []
+        for layer in soil_layout["layers"]:
+            soil = layer["soil"]
+            if soil["name"] not in soil_indices:
+                soil_indices[soil["name"]] = len(soils)
+                soils.append(soil)
+            top_of_layer.append(layer["top_of_layer"])
+            bottom_of_layer.append(layer["bottom_of_layer"])
+            soil_index.append(soil_indices[soil["name"]])
+            properties.append(layer["properties"])
+        return cls.from_layers(top_of_layer, bottom_of_layer, soil_index, tuple(soils), tuple(properties))
+
+    @classmethod
+    def from_soil_layout(cls, soil_layout: SoilLayout) -> "ArraySoilLayout":
+        return cls.from_dict(soil_layout.serialize())
+
+    @property
+    def number_of_layers(self) -> int:
+        return len(self.top_of_layer)
+
+    @property
+    def thickness(self) -> np.ndarray:
+        return self.top_of_layer - self.bottom_of_layer
+
+    @property
+    def aquifer(self) -> np.ndarray:
+        return np.array([bool(properties.get("aquifer")) for properties in self.properties], dtype=bool)
+
+    @property
+    def soil_names(self) -> List[str]:
+        return [self.soils[index]["name"] for index in self.soil_index.tolist()]
+
+    def get_property(self, name: str) -> np.ndarray:
+        """Return a layer property as a float array, a missing property is nan"""
+        values = [properties.get(name) for properties in self.properties]
+        return np.array([np.nan if value is None else value for value in values], dtype=float)
+
+    def select(self, layers: slice) -> "ArraySoilLayout":
+        """Return the layout of a slice of the layers, its arrays are views on the arrays of this layout"""
+        return ArraySoilLayout(
+            top_of_layer=self.top_of_layer[layers],
+            bottom_of_layer=self.bottom_of_layer[layers],
+            soil_index=self.soil_index[layers],
+            soils=self.soils,
+            properties=self.properties[layers],
+        )
+
+    def cut_at_z(self, z: float) -> "ArraySoilLayout":
+        """Cut the layout at level z: the layers above z are removed and the top of the layer at z is set to z. When z
+        lies above the layout, the first layer is extended up to z. When z is nan, the layout is returned unchanged."""
+        if np.isnan(z) or self.number_of_layers == 0:
+            return self
+        below_next_top = z > self.top_of_layer[1:]
+        if not below_next_top.any():
+            return self.select(slice(self.number_of_layers - 1, None))
+        index = int(np.argmax(below_next_top))
+        top_of_layer = self.top_of_layer[index:].copy()
+        top_of_layer[0] = z
+        return replace(self.select(slice(index, None)), top_of_layer=_read_only(top_of_layer))
+
+    def get_group_slices(self) -> Dict[str, slice]:
+        """Slices of the consecutive layers of the cover layer, first aquifer, intermediate aquitard and second aquifer,
+        see group_layers. A group that is not present is an empty slice."""
+        aquifer = self.aquifer
+        run_starts = np.flatnonzero(np.diff(aquifer.astype(int))) + 1
+        run_bounds = list(zip([0, *run_starts.tolist()], [*run_starts.tolist(), len(aquifer)]))
+        if not aquifer.any() or not aquifer[0]:
+            runs = run_bounds
+        else:
+            runs = [(0, 0), *run_bounds]  # no cover layer
+        group_slices = {group: slice(0, 0) for group in LAYER_GROUPS}
+        for group, (start, stop) in zip(LAYER_GROUPS, runs):
+            group_slices[group] = slice(start, stop)
+        return group_slices
+
+    def get_layer_groups(self) -> Dict[str, "ArraySoilLayout"]:
+        return {group: self.select(group_slice) for group, group_slice in self.get_group_slices().items()}
+
+    def serialize_layers(self, aquifer_index: Optional[int] = None) -> List[dict]:
+        """Serialize the layers in the format of SoilLayer.serialize. The properties are copied, such that the result
+        can be modified.
+        :param aquifer_index: when given, only this layer is flagged as aquifer
+        """
+        layers = []
+        for i, (top, bottom, soil_index, properties) in enumerate(
+            zip(self.top_of_layer.tolist(), self.bottom_of_layer.tolist(), self.soil_index.tolist(), self.properties)
+        ):
+            properties = dict(properties)
+            if aquifer_index is not None:
+                properties["aquifer"] = i == aquifer_index
+            layers.append(
+                {
+                    "soil": self.soils[soil_index],
+                    "top_of_layer": top,
+                    "bottom_of_layer": bottom,
+                    "properties": properties,
+                }
+            )
+        return layers
+
+    def serialize_layers_per_aquifer(self) -> List[List[dict]]:
+        """Return the serialized layers once per aquifer, each time with only that aquifer flagged. A layout with one or
+        no aquifer is returned once, unchanged."""
+        aquifer_indices = np.flatnonzero(self.aquifer).tolist()
+        if len(aquifer_indices) <= 1:
+            return [self.serialize_layers()]
+        return [self.serialize_layers(aquifer_index) for aquifer_index in aquifer_indices]
+
+    def serialize(self) -> dict:
+        return {"layers": self.serialize_layers()}
+
+    def to_soil_layout(self) -> SoilLayout:
+        return SoilLayout.from_dict(self.serialize())
+
+
+def as_array_soil_layout(soil_layout: Union[ArraySoilLayout, SoilLayout, dict, Munch]) -> ArraySoilLayout:
+    """Return the soil layout as ArraySoilLayout, a serialized SoilLayout or a SoilLayout is converted"""
+    if isinstance(soil_layout, ArraySoilLayout):
+        return soil_layout
+    if isinstance(soil_layout, SoilLayout):
+        return ArraySoilLayout.from_soil_layout(soil_layout)
+    return ArraySoilLayout.from_dict(soil_layout)
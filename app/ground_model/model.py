@@ -25,6 +25,8 @@ from shapely.geometry import LineString
 from shapely.geometry import MultiPoint
 from shapely.geometry import Point
 
+from app.ground_model.array_soil_layout import ArraySoilLayout
+from app.ground_model.array_soil_layout import as_array_soil_layout
 from app.ground_model.constants import AQUIFER_TNO_SOIL_CODES
 from app.ground_model.constants import COVER_LAYER_COLOR
 from app.ground_model.constants import FIRST_AQUIFER_COLOR
@@ -393,58 +395,6 @@ def classify_tno_soil_model(
     return SoilLayout(base_soil_layers)
 
 
-def generate_layouts_per_aquifer(base_soil_layers: List[SoilLayer]) -> List[List[SoilLayer]]:
-    """
-    The base_soil_layers is a soil layout for which multiple layers are considered as aquifer (2 max). This function
-     returns a collection of soil layouts which contains only one aquifer.
-     Example:
-
-     This base_soil_layers         results in 2 layouts:
-
-
-     layer | aquifer |                       layer | aquifer                         layer | aquifer
-     --------------------                   -----------------                       ------------------
-       1   |  False  |                           1  | False                             1   |  False
-       2   |  True   |                           2  | True            and               2   |  False
-       3   |  False  |                           3  |  False                            3   |  False
-       4   |  True   |                           4  |  False                            4   |  True
-
-    :param base_soil_layers: List of SoilLayers
-    :return:
-    """
-    # if the base soil layers has only one aquifer, it is unnecessary to deepcopy (it saves some memory)
-    if has_single_aquifer(base_soil_layers):
-        return [base_soil_layers]
-    list_duplicated_layouts = []
-    soil_layers_copy = deepcopy(base_soil_layers)
-    for layer in soil_layers_copy:
-        layer.properties.aquifer = False
-
-    has_aquifer = False
-    for index, layer in enumerate(base_soil_layers):
-        if layer.properties.aquifer:
-            has_aquifer = True
-            copy_soil_layer = deepcopy(soil_layers_copy)
-            copy_soil_layer[index].properties.aquifer = True
-            list_duplicated_layouts.append(copy_soil_layer)
-
-    if not has_aquifer:  # Fallback when the original soil layout does not have an aquifer.
-        list_duplicated_layouts.append(soil_layers_copy)
-
-    return list_duplicated_layouts
-
-
-def has_single_aquifer(base_soil_layout: List[SoilLayer]) -> bool:
-    """Return True is the base_soil_layout has one or no aquifer, and false otherwise."""
-    counter = 0
-    for layer in base_soil_layout:
-        if layer.properties.aquifer:
-            counter += 1
-    if counter in [0, 1]:
-        return True
-    return False
-
-
 def check_aquifer_thickness(layers: List[SoilLayer], minimal_aquifer_thickness: float):
     """
     Checks if the permeables soil layers are thick enough to be considered an aquifer based on a threshold value and updates the SoilLayer properties accordingly
@@ -711,37 +661,22 @@ def calc_effective_aquifer_permeability(layers: List[SoilLayer]) -> float:
 
 
 def agglomerate_repr_soil_layer(
-    layer_list: List[SoilLayer], soil: Soil, aquifer_params: Optional[Munch] = None
-) -> SoilLayer:
-    """Agglomerate a list of grouped SoilLayer into a single SoilLayer. The effective 'average' properties of the
-    agglomerated layer depends on its nature: whether it's an aquifer or not
-    :param layer_list: List of grouped SoilLayers that must be agglomerated
+    layers: ArraySoilLayout, soil: Soil, aquifer_params: Optional[Munch] = None
+) -> Dict[str, Any]:
+    """Agglomerate a group of consecutive layers into a single serialized SoilLayer. The effective 'average' properties
+    of the agglomerated layer depends on its nature: whether it's an aquifer or not
+    :param layers: view on the grouped layers that must be agglomerated
     :param soil: Soil object to be assigned to the agglomerated SoilLayer
     :param aquifer_params: aquifer parameters to be added to the properties of the agglomerated SoilLayer when relevant
     """
-
+    gamma_dry = np.nanmean(layers.get_property("gamma_dry"))
+    gamma_wet = np.nanmean(layers.get_property("gamma_wet"))
     if aquifer_params is None:
         properties = {
-            "vertical_permeability": mean(
-                [
-                    layer.properties.vertical_permeability
-                    for layer in layer_list
-                    if layer.properties.vertical_permeability is not None
-                ]
-            ),
-            "horizontal_permeability": mean(
-                [
-                    layer.properties.horizontal_permeability
-                    for layer in layer_list
-                    if layer.properties.horizontal_permeability is not None
-                ]
-            ),
-            "gamma_dry": mean(
-                [layer.properties.gamma_dry for layer in layer_list if layer.properties.gamma_dry is not None]
-            ),
-            "gamma_wet": mean(
-                [layer.properties.gamma_wet for layer in layer_list if layer.properties.gamma_wet is not None]
-            ),
+            "vertical_permeability": np.nanmean(layers.get_property("vertical_permeability")),
+            "horizontal_permeability": np.nanmean(layers.get_property("horizontal_permeability")),
+            "gamma_dry": gamma_dry,
+            "gamma_wet": gamma_wet,
             "grain_size_d70": None,
             "aquifer": False,
         }
@@ -749,24 +684,22 @@ def agglomerate_repr_soil_layer(
         properties = {
             "vertical_permeability": aquifer_params.permeability,
             "horizontal_permeability": aquifer_params.permeability,
-            "gamma_dry": mean(
-                [layer.properties.gamma_dry for layer in layer_list if layer.properties.gamma_dry is not None]
-            ),
-            "gamma_wet": mean(
-                [layer.properties.gamma_wet for layer in layer_list if layer.properties.gamma_wet is not None]
-            ),
+            "gamma_dry": gamma_dry,
+            "gamma_wet": gamma_wet,
             "grain_size_d70": aquifer_params.d70,
             "aquifer": True,
         }
     return SoilLayer(
-        top_of_layer=layer_list[0].top_of_layer,
-        bottom_of_layer=layer_list[-1].bottom_of_layer,
+        top_of_layer=float(layers.top_of_layer[0]),
+        bottom_of_layer=float(layers.bottom_of_layer[-1]),
         properties=properties,
         soil=soil,
-    )
+    ).serialize()
 
 
-def build_simplified_1d_rep_soil_layout(base_soil_layout: SoilLayout, aquifer_params: Munch) -> SoilLayout:
+def build_simplified_1d_rep_soil_layout(
+    base_soil_layout: Union[SoilLayout, ArraySoilLayout], aquifer_params: Munch
+) -> SoilLayout:
     """Return a 1d representative SoilLayout which is simplified into 4 layers: cover_layer, first_aquifer,
     intermediate_aquitard and second_aquifer. This simplified SoilLayout is built from a base soil layout and the
     aquifer parameters defined by the user in the segment parametrization.
@@ -775,10 +708,16 @@ def build_simplified_1d_rep_soil_layout(base_soil_layout: SoilLayout, aquifer_pa
     :param aquifer_params: dict-like structure with the user input properties of the aquifers: {'first_aquifer': {
     'permeability': 123, 'd70': 200}, 'second_aquifer': {'is_second_aquifer': True, ...}}
     """
+    return build_simplified_1d_rep_array_layout(as_array_soil_layout(base_soil_layout), aquifer_params).to_soil_layout()
+
+
+def build_simplified_1d_rep_array_layout(base_soil_layout: ArraySoilLayout, aquifer_params: Munch) -> ArraySoilLayout:
+    """Array counterpart of build_simplified_1d_rep_soil_layout, the layers of every group are agglomerated from a view
+    on the base soil layout."""
     output_layers = []
-    grouped_layers = group_layers(base_soil_layout)
+    grouped_layers = base_soil_layout.get_layer_groups()
     cover_layers = grouped_layers["cover_layer"]
-    if cover_layers:
+    if cover_layers.number_of_layers:
         output_layers.append(
             agglomerate_repr_soil_layer(
                 cover_layers, soil=Soil(name="cover_layer", color=COVER_LAYER_COLOR, properties={"ui_name": "Deklaag"})
@@ -786,7 +725,7 @@ def build_simplified_1d_rep_soil_layout(base_soil_layout: SoilLayout, aquifer_pa
         )
 
     first_aquifer_layers = grouped_layers["first_aquifer"]
-    if first_aquifer_layers:
+    if first_aquifer_layers.number_of_layers:
         output_layers.append(
             agglomerate_repr_soil_layer(
                 first_aquifer_layers,
@@ -796,7 +735,7 @@ def build_simplified_1d_rep_soil_layout(base_soil_layout: SoilLayout, aquifer_pa
         )
 
     intermediate_layers = grouped_layers["intermediate"]
-    if intermediate_layers:
+    if intermediate_layers.number_of_layers:
         output_layers.append(
             agglomerate_repr_soil_layer(
                 intermediate_layers,
@@ -809,7 +748,7 @@ def build_simplified_1d_rep_soil_layout(base_soil_layout: SoilLayout, aquifer_pa
         )
 
     second_aquifer_layers = grouped_layers["second_aquifer"]
-    if aquifer_params.second_aquifer.is_second_aquifer and second_aquifer_layers:
+    if aquifer_params.second_aquifer.is_second_aquifer and second_aquifer_layers.number_of_layers:
         output_layers.append(
             agglomerate_repr_soil_layer(
                 second_aquifer_layers,
@@ -817,62 +756,68 @@ def build_simplified_1d_rep_soil_layout(base_soil_layout: SoilLayout, aquifer_pa
                 aquifer_params=aquifer_params.second_aquifer,
             )
         )
-    return SoilLayout(output_layers)
+    return ArraySoilLayout.from_dict({"layers": output_layers})
 
 
 def build_combined_rep_and_exit_point_layout(
-    exit_point_layout: Munch, representative_segment_layout: SoilLayout
-) -> SoilLayout:
+    exit_point_layout: Union[Munch, ArraySoilLayout], representative_segment_layout: Union[SoilLayout, ArraySoilLayout]
+) -> ArraySoilLayout:
     """
-    Build a combined SoilLayout from the simplified representative SoilLayout of the segment (dijkvak) modified at the
-    location of an exit point. The returned SoilLayout keeps the properties of the first aquifer and of all the layers
-    below, the cover layer is obtained from the SoilLayout of the exit point.
+    Build a combined soil layout from the simplified representative SoilLayout of the segment (dijkvak) modified at the
+    location of an exit point. The returned layout keeps the properties of the first aquifer and of all the layers
+    below, the cover layer is obtained from the SoilLayout of the exit point. The layers below the cover are views on
+    the representative layout, shifted with array arithmetic.
     :param exit_point_layout: serialized SoilLayout at the exit point
     :param representative_segment_layout: simplified representative SoilLayout of the segment (dijkvak)
     :return:
     """
-    # Adapt the first cover layer of the rep layout with the exit point
-    rep_layout = deepcopy(representative_segment_layout)
-    if len(representative_segment_layout.layers) <= 1:
+    rep_layout = as_array_soil_layout(representative_segment_layout)
+    if rep_layout.number_of_layers <= 1:
         raise UserException("The dijkvak does not have an aquifer")  # TODO TRANSLATE
-    exit_point_bottom_cover_layer = exit_point_layout.get("layers")[-1].get("bottom_of_layer")
-    gamma_dry, gamma_wet, k_ver, k_h, thicknesses = [], [], [], [], []
-    for layer in exit_point_layout.get("layers"):
-        if layer["properties"]["aquifer"]:
-            break
-        thicknesses.append(layer.top_of_layer - layer.bottom_of_layer)
-        exit_point_bottom_cover_layer = layer.get("bottom_of_layer")
-        gamma_dry.append(layer["properties"].get("gamma_dry"))
-        gamma_wet.append(layer["properties"].get("gamma_wet"))
-        k_ver.append(layer["properties"].get("vertical_permeability"))
-        k_h.append(layer["properties"].get("horizontal_permeability"))
-
-    cover_layer = SoilLayer(
-        top_of_layer=exit_point_layout.get("layers")[0].get("top_of_layer"),
-        bottom_of_layer=exit_point_bottom_cover_layer,
-        soil=representative_segment_layout.layers[0].soil,
-        properties={
-            "gamma_dry": safe_execute_average(nan, gamma_dry, thicknesses),
-            "gamma_wet": safe_execute_average(nan, gamma_wet, thicknesses),
-            "vertical_permeability": safe_execute_average(nan, k_ver, thicknesses),
-            "horizontal_permeability": safe_execute_average(nan, k_h, thicknesses),
-            "aquifer": False,
-        },
-    )
+    exit_point_layout = as_array_soil_layout(exit_point_layout)
+
+    # Adapt the first cover layer of the rep layout with the exit point
+    cover_layers = exit_point_layout.get_layer_groups()["cover_layer"]
+    thicknesses = cover_layers.thickness
+    if cover_layers.number_of_layers:
+        exit_point_bottom_cover_layer = float(cover_layers.bottom_of_layer[-1])
+    else:
+        exit_point_bottom_cover_layer = float(exit_point_layout.bottom_of_layer[-1])
+    cover_layer_properties = {
+        "gamma_dry": safe_execute_average(nan, cover_layers.get_property("gamma_dry"), thicknesses),
+        "gamma_wet": safe_execute_average(nan, cover_layers.get_property("gamma_wet"), thicknesses),
+        "vertical_permeability": safe_execute_average(
+            nan, cover_layers.get_property("vertical_permeability"), thicknesses
+        ),
+        "horizontal_permeability": safe_execute_average(
+            nan, cover_layers.get_property("horizontal_permeability"), thicknesses
+        ),
+        "aquifer": False,
+    }
 
-    if exit_point_bottom_cover_layer > rep_layout.layers[0].bottom_of_layer:
+    if exit_point_bottom_cover_layer > rep_layout.bottom_of_layer[0]:
         # if the cover layer of the exit point is above the bottom of the dijkvak cover, then only the top of first
         # aquifer is updated.
-        rep_layout.layers[1].top_of_layer = cover_layer.bottom_of_layer
+        top_of_layer = rep_layout.top_of_layer.copy()
+        top_of_layer[1] = exit_point_bottom_cover_layer
+        bottom_of_layer = rep_layout.bottom_of_layer.copy()
     else:
         # Else, the layers of the dijvak are simply lowered by the difference between the bottom levels of the dijvak's
         # cover and the exit point layout's cover.
-        extension_cover = rep_layout.layers[0].bottom_of_layer - exit_point_bottom_cover_layer
-        for layer in rep_layout.layers[1:]:
-            layer.top_of_layer = layer.top_of_layer - extension_cover
-            layer.bottom_of_layer = layer.bottom_of_layer - extension_cover
-
-    return SoilLayout([cover_layer, *rep_layout.layers[1:]])
+        extension_cover = rep_layout.bottom_of_layer[0] - exit_point_bottom_cover_layer
+        top_of_layer = rep_layout.top_of_layer - extension_cover
+        bottom_of_layer = rep_layout.bottom_of_layer - extension_cover
+    top_of_layer[0] = exit_point_layout.top_of_layer[0]
+    bottom_of_layer[0] = exit_point_bottom_cover_layer
+
+    # the cover layer keeps the soil of the representative cover layer
+    return ArraySoilLayout.from_layers(
+        top_of_layer,
+        bottom_of_layer,
+        rep_layout.soil_index,
+        rep_layout.soils,
+        (cover_layer_properties, *rep_layout.properties[1:]),
+    )
 
 
 def safe_execute_average(default: Any, values: List, thickness: List):
@@ -1,22 +1,29 @@
-import io
 import math
 from typing import List
+from typing import Optional
 from typing import Tuple
 
 import numpy as np
 import pandas as pd
-import PIL
 import requests
 from pandas import DataFrame
-from PIL import Image
+from rasterio.errors import RasterioIOError
+from rasterio.io import MemoryFile
+from rasterio.transform import Affine
+from rasterio.transform import from_origin
 from shapely.geometry import MultiPoint
-from sklearn.cluster import KMeans
 
 from viktor import UserException
 
+AHN_NODATA_THRESHOLD = 20000000
+
 
 def fetch_ahn_z_values(
-    df_data_points: pd.DataFrame, coverage: str = "ahn3_05m_dtm", resolution: float = 0.5, skip_clustering: bool = False
+    df_data_points: pd.DataFrame,
+    coverage: str = "ahn3_05m_dtm",
+    resolution: float = 0.5,
+    skip_clustering: bool = False,
+    interpolation: str = "nearest",
 ) -> pd.DataFrame:
     """
     Fetch height values from the AHN3.
@@ -39,6 +46,9 @@ def fetch_ahn_z_values(
         Resolution of the returned image. Should always be >= then the resolution of the coverage.
     skip_clustering:
         If False the clustering is skipped, do this only if points are few and close to each other
+    interpolation:
+        One of ["nearest", "bilinear"]. Nearest returns the value of the cell containing the point, bilinear
+        interpolates between the four surrounding cell centres.
     Returns
     -------
     df_data_points
@@ -55,24 +65,31 @@ def fetch_ahn_z_values(
     else:
         df_data_points, dict_cluster_bbox = cluster_points(df_data_points, resolution)
 
-    df_data_points = df_data_points.assign(z=None)
+    z_values = np.full(len(df_data_points), np.nan)
+    clusters = df_data_points["cluster"].to_numpy()
     # Fetch z values for each cluster
     for cluster, bbox in dict_cluster_bbox.items():
-        img_array = request_data(bbox=bbox, coverage=coverage, resolution=resolution)
-        df_data_points["z"].loc[df_data_points["cluster"] == cluster] = get_z_values(
-            df_data_points[["x", "y"]].loc[df_data_points["cluster"] == cluster],
+        img_array, transform = request_data(bbox=bbox, coverage=coverage, resolution=resolution)
+        in_cluster = clusters == cluster
+        z_values[in_cluster] = get_z_values(
+            df_data_points[["x", "y"]].loc[in_cluster],
             bbox,
             img_array,
             resolution,
+            transform=transform,
+            interpolation=interpolation,
         )
         del img_array
-    df_data_points["z"] = df_data_points["z"].apply(lambda x: round(x, 3))
-    df_data_points["z"].loc[df_data_points["z"] >= 20000000] = np.nan
+    z_values = np.round(z_values, 3)
+    z_values[z_values >= AHN_NODATA_THRESHOLD] = np.nan
+    df_data_points = df_data_points.assign(z=z_values)
     df_data_points = df_data_points.drop(["cluster"], axis=1)
     return df_data_points
 
 
-def request_data(bbox: List[float], coverage: str = "ahn3_05m_dtm", resolution: float = 0.5) -> np.ndarray:
+def request_data(
+    bbox: List[float], coverage: str = "ahn3_05m_dtm", resolution: float = 0.5
+) -> Tuple[Optional[np.ndarray], Optional[Affine]]:
     """
     Function that returns the tiff image within a bbox.
 
@@ -93,7 +110,9 @@ def request_data(bbox: List[float], coverage: str = "ahn3_05m_dtm", resolution:
         Resolution of the returned image. Should always be >= then the resolution of the coverage.
     Returns
     -------
-    np.ndarray
+    Tuple of:
+        - float32 array of the first band, nodata cells are NaN
+        - affine transform of the decoded GeoTIFF, with which the points are located in the array
     """
     width = (bbox[2] - bbox[0]) / resolution
     height = (bbox[3] - bbox[1]) / resolution
@@ -115,78 +134,131 @@ def request_data(bbox: List[float], coverage: str = "ahn3_05m_dtm", resolution:
     q = requests.Request("GET", url, params=params).prepare().url
     if q is None:
         raise ValueError("request is None")
-    if requests.get(q).status_code == 200:
-        try:
-            return np.array(Image.open(io.BytesIO(requests.get(q).content)))
-        except PIL.UnidentifiedImageError:
-            raise UserException("AHN unavailable, retry later.")
-    else:
-        requests.get(q).raise_for_status()
-        return None
+    response = requests.get(q)
+    if response.status_code != 200:
+        response.raise_for_status()
+        return None, None
+    return read_geotiff(response.content)
 
 
-def get_z_values(df_x_y: pd.DataFrame, bbox: List[float], img_array: np.ndarray, resolution: float) -> List[float]:
+def read_geotiff(content: bytes) -> Tuple[np.ndarray, Affine]:
     """
-    Returns z values for a pd.DataFrame and img_array
+    Decode the bytes of a GeoTIFF into a float32 array of its first band, without intermediate copies to Python
+    objects.
+
     Parameters
     ----------
-    df_x_y:
-        Dataframe with columns: [x, y]
-    bbox:
-        list of 4 elements:
-        [bottom_left_x_coordinate,
-        bottom_left_y_coordinate,
-        top_right_x_coordinate,
-        top_right_y_coordinate]
-    img_array:
-        Array of the downloaded tiff Image
-    resolution:
-        Resolution of the returned image.
+    content:
+        Raw content of the GeoTIFF file
     Returns
     -------
-    List of z values
+    Tuple of:
+        - float32 array of the first band in which the nodata cells are set to NaN
+        - affine transform of the raster
     """
-    # Add bathymetry check
-    return [z_value(x, y, img_array, resolution, bbox) for x, y in zip(df_x_y["x"], df_x_y["y"])]
+    try:
+        with MemoryFile(content) as memory_file, memory_file.open() as dataset:
+            img_array = dataset.read(1, out_dtype="float32")
+            if dataset.nodata is not None:
+                img_array[img_array == np.float32(dataset.nodata)] = np.nan
+            return img_array, dataset.transform
+    except RasterioIOError:
+        raise UserException("AHN unavailable, retry later.")
 
 
-def z_value(x: float, y: float, img_array: np.ndarray, resolution: float, bbox: List[float]) -> float:
+def get_z_values(
+    df_x_y: pd.DataFrame,
+    bbox: List[float],
+    img_array: np.ndarray,
+    resolution: float,
+    transform: Optional[Affine] = None,
+    interpolation: str = "nearest",
+) -> np.ndarray:
     """
-    Given the x and y coordinates return the correspondent z value
+    Returns z values for a pd.DataFrame and img_array. All points are sampled at once, points outside the image get
+    a NaN value.
     Parameters
     ----------
-    x
-        X-coordinate RD system
-    y
-        Y-coordinate RD system
-    img_array
-        Array of the downloaded tiff Image
-    resolution:
-        Resolution of the returned image.
+    df_x_y:
+        Dataframe with columns: [x, y]
     bbox:
         list of 4 elements:
         [bottom_left_x_coordinate,
         bottom_left_y_coordinate,
         top_right_x_coordinate,
         top_right_y_coordinate]
-
+    img_array:
+        Array of the downloaded tiff Image
+    resolution:
+        Resolution of the returned image.
+    transform:
+        Affine transform of the image. If not provided, it is derived from the top left corner of the bbox and the
+        resolution, which is the grid requested from the WCS.
+    interpolation:
+        One of ["nearest", "bilinear"]
     Returns
     -------
-    Z value
+    Array of z values
     """
-    col = math.floor((x - bbox[0]) / resolution)
-    row = math.floor((bbox[3] - y) / resolution)
-    try:
-        return img_array[row][col]
-    except TypeError:
+    if img_array is None:
         raise UserException("AHN unavailable, retry later.")
+    if transform is None:
+        transform = from_origin(bbox[0], bbox[3], resolution, resolution)
+    img_array = np.asarray(img_array, dtype=float)
+    xs = df_x_y["x"].to_numpy(dtype=float)
+    ys = df_x_y["y"].to_numpy(dtype=float)
+
+    if interpolation == "nearest":
+        cols_float, rows_float = ~transform * (xs, ys)
+        return sample_cells(img_array, np.floor(rows_float).astype(int), np.floor(cols_float).astype(int))
+    if interpolation == "bilinear":
+        return sample_bilinear(img_array, transform, xs, ys)
+    raise ValueError(f"Unknown interpolation method: {interpolation}")
+
+
+def sample_cells(img_array: np.ndarray, rows: np.ndarray, cols: np.ndarray) -> np.ndarray:
+    """Return the values of the cells at the given row and column indices, NaN for the indices outside the array."""
+    n_rows, n_cols = img_array.shape
+    inside = (rows >= 0) & (rows < n_rows) & (cols >= 0) & (cols < n_cols)
+    z_values = np.full(rows.shape, np.nan)
+    z_values[inside] = img_array[rows[inside], cols[inside]]
+    return z_values
+
+
+def sample_bilinear(img_array: np.ndarray, transform: Affine, xs: np.ndarray, ys: np.ndarray) -> np.ndarray:
+    """Bilinear interpolation between the centres of the four cells surrounding each point. Points closer than half a
+    cell to the border of the image are clamped to the outer cell centres. A NaN in any of the four surrounding cells
+    results in NaN."""
+    n_rows, n_cols = img_array.shape
+    cols_float, rows_float = ~transform * (xs, ys)
+    inside = (rows_float >= 0) & (rows_float <= n_rows) & (cols_float >= 0) & (cols_float <= n_cols)
+    # Shift to cell centres and clamp within the image
+    rows_float = np.clip(rows_float - 0.5, 0, n_rows - 1)
+    cols_float = np.clip(cols_float - 0.5, 0, n_cols - 1)
+    rows_0 = np.minimum(np.floor(rows_float).astype(int), max(n_rows - 2, 0))
+    cols_0 = np.minimum(np.floor(cols_float).astype(int), max(n_cols - 2, 0))
+    rows_1 = np.minimum(rows_0 + 1, n_rows - 1)
+    cols_1 = np.minimum(cols_0 + 1, n_cols - 1)
+    d_row = rows_float - rows_0
+    d_col = cols_float - cols_0
+
+    z_values = (
+        img_array[rows_0, cols_0] * (1 - d_row) * (1 - d_col)
+        + img_array[rows_0, cols_1] * (1 - d_row) * d_col
+        + img_array[rows_1, cols_0] * d_row * (1 - d_col)
+        + img_array[rows_1, cols_1] * d_row * d_col
+    )
+    z_values[~inside] = np.nan
+    return z_values
 
 
 def cluster_points(
     df_data_points: pd.DataFrame, resolution: float, limits: tuple = (2000, 2000)
 ) -> Tuple[pd.DataFrame, dict]:
     """
-    Create clusters of points
+    Create clusters of points by bucketing them on a fixed grid of tiles, and shrink-wrap a bbox around the points of
+    each tile. The tile size is chosen such that every bbox respects the limits, so the clustering is deterministic
+    and linear in the number of points. Clusters are numbered in the order of their (column, row) key on the grid.
 
     Parameters
     ----------
@@ -213,35 +285,21 @@ def cluster_points(
         - dict_cluster_bbox
             Dictionary with clusters bbox
     """
-    n = 1  # initial number of clusters
-    df_data_points = df_data_points.assign(cluster=0)
-    while True:
-        km = KMeans(n_clusters=n, random_state=0).fit(df_data_points[["x", "y"]])
-        df_data_points["cluster"] = km.labels_
-        dict_cluster_bbox = compute_bbox_from_cluster(df_data_points, resolution)
-        limits_validation = check_limits(dict_cluster_bbox, limits)
-        if not any(limits_validation):  # loop until at least 1 cluster meet the condition
-            n += 1
-        else:
-            while True:
-                for cluster, _ in dict_cluster_bbox.items():
-                    if limits_validation[cluster]:
-                        pass
-                    else:
-                        km = KMeans(n_clusters=2, random_state=0).fit(
-                            df_data_points[["x", "y"]].loc[df_data_points["cluster"] == cluster]
-                        )
-
-                        df_data_points["cluster"].loc[df_data_points["cluster"] == cluster] = (
-                            df_data_points["cluster"].loc[df_data_points["cluster"] == cluster] + km.labels_
-                        )
-                        dict_cluster_bbox = compute_bbox_from_cluster(df_data_points, resolution)
-                        limits_validation = check_limits(dict_cluster_bbox, limits)
-                if all(limits_validation):
-                    break
-        if all(limits_validation):
-            break
+    # The bbox of a tile is rounded outwards to whole meters and padded with the resolution on both sides
+    margin = 2 * (1 + resolution)
+    tile_width, tile_height = limits[0] - margin, limits[1] - margin
+    if tile_width <= 0 or tile_height <= 0:
+        raise ValueError(f"Limits {limits} are too small for a resolution of {resolution}")
 
+    tile_keys = np.column_stack(
+        [
+            np.floor(df_data_points["x"].to_numpy(dtype=float) / tile_width),
+            np.floor(df_data_points["y"].to_numpy(dtype=float) / tile_height),
+        ]
+    ).astype(np.int64)
+    _, clusters = np.unique(tile_keys, axis=0, return_inverse=True)
+    df_data_points = df_data_points.assign(cluster=clusters.reshape(-1))
+    dict_cluster_bbox = compute_bbox_from_cluster(df_data_points, resolution)
     return df_data_points, dict_cluster_bbox
 
 
@@ -265,16 +323,17 @@ def compute_bbox_from_cluster(df_data_points: pd.DataFrame, resolution: float) -
     dict_cluster_bbox
         Dictionary linking clusters with bboxes
     """
+    df_extremes = df_data_points.groupby("cluster").agg(
+        x_min=("x", "min"), y_min=("y", "min"), x_max=("x", "max"), y_max=("y", "max")
+    )
     dict_cluster_bbox = {}
-    for cluster in np.unique(df_data_points["cluster"]):
-        df_cluster = df_data_points.loc[df_data_points["cluster"] == cluster].reset_index(drop=True)
-        bbox = [
-            math.floor(df_cluster["x"].min()) - resolution,
-            math.floor(df_cluster["y"].min()) - resolution,
-            math.ceil(df_cluster["x"].max()) + resolution,
-            math.ceil(df_cluster["y"].max()) + resolution,
+    for cluster, x_min, y_min, x_max, y_max in df_extremes.itertuples(name=None):
+        dict_cluster_bbox[cluster] = [
+            math.floor(x_min) - resolution,
+            math.floor(y_min) - resolution,
+            math.ceil(x_max) + resolution,
+            math.ceil(y_max) + resolution,
         ]
-        dict_cluster_bbox[cluster] = bbox
     return dict_cluster_bbox
 
 
@@ -0,0 +1,172 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from typing import BinaryIO
+from typing import Iterable
+from typing import Iterator
+from typing import List
+from typing import NamedTuple
+from typing import Optional
+from typing import Tuple
+from typing import Union
+from zipfile import ZIP_STORED
+from zipfile import ZipFile
+
+import numpy as np
+from munch import Munch
+from shapely.geometry import LineString
+from shapely.geometry import MultiPoint
+from shapely.geometry import Polygon
+
+from app.exit_point.soil_geometry_model import SoilGeometry
+from app.exit_point.soil_geometry_model import get_all_point_coordinates_on_crosses
+from viktor import UserException
+from viktor.geo import SoilLayout
+
+from ...geolib_helpers.geolib.models.dgeoflow.serializer import DGeoflowInputZipSerializer
+from ...geolib_helpers.geolib.models.dstability.serializer import DStabilityInputZipSerializer
+from .create_geolib_models import generate_dgeoflow_model
+from .create_geolib_models import generate_dstability_model
+from .create_geolib_models import is_river_on_the_right
+
+GEOLIB_MODEL_TYPES = ("flox", "stix")
+
+
+class ExitPointModelInput(NamedTuple):
+    """Everything that is needed to generate the D-Geoflow or D-Stability model of an exit point in a worker process"""
+
+    name: str
+    soil_geometry: SoilGeometry
+    river_on_the_right: bool
+    ditch_data: List[dict]
+
+
+class DitchIndex:
+    """Polygons and bounding boxes of all ditches, built once to select the ditches crossed by many cross-sections"""
+
+    def __init__(self, ditch_data: List[dict]):
+        self.ditch_data = ditch_data
+        self.polygons = [Polygon(ditch["ditch_polygon"]) for ditch in ditch_data]
+        self.bounds = np.array([polygon.bounds for polygon in self.polygons], dtype=float).reshape(-1, 4)
+
+    def query(self, line: LineString) -> List[dict]:
+        """Return the params of the ditches whose polygon intersects the line"""
+        x_min, y_min, x_max, y_max = line.bounds
+        candidates = np.flatnonzero(
+            (self.bounds[:, 0] <= x_max)
+            & (self.bounds[:, 2] >= x_min)
+            & (self.bounds[:, 1] <= y_max)
+            & (self.bounds[:, 3] >= y_min)
+        )
+        return [self.ditch_data[i] for i in candidates if self.polygons[i].intersects(line)]
+
+
+def get_exit_point_model_inputs(
+    exit_points: List[Tuple[str, Munch]],
+    detailed_1d_soil_layout: SoilLayout,
+    base_trajectory: LineString,
+    entry_line: LineString,
+    bathymetry_points: MultiPoint,
+    polder_level: float,
+    river_level: float,
+    ditch_water_level: float,
+    ditch_data: List[dict],
+) -> List[ExitPointModelInput]:
+    """Create the soil geometries of several exit points. The AHN heights of all cross-sections are fetched at once
+    and the ditches of every cross-section are selected from a single ditch index.
+
+    :param exit_points: name and params of every exit point
+    :param detailed_1d_soil_layout: representative soil layout of the segment
+    :param base_trajectory: base trajectory of the dike
+    :param entry_line: entry line of the dike
+    :param bathymetry_points: bathymetry points of the dike
+    :param polder_level: polder level of the segment
+    :param river_level: river level of the segment
+    :param ditch_water_level: water level of the ditches of the segment
+    :param ditch_data: params of the ditches of the segment
+    :return: the model input of every exit point, in the order of the exit points
+    """
+    soil_geometries = [
+        SoilGeometry.from_exit_point_params(
+            params,
+            detailed_1d_soil_layout,
+            base_trajectory,
+            entry_line,
+            bathymetry_points,
+            polder_level,
+            river_level,
+            ditch_water_level,
+        )
+        for _, params in exit_points
+    ]
+    cross_sections_data = get_all_point_coordinates_on_crosses(
+        [soil_geometry.cross_section_line for soil_geometry in soil_geometries]
+    )
+    ditch_index = DitchIndex(ditch_data)
+
+    model_inputs = []
+    for (name, _), soil_geometry, cross_section_data in zip(exit_points, soil_geometries, cross_sections_data):
+        soil_geometry.cross_section_data = cross_section_data
+        # The bathymetry is only needed to fetch the cross-section data, it is not sent to the worker processes
+        soil_geometry.all_bathymetry_points = MultiPoint()
+        model_inputs.append(
+            ExitPointModelInput(
+                name=name,
+                soil_geometry=soil_geometry,
+                river_on_the_right=is_river_on_the_right(soil_geometry, base_trajectory, entry_line),
+                ditch_data=ditch_index.query(soil_geometry.trajectory),
+            )
+        )
+    return model_inputs
+
+
+def serialize_geolib_model(model_type: str, model_input: ExitPointModelInput) -> bytes:
+    """Generates the D-Geoflow (flox) or D-Stability (stix) model of an exit point and returns the content of the
+    archive. This function is defined at module level so that it can be sent to a worker process."""
+    output = BytesIO()
+    if model_type == "flox":
+        model = generate_dgeoflow_model(
+            model_input.soil_geometry, model_input.river_on_the_right, model_input.ditch_data
+        )
+        DGeoflowInputZipSerializer(ds=model.datastructure).write(output)
+    elif model_type == "stix":
+        model = generate_dstability_model(model_input.soil_geometry, model_input.ditch_data)
+        DStabilityInputZipSerializer(ds=model.datastructure).write(output)
+    else:
+        raise ValueError(f"Unknown model type: {model_type}")
+    return output.getvalue()
+
+
+def generate_geolib_model_files(
+    model_type: str, model_inputs: List[ExitPointModelInput], max_workers: Optional[int] = None
+) -> Iterator[Tuple[str, bytes]]:
+    """Generates the models of several exit points in parallel in a process pool.
+
+    :param model_type: one of GEOLIB_MODEL_TYPES
+    :param model_inputs: model input of every exit point
+    :param max_workers: number of worker processes, defaults to the number of CPUs
+    :return: yields the file name and content of the model of every exit point, in the order of the input
+    """
+    if model_type not in GEOLIB_MODEL_TYPES:
+        raise ValueError(f"Unknown model type: {model_type}")
+    if not model_inputs:
+        return
+    max_workers = min(max_workers or os.cpu_count() or 1, len(model_inputs))
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            (model_input.name, executor.submit(serialize_geolib_model, model_type, model_input))
+            for model_input in model_inputs
+        ]
+        for name, future in futures:
+            try:
+                yield f"{name}.{model_type}", future.result()
+            except UserException as e:
+                raise UserException(f"Uittredepunt {name}: {e}")
+
+
+def write_zip(files: Iterable[Tuple[str, bytes]], file: Union[str, os.PathLike, BinaryIO]) -> None:
+    """Streams files into a zip archive as they come. The .flox and .stix archives are already compressed, so they are
+    stored without compression."""
+    with ZipFile(file, mode="w", compression=ZIP_STORED) as zip_file:
+        for file_name, content in files:
+            zip_file.writestr(file_name, content)
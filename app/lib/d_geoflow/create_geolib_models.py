@@ -1,15 +1,17 @@
 from typing import List
 from typing import Optional
+from typing import Tuple
 
 from geolib.soils import StorageParameters
+from shapely.geometry import LineString
 
 from app.exit_point.soil_geometry_model import SoilGeometry
 from viktor.geo import Soil as ViktorSoil
 from viktor.geo import SoilLayout
+from viktor.geo import SoilLayout2D
 from viktor.geometry import Polygon as ViktorPolygon
 from viktor.geometry import Polyline
 
-from ...dyke.dyke_model import Dyke
 from ...geolib_helpers.geolib import DStabilityModel
 from ...geolib_helpers.geolib.geometry import Point as GeolibPoint
 from ...geolib_helpers.geolib.models.dgeoflow import DGeoflowModel
@@ -55,6 +57,22 @@ def get_boundary_condition_contour(line: Polyline) -> List[GeolibPoint]:
     ]
 
 
+def get_geolib_polygons_and_soil_codes(soil_layout_2d: SoilLayout2D) -> Tuple[List[List[GeolibPoint]], List[str]]:
+    """Returns the GeoLib points of every polygon of the layers of a 2D soil layout, and the soil name of its layer"""
+    polygons, soil_codes = [], []
+    for layer in soil_layout_2d.layers:
+        for polygon in layer.polygons():
+            polygons.append(get_geolib_points_from_viktor_polygon(polygon))
+            soil_codes.append(layer.soil.name)
+    return polygons, soil_codes
+
+
+def get_thickness(points: List[GeolibPoint]) -> float:
+    """Returns the vertical extent of a polygon"""
+    z_values = [point.z for point in points]
+    return max(z_values) - min(z_values)
+
+
 def generate_dstability_model(soil_geometry: SoilGeometry, ditch_data: Optional[List[dict]] = None) -> DStabilityModel:
     """create a DStability model that only contains a geometry and the soils"""
     dm = DStabilityModel()
@@ -72,16 +90,20 @@ def generate_dstability_model(soil_geometry: SoilGeometry, ditch_data: Optional[
     for soil in soil_geometry.soil_layout.filter_unique_soils():
         dm.add_soil(_to_geolib_soil(soil))
 
-    for layer in soil_layout_2d.layers:
-        for polygon in layer.polygons():
-            geolib_polygon = get_geolib_points_from_viktor_polygon(polygon)
-            dm.add_layer(geolib_polygon, layer.soil.name)
+    polygons, soil_codes = get_geolib_polygons_and_soil_codes(soil_layout_2d)
+    dm.add_layers(polygons, soil_codes)
 
     return dm
 
 
-def generate_dgeoflow_model(soil_geometry: SoilGeometry, dike: Dyke, ditch_data: List[dict] = None) -> DGeoflowModel:
-    """create a DGeoflow model"""
+def generate_dgeoflow_model(
+    soil_geometry: SoilGeometry, river_on_the_right: bool, ditch_data: List[dict] = None
+) -> DGeoflowModel:
+    """create a DGeoflow model
+    :param soil_geometry: soil geometry of the cross-section
+    :param river_on_the_right: whether the right side of the cross-section is the river side, see is_river_on_the_right
+    :param ditch_data: ditches that are removed from the geometry
+    """
 
     dm = DGeoflowModel()
     transfer_layer_properties_to_soil(soil_geometry.soil_layout)
@@ -97,20 +119,15 @@ def generate_dgeoflow_model(soil_geometry: SoilGeometry, dike: Dyke, ditch_data:
     for soil in soil_geometry.soil_layout.filter_unique_soils():
         dm.add_soil(_to_geolib_soil(soil))
 
-    for layer in soil_layout_2d.layers:
-        for polygon in layer.polygons():
-            geolib_polygon = get_geolib_points_from_viktor_polygon(polygon)
-            layer_id = dm.add_layer(geolib_polygon, soil_code=layer.soil.name)
+    polygons, soil_codes = get_geolib_polygons_and_soil_codes(soil_layout_2d)
+    element_sizes = [soil_geometry.get_element_size(get_thickness(points)) for points in polygons]
+    dm.add_layers(polygons, soil_codes, element_size=element_sizes)
 
-            # TODO Below: how to assign the right layer id??
-            layeractivation_id = dm.add_layeractivation(layer_id=layer_id)
-            mesh_properties_id = dm.add_meshproperties(element_size=soil_geometry.element_size, layer_id=layer_id)
-
-    bc_id = add_side_boundary_conditions(dm, soil_geometry, dike)
+    bc_id = add_side_boundary_conditions(dm, soil_geometry, soil_layout_2d, river_on_the_right)
     dm.add_scenario(
         boundaryconditions_id=bc_id,
-        layeractivations_id=layeractivation_id,
-        meshproperties_id=mesh_properties_id,
+        layeractivations_id=int(dm.datastructure.layer_activations[-1].Id),
+        meshproperties_id=int(dm.datastructure.mesh_properties[-1].Id),
         soillayers_id=dm.datastructure.soillayers[-1].Id,
         geometry_id=dm.datastructure.geometries[-1].Id,
         calculations_label="Calculation 1",
@@ -122,15 +139,23 @@ def generate_dgeoflow_model(soil_geometry: SoilGeometry, dike: Dyke, ditch_data:
     return dm
 
 
-def add_side_boundary_conditions(dm: DGeoflowModel, soil_geometry: SoilGeometry, dike: Dyke) -> id:
-    """Add the boundary conditions on the left and right sides of the model. The method automatically recognizes if
-    the left side is the hinterland or the foreland and assigns the head level of the boundary conditions accordingly"""
-    left_bc = get_boundary_condition_contour(soil_geometry.soil_layout_2d.get_left_boundary_polyline())
-    right_bc = get_boundary_condition_contour(soil_geometry.soil_layout_2d.get_right_boundary_polyline())
+def is_river_on_the_right(soil_geometry: SoilGeometry, base_trajectory: LineString, entry_line: LineString) -> bool:
+    """Recognizes if the right side of the cross-section is the river side: the start point of the cross-section
+    lies further from the entry line than from the crest line"""
+    crest_line_x_value = soil_geometry.start_point.distance(base_trajectory)
+    entry_line_x_value = soil_geometry.start_point.distance(entry_line)
+    return entry_line_x_value > crest_line_x_value
+
+
+def add_side_boundary_conditions(
+    dm: DGeoflowModel, soil_geometry: SoilGeometry, soil_layout_2d: SoilLayout2D, river_on_the_right: bool
+) -> id:
+    """Add the boundary conditions on the left and right sides of the model, and assign the head level of the
+    boundary conditions according to the side of the river"""
+    left_bc = get_boundary_condition_contour(soil_layout_2d.get_left_boundary_polyline())
+    right_bc = get_boundary_condition_contour(soil_layout_2d.get_right_boundary_polyline())
 
-    crest_line_x_value = soil_geometry.start_point.distance(dike.get_base_trajectory())
-    entry_line_x_value = soil_geometry.start_point.distance(dike.entry_line)
-    if entry_line_x_value > crest_line_x_value:  # right side of layout is the river side
+    if river_on_the_right:
         bc_id = dm.add_boundarycondition(left_bc, head_level=soil_geometry.polder_level, label="Polder head")
         dm.add_boundarycondition(right_bc, head_level=soil_geometry.river_level, label="River head")
     else:
@@ -1,7 +1,11 @@
+import hashlib
+import json
+from typing import Dict
 from typing import List
 from typing import Optional
 from typing import Tuple
 
+import numpy as np
 from munch import Munch
 
 from app.cpt.constants import BORE_COLOR
@@ -13,18 +17,17 @@ from app.lib.constants import DRY_DITCH_COLOR
 from app.lib.constants import EXISTING_EXIT_POINT_COLOR
 from app.lib.constants import MAP_LEGEND_LIST
 from app.lib.constants import WET_DITCH_COLOR
+from app.lib.rd_wgs_converter import from_rd_to_wgs
+from app.lib.rd_wgs_converter import rd_to_geo_points
 from app.lib.shapely_helper_functions import convert_linestring_to_geo_polyline
-from app.lib.shapely_helper_functions import convert_shapely_point_to_geo_point
 from app.lib.shapely_helper_functions import convert_shapely_polgon_to_geopolygon
-from app.lib.shapely_helper_functions import get_value_hex_color
+from app.lib.shapely_helper_functions import get_values_hex_colors
 from app.segment.segment_model import Segment
 from viktor import Color
 from viktor import UserException
 from viktor.api_v1 import EntityList
-from viktor.geometry import GeoPoint
 from viktor.geometry import GeoPolygon
 from viktor.geometry import GeoPolyline
-from viktor.geometry import RDWGSConverter
 from viktor.views import MapEntityLink
 from viktor.views import MapFeature
 from viktor.views import MapLabel
@@ -33,6 +36,10 @@ from viktor.views import MapPoint
 from viktor.views import MapPolygon
 from viktor.views import MapPolyline
 
+LEAKAGE_VOXEL_SIZE = 25
+LEAKAGE_MAP_FEATURES_CACHE_SIZE = 8
+LEAKAGE_MAP_FEATURES_CACHE: Dict[str, Tuple[List[MapFeature], List[MapLabel], MapLegend]] = {}
+
 
 def add_dike_trajectory_and_entry_line_to_map_features(
     map_features: List, dike_trajectory: GeoPolyline, entry_line: GeoPolyline = None
@@ -73,26 +80,22 @@ def add_ditches_to_map_features(map_features: List[MapFeature], ditch_features:
 
     for ditch in ditch_features["ditches"]:
         map_features.append(
-            MapPolygon.from_geo_polygon(
-                GeoPolygon(*[GeoPoint.from_rd(tuple(pt)) for pt in ditch["ditch_polygon"]]), color=Color.black()
-            )
+            MapPolygon.from_geo_polygon(GeoPolygon(*rd_to_geo_points(ditch["ditch_polygon"])), color=Color.black())
         )
         map_features.append(
             MapPolyline.from_geo_polyline(
-                GeoPolyline(*[GeoPoint.from_rd(tuple(pt)) for pt in ditch["ditch_center_line"]]),
+                GeoPolyline(*rd_to_geo_points(ditch["ditch_center_line"])),
                 color=WET_DITCH_COLOR,
             )
         )
 
     for ditch in ditch_features["dry_ditches"]:
         map_features.append(
-            MapPolygon.from_geo_polygon(
-                GeoPolygon(*[GeoPoint.from_rd(tuple(pt)) for pt in ditch["ditch_polygon"]]), color=Color.black()
-            )
+            MapPolygon.from_geo_polygon(GeoPolygon(*rd_to_geo_points(ditch["ditch_polygon"])), color=Color.black())
         )
         map_features.append(
             MapPolyline.from_geo_polyline(
-                GeoPolyline(*[GeoPoint.from_rd(tuple(pt)) for pt in ditch["ditch_center_line"]]),
+                GeoPolyline(*rd_to_geo_points(ditch["ditch_center_line"])),
                 color=DRY_DITCH_COLOR,
             )
         )
@@ -108,13 +111,13 @@ def add_dijkpalen_points_to_map_features(
     :param dijkpalen: dijkpalen data parsed from the shapefile
     :return:
     """
-    for point in dijkpalen:
-        lat, lon = tuple(RDWGSConverter.from_rd_to_wgs((list(point["geometry"].coords)[0])))
-        map_labels.append(MapLabel(lat, lon, scale=16, text=f"{point['value']}"))
+    geo_points = rd_to_geo_points([list(point["geometry"].coords)[0] for point in dijkpalen])
+    for point, geo_point in zip(dijkpalen, geo_points):
+        map_labels.append(MapLabel(geo_point.lat, geo_point.lon, scale=16, text=f"{point['value']}"))
 
         map_features.append(
             MapPoint.from_geo_point(
-                convert_shapely_point_to_geo_point(point["geometry"]),
+                geo_point,
                 icon="circle",
                 description=f"{point['value']}",
             )
@@ -129,13 +132,11 @@ def add_intersected_segment_ditches_to_map_features(map_features: List[MapFeatur
     if segment_params.segment_ditches:
         for ditch in segment_params.segment_ditches:
             map_features.append(
-                MapPolygon.from_geo_polygon(
-                    GeoPolygon(*[GeoPoint.from_rd(tuple(pt)) for pt in ditch["ditch_polygon"]]), color=Color.black()
-                )
+                MapPolygon.from_geo_polygon(GeoPolygon(*rd_to_geo_points(ditch["ditch_polygon"])), color=Color.black())
             )
             map_features.append(
                 MapPolyline.from_geo_polyline(
-                    GeoPolyline(*[GeoPoint.from_rd(tuple(pt)) for pt in ditch["ditch_center_line"]]),
+                    GeoPolyline(*rd_to_geo_points(ditch["ditch_center_line"])),
                     color=WET_DITCH_COLOR,
                 )
             )
@@ -143,13 +144,11 @@ def add_intersected_segment_ditches_to_map_features(map_features: List[MapFeatur
     if segment_params.segment_dry_ditches:
         for ditch in segment_params.segment_dry_ditches:
             map_features.append(
-                MapPolygon.from_geo_polygon(
-                    GeoPolygon(*[GeoPoint.from_rd(tuple(pt)) for pt in ditch["ditch_polygon"]]), color=Color.black()
-                )
+                MapPolygon.from_geo_polygon(GeoPolygon(*rd_to_geo_points(ditch["ditch_polygon"])), color=Color.black())
             )
             map_features.append(
                 MapPolyline.from_geo_polyline(
-                    GeoPolyline(*[GeoPoint.from_rd(tuple(pt)) for pt in ditch["ditch_center_line"]]),
+                    GeoPolyline(*rd_to_geo_points(ditch["ditch_center_line"])),
                     color=DRY_DITCH_COLOR,
                 )
             )
@@ -214,17 +213,20 @@ def add_existing_exit_point_to_map_features(
     interaction_point_list: Optional[list] = None,
 ):
     """Add the existing saved exit point to a MapView, including labels with exit point name"""
-    for exit_point in exit_point_entities:
-        lat, lon = tuple(
-            RDWGSConverter.from_rd_to_wgs(
-                (
-                    exit_point.last_saved_summary.x_coordinate.get("value"),
-                    exit_point.last_saved_summary.y_coordinate.get("value"),
-                )
+    exit_point_entities = list(exit_point_entities)
+    geo_points = rd_to_geo_points(
+        [
+            (
+                exit_point.last_saved_summary.x_coordinate.get("value"),
+                exit_point.last_saved_summary.y_coordinate.get("value"),
             )
-        )
+            for exit_point in exit_point_entities
+        ]
+    )
+    for exit_point, geo_point in zip(exit_point_entities, geo_points):
+        lat, lon = geo_point.lat, geo_point.lon
         map_point = MapPoint.from_geo_point(
-            GeoPoint(lat, lon),
+            geo_point,
             color=EXISTING_EXIT_POINT_COLOR,
             icon="triangle-down",
             description=f"{exit_point.name}",
@@ -237,6 +239,30 @@ def add_existing_exit_point_to_map_features(
         map_labels.append(MapLabel(lat, lon, scale=17, text=f"{exit_point.name[13:]}"))
 
 
+def get_leakage_points_wgs_coordinates(points: np.ndarray, voxel_size: float = LEAKAGE_VOXEL_SIZE) -> np.ndarray:
+    """Convert the RD centers of the leakage voxels and the 4 corners of their squares to WGS84 in one vectorized
+    transform.
+
+    :param points: (n, 2) array of RD coordinates of the voxel centers
+    :param voxel_size: width of the square voxel in m
+    :return: (n, 5, 2) array of (lat, lon), of the center followed by the top right, bottom right, bottom left and top
+    left corners
+    """
+    half_width = voxel_size / 2
+    offsets = np.array(
+        [
+            (0, 0),
+            (half_width, half_width),
+            (half_width, -half_width),
+            (-half_width, -half_width),
+            (-half_width, half_width),
+        ]
+    )
+    rd_coordinates = np.asarray(points, dtype=float).reshape(-1, 1, 2) + offsets
+    lat, lon = from_rd_to_wgs(rd_coordinates[..., 0], rd_coordinates[..., 1])
+    return np.stack([lat, lon], axis=-1)
+
+
 def add_leakage_point_to_map_features(
     map_features: List[MapFeature],
     map_labels,
@@ -245,24 +271,24 @@ def add_leakage_point_to_map_features(
     color: Color,
     description: str,
     as_polygons: bool = True,
+    wgs_coordinates: Optional[np.ndarray] = None,
 ):
-    """Add a point marker displaying t"""
-    lat, lon = RDWGSConverter.from_rd_to_wgs(point)
+    """Add a point marker displaying the leakage length of a voxel, or its square if as_polygons is True.
+    The WGS84 coordinates of the point and its corners, as returned by get_leakage_points_wgs_coordinates, can be
+    provided to skip the conversion of the RD point."""
+    if wgs_coordinates is None:
+        wgs_coordinates = get_leakage_points_wgs_coordinates(np.array([point]))[0]
+    (lat, lon), corners = wgs_coordinates[0], wgs_coordinates[1:]
 
     if as_polygons:
-        x, y = point
-        half_width = 25 / 2
-        top_right, top_left = (x + half_width, y + half_width), (x - half_width, y + half_width)
-        bottom_right, bottom_left = (x + half_width, y - half_width), (x - half_width, y - half_width)
-
-        corners = [top_right, bottom_right, bottom_left, top_left]
-        corners_mapoint = [MapPoint.from_geo_point(GeoPoint.from_rd(corner)) for corner in corners]
+        corners_mapoint = [MapPoint(corner_lat, corner_lon) for corner_lat, corner_lon in corners]
         map_features.append(MapPolygon(corners_mapoint, color=color, description=description))
         map_labels.append(MapLabel(lat, lon, str(i), scale=17))
     else:
         map_features.append(
-            MapPoint.from_geo_point(
-                GeoPoint(lat, lon),
+            MapPoint(
+                lat,
+                lon,
                 color=color,
                 description=description,
                 icon="circle-filled",
@@ -270,28 +296,49 @@ def add_leakage_point_to_map_features(
         )
 
 
-def add_all_leakage_points_to_map_features(
-    map_features: List[MapFeature], map_labels, leakage_point_properties: List[dict], as_polygons: bool = True
-) -> MapLegend:
-    """Add all the leakages points to the list of map features, their color is based on their respective leakage length.
-    Returns the mapleagend with a color gradient scale.
-    """
+def get_leakage_points_hash(leakage_point_properties: List[dict], as_polygons: bool) -> str:
+    """Hash of the leakage table, used as key of the cached leakage map features"""
+    leakage_table = json.dumps([leakage_point_properties, as_polygons], sort_keys=True, default=float)
+    return hashlib.sha256(leakage_table.encode()).hexdigest()
+
+
+def build_leakage_map_features(
+    leakage_point_properties: List[dict], as_polygons: bool = True
+) -> Tuple[List[MapFeature], List[MapLabel], MapLegend]:
+    """Build the map features, labels and legend of all the leakage points. The colors are looked up in one
+    vectorized pass over the leakage lengths and all the coordinates are converted to WGS84 at once."""
+    map_features, map_labels = [], []
 
-    unique_leak_len = sorted(list({int(lp["ll"]) for lp in leakage_point_properties if lp["ll"] is not None}))
-    color_dict = {
-        ll: Color.from_hex(get_value_hex_color(ll, vmin=min(unique_leak_len), vmax=max(unique_leak_len)))
-        for ll in unique_leak_len
-    }
-    for i, lp in enumerate(leakage_point_properties, 1):
-        leakage_length = lp["ll"]
+    leakage_lengths = np.array(
+        [np.nan if lp["ll"] is None else lp["ll"] for lp in leakage_point_properties], dtype=float
+    )
+    has_leakage_length = ~np.isnan(leakage_lengths)
+    unique_leak_len = sorted({int(ll) for ll in leakage_lengths[has_leakage_length]})
+    if unique_leak_len:
+        vmin, vmax = min(unique_leak_len), max(unique_leak_len)
+        hex_colors = get_values_hex_colors(leakage_lengths[has_leakage_length], vmin=vmin, vmax=vmax)
+        color_dict = {
+            ll: Color.from_hex(hex_color)
+            for ll, hex_color in zip(unique_leak_len, get_values_hex_colors(unique_leak_len, vmin=vmin, vmax=vmax))
+        }
+    else:
+        hex_colors, color_dict = [], {}
+    lookup_colors = {hex_color: Color.from_hex(hex_color) for hex_color in set(hex_colors)}
+    colors_iterator = iter([lookup_colors[hex_color] for hex_color in hex_colors])
 
-        if leakage_length is None:
+    wgs_coordinates = get_leakage_points_wgs_coordinates(
+        np.array([(lp["x"], lp["y"]) for lp in leakage_point_properties], dtype=float)
+    )
+    for i, (lp, point_has_leakage_length, point_wgs_coordinates) in enumerate(
+        zip(leakage_point_properties, has_leakage_length, wgs_coordinates), 1
+    ):
+        if not point_has_leakage_length:
             color = Color.black()
             description = "Leakage length unavailable for this voxel"
         else:
-            color = Color.from_hex(get_value_hex_color(lp["ll"], vmin=min(unique_leak_len), vmax=max(unique_leak_len)))
+            color = next(colors_iterator)
             description = (
-                f"Leakage length: {leakage_length:.2f} m \\\n \\\n"
+                f"Leakage length: {lp['ll']:.2f} m \\\n \\\n"
                 + f"Cover layer thickness: {lp['cover_layer_d']:.2f} m \\\n "
                 + f"Cover layer permeability: {lp['cover_layer_k']:.2e} m/d \\\n"
                 + f"First aquifer thickness: {lp['first_aquifer_d']:.2f} m \\\n"
@@ -306,20 +353,45 @@ def add_all_leakage_points_to_map_features(
             color=color,
             description=description,
             as_polygons=as_polygons,
+            wgs_coordinates=point_wgs_coordinates,
         )
 
     legend = MapLegend([(color, f"{ll} m") for ll, color in color_dict.items()])
+    return map_features, map_labels, legend
+
+
+def add_all_leakage_points_to_map_features(
+    map_features: List[MapFeature], map_labels, leakage_point_properties: List[dict], as_polygons: bool = True
+) -> MapLegend:
+    """Add all the leakages points to the list of map features, their color is based on their respective leakage length.
+    Returns the mapleagend with a color gradient scale.
+    The finished features are cached per hash of the leakage table, such that the map is only built once for the same
+    leakage lengths.
+    """
+    leakage_points_hash = get_leakage_points_hash(leakage_point_properties, as_polygons)
+    if leakage_points_hash not in LEAKAGE_MAP_FEATURES_CACHE:
+        if len(LEAKAGE_MAP_FEATURES_CACHE) >= LEAKAGE_MAP_FEATURES_CACHE_SIZE:
+            LEAKAGE_MAP_FEATURES_CACHE.pop(next(iter(LEAKAGE_MAP_FEATURES_CACHE)))
+        LEAKAGE_MAP_FEATURES_CACHE[leakage_points_hash] = build_leakage_map_features(
+            leakage_point_properties, as_polygons
+        )
+    leakage_map_features, leakage_map_labels, legend = LEAKAGE_MAP_FEATURES_CACHE[leakage_points_hash]
+    map_features.extend(leakage_map_features)
+    map_labels.extend(leakage_map_labels)
     return legend
 
 
 def add_cpts_to_mapfeatures(map_features: List[MapFeature], all_cpts: EntityList, map_labels):
-    for cpt in all_cpts:
-        cpt_summary = cpt.last_saved_summary
-        coords = (int(cpt_summary.x_coordinate["value"]), int(cpt_summary.y_coordinate["value"]))
-        lat, lon = RDWGSConverter.from_rd_to_wgs(coords)
+    all_cpts = list(all_cpts)
+    cpt_coordinates = [
+        (int(cpt.last_saved_summary.x_coordinate["value"]), int(cpt.last_saved_summary.y_coordinate["value"]))
+        for cpt in all_cpts
+    ]
+    for cpt, coords, geo_point in zip(all_cpts, cpt_coordinates, rd_to_geo_points(cpt_coordinates)):
+        lat, lon = geo_point.lat, geo_point.lon
         map_features.append(
             MapPoint.from_geo_point(
-                GeoPoint(lat, lon),
+                geo_point,
                 color=CPT_COLOR,
                 title=f"CPT: {coords}",
                 entity_links=[MapEntityLink(cpt.name, cpt.id)],
@@ -330,13 +402,16 @@ def add_cpts_to_mapfeatures(map_features: List[MapFeature], all_cpts: EntityList
 
 
 def add_bore_to_mapfeatures(map_features: List[MapFeature], all_bores: EntityList, map_labels):
-    for bore in all_bores:
-        params = bore.last_saved_params
-        coords = (float(params["x_rd"]), float(params["y_rd"]))
-        lat, lon = RDWGSConverter.from_rd_to_wgs(coords)
+    all_bores = list(all_bores)
+    all_params = [bore.last_saved_params for bore in all_bores]
+    bore_coordinates = [(float(params["x_rd"]), float(params["y_rd"])) for params in all_params]
+    for bore, params, coords, geo_point in zip(
+        all_bores, all_params, bore_coordinates, rd_to_geo_points(bore_coordinates)
+    ):
+        lat, lon = geo_point.lat, geo_point.lon
         map_features.append(
             MapPoint.from_geo_point(
-                GeoPoint(lat, lon),
+                geo_point,
                 color=BORE_COLOR,
                 title=f"Bore: {coords}",
                 entity_links=[MapEntityLink(bore.name, bore.id)],
@@ -1,3 +1,5 @@
+from typing import Dict
+from typing import Iterator
 from typing import List
 from typing import Optional
 from typing import Tuple
@@ -9,13 +11,15 @@ from numpy import floor
 from shapely.geometry import LineString
 from shapely.geometry import Point
 
+from app.cpt.constants import MAX_CPT_TRACE_POINTS
 from app.cpt.model import CPT
 from app.ground_model.constants import UNIQUE_TNO_SOIL_TYPES
 from app.ground_model.model import classify_tno_soil_model
 from app.lib.helper_read_files import round_to_nearest_0_05
+from app.lib.plotly_downsampling_helper_functions import downsample_trace
 from viktor import Color
 from viktor import UserException
-from viktor.geo import GEFData
+from viktor.geo import SoilLayer
 from viktor.geo import SoilLayout
 
 DICT_SOIL_TYPES = {
@@ -66,18 +70,21 @@ def add_borehole_soil_table(
         return fig
 
 
-def add_u2(fig: go.Figure, cpt: GEFData, scale_factor: float = 1, distance: float = 0) -> go.Figure:
+def add_u2(
+    fig: go.Figure, cpt: CPT, scale_factor: float = 1, distance: float = 0, max_points: int = MAX_CPT_TRACE_POINTS
+) -> go.Figure:
+    u2, elevation = downsample_trace(cpt.measurement_arrays["u2"], cpt.elevation_in_m, max_points)
     fig.add_trace(
         go.Scatter(
-            x=list(-np.array(cpt.u2) * scale_factor + distance),
-            y=list(np.array(cpt.elevation) * 1e-3),
+            x=(-u2 * scale_factor + distance).tolist(),
+            y=elevation.tolist(),
             mode="lines",
             line=dict(color="brown", width=1),
-            customdata=cpt.u2,
+            customdata=u2.tolist(),
             legendgroup="u2",
             showlegend=False,
             hoverinfo="text",
-            hovertemplate=f"CPT naam: {cpt.name} <br>"
+            hovertemplate=f"CPT naam: {cpt.parsed_cpt.name} <br>"
             + "<br><b>Diepte</b>: %{y:.2f} m NAP"
             + "<br><b>u2</b>: %{customdata:.2f} MPa<br>"
             + "<extra></extra>",
@@ -86,19 +93,21 @@ def add_u2(fig: go.Figure, cpt: GEFData, scale_factor: float = 1, distance: floa
     return fig
 
 
-def add_Rf(fig: go.Figure, cpt: GEFData, scale_factor: float = 1, distance: float = 0) -> go.Figure:
-    rf = -np.array(cpt.Rf) * 100
+def add_Rf(
+    fig: go.Figure, cpt: CPT, scale_factor: float = 1, distance: float = 0, max_points: int = MAX_CPT_TRACE_POINTS
+) -> go.Figure:
+    rf, elevation = downsample_trace(-cpt.friction_ratio_in_percent, cpt.elevation_in_m, max_points)
     fig.add_trace(
         go.Scatter(
-            x=list(rf * scale_factor + distance),
-            y=list(np.array(cpt.elevation) * 1e-3),
+            x=(rf * scale_factor + distance).tolist(),
+            y=elevation.tolist(),
             mode="lines",
             line=dict(color="mediumblue", width=1),
-            customdata=list(rf),
+            customdata=rf.tolist(),
             legendgroup="Rf",
             showlegend=False,
             hoverinfo="text",
-            hovertemplate=f"CPT naam: {cpt.name} <br>"
+            hovertemplate=f"CPT naam: {cpt.parsed_cpt.name} <br>"
             + "<br><b>Diepte</b>: %{y:.2f} m NAP"
             + "<br><b>Rf</b>: %{customdata:.2f} %<br>"
             + "<extra></extra>",
@@ -107,18 +116,21 @@ def add_Rf(fig: go.Figure, cpt: GEFData, scale_factor: float = 1, distance: floa
     return fig
 
 
-def add_qc(fig: go.Figure, cpt: GEFData, scale_factor: float = 1, distance: float = 0) -> go.Figure:
+def add_qc(
+    fig: go.Figure, cpt: CPT, scale_factor: float = 1, distance: float = 0, max_points: int = MAX_CPT_TRACE_POINTS
+) -> go.Figure:
+    qc, elevation = downsample_trace(cpt.measurement_arrays["qc"], cpt.elevation_in_m, max_points)
     fig.add_trace(
         go.Scatter(
-            x=list(np.array(cpt.qc) * scale_factor + distance),
-            y=list(np.array(cpt.elevation) * 1e-3),
+            x=(qc * scale_factor + distance).tolist(),
+            y=elevation.tolist(),
             mode="lines",
             line=dict(color="red", width=1),
-            customdata=cpt.qc,
+            customdata=qc.tolist(),
             legendgroup="qc",
             showlegend=False,
             hoverinfo="text",
-            hovertemplate=f"CPT naam: {cpt.name} <br>"
+            hovertemplate=f"CPT naam: {cpt.parsed_cpt.name} <br>"
             + "<br><b>Diepte</b>: %{y:.2f} m NAP"
             + "<br><b>qc</b>: %{customdata:.2f} kN<br>"
             + "<extra></extra>",
@@ -141,7 +153,7 @@ def get_visualisation_along_trajectory(
     regis_layouts: Optional[List[SoilLayout]] = None,
 ) -> go.Figure:
     """
-    Generate a 2d profile along a trajectory.
+    Generate a 2d profile along a trajectory. The soil layouts are added as one bar trace per legend category.
     """
     layout = go.Layout(yaxis=dict(title="diepte [m NAP]"), xaxis=dict(title="meetpunt langs traject [m]"))
     fig = go.Figure(layout=layout)
@@ -151,7 +163,9 @@ def get_visualisation_along_trajectory(
     distance_right_side_barchart = traj_as_points[0].distance(traj_as_points[1]) / 2
     width = chainage_step / 2
     bottom_list, top_list = [], []
-    button_options_list = []
+    soil_bars = SoilProfileBars()
+    classified_soil_types = [soil.name for soil in materials_table]
+    classified_layouts = {}
 
     for i, soil_layout in enumerate(longitudinal_soil_layout):
 
@@ -167,16 +181,20 @@ def get_visualisation_along_trajectory(
             distance_leftside=distance_left_side_barchart, distance_rightside=distance_right_side_barchart, width=width
         )
 
-        # add the corresponding traces at this
-        button_options_list = add_2d_soil_traces_to_fig(
-            fig,
+        # neighbouring voxel columns are often identical, so each distinct layout is only classified once
+        layout_key = get_classified_layout_key(soil_layout)
+        if layout_key not in classified_layouts:
+            classified_layouts[layout_key] = classify_tno_soil_model(
+                soil_layout, classification_table, materials_table, minimal_aquifer_thickness=1
+            )
+
+        # add the corresponding bars at this x coordinate
+        collect_2d_soil_bars(
+            soil_bars,
             soil_layout,
-            classification_table,
-            materials_table,
-            button_options_list,
+            classified_layouts[layout_key],
+            classified_soil_types,
             distances,
-            min_max_permeabilities=min_max_permeabilities,
-            showlegend=i == 1,
             regis_layout=regis_layout,
         )
 
@@ -184,6 +202,8 @@ def get_visualisation_along_trajectory(
         distance_right_side_barchart += chainage_step
         width = chainage_step
 
+    button_options_list = add_2d_soil_bars_to_fig(fig, soil_bars, min_max_permeabilities)
+
     if segment_array:
         for segment in segment_array:
             start_segment = segment.segment_start_chainage
@@ -348,16 +368,16 @@ def add_cpts_to_2d_profile(
             cpt_point = Point(coords)
             distance = trajectory.project(cpt_point)
 
-            fig = add_qc(fig, gef.parsed_cpt, scale_factor=scale_factor_qc, distance=distance)
+            fig = add_qc(fig, gef, scale_factor=scale_factor_qc, distance=distance)
             n_traces += 1
-            if hasattr(gef.parsed_cpt, "Rf"):
+            if gef.has_signal("Rf"):
                 is_rf = True
                 n_traces += 1
-                fig = add_Rf(fig, gef.parsed_cpt, scale_factor=scale_factor_rf, distance=distance)
-            if hasattr(gef.parsed_cpt, "u2"):
+                fig = add_Rf(fig, gef, scale_factor=scale_factor_rf, distance=distance)
+            if gef.has_signal("u2"):
                 is_u2 = True
                 n_traces += 1
-                fig = add_u2(fig, gef.parsed_cpt, scale_factor=scale_factor_u2, distance=distance)
+                fig = add_u2(fig, gef, scale_factor=scale_factor_u2, distance=distance)
         except AttributeError as e:
             raise UserException(e)
 
@@ -403,217 +423,267 @@ def add_cpts_to_2d_profile(
     return n_traces, fig
 
 
-def add_2d_soil_traces_to_fig(
-    fig: go.Figure,
+def get_classified_layout_key(soil_layout: SoilLayout) -> tuple:
+    """Key of the raw TNO layout properties used by the classification, identical voxel columns share the same key"""
+    return tuple(
+        (layer.soil.name, layer.top_of_layer, layer.bottom_of_layer, layer.properties.aquifer)
+        for layer in soil_layout.layers
+    )
+
+
+class SoilProfileBars:
+    """Collects the bars of the 2D soil profile along the trajectory per legend category (button option, legend group
+    and trace name). Every category is added to the figure as a single bar trace, instead of one trace per soil
+    layout."""
+
+    def __init__(self):
+        self._bars: Dict[Tuple[str, str, str], dict] = {}
+
+    def add(
+        self,
+        option: str,
+        legendgroup: str,
+        name: str,
+        layers: List[SoilLayer],
+        distances: dict,
+        colors: list,
+        customdata: Optional[list] = None,
+    ) -> None:
+        """Add the bars of the provided layers at one x coordinate to the category (option, legendgroup, name)"""
+        if not layers:
+            return
+        bars = self._bars.setdefault(
+            (option, legendgroup, name), dict(x=[], width=[], top=[], bottom=[], colors=[], customdata=[])
+        )
+        bars["x"].append(np.full(len(layers), distances["distance_leftside"], dtype=np.float32))
+        bars["width"].append(np.full(len(layers), distances["width"], dtype=np.float32))
+        bars["top"].append(np.array([layer.top_of_layer for layer in layers], dtype=np.float32))
+        bars["bottom"].append(np.array([layer.bottom_of_layer for layer in layers], dtype=np.float32))
+        bars["colors"].extend(colors)
+        if customdata is not None:
+            bars["customdata"].append(np.array(customdata, dtype=np.float32))
+
+    def categories(self) -> Iterator[Tuple[str, str, str, dict]]:
+        """Yield (option, legendgroup, name, bar arrays) per category, in the order in which they were first added"""
+        for (option, legendgroup, name), bars in self._bars.items():
+            top = np.concatenate(bars["top"])
+            colors = bars["colors"]
+            if isinstance(colors[0], str):
+                # a single color for the whole trace avoids repeating the same rgb string for every bar
+                colors = colors[0] if len(set(colors)) == 1 else colors
+            else:
+                colors = np.array(colors, dtype=np.float32)
+            yield option, legendgroup, name, dict(
+                x=np.concatenate(bars["x"]),
+                width=np.concatenate(bars["width"]),
+                base=top,
+                y=np.concatenate(bars["bottom"]) - top,
+                colors=colors,
+                customdata=np.concatenate(bars["customdata"]) if bars["customdata"] else None,
+            )
+
+
+def collect_2d_soil_bars(
+    soil_bars: SoilProfileBars,
     soil_layout: SoilLayout,
-    classification_table: List,
-    materials_table: List,
-    button_options_list: List,
+    classified_layout: SoilLayout,
+    classified_soil_types: List[str],
     distances: dict,
-    min_max_permeabilities: Optional[dict] = None,
     regis_layout: Optional[SoilLayout] = None,
-    showlegend: Optional[bool] = False,
-) -> List[str]:
+) -> None:
     """
-    The function adds to the Plotly figure the bar traces for one x coordinate the following data:
-        - Raw TNO data: "tno_model"
+    Add the bars for one x coordinate to the soil profile bars, for the following data:
+        - Raw TNO data and REGIS layers: "tno_model"
         - Classified TNO data based on provided materials and classification table: "classified"
-        - Gradient scale for the TNO vertical permeability: vertical permeability
-        - Gradient scale for the TNO horizontal permeability: horizontal permeability
+        - Gradient scale for the TNO vertical permeability: "vertical permeability"
+        - Gradient scale for the TNO horizontal permeability: "horizontal permeability"
 
-    This function also returns a list of string to make the Widget Plotly button to switch between the 4 traces
-    mentioned above.
-    :param fig: Plotly fig to which the traces are appended
-    :param option: one of ["classified", "tno_model", "vertical permeability", "horizontal permeability"]
+    :param soil_bars: bars of the 2D profile, collected per legend category
     :param soil_layout: raw TNO SoilLayout
-    :param classification_table:
-    :param materials_table:
-    :param distances: dictionary containing the following keys: "distance_along_dyke", "dist_to_prev_point",
-    "midpoint_distance_along_dyke"
-    :param min_max_permeabilities: min and max permeability from the TNO data, is used to make the color gradient
-    :param regis_layout
-    :param showlegend:
-    :return:
+    :param classified_layout: TNO SoilLayout classified with the materials and classification table
+    :param classified_soil_types: names of the soil types of the materials table
+    :param distances: dictionary containing the following keys: "distance_leftside", "distance_rightside", "width"
+    :param regis_layout: REGIS SoilLayout at the same x coordinate
     """
-
-    # to distinguish (non-)categorised soillayouts
-    unique_soil_types = UNIQUE_TNO_SOIL_TYPES
-    layers = soil_layout
-
     if regis_layout:
-        regis_soil_types = [soil.name for soil in regis_layout.filter_unique_soils()]
-        for soil_name in regis_soil_types:
-            regis_layers = [layer for layer in regis_layout.layers if layer.soil.name == soil_name]
-            button_options_list.append("tno_model")
-            legendgroup = "Regis"
-            hovertext = [
-                f"Grondsoort: {layer.soil.name}<br>"
-                f"Bovenkant laag: {layer.top_of_layer:.2f}<br>"
-                f"Onderkant laag: {layer.bottom_of_layer:.2f}"
-                for layer in regis_layers
-            ]
-            fig.add_trace(
-                go.Bar(
-                    name=soil_name,
-                    x=[distances["distance_leftside"]] * len(regis_layers),
-                    y=[-(layer.top_of_layer - layer.bottom_of_layer) for layer in regis_layers],
-                    width=distances["width"],
-                    offset=0,
-                    marker=dict(color=[f"rgb{Color(*layer.soil.color).rgb}" for layer in regis_layers]),
-                    showlegend=showlegend,
-                    hoverinfo="text",
-                    hovertext=hovertext,
-                    legendgroup=legendgroup,
-                    legendgrouptitle_text="REGIS lagen",
-                    base=[layer.top_of_layer for layer in regis_layers],
-                    visible=True,
-                )
+        for soil in regis_layout.filter_unique_soils():
+            regis_layers = [layer for layer in regis_layout.layers if layer.soil.name == soil.name]
+            soil_bars.add(
+                "tno_model",
+                "Regis",
+                soil.name,
+                regis_layers,
+                distances,
+                colors=[f"rgb{Color(*layer.soil.color).rgb}" for layer in regis_layers],
+                customdata=[(layer.top_of_layer, layer.bottom_of_layer) for layer in regis_layers],
             )
 
-    for ui_name in unique_soil_types:
-        original_layers = [layer for layer in layers.layers if layer.soil.name == ui_name]
-        soil_type_layers = [*original_layers]
-        button_options_list.append("tno_model")
-        hovertext = [
-            f"{floor(distances['distance_leftside']):.0f} m van startpunt <br>"
-            f"diepte:  {round_to_nearest_0_05(layer.top_of_layer):.2f}"
-            f"tot {round_to_nearest_0_05(layer.bottom_of_layer):.2f} m NAP <br>"
-            f"Geclassificeerd als {layer.soil.name} <br>"
-            f"{layer.properties.kans_1_veen:.0f} % kans op veen <br>"
-            f"{layer.properties.kans_2_klei:.0f} % kans op klei <br>"
-            f"{layer.properties.kans_3_kleiig_zand:.0f} % kans op kleig zand <br>"
-            f"{layer.properties.kans_5_zand_fijn:.0f} % kans op fijn zand <br>"
-            f"{layer.properties.kans_6_zand_matig_grof:.0f} % kans op matig grof zand <br>"
-            f"{layer.properties.kans_7_zand_grof:.0f} % kans op grof zand"
-            for layer in soil_type_layers
-        ]
-        legendgroup = "TNO"
-        fig.add_trace(
-            go.Bar(
-                name=ui_name,
-                x=[distances["distance_leftside"]] * len(soil_type_layers),
-                y=[-(layer.top_of_layer - layer.bottom_of_layer) for layer in soil_type_layers],
-                width=distances["width"],
-                offset=0,
-                marker=dict(color=[f"rgb{Color(*layer.soil.color).rgb}" for layer in soil_type_layers]),
-                showlegend=showlegend,
-                hoverinfo="text",
-                hovertext=hovertext,
-                legendgroup=legendgroup,
-                legendgrouptitle_text="3D model lagen",
-                base=[layer.top_of_layer for layer in soil_type_layers],
-            )
+    for ui_name in UNIQUE_TNO_SOIL_TYPES:
+        soil_type_layers = [layer for layer in soil_layout.layers if layer.soil.name == ui_name]
+        soil_bars.add(
+            "tno_model",
+            "TNO",
+            ui_name,
+            soil_type_layers,
+            distances,
+            colors=[f"rgb{Color(*layer.soil.color).rgb}" for layer in soil_type_layers],
+            customdata=[
+                (
+                    floor(distances["distance_leftside"]),
+                    round_to_nearest_0_05(layer.top_of_layer),
+                    round_to_nearest_0_05(layer.bottom_of_layer),
+                    layer.properties.kans_1_veen,
+                    layer.properties.kans_2_klei,
+                    layer.properties.kans_3_kleiig_zand,
+                    layer.properties.kans_5_zand_fijn,
+                    layer.properties.kans_6_zand_matig_grof,
+                    layer.properties.kans_7_zand_grof,
+                )
+                for layer in soil_type_layers
+            ],
         )
-        button_options_list.append("verticale doorlatendheid")
-        hovertext = [
-            f"diepte: {layer.bottom_of_layer} tot {layer.top_of_layer} m NAP <br>"
-            f"Geclassificeerd als {layer.soil.name} <br>"
-            f"{layer.properties.vertical_permeability:.2f} m/d verticale doorlatendheid <br>"
-            f"{layer.properties.horizontal_permeability:.2f} m/d horizontale doorlatendheid <br>"
+        permeability_customdata = [
+            (
+                layer.bottom_of_layer,
+                layer.top_of_layer,
+                layer.properties.vertical_permeability,
+                layer.properties.horizontal_permeability,
+            )
             for layer in soil_type_layers
         ]
-        fig.add_trace(
-            go.Bar(
-                name=ui_name,
-                x=[distances["distance_leftside"]] * len(soil_type_layers),
-                y=[-(layer.top_of_layer - layer.bottom_of_layer) for layer in soil_type_layers],
-                width=distances["width"],
-                offset=0,
-                marker=dict(
-                    color=[layer.properties.vertical_permeability for layer in soil_type_layers],
-                    cmin=min_max_permeabilities["min_perm_v"],
-                    cmax=min_max_permeabilities["max_perm_v"],
-                    colorbar=dict(
-                        title="Schaal doorlatendheid",
-                        tickfont=dict(family="Arial"),
-                        ticksuffix="m/d",
-                        showticksuffix="all",
-                        y=0.45,
-                    ),
-                    colorscale=[[0, "red"], [0.5, "yellow"], [1, "green"]],
-                ),
-                showlegend=False,
-                hoverinfo="text",
-                hovertext=hovertext,
-                base=[layer.top_of_layer for layer in soil_type_layers],
-                visible=False,
-            )
+        soil_bars.add(
+            "vertical permeability",
+            "permeability",
+            ui_name,
+            soil_type_layers,
+            distances,
+            colors=[layer.properties.vertical_permeability for layer in soil_type_layers],
+            customdata=permeability_customdata,
+        )
+        soil_bars.add(
+            "horizontal permeability",
+            "permeability",
+            ui_name,
+            soil_type_layers,
+            distances,
+            colors=[layer.properties.horizontal_permeability for layer in soil_type_layers],
+            customdata=permeability_customdata,
         )
 
-        button_options_list.append("horizontal permeability")
-        hovertext = [
-            f"diepte: {layer.bottom_of_layer} tot {layer.top_of_layer} m NAP <br>"
-            f"Geclassificeerd als {layer.soil.name} <br>"
-            f"{layer.properties.vertical_permeability:.2f} m/d verticale doorlatendheid <br>"
-            f"{layer.properties.horizontal_permeability:.2f} m/d horizontale doorlatendheid <br>"
-            for layer in soil_type_layers
-        ]
-        fig.add_trace(
-            go.Bar(
-                name=ui_name,
-                x=[distances["distance_leftside"]] * len(soil_type_layers),
-                y=[-(layer.top_of_layer - layer.bottom_of_layer) for layer in soil_type_layers],
-                width=distances["width"],
-                offset=0,
-                marker=dict(
-                    color=[layer.properties.horizontal_permeability for layer in soil_type_layers],
-                    cmin=min_max_permeabilities["min_perm_h"],
-                    cmax=min_max_permeabilities["max_perm_h"],
-                    colorbar=dict(
-                        title="Schaal doorlatendheid",
-                        tickfont=dict(family="Arial"),
-                        ticksuffix="m/d",
-                        showticksuffix="all",
-                        y=0.45,
-                    ),
-                    colorscale=[[0, "red"], [0.5, "yellow"], [1, "green"]],
-                ),
-                showlegend=False,
-                hoverinfo="text",
-                hovertext=hovertext,
-                base=[layer.top_of_layer for layer in soil_type_layers],
-                visible=False,
-            )
+    for ui_name in classified_soil_types:
+        soil_type_layers = [layer for layer in classified_layout.layers if layer.soil.name == ui_name]
+        soil_bars.add(
+            "classified",
+            "classified",
+            ui_name,
+            soil_type_layers,
+            distances,
+            colors=[f"rgb{Color(*layer.soil.color).rgb}" for layer in soil_type_layers],
+            customdata=[(layer.top_of_layer, layer.bottom_of_layer) for layer in soil_type_layers],
         )
 
-    # classify
-    layers = classify_tno_soil_model(
-        layers,
-        classification_table,
-        materials_table,
-        minimal_aquifer_thickness=1,
-    )
-    unique_soil_types = [soil.name for soil in materials_table]
-
-    for ui_name in unique_soil_types:
-        original_layers = [layer for layer in layers.layers if layer.soil.name == ui_name]
-        soil_type_layers = [*original_layers]
-
-        button_options_list.append("classified")
-        legendgroup = "classified"
-        hovertext = [
-            f"Grondsoort: {layer.soil.name}<br>"
-            f"Bovenkant laag: {layer.top_of_layer:.2f}<br>"
-            f"Onderkant laag: {layer.bottom_of_layer:.2f}"
-            for layer in soil_type_layers
-        ]
 
-        fig.add_trace(
-            go.Bar(
-                name=ui_name,
-                x=[distances["distance_leftside"]] * len(soil_type_layers),
-                y=[-(layer.top_of_layer - layer.bottom_of_layer) for layer in soil_type_layers],
-                width=distances["width"],
-                offset=0,
-                marker=dict(color=[f"rgb{Color(*layer.soil.color).rgb}" for layer in soil_type_layers]),
-                showlegend=showlegend,
-                hoverinfo="text",
-                hovertext=hovertext,
-                legendgroup=legendgroup,
-                base=[layer.top_of_layer for layer in soil_type_layers],
-                visible=False,
-            )
-        )
-        fig.update_layout(showlegend=True)
+def add_2d_soil_bars_to_fig(
+    fig: go.Figure, soil_bars: SoilProfileBars, min_max_permeabilities: Optional[dict] = None
+) -> List[str]:
+    """
+    Add one bar trace per legend category of the soil profile bars to the Plotly figure. The hover information is
+    passed as numeric customdata and formatted by a hovertemplate, which keeps the JSON payload compact.
 
+    This function also returns the button option of every added trace, to make the Widget Plotly button to switch
+    between the "tno_model", "classified", "vertical permeability" and "horizontal permeability" views.
+    :param fig: Plotly fig to which the traces are appended
+    :param soil_bars: bars of the 2D profile, collected per legend category
+    :param min_max_permeabilities: min and max permeability from the TNO data, is used to make the color gradient
+    :return:
+    """
+    button_options_list = []
+    for option, legendgroup, name, bars in soil_bars.categories():
+        button_options_list.append(option)
+        bar_kwargs = dict(
+            name=name,
+            x=bars["x"],
+            y=bars["y"],
+            base=bars["base"],
+            width=bars["width"],
+            offset=0,
+            customdata=bars["customdata"],
+        )
+        if legendgroup == "Regis":
+            fig.add_trace(
+                go.Bar(
+                    **bar_kwargs,
+                    marker=dict(color=bars["colors"]),
+                    showlegend=True,
+                    hovertemplate=f"Grondsoort: {name}<br>"
+                    + "Bovenkant laag: %{customdata[0]:.2f}<br>"
+                    + "Onderkant laag: %{customdata[1]:.2f}"
+                    + "<extra></extra>",
+                    legendgroup="Regis",
+                    legendgrouptitle_text="REGIS lagen",
+                    visible=True,
+                )
+            )
+        elif legendgroup == "TNO":
+            fig.add_trace(
+                go.Bar(
+                    **bar_kwargs,
+                    marker=dict(color=bars["colors"]),
+                    showlegend=True,
+                    hovertemplate="%{customdata[0]:.0f} m van startpunt <br>"
+                    + "diepte: %{customdata[1]:.2f} tot %{customdata[2]:.2f} m NAP <br>"
+                    + f"Geclassificeerd als {name} <br>"
+                    + "%{customdata[3]:.0f} % kans op veen <br>"
+                    + "%{customdata[4]:.0f} % kans op klei <br>"
+                    + "%{customdata[5]:.0f} % kans op kleig zand <br>"
+                    + "%{customdata[6]:.0f} % kans op fijn zand <br>"
+                    + "%{customdata[7]:.0f} % kans op matig grof zand <br>"
+                    + "%{customdata[8]:.0f} % kans op grof zand"
+                    + "<extra></extra>",
+                    legendgroup="TNO",
+                    legendgrouptitle_text="3D model lagen",
+                )
+            )
+        elif legendgroup == "permeability":
+            suffix = "v" if option == "vertical permeability" else "h"
+            fig.add_trace(
+                go.Bar(
+                    **bar_kwargs,
+                    marker=dict(
+                        color=bars["colors"],
+                        cmin=min_max_permeabilities[f"min_perm_{suffix}"],
+                        cmax=min_max_permeabilities[f"max_perm_{suffix}"],
+                        colorbar=dict(
+                            title="Schaal doorlatendheid",
+                            tickfont=dict(family="Arial"),
+                            ticksuffix="m/d",
+                            showticksuffix="all",
+                            y=0.45,
+                        ),
+                        colorscale=[[0, "red"], [0.5, "yellow"], [1, "green"]],
+                    ),
+                    showlegend=False,
+                    hovertemplate="diepte: %{customdata[0]:.2f} tot %{customdata[1]:.2f} m NAP <br>"
+                    + f"Geclassificeerd als {name} <br>"
+                    + "%{customdata[2]:.2f} m/d verticale doorlatendheid <br>"
+                    + "%{customdata[3]:.2f} m/d horizontale doorlatendheid <br>"
+                    + "<extra></extra>",
+                    visible=False,
+                )
+            )
+        else:
+            fig.add_trace(
+                go.Bar(
+                    **bar_kwargs,
+                    marker=dict(color=bars["colors"]),
+                    showlegend=True,
+                    hovertemplate=f"Grondsoort: {name}<br>"
+                    + "Bovenkant laag: %{customdata[0]:.2f}<br>"
+                    + "Onderkant laag: %{customdata[1]:.2f}"
+                    + "<extra></extra>",
+                    legendgroup="classified",
+                    visible=False,
+                )
+            )
+    fig.update_layout(showlegend=True)
     return button_options_list
@@ -0,0 +1,43 @@
+from math import ceil
+from typing import Tuple
+
+import numpy as np
+
+
+def min_max_downsample_indices(values: np.ndarray, max_points: int) -> np.ndarray:
+    """
+    Returns the sorted indices of the points to keep when decimating a line trace to at most (about) max_points points.
+
+    The trace is split in buckets of consecutive points and the minimum and maximum of each bucket are kept, together
+    with the first and last point. Contrary to taking every n-th point, peaks (e.g. in the cone resistance) survive
+    the decimation. NaN values are never selected as extreme, unless a bucket only contains NaN values.
+    :param values: values along the trace, e.g. qc for a CPT plotted against its elevation
+    :param max_points: maximum number of points of the decimated trace
+    :return: sorted array of indices
+    """
+    values = np.asarray(values, dtype=float)
+    n_points = len(values)
+    if n_points <= max_points:
+        return np.arange(n_points)
+
+    n_buckets = max((max_points - 2) // 2, 1)
+    bucket_size = ceil(n_points / n_buckets)
+    n_buckets = ceil(n_points / bucket_size)
+    padding = n_buckets * bucket_size - n_points
+    offsets = np.arange(n_buckets) * bucket_size
+
+    is_nan = np.isnan(values)
+    values_for_min = np.pad(np.where(is_nan, np.inf, values), (0, padding), constant_values=np.inf)
+    values_for_max = np.pad(np.where(is_nan, -np.inf, values), (0, padding), constant_values=-np.inf)
+    index_min = values_for_min.reshape(n_buckets, bucket_size).argmin(axis=1) + offsets
+    index_max = values_for_max.reshape(n_buckets, bucket_size).argmax(axis=1) + offsets
+
+    indices = np.unique(np.concatenate([[0, n_points - 1], index_min, index_max]))
+    return indices[indices < n_points]
+
+
+def downsample_trace(values: np.ndarray, positions: np.ndarray, max_points: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Decimate a line trace of values plotted against positions (e.g. the elevation of a CPT) with the min-max
+    downsampler, returning the decimated values and positions"""
+    indices = min_max_downsample_indices(values, max_points)
+    return np.asarray(values)[indices], np.asarray(positions)[indices]
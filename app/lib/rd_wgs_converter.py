@@ -0,0 +1,96 @@
+from typing import List
+from typing import Sequence
+from typing import Tuple
+
+import numpy as np
+
+from viktor.geometry import GeoPoint
+
+# Reference point (Amersfoort) and coefficients of the polynomial series, as used by viktor.geometry.RDWGSConverter
+X0 = 155000
+Y0 = 463000
+PHI0 = 52.15517440
+LAM0 = 5.38720621
+
+# RD to WGS84
+KP = np.array([0, 2, 0, 2, 0, 2, 1, 4, 2, 4, 1])
+KQ = np.array([1, 0, 2, 1, 3, 2, 0, 0, 3, 1, 1])
+KPQ = np.array(
+    [3235.65389, -32.58297, -0.24750, -0.84978, -0.06550, -0.01709, -0.00738, 0.00530, -0.00039, 0.00033, -0.00012]
+)
+LP = np.array([1, 1, 1, 3, 1, 3, 0, 3, 1, 0, 2, 5])
+LQ = np.array([0, 1, 2, 0, 3, 1, 1, 2, 4, 2, 0, 0])
+LPQ = np.array(
+    [
+        5260.52916,
+        105.94684,
+        2.45656,
+        -0.81885,
+        0.05594,
+        -0.05607,
+        0.01199,
+        -0.00256,
+        0.00128,
+        0.00022,
+        -0.00022,
+        0.00026,
+    ]
+)
+
+# WGS84 to RD
+RP = np.array([0, 1, 2, 0, 1, 3, 1, 0, 2])
+RQ = np.array([1, 1, 1, 3, 0, 1, 3, 2, 3])
+RPQ = np.array([190094.945, -11832.228, -114.221, -32.391, -0.705, -2.340, -0.608, -0.008, 0.148])
+SP = np.array([1, 0, 2, 1, 3, 0, 2, 1, 0, 1])
+SQ = np.array([0, 2, 0, 2, 0, 1, 2, 1, 4, 4])
+SPQ = np.array([309056.544, 3638.893, 73.077, -157.984, 59.788, 0.433, -6.439, -0.032, 0.092, -0.054])
+
+
+def _polynomial_series(d_x: np.ndarray, d_y: np.ndarray, p: np.ndarray, q: np.ndarray, pq: np.ndarray) -> np.ndarray:
+    """Evaluate sum(pq_k * d_x ** p_k * d_y ** q_k) for all points at once"""
+    return (pq * d_x[..., np.newaxis] ** p * d_y[..., np.newaxis] ** q).sum(axis=-1)
+
+
+def from_rd_to_wgs(x: np.ndarray, y: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Convert arrays of RD coordinates to WGS84 latitudes and longitudes, with the same polynomial series as
+    RDWGSConverter.from_rd_to_wgs. The output arrays have the shape of the input arrays.
+
+    :param x: RD x coordinates
+    :param y: RD y coordinates
+    :return: latitudes, longitudes
+    """
+    d_x = 1e-5 * (np.asarray(x, dtype=float) - X0)
+    d_y = 1e-5 * (np.asarray(y, dtype=float) - Y0)
+    lat = PHI0 + _polynomial_series(d_x, d_y, KP, KQ, KPQ) / 3600
+    lon = LAM0 + _polynomial_series(d_x, d_y, LP, LQ, LPQ) / 3600
+    return lat, lon
+
+
+def from_wgs_to_rd(lat: np.ndarray, lon: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Convert arrays of WGS84 latitudes and longitudes to RD coordinates, with the same polynomial series as
+    RDWGSConverter.from_wgs_to_rd. The output arrays have the shape of the input arrays.
+
+    :param lat: latitudes
+    :param lon: longitudes
+    :return: RD x coordinates, RD y coordinates
+    """
+    d_phi = 0.36 * (np.asarray(lat, dtype=float) - PHI0)
+    d_lam = 0.36 * (np.asarray(lon, dtype=float) - LAM0)
+    x = X0 + _polynomial_series(d_phi, d_lam, RP, RQ, RPQ)
+    y = Y0 + _polynomial_series(d_phi, d_lam, SP, SQ, SPQ)
+    return x, y
+
+
+def rd_to_geo_points(rd_coordinates: Sequence[Sequence[float]]) -> List[GeoPoint]:
+    """Convert a sequence of RD (x, y) coordinates to GeoPoints, in one vectorized transform. Equivalent to
+    [GeoPoint.from_rd(point) for point in rd_coordinates], a third (z) coordinate is ignored."""
+    rd_coordinates = np.asarray(rd_coordinates, dtype=float)[..., :2].reshape(-1, 2)
+    lat, lon = from_rd_to_wgs(rd_coordinates[:, 0], rd_coordinates[:, 1])
+    return [GeoPoint(point_lat, point_lon) for point_lat, point_lon in zip(lat.tolist(), lon.tolist())]
+
+
+def geo_points_to_rd(geo_points: Sequence[GeoPoint]) -> List[Tuple[float, float]]:
+    """Convert a sequence of GeoPoints to RD (x, y) coordinates, in one vectorized transform. Equivalent to
+    [geo_point.rd for geo_point in geo_points]."""
+    x, y = from_wgs_to_rd([point.lat for point in geo_points], [point.lon for point in geo_points])
+    return list(zip(x.tolist(), y.tolist()))
@@ -1,4 +1,7 @@
+import os
+import tempfile
 import urllib.request
+from hashlib import sha256
 from pathlib import Path
 from typing import Dict
 from typing import List
@@ -6,7 +9,6 @@ from typing import Tuple
 
 import numpy as np
 import xarray
-from scipy.spatial import distance
 from shapely.geometry import LineString
 from shapely.geometry import Polygon
 
@@ -18,18 +20,55 @@ from viktor.geo import Soil
 from viktor.geo import SoilLayer
 from viktor.geo import SoilLayout
 
-PATH_REGIS_FILE = Path(__file__).parent / "REGIS.nc"
+REGIS_CACHE_DIR = Path(tempfile.gettempdir()) / "regis_cache"
+REGIS_URL = "https://www.dinodata.nl/opendap/REGIS/REGIS.nc.nc4"
+REGIS_VARIABLE = "top"
+# Number of downloaded REGIS subsets kept in the cache, the least recently used files are removed beyond it
+REGIS_CACHE_MAX_FILES = 100
 
 
 # isolated for testing purposes
-def save_regis_data_from_url(url: str) -> None:
-    urllib.request.urlretrieve(url, PATH_REGIS_FILE)
+def save_regis_data_from_url(url: str, file_path: Path) -> None:
+    """Download the url into a temporary file next to file_path and move it in place once it is complete, such that
+    concurrent workers never read a partially written file"""
+    file_path.parent.mkdir(parents=True, exist_ok=True)
+    file_descriptor, temporary_path = tempfile.mkstemp(dir=file_path.parent, suffix=".part")
+    os.close(file_descriptor)
+    try:
+        urllib.request.urlretrieve(url, temporary_path)
+        os.replace(temporary_path, file_path)
+    finally:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+
+
+def get_regis_cache_path(url: str) -> Path:
+    """Path of the cached subset of REGIS, the file name is the hash of the query url (boundary box and variable)"""
+    return REGIS_CACHE_DIR / f"{sha256(url.encode()).hexdigest()}.nc"
+
+
+def evict_regis_cache() -> None:
+    """Removes the least recently used subsets beyond the maximum number of files from the REGIS cache directory"""
+    cached_files = []
+    for file_path in REGIS_CACHE_DIR.glob("*.nc"):
+        try:
+            cached_files.append((file_path.stat().st_mtime, file_path))
+        except FileNotFoundError:  # removed by another process
+            continue
+    cached_files.sort(reverse=True)
+    for _, file_path in cached_files[REGIS_CACHE_MAX_FILES:]:
+        try:
+            file_path.unlink()
+        except FileNotFoundError:
+            pass
 
 
 def get_regis_dataset(x_min: int, y_min: int, x_max: int, y_max: int, bottom_level_query: int) -> xarray.Dataset:
     """
     Extract a Dataset based on a domain/boundary box (x_min, y_min, x_max, xy_max, bottom) of Regis.
     More info: https://www.dinodata.nl/opendap/REGIS/REGIS.nc.html
+    The subset of every boundary box is downloaded once and stored in the REGIS cache directory, which keeps the
+    REGIS_CACHE_MAX_FILES most recently used subsets.
 
     :param x_min, y_min, x_max, y_max: RD coodinates of the boundaries
     :param bottom_level_query: bottom level in meters of the REGIS selection data, all data below 'bottom' is dropped.
@@ -48,10 +87,17 @@ def get_regis_dataset(x_min: int, y_min: int, x_max: int, y_max: int, bottom_lev
     if y_min > y_max:
         raise ValueError("south coordinate is larger than north coordinate")
 
-    # Retrieve REGIS data from an API call on the custom url and write the content into "REGIS.nc" file
-    url = f"https://www.dinodata.nl/opendap/REGIS/REGIS.nc.nc4?top%5B0:1:131%5D%5B{y_min}:1:{y_max}%5D%5B{x_min}:1:{x_max}%5D"
-    save_regis_data_from_url(url)
-    ds = xarray.open_dataset(PATH_REGIS_FILE)
+    # Retrieve REGIS data from an API call on the custom url, unless the same subset has been downloaded before
+    url = f"{REGIS_URL}?{REGIS_VARIABLE}%5B0:1:131%5D%5B{y_min}:1:{y_max}%5D%5B{x_min}:1:{x_max}%5D"
+    file_path = get_regis_cache_path(url)
+    if file_path.exists():
+        # the modification time marks the last use of the subset
+        file_path.touch()
+    else:
+        save_regis_data_from_url(url, file_path)
+        evict_regis_cache()
+    with xarray.open_dataset(file_path) as ds:
+        ds = ds.load()
     ds = ds.dropna("layer", how="all")
     ds = ds.where(ds.top > bottom_level_query, drop=True)
     return ds
@@ -64,20 +110,22 @@ def get_longitudinal_regis_soil_layouts(
     - polygon: Region within which to parse REGIS [RD coordinates]
     - trajectory: linestring of points for which the soillayouts need to be found (m, RD)
     - bottom level query: until wat depth to parse the regis model [m]
-    Returns: a list for each point on the trajectory, the closest regis_soilLayout that was found within the
+    Returns: a list for each point on the trajectory, the regis_soilLayout of the closest grid point within the
     polygon"""
-    all_regis_soil_layouts = get_regis_soil_layouts_in_region(polygon, bottom_level_query)
-    coords = [key for key in all_regis_soil_layouts.keys()]
-    regis_soil_layouts = []
-    for point in trajectory.coords:
-        closest_point_index = distance.cdist([[*point]], coords).argmin()
-        regis_soil_layouts.append(all_regis_soil_layouts[coords[closest_point_index]])
-    return regis_soil_layouts
+    x_min, y_min, x_max, y_max = polygon.bounds
+    ds = get_regis_dataset(x_min=x_min, x_max=x_max, y_min=y_min, y_max=y_max, bottom_level_query=bottom_level_query)
+    coords = np.asarray(trajectory.coords)
+    top = ds.top.sel(
+        x=xarray.DataArray(coords[:, 0], dims="point"),
+        y=xarray.DataArray(coords[:, 1], dims="point"),
+        method="nearest",
+    )
+    return get_regis_soil_layouts(top, bottom_level_query)
 
 
 def get_regis_soil_layouts_in_region(
     polygon: Polygon, bottom_level_query: int = -30
-) -> Dict[Tuple[int, int], SoilLayout]:
+) -> Dict[Tuple[float, float], SoilLayout]:
     """
     - polygon: Region within which to parse REGIS [RD coordinates]
     - bottom level query: until wat depth to parse the regis model [m]
@@ -86,33 +134,51 @@ def get_regis_soil_layouts_in_region(
     """
     x_min, y_min, x_max, y_max = polygon.bounds
     ds = get_regis_dataset(x_min=x_min, x_max=x_max, y_min=y_min, y_max=y_max, bottom_level_query=bottom_level_query)
-    regis_data = parse_regis_top_layer(ds)
-    soil_layouts = {}
-
-    for location in regis_data:
-        sorted_top_of_layers = sorted(regis_data[location].keys())  # sort by depth
-        bottom_of_layer = sorted_top_of_layers[0]
-        soil_layers = []
-        previous_soil_name = get_REGIS_hydrogeological_name(regis_data[location][bottom_of_layer])
-        soil_name = ""
-
-        for top_of_layer in sorted_top_of_layers:
-            soil_name = get_REGIS_hydrogeological_name(regis_data[location][top_of_layer])
-            # if the soil is still the same, do nothing
-            if soil_name not in previous_soil_name:  # new soil!
-                # save previous soilLayer
-                soil = Soil(previous_soil_name, find_regis_color(previous_soil_name))
-                soil_layers.append(SoilLayer(soil, top_of_layer, bottom_of_layer))
-
-                # start new layer
-                bottom_of_layer = top_of_layer
-                previous_soil_name = soil_name
-
-        # also add last detected soil
-        soil = Soil(soil_name, find_regis_color(previous_soil_name))
-        soil_layers.append(SoilLayer(soil, sorted_top_of_layers[-1], bottom_of_layer))
-        soil_layouts[location] = SoilLayout(soil_layers)
+    top = ds.top.stack(point=("x", "y"))
+    return dict(zip(top["point"].values.tolist(), get_regis_soil_layouts(top, bottom_level_query)))
+
 
+def get_regis_soil_layouts(top: xarray.DataArray, bottom_level_query: float) -> List[SoilLayout]:
+    """Build the REGIS SoilLayout of every point from the top levels of the formations. The formations of a point are
+    sorted from top to bottom, a formation ends at the top of the next formation below it and the lowest formation ends
+    at the bottom level of the query. Consecutive formations with the same name are merged into one layer.
+
+    :param top: top levels of the formations [m NAP] with dimensions (layer, point), nan where a formation is absent
+    :param bottom_level_query: bottom of the lowest formation [m NAP]
+    :return: list with the SoilLayout of every point
+    """
+    layer_codes = [code.decode() if isinstance(code, bytes) else str(code) for code in top["layer"].values]
+    soil_names, layer_soil_index = np.unique(
+        [get_REGIS_hydrogeological_name(code) for code in layer_codes], return_inverse=True
+    )
+    soils = [Soil(soil_name, find_regis_color(soil_name)) for soil_name in soil_names.tolist()]
+
+    # sort the formations of every point by descending top level, the absent formations (nan) are sorted last
+    top_values = top.transpose("layer", "point").values
+    order = np.argsort(-top_values, axis=0)
+    top_of_layer = np.take_along_axis(top_values, order, axis=0)
+    soil_index = layer_soil_index[order]
+    present = ~np.isnan(top_of_layer)
+    next_top_of_layer = np.vstack([top_of_layer[1:], np.full((1, top_of_layer.shape[1]), np.nan)])
+    bottom_of_layer = np.where(np.isnan(next_top_of_layer), bottom_level_query, next_top_of_layer)
+
+    # a layer starts at a formation with another name than the one above and ends where the next layer starts
+    new_soil = soil_index[1:] != soil_index[:-1]
+    every_point = np.ones((1, top_of_layer.shape[1]), dtype=bool)
+    layer_starts = present & np.vstack([every_point, new_soil])
+    layer_ends = present & np.vstack([new_soil | ~present[1:], every_point])
+
+    soil_layouts = []
+    for starts, ends, tops, bottoms, indices in zip(
+        layer_starts.T, layer_ends.T, top_of_layer.T, bottom_of_layer.T, soil_index.T
+    ):
+        soil_layers = [
+            SoilLayer(soils[index], top_of_soil, bottom_of_soil)
+            for index, top_of_soil, bottom_of_soil in zip(
+                indices[starts].tolist(), tops[starts].tolist(), bottoms[ends].tolist()
+            )
+        ]
+        soil_layouts.append(SoilLayout(soil_layers))
     return soil_layouts
 
 
@@ -128,30 +194,6 @@ def find_regis_color(soil_name):
     return Color(0, 146, 0)
 
 
-def parse_regis_top_layer(dataset: xarray.Dataset) -> Dict[Tuple[int, int], dict]:
-    """Parse a REGIS x.array.Dataset and return a dictionnary with soil name by depth and by location
-    :param dataset: xarray.Dataset obtained from a .nc file
-    :return: dictionary with following structure :
-             - key: (x, y): Tuple[int, int]  coordinates in RD
-             - value: dict with the following structure:
-                      - key: dapth of top layer: float [mNAP]
-                      - value: soil_name: str
-    """
-    layers = dataset.coords.get("layer").values
-    data = {layer.decode(): data.values for layer, data in zip(layers, dataset.top)}
-
-    soils_by_depth = {}
-
-    for i, (x, y) in enumerate(zip(dataset["x"].values, dataset["y"].values)):
-        soils_by_depth[(x, y)] = {}
-        for soil_name in data.keys():  # for each soil type
-            for layer in data[soil_name]:  # there can be more than one layer with a given soil
-                if not np.isnan(layer[i]):
-                    soils_by_depth[(x, y)][layer[i]] = soil_name  # if there is height for the layer, add it
-
-    return soils_by_depth
-
-
 def get_REGIS_hydrogeological_name(layer_code: str) -> str:
     """
     Return the full name of the REGIS geological layer based on its code.
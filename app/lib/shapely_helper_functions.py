@@ -1,3 +1,4 @@
+from functools import lru_cache
 from io import BytesIO
 from math import hypot
 from typing import Dict
@@ -9,7 +10,6 @@ import numpy as np
 import pandas as pd
 import shapefile as pyshp
 from matplotlib import cm
-from matplotlib.colors import Normalize
 from matplotlib.colors import rgb2hex
 from munch import Munch
 from numpy import isinf
@@ -25,7 +25,11 @@ from shapely.ops import transform
 # ------
 # POINTS
 # ------
+from app.ground_model.array_soil_layout import ArraySoilLayout
+from app.ground_model.array_soil_layout import as_array_soil_layout
 from app.lib.constants import WaterDirection
+from app.lib.rd_wgs_converter import geo_points_to_rd
+from app.lib.rd_wgs_converter import rd_to_geo_points
 from viktor import Color
 from viktor import UserException
 from viktor.api_v1 import Entity
@@ -54,7 +58,7 @@ def convert_shapely_point_to_geo_point(point: Point) -> GeoPoint:
 
 def convert_geo_polyline_to_linestring(geo_polyline: GeoPolyline, offset: int = 0, side: str = "left") -> LineString:
     """Convert a SDK GeoPolyline object into a shapely LineString, if necessary including an offset"""
-    list_points = [pt.rd for pt in geo_polyline.points]
+    list_points = geo_points_to_rd(geo_polyline.points)
     if offset < 0:
         return reverse_shapely_geoms(LineString(list_points).parallel_offset(offset, side, join_style=2))
     return LineString(list_points).parallel_offset(offset, side, join_style=2)
@@ -72,7 +76,7 @@ def reverse_shapely_geoms(geom):
 def convert_linestring_to_geo_polyline(linestring: LineString) -> GeoPolyline:
     """Convert a shapely LineString into a shapely a SDK GeoPolyline"""
     linestring_points = list(linestring.coords)
-    return GeoPolyline(*[GeoPoint.from_rd(pt) for pt in linestring_points])
+    return GeoPolyline(*rd_to_geo_points(linestring_points))
 
 
 def convert_shapely_linestring_to_shapefile(params: Munch, polygon: GeoPolygon, name: str) -> Dict[str, BytesIO]:
@@ -131,14 +135,14 @@ def create_line_by_point_and_vector(point: Point, vector: np.array) -> LineStrin
 # POLYGONS:
 # --------
 def convert_geopolygon_to_shapely_polgon(geopolygon: GeoPolygon) -> Polygon:
-    return Polygon([points.rd for points in geopolygon.points])
+    return Polygon(geo_points_to_rd(geopolygon.points))
 
 
 def convert_shapely_polgon_to_geopolygon(polygon: Polygon) -> Tuple[GeoPolygon, List[GeoPolygon]]:
     list_holes = []
     for interior in polygon.interiors:
-        list_holes.append(GeoPolygon(*[GeoPoint.from_rd(point) for point in interior.coords]))
-    return GeoPolygon(*[GeoPoint.from_rd(point) for point in polygon.exterior.coords]), list_holes
+        list_holes.append(GeoPolygon(*rd_to_geo_points(interior.coords)))
+    return GeoPolygon(*rd_to_geo_points(polygon.exterior.coords)), list_holes
 
 
 def convert_viktor_polygon_to_shapely(polygon: ViktorPolygon) -> Polygon:
@@ -191,7 +195,7 @@ def get_all_exit_point_entities_within_polygon(
     exit_point_entities: Union[EntityList, List[Entity]], polygon_coord: GeoPolygon
 ) -> List[Entity]:
     """Return a list of entities for which the exit points are located within a drawn polygon"""
-    polygon = Polygon([point.rd for point in polygon_coord.points])
+    polygon = Polygon(geo_points_to_rd(polygon_coord.points))
     filtered_exit_point_entities = []
     for exit_point in exit_point_entities:
         exit_point_coord = (
@@ -285,41 +289,25 @@ def calc_minimum_distance(
     return geom_1.distance(geom_2)
 
 
-def intersect_soil_layout_table_with_z(soil_layout: SoilLayout, ahn_ground_level: float) -> SoilLayout:
+def intersect_soil_layout_table_with_z(
+    soil_layout: Union[SoilLayout, ArraySoilLayout], ahn_ground_level: float
+) -> ArraySoilLayout:
     """
     Intersect the soil layout table with ground level.
 
     Parameters
     ----------
     soil_layout
-        List of dictionaries, example:
-            [ {'name': 'Zand grof', 'top_of_layer': -5},
-              {'name': 'Zand grof', 'top_of_layer': -8},
-              ...
-            ]
+        SoilLayout, or its array representation, from top to bottom
     ahn_ground_level
         Value of ahn
     Returns
     -------
     soil_layout_table
+        array representation of the intersected soil layout, its arrays are views on the input layout
     """
     # if no AHN data has been found, don't intersect soil layout.
-    if isnan(ahn_ground_level):
-        return soil_layout
-
-    soil_layout_serialized = soil_layout.serialize()
-    index_to_remove = 0
-    for layer, next_layer in zip(soil_layout_serialized["layers"], soil_layout_serialized["layers"][1:]):
-        if ahn_ground_level >= layer["top_of_layer"]:
-            # If the first layer has a lower z, this is extended until the ahn value
-            layer["top_of_layer"] = ahn_ground_level
-            break
-
-        if next_layer["top_of_layer"] < ahn_ground_level <= layer["top_of_layer"]:
-            layer["top_of_layer"] = ahn_ground_level
-            break
-        index_to_remove += 1
-    return SoilLayout.from_dict({"layers": soil_layout_serialized["layers"][index_to_remove:]})
+    return as_array_soil_layout(soil_layout).cut_at_z(ahn_ground_level)
 
 
 def get_unity_check_color(unity_checks: List[float]) -> Color:
@@ -375,13 +363,28 @@ def generate_perpendicular_line_to_trajectory_from_point(
     return perp_line
 
 
+@lru_cache(maxsize=1)
+def get_hex_color_lookup_table() -> Tuple[str, ...]:
+    """The 256 hex colors of the viridis colormap, computed once instead of on every color query"""
+    return tuple(rgb2hex(rgb) for rgb in cm.viridis(np.arange(cm.viridis.N)))
+
+
+def get_values_hex_colors(values: np.ndarray, vmin: float, vmax: float) -> List[str]:
+    """Get the hex colors of an array of values within 2 given bounds vmin and vmax, in one vectorized lookup. The
+    values are binned in the same way as the matplotlib colormap does for a single value."""
+    lookup_table = get_hex_color_lookup_table()
+    values = np.asarray(values, dtype=float)
+    if vmax == vmin:
+        normalized_values = np.zeros_like(values)
+    else:
+        normalized_values = (values - vmin) / (vmax - vmin)
+    indices = np.clip((normalized_values * len(lookup_table)).astype(int), 0, len(lookup_table) - 1)
+    return [lookup_table[index] for index in indices]
+
+
 def get_value_hex_color(value: float, vmin: float, vmax: float) -> str:
     """Get the hex color of a value within 2 given bounds vmin and vmax. This is useful to make color gradient scales"""
-    cmap = cm.viridis
-    norm = Normalize(vmin=vmin, vmax=vmax)
-    rgb = cmap(norm(value))
-    color = rgb2hex(rgb)
-    return color
+    return get_values_hex_colors(np.array([value]), vmin, vmax)[0]
 
 
 def get_objects_in_polygon(list_objects: List, polygon: Polygon) -> List:
@@ -1,4 +1,3 @@
-from typing import Any
 from typing import Optional
 from typing import Tuple
 from typing import Union
@@ -7,8 +6,7 @@ from munch import Munch
 from munch import munchify
 from numpy import Inf
 from numpy import exp
-from numpy import float64
-from numpy import isnan
+from numpy import fmax
 from numpy import pi
 from numpy import sqrt
 from numpy import tan
@@ -25,6 +23,7 @@ from app.piping_tool.constants import THETA
 from app.piping_tool.constants import VISCOSITY
 from app.piping_tool.constants import WHITE_COEFFICIENT
 from app.piping_tool.constants import PipingDataFrameColumns
+from app.piping_tool.piping_result_table import PipingResultTableBuilder
 from viktor import UserException
 
 
@@ -116,6 +115,18 @@ class PipingCalculation:
         if aquifer_layer.properties.horizontal_permeability is None:
             raise UserException("Geen horizontaal doorlatendheid voor aquifer")
 
+    def validator_geohydrologic_model(self):
+        """Raise when the geohydrologic model is unknown, or when the damping factor of model 1 is out of range"""
+        if self.geohydrologic_model not in ("0", "1", "2"):
+            raise UserException(f"{self.geohydrologic_model} is geen valide Geohydrologisch model")
+        if self.geohydrologic_model == "1" and (self.damping_factor > 1 or self.damping_factor < 0):
+            raise ValueError("Incorrect damping factor")
+
+    def validator_ditch(self):
+        """Schematize the ditch at the top of the aquifer, which raises a Ditch error when it is not possible"""
+        if self.is_ditch:
+            self.ditch.h_eff(self.aquifer_layer["top_of_layer"])
+
     @property
     def ground_level(self) -> float:
         """
@@ -210,51 +221,49 @@ class PipingCalculation:
             / self.calc_reduced_head_difference
         )
 
-    def get_piping_summary_results(self) -> dict:
+    def write_piping_summary_results(self, piping_results: PipingResultTableBuilder):
+        """Write the intermediate results and unity checks of the calculation into the current row of the piping result
+        table. A nan result is stored as null in the table."""
         column_names = PipingDataFrameColumns
         aquifer_properties = self.aquifer_layer.get("properties")
         aquifer_thickness = self.aquifer_layer.top_of_layer - self.aquifer_layer.bottom_of_layer
         cover_thickness = self.get_cover_layer_properties["thickness"]
 
-        res = {
-            column_names.DITCH.value: "Ja" if self.is_ditch else "Nee",
-            column_names.DITCH_SMALL_B.value: self.ditch.small_b if self.is_ditch else "-",
-            column_names.DITCH_LARGE_B.value: self.ditch.large_b if self.is_ditch else "-",
-            column_names.GROUND_LEVEL.value: self.ground_level,
-            column_names.RIVER_LEVEL.value: self.river_level,
-            column_names.PHREATIC_LEVEL.value: self.calc_h_exit,
-            column_names.COVER_LAYER_THICKNESS.value: cover_thickness,
-            column_names.AQUIFER_THICKNESS.value: convert_nan(aquifer_thickness),
-            column_names.AQUIFER_PERMEABILITY.value: convert_nan(aquifer_properties.get("horizontal_permeability")),
-            column_names.AQUIFER_INTR_PERMEABILITY.value: convert_nan(
-                self.calc_intrinsic_permeability(aquifer_properties.get("horizontal_permeability"))
-            ),
-            column_names.AQUIFER_D_70.value: aquifer_properties.grain_size_d70 / 1e3,
-            column_names.M_P.value: M_P,
-            column_names.F_1.value: convert_nan(self.calc_f_resistance),
-            column_names.WHITE_COEFFICIENT.value: WHITE_COEFFICIENT,
-            column_names.THETA.value: THETA,
-            column_names.D_70_REF.value: D70_REF,
-            column_names.R_C.value: R_C,
-            column_names.F_2.value: convert_nan(self.calc_f_scale),
-            column_names.F_3.value: convert_nan(self.calc_f_geometry),
-            column_names.SEEPAGE_LENGTH.value: self.distance_from_entry_line,
-            column_names.CRITICAL_HEAD_DIFFERENCE_SELLMEIJER.value: convert_nan(
-                self.calc_critical_head_difference_sellmeijer
-            ),
-            column_names.REDUCED_HEAD_DIFFERENCE.value: convert_nan(self.calc_reduced_head_difference),
-            column_names.UNITY_CHECK.value: convert_nan(self.uplift_unity_check),
-            column_names.POTENTIAL_UPLIFT.value: convert_nan(self.calc_uplift_critical_potential_difference),
-            column_names.AQUIFER_HYDRAULIC_HEAD.value: convert_nan(self.calc_phi_exit),
-            column_names.WATER_LEVEL_EXIT_POINT.value: self.calc_h_exit,
-            column_names.CRITICAL_HEAVE_GRADIENT.value: CRITICAL_HEAVE_GRADIENT,
-            column_names.UPLIFT_UNITY_CHECK.value: convert_nan(self.uplift_unity_check),
-            column_names.HEAVE_UNITY_CHECK.value: convert_nan(self.heave_unity_check),
-            column_names.SELLMEIJER_UNITY_CHECK.value: convert_nan(self.backward_erosion_unity_check),
-            column_names.UPLIFT_LIMIT_STATE_SCORE.value: convert_nan(self.uplift_limit_state),
-            column_names.HEAVE_LIMIT_STATE_SCORE.value: convert_nan(self.heave_limit_state),
-        }
-        return res
+        add = piping_results.add
+        add(column_names.DITCH, "Ja" if self.is_ditch else "Nee")
+        add(column_names.DITCH_SMALL_B, self.ditch.small_b if self.is_ditch else None)
+        add(column_names.DITCH_LARGE_B, self.ditch.large_b if self.is_ditch else None)
+        add(column_names.GROUND_LEVEL, self.ground_level)
+        add(column_names.RIVER_LEVEL, self.river_level)
+        add(column_names.COVER_LAYER_THICKNESS, cover_thickness)
+        add(column_names.AQUIFER_THICKNESS, aquifer_thickness)
+        add(column_names.AQUIFER_PERMEABILITY, aquifer_properties.get("horizontal_permeability"))
+        add(
+            column_names.AQUIFER_INTR_PERMEABILITY,
+            self.calc_intrinsic_permeability(aquifer_properties.get("horizontal_permeability")),
+        )
+        add(column_names.AQUIFER_D_70, aquifer_properties.grain_size_d70 / 1e3)
+        add(column_names.M_P, M_P)
+        add(column_names.F_1, self.calc_f_resistance)
+        add(column_names.WHITE_COEFFICIENT, WHITE_COEFFICIENT)
+        add(column_names.THETA, THETA)
+        add(column_names.D_70_REF, D70_REF)
+        add(column_names.R_C, R_C)
+        add(column_names.F_2, self.calc_f_scale)
+        add(column_names.F_3, self.calc_f_geometry)
+        add(column_names.SEEPAGE_LENGTH, self.distance_from_entry_line)
+        add(column_names.CRITICAL_HEAD_DIFFERENCE_SELLMEIJER, self.calc_critical_head_difference_sellmeijer)
+        add(column_names.REDUCED_HEAD_DIFFERENCE, self.calc_reduced_head_difference)
+        add(column_names.POTENTIAL_UPLIFT, self.calc_uplift_critical_potential_difference)
+        add(column_names.AQUIFER_HYDRAULIC_HEAD, self.calc_phi_exit)
+        # the phreatic level and the water level at the exit point share the same column
+        add(column_names.WATER_LEVEL_EXIT_POINT, self.calc_h_exit)
+        add(column_names.CRITICAL_HEAVE_GRADIENT, CRITICAL_HEAVE_GRADIENT)
+        add(column_names.UPLIFT_UNITY_CHECK, self.uplift_unity_check)
+        add(column_names.HEAVE_UNITY_CHECK, self.heave_unity_check)
+        add(column_names.SELLMEIJER_UNITY_CHECK, self.backward_erosion_unity_check)
+        add(column_names.UPLIFT_LIMIT_STATE_SCORE, self.uplift_limit_state)
+        add(column_names.HEAVE_LIMIT_STATE_SCORE, self.heave_limit_state)
 
     def average_volumetric_weight_cover_layers(
         self,
@@ -370,42 +379,36 @@ class PipingCalculation:
         """
         Calculate and return the hydraulic head in the aquifer at the exit point.
         """
+        self.validator_geohydrologic_model()
         if self.geohydrologic_model == "0":
             return self.aquifer_hydraulic_head_hinterland
         if self.geohydrologic_model == "1":
-            if self.damping_factor > 1 or self.damping_factor < 0:
-                raise ValueError("Incorrect damping factor")
             return self.calc_phi_exit_level_1
-        elif self.geohydrologic_model == "2":
-            return self.calc_phi_exit_level_2
-        else:
-            raise UserException(f"{self.geohydrologic_model} is geen valide Geohydrologisch model")
+        return self.calc_phi_exit_level_2
 
     @property
     def calc_phi_exit_level_1(self) -> float:
         """Calculate the hydraulic head in the aquifer at the exit point according to the Geohydrologic model 1"""
-        return self.phi_exit_average_hinterland + self.damping_factor * (
-            self.river_level - self.phi_exit_average_hinterland
-        )
+        return calc_phi_exit_level_1(self.phi_exit_average_hinterland, self.damping_factor, self.river_level)
 
     @property
     def calc_phi_exit_level_2(self) -> float:
         """Calculate the hydraulic head in the aquifer at the exit point according to the Geohydrologic model 2"""
-
-        phi_2 = self.polder_level + (self.river_level - self.polder_level) * self.leakage_length_hinterland / (
-            self.leakage_length_foreland + self.dike_width + self.leakage_length_hinterland
+        return calc_phi_exit_level_2(
+            self.polder_level,
+            self.river_level,
+            self.leakage_length_hinterland,
+            self.leakage_length_foreland,
+            self.dike_width,
+            self.distance_from_ref_line,
         )
-        phi_exit = self.polder_level + (phi_2 - self.polder_level) * exp(
-            (self.dike_width / 2 - self.distance_from_ref_line) / self.leakage_length_hinterland
-        )
-        return phi_exit
 
     @property
     def calc_reduced_head_difference(self) -> float:
         """Calculate the head difference. The head difference is corrected with the 0.3D rule"""
         cover_thickness = self.get_cover_layer_properties["thickness"]
 
-        return max(0.01, (self.river_level - self.calc_h_exit - R_C * cover_thickness))
+        return calc_reduced_head_difference(self.river_level, self.calc_h_exit, cover_thickness)
 
     @property
     def calc_critical_head_difference_sellmeijer(self) -> float:
@@ -424,12 +427,12 @@ class PipingCalculation:
     @property
     def calc_f_scale(self) -> float:
         """Calculate the scale factor"""
-        seepage_length = self.distance_from_entry_line
         aquifer_properties = self.aquifer_layer.get("properties")
-        d_70_m = aquifer_properties.grain_size_d70 / 1e3  # convert to m (input field in mm)
-        intr_permeability = self.calc_intrinsic_permeability(aquifer_properties.get("horizontal_permeability"))
-        f_scale = D70_REF / (intr_permeability * seepage_length) ** (1 / 3) * (d_70_m / D70_REF) ** 0.4
-        return f_scale
+        return calc_f_scale(
+            aquifer_properties.get("horizontal_permeability"),
+            aquifer_properties.grain_size_d70,
+            self.distance_from_entry_line,
+        )
 
     @property
     def calc_f_geometry(self) -> float:
@@ -445,15 +448,45 @@ class PipingCalculation:
     def calc_intrinsic_permeability(self, horizontal_permeability) -> float:
         """Calculate the intrinsic permeability from the Darcy permeability.
         The permeability is in [m/day] and the resulting intrinsic permeability is [m/s]"""
-        return (VISCOSITY / GRAVITY) * horizontal_permeability / (24 * 3600)
+        return calc_intrinsic_permeability(horizontal_permeability)
 
 
-def calculate_leakage_length(cover_layer_thickness, k_cover_layer, first_aquifer_thickness, k_first_aquifer_layer):
-    return sqrt(k_first_aquifer_layer * cover_layer_thickness * first_aquifer_thickness / k_cover_layer)
+# The functions below evaluate the formulas of the PipingCalculation for floats as well as for NumPy arrays, such that
+# the limit states can be evaluated for many river levels or samples of the parameters at once by broadcasting.
+def calc_phi_exit_level_1(phi_exit_average_hinterland, damping_factor, river_level):
+    """Hydraulic head in the aquifer at the exit point according to the Geohydrologic model 1"""
+    return phi_exit_average_hinterland + damping_factor * (river_level - phi_exit_average_hinterland)
+
+
+def calc_phi_exit_level_2(
+    polder_level, river_level, leakage_length_hinterland, leakage_length_foreland, dike_width, distance_from_ref_line
+):
+    """Hydraulic head in the aquifer at the exit point according to the Geohydrologic model 2"""
+    phi_2 = polder_level + (river_level - polder_level) * leakage_length_hinterland / (
+        leakage_length_foreland + dike_width + leakage_length_hinterland
+    )
+    return polder_level + (phi_2 - polder_level) * exp(
+        (dike_width / 2 - distance_from_ref_line) / leakage_length_hinterland
+    )
+
+
+def calc_reduced_head_difference(river_level, h_exit, cover_thickness):
+    """Head difference over the dike, corrected with the 0.3D rule. Like the built-in max, a nan head difference
+    gives the minimum of 0.01."""
+    return fmax(0.01, river_level - h_exit - R_C * cover_thickness)
 
 
-def convert_nan(value: Any) -> Any:
-    """Convert numpy nan type into string"""
-    if isinstance(value, float64) and isnan(value):
-        return "nan"
-    return value
+def calc_f_scale(horizontal_permeability, d_70, seepage_length):
+    """Scale factor of Sellmeijer, with the permeability of the aquifer in m/day and its d70 in mm"""
+    d_70_m = d_70 / 1e3  # convert to m (input field in mm)
+    intr_permeability = calc_intrinsic_permeability(horizontal_permeability)
+    return D70_REF / (intr_permeability * seepage_length) ** (1 / 3) * (d_70_m / D70_REF) ** 0.4
+
+
+def calc_intrinsic_permeability(horizontal_permeability):
+    """Intrinsic permeability in m/s from the Darcy permeability in m/day"""
+    return (VISCOSITY / GRAVITY) * horizontal_permeability / (24 * 3600)
+
+
+def calculate_leakage_length(cover_layer_thickness, k_cover_layer, first_aquifer_thickness, k_first_aquifer_layer):
+    return sqrt(k_first_aquifer_layer * cover_layer_thickness * first_aquifer_thickness / k_cover_layer)
@@ -0,0 +1,186 @@
+from typing import NamedTuple
+from typing import Sequence
+
+import numpy as np
+
+from app.piping_tool.constants import CRITICAL_HEAVE_GRADIENT
+from app.piping_tool.constants import GAMMA_W
+from app.piping_tool.constants import M_P
+from app.piping_tool.PipingCalculationUtilities import PipingCalculation
+from app.piping_tool.PipingCalculationUtilities import calc_f_scale
+from app.piping_tool.PipingCalculationUtilities import calc_phi_exit_level_1
+from app.piping_tool.PipingCalculationUtilities import calc_phi_exit_level_2
+from app.piping_tool.PipingCalculationUtilities import calc_reduced_head_difference
+
+
+class PipingCalculationArrays(NamedTuple):
+    """The input and the intermediate results of several piping calculations that do not depend on the river level or
+    on the sampled parameters, one element per calculation. The limit states of all the calculations are evaluated at
+    once for arrays of river levels or samples whose last axis is the axis of the calculations."""
+
+    geohydrologic_model: np.ndarray
+    river_level: np.ndarray
+    polder_level: np.ndarray
+    phi_exit_average_hinterland: np.ndarray
+    damping_factor: np.ndarray
+    aquifer_hydraulic_head_hinterland: np.ndarray
+    leakage_length_hinterland: np.ndarray
+    leakage_length_foreland: np.ndarray
+    dike_width: np.ndarray
+    distance_from_ref_line: np.ndarray
+    seepage_length: np.ndarray
+    h_exit: np.ndarray
+    cover_layer_thickness: np.ndarray
+    effective_stress: np.ndarray
+    horizontal_permeability: np.ndarray
+    d_70: np.ndarray  # mm
+    f_resistance: np.ndarray
+    f_geometry: np.ndarray
+    uplift_factor: np.ndarray  # schematisation factor times safety factor
+    heave_factor: np.ndarray
+    piping_factor: np.ndarray
+
+    @classmethod
+    def from_calculations(cls, calculations: Sequence[PipingCalculation]) -> "PipingCalculationArrays":
+        """Collect the arrays from the deterministic calculations, their input is validated as in the deterministic
+        calculation"""
+        columns = {name: [] for name in cls._fields}
+        for calculation in calculations:
+            calculation.validator_sellmeijer()
+            calculation.validator_geohydrologic_model()
+            cover_layer_properties = calculation.get_cover_layer_properties
+            aquifer_properties = calculation.aquifer_layer.get("properties")
+            values = {
+                "geohydrologic_model": calculation.geohydrologic_model,
+                "river_level": calculation.river_level,
+                "polder_level": calculation.polder_level,
+                "phi_exit_average_hinterland": calculation.phi_exit_average_hinterland,
+                "damping_factor": calculation.damping_factor,
+                "aquifer_hydraulic_head_hinterland": calculation.aquifer_hydraulic_head_hinterland,
+                "leakage_length_hinterland": calculation.leakage_length_hinterland,
+                "leakage_length_foreland": calculation.leakage_length_foreland,
+                "dike_width": calculation.dike_width,
+                "distance_from_ref_line": calculation.distance_from_ref_line,
+                "seepage_length": calculation.distance_from_entry_line,
+                "h_exit": calculation.calc_h_exit,
+                "cover_layer_thickness": cover_layer_properties["thickness"],
+                "effective_stress": cover_layer_properties["effective_stress"],
+                "horizontal_permeability": aquifer_properties.get("horizontal_permeability"),
+                "d_70": aquifer_properties.grain_size_d70,
+                "f_resistance": calculation.calc_f_resistance,
+                "f_geometry": calculation.calc_f_geometry,
+                "uplift_factor": calculation.schematisation_factor_uplift * calculation.safety_factor_uplift,
+                "heave_factor": calculation.schematisation_factor_heave * calculation.safety_factor_heave,
+                "piping_factor": calculation.schematisation_factor_piping * calculation.safety_factor_piping,
+            }
+            for name, value in values.items():
+                columns[name].append(value)
+
+        return cls(
+            **{
+                name: np.array(values, dtype=str if name == "geohydrologic_model" else float)
+                for name, values in columns.items()
+            }
+        )
+
+    @property
+    def number_of_calculations(self) -> int:
+        return len(self.river_level)
+
+    @property
+    def volumetric_weight(self) -> np.ndarray:
+        """Average effective volumetric weight of the cover layer that gives its effective stress at the exit point"""
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return self.effective_stress / self.cover_layer_thickness
+
+    def calc_phi_exit(self, river_level, leakage_length_hinterland=None) -> np.ndarray:
+        """Hydraulic head in the aquifer at the exit points for (arrays of) river levels and hinterland leakage lengths,
+        according to the geohydrologic model of every calculation"""
+        if leakage_length_hinterland is None:
+            leakage_length_hinterland = self.leakage_length_hinterland
+        with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+            phi_exit_level_1 = calc_phi_exit_level_1(self.phi_exit_average_hinterland, self.damping_factor, river_level)
+            phi_exit_level_2 = calc_phi_exit_level_2(
+                self.polder_level,
+                river_level,
+                leakage_length_hinterland,
+                self.leakage_length_foreland,
+                self.dike_width,
+                self.distance_from_ref_line,
+            )
+        model = self.geohydrologic_model
+        return np.select(
+            [model == "0", model == "1", model == "2"],
+            [self.aquifer_hydraulic_head_hinterland, phi_exit_level_1, phi_exit_level_2],
+            default=np.nan,
+        )
+
+    def calc_critical_head_difference_sellmeijer(self, horizontal_permeability=None, d_70=None) -> np.ndarray:
+        """Critical head difference of Sellmeijer for (arrays of) permeabilities in m/day and d70 in mm of the
+        aquifer"""
+        if horizontal_permeability is None:
+            horizontal_permeability = self.horizontal_permeability
+        if d_70 is None:
+            d_70 = self.d_70
+        f_scale = calc_f_scale(horizontal_permeability, d_70, self.seepage_length)
+        return self.f_resistance * f_scale * self.f_geometry * self.seepage_length
+
+    def calc_limit_states(
+        self,
+        river_level,
+        h_exit=None,
+        cover_layer_thickness=None,
+        volumetric_weight=None,
+        leakage_length_hinterland=None,
+        horizontal_permeability=None,
+        d_70=None,
+        safety_factors: bool = True,
+    ) -> dict:
+        """Evaluate the limit states and unity checks of uplift, heave and Sellmeijer by broadcasting the given arrays
+        with the arrays of the calculations. The parameters that are not given keep the value of the calculations.
+
+        :param river_level: river level in m NAP
+        :param h_exit: phreatic level at the exit point in m NAP
+        :param cover_layer_thickness: thickness of the cover layer in m
+        :param volumetric_weight: average effective volumetric weight of the cover layer in kN/m3
+        :param leakage_length_hinterland: leakage length of the hinterland in m
+        :param horizontal_permeability: permeability of the aquifer in m/day
+        :param d_70: d70 of the aquifer in mm
+        :param safety_factors: divide the resistances by the schematisation and safety factors of the calculations, as
+            in the deterministic calculation. Without them the limit states are those of a probabilistic analysis.
+        :return: dictionary with the limit states "z_uplift", "z_heave", "z_sellmeijer", the unity checks "uc_uplift",
+            "uc_heave", "uc_sellmeijer" and the hydraulic head "phi_exit" and "heave_gradient"
+        """
+        h_exit = self.h_exit if h_exit is None else h_exit
+        if cover_layer_thickness is None and volumetric_weight is None:
+            cover_layer_thickness, effective_stress = self.cover_layer_thickness, self.effective_stress
+        else:
+            if cover_layer_thickness is None:
+                cover_layer_thickness = self.cover_layer_thickness
+            if volumetric_weight is None:
+                volumetric_weight = self.volumetric_weight
+            effective_stress = volumetric_weight * cover_layer_thickness
+        uplift_factor, heave_factor, piping_factor = (
+            (self.uplift_factor, self.heave_factor, self.piping_factor) if safety_factors else (1, 1, 1)
+        )
+
+        phi_exit = self.calc_phi_exit(river_level, leakage_length_hinterland)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            head_difference = phi_exit - h_exit
+            heave_gradient = head_difference / cover_layer_thickness
+            uplift_resistance = effective_stress / GAMMA_W / uplift_factor
+            heave_resistance = CRITICAL_HEAVE_GRADIENT / heave_factor
+            sellmeijer_resistance = (
+                M_P * self.calc_critical_head_difference_sellmeijer(horizontal_permeability, d_70) / piping_factor
+            )
+            reduced_head_difference = calc_reduced_head_difference(river_level, h_exit, cover_layer_thickness)
+            return {
+                "phi_exit": phi_exit,
+                "heave_gradient": heave_gradient,
+                "z_uplift": uplift_resistance - head_difference,
+                "z_heave": heave_resistance - heave_gradient,
+                "z_sellmeijer": sellmeijer_resistance - reduced_head_difference,
+                "uc_uplift": uplift_resistance / head_difference,
+                "uc_heave": np.where(head_difference == 0, np.inf, heave_resistance / heave_gradient),
+                "uc_sellmeijer": sellmeijer_resistance / reduced_head_difference,
+            }
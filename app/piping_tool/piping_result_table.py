@@ -0,0 +1,97 @@
+from enum import Enum
+from typing import Any
+from typing import Dict
+from typing import Union
+
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from app.piping_tool.constants import HeaveDataFrameColumns
+from app.piping_tool.constants import PipingDataFrameColumns
+from app.piping_tool.constants import SellmeijerDataFrameColumns
+from app.piping_tool.constants import UpliftDataFrameColumns
+
+# Columns describing the exit point and the scenario of a piping result, next to the columns of the calculation
+EXIT_POINT_ID = "exit_point_id"
+X_COORDINATE = "x_coordinate"
+Y_COORDINATE = "y_coordinate"
+SCENARIO_NAME = "scenario_name"
+SCENARIO_WEIGHT = "scenario_weight"
+
+STRING_COLUMNS = [PipingDataFrameColumns.EXIT_POINT.value, PipingDataFrameColumns.DITCH.value, SCENARIO_NAME]
+INTEGER_COLUMNS = [PipingDataFrameColumns.AQUIFER.value, EXIT_POINT_ID]
+
+
+def _get_piping_result_schema() -> pa.Schema:
+    """Arrow schema with one column per piping result, in the order of the Sellmeijer, uplift and heave sheets.
+    Text and integer columns are typed explicitly, all the other columns are floats in which a missing or nan result
+    is stored as null."""
+    column_names = [SCENARIO_NAME, SCENARIO_WEIGHT, EXIT_POINT_ID, X_COORDINATE, Y_COORDINATE]
+    for columns in (SellmeijerDataFrameColumns, UpliftDataFrameColumns, HeaveDataFrameColumns):
+        column_names.extend(column.value for column in columns if column.value not in column_names)
+
+    fields = []
+    for column_name in column_names:
+        if column_name in STRING_COLUMNS:
+            fields.append(pa.field(column_name, pa.string()))
+        elif column_name in INTEGER_COLUMNS:
+            fields.append(pa.field(column_name, pa.int64()))
+        else:
+            fields.append(pa.field(column_name, pa.float64()))
+    return pa.schema(fields)
+
+
+PIPING_RESULT_SCHEMA = _get_piping_result_schema()
+
+
+class PipingResultTableBuilder:
+    """Collects the piping results of a segment column by column, every calculation writes its results directly into
+    the columns of the current row. The columns are converted into an Arrow table with the PIPING_RESULT_SCHEMA at the
+    end."""
+
+    def __init__(self):
+        self._columns = {name: [] for name in PIPING_RESULT_SCHEMA.names}
+        self._row_defaults = {}
+        self.num_rows = 0
+
+    def set_row_defaults(self, values: Dict[str, Any]):
+        """Set the values of the columns that are not written by the calculation, e.g. the exit point and scenario"""
+        self._row_defaults = values
+
+    def add(self, column: Union[Enum, str], value: Any):
+        """Write the value of a column of the current row, a column that is written twice keeps the last value"""
+        values = self._columns[column.value if isinstance(column, Enum) else column]
+        if len(values) > self.num_rows:
+            values[-1] = value
+        else:
+            values.append(value)
+
+    def add_values(self, values: Dict[str, Any]):
+        """Write the values of several columns of the current row"""
+        for column, value in values.items():
+            self.add(column, value)
+
+    def end_row(self):
+        """Close the current row, the columns that have not been written get their default value or null"""
+        self.num_rows += 1
+        for column, values in self._columns.items():
+            if len(values) < self.num_rows:
+                values.append(self._row_defaults.get(column))
+
+    def discard_row(self):
+        """Remove the values that have already been written in the current row"""
+        for values in self._columns.values():
+            del values[self.num_rows :]
+
+    def to_table(self) -> pa.Table:
+        """Return the collected results as an Arrow table, nan values of the float columns are stored as null"""
+        self.discard_row()
+        return pa.Table.from_arrays(
+            [pa.array(self._columns[field.name], type=field.type, from_pandas=True) for field in PIPING_RESULT_SCHEMA],
+            schema=PIPING_RESULT_SCHEMA,
+        )
+
+
+def filter_scenario(piping_results: pa.Table, scenario_name: str) -> pa.Table:
+    """Return the rows of the piping result table that belong to a scenario"""
+    return piping_results.filter(pc.equal(piping_results[SCENARIO_NAME], scenario_name))
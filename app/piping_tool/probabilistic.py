@@ -0,0 +1,150 @@
+from typing import Dict
+from typing import List
+from typing import NamedTuple
+from typing import Optional
+
+import numpy as np
+import pyarrow as pa
+from scipy.stats import norm
+
+from app.piping_tool.piping_arrays import PipingCalculationArrays
+
+NORMAL = "normal"
+LOGNORMAL = "lognormal"
+DETERMINISTIC = "deterministic"
+
+# The stochastic variables, named after the parameters of PipingCalculationArrays.calc_limit_states. The mean of every
+# variable is its deterministic value in the calculation of the exit point.
+STOCHASTIC_VARIABLES = (
+    "river_level",
+    "d_70",
+    "horizontal_permeability",
+    "cover_layer_thickness",
+    "volumetric_weight",
+    "leakage_length_hinterland",
+)
+# The river level is the same for all the exit points in a sample, the soil parameters are sampled per exit point
+COMMON_VARIABLES = ("river_level",)
+POSITIVE_VARIABLES = ("d_70", "horizontal_permeability", "cover_layer_thickness", "leakage_length_hinterland")
+MINIMUM_POSITIVE_VALUE = 1e-3
+
+MECHANISMS = ("uplift", "heave", "sellmeijer", "piping")
+# Number of values of an array of samples x calculations, bounds the memory used for a chunk of samples
+DEFAULT_CHUNK_SIZE = 250_000
+
+
+class Distribution(NamedTuple):
+    """Distribution of a stochastic variable around its deterministic value. The spread is the standard deviation in
+    the unit of the variable for a normal distribution and the coefficient of variation for a lognormal distribution."""
+
+    kind: str = DETERMINISTIC
+    spread: float = 0.0
+
+    def sample(self, mean: np.ndarray, standard_normal: np.ndarray) -> np.ndarray:
+        """Transform standard normal samples into samples of the distribution with the given mean. The mean of a
+        lognormal distribution must be positive."""
+        if self.kind == NORMAL:
+            return mean + self.spread * standard_normal
+        if self.kind == LOGNORMAL:
+            if np.any(np.asarray(mean) <= 0):
+                raise ValueError("The mean of a lognormal distribution must be positive")
+            sigma = np.sqrt(np.log(1 + self.spread**2))
+            return np.exp(np.log(mean) - sigma**2 / 2 + sigma * standard_normal)
+        if self.kind == DETERMINISTIC:
+            return mean
+        raise ValueError(f"Unknown distribution: {self.kind}")
+
+
+def calculate_failure_probabilities(
+    arrays: PipingCalculationArrays,
+    distributions: Dict[str, Distribution],
+    number_of_samples: int,
+    seed: Optional[int] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> Dict[str, np.ndarray]:
+    """Estimate the failure probabilities of uplift, heave, Sellmeijer and piping of every calculation with a Monte
+    Carlo simulation. The limit states are evaluated without the schematisation and safety factors for a chunk of
+    samples of all the calculations at once, such that the memory is bounded by the chunk size. Piping fails when
+    uplift, heave and Sellmeijer fail in the same sample. The failure probability is nan when the limit state is nan
+    in any sample, e.g. for a lognormal variable without a positive deterministic value in a calculation.
+
+    :param arrays: the deterministic calculations, e.g. one per exit point, aquifer and scenario
+    :param distributions: distribution of the stochastic variables, the variables without distribution are
+        deterministic
+    :param number_of_samples: number of samples of every calculation
+    :param seed: seed of the random generator, to reproduce the results
+    :param chunk_size: maximum number of samples times calculations that are evaluated at once
+    :return: the failure probability of every calculation for every mechanism of MECHANISMS
+    """
+    unknown_variables = set(distributions) - set(STOCHASTIC_VARIABLES)
+    if unknown_variables:
+        raise ValueError(f"Unknown stochastic variables: {', '.join(sorted(unknown_variables))}")
+    for variable, distribution in distributions.items():
+        if variable in COMMON_VARIABLES and distribution.kind == LOGNORMAL:
+            raise ValueError(f"The stochastic variable {variable} cannot have a lognormal distribution")
+
+    number_of_calculations = arrays.number_of_calculations
+    if number_of_calculations == 0 or number_of_samples <= 0:
+        return {mechanism: np.full(number_of_calculations, np.nan) for mechanism in MECHANISMS}
+
+    failures = {mechanism: np.zeros(number_of_calculations, dtype=np.int64) for mechanism in MECHANISMS}
+    undefined = {mechanism: np.zeros(number_of_calculations, dtype=bool) for mechanism in MECHANISMS}
+    random_generator = np.random.default_rng(seed)
+    samples_per_chunk = max(1, chunk_size // number_of_calculations)
+    for start in range(0, number_of_samples, samples_per_chunk):
+        chunk_samples = min(samples_per_chunk, number_of_samples - start)
+
+        sampled_values = {}
+        for variable, distribution in distributions.items():
+            if distribution.kind == DETERMINISTIC:
+                continue
+            mean = getattr(arrays, variable)
+            shape = (chunk_samples, 1) if variable in COMMON_VARIABLES else (chunk_samples, number_of_calculations)
+            standard_normal = random_generator.standard_normal(shape)
+            if distribution.kind == LOGNORMAL:
+                # the samples of the calculations without a positive deterministic value are nan
+                mean = np.where(mean > 0, mean, np.nan)
+            values = distribution.sample(mean, standard_normal)
+            if variable in POSITIVE_VARIABLES:
+                values = np.maximum(values, MINIMUM_POSITIVE_VALUE)
+            sampled_values[variable] = values
+        river_level = sampled_values.pop("river_level", arrays.river_level)
+
+        limit_states = arrays.calc_limit_states(river_level, safety_factors=False, **sampled_values)
+        failure = {mechanism: limit_states[f"z_{mechanism}"] < 0 for mechanism in ["uplift", "heave", "sellmeijer"]}
+        failure["piping"] = failure["uplift"] & failure["heave"] & failure["sellmeijer"]
+        nan = {mechanism: np.isnan(limit_states[f"z_{mechanism}"]) for mechanism in ["uplift", "heave", "sellmeijer"]}
+        nan["piping"] = nan["uplift"] | nan["heave"] | nan["sellmeijer"]
+        # deterministic limit states have a single row for all the samples of the chunk
+        chunk_shape = (chunk_samples, number_of_calculations)
+        for mechanism in MECHANISMS:
+            failures[mechanism] += np.broadcast_to(failure[mechanism], chunk_shape).sum(axis=0)
+            undefined[mechanism] |= np.broadcast_to(nan[mechanism], chunk_shape).any(axis=0)
+
+    return {
+        mechanism: np.where(undefined[mechanism], np.nan, failures[mechanism] / number_of_samples)
+        for mechanism in MECHANISMS
+    }
+
+
+def get_reliability_index(failure_probability: np.ndarray) -> np.ndarray:
+    """Reliability index beta of failure probabilities, infinite when no sample fails and nan when the probability is
+    nan"""
+    return norm.isf(failure_probability)
+
+
+def get_failure_probability_table(rows: List[dict], failure_probabilities: Dict[str, np.ndarray]) -> pa.Table:
+    """Arrow table with the description of every calculation, followed by its failure probability and reliability
+    index for every mechanism
+
+    :param rows: description of every calculation, e.g. the exit point, aquifer and scenario
+    :param failure_probabilities: failure probabilities as returned by calculate_failure_probabilities
+    """
+    table = pa.Table.from_pylist(rows) if rows else pa.table({})
+    for mechanism in MECHANISMS:
+        probabilities = failure_probabilities[mechanism]
+        table = table.append_column(f"p_{mechanism}", pa.array(probabilities, type=pa.float64()))
+        table = table.append_column(
+            f"beta_{mechanism}", pa.array(get_reliability_index(probabilities), type=pa.float64())
+        )
+    return table
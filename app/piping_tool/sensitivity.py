@@ -0,0 +1,88 @@
+from typing import Dict
+from typing import NamedTuple
+from typing import Optional
+from typing import Tuple
+
+import numpy as np
+
+from app.piping_tool.piping_arrays import PipingCalculationArrays
+
+# The unity check of piping is the largest of the three mechanisms, since piping only occurs when all of them fail
+MECHANISMS = ("uplift", "heave", "sellmeijer", "piping")
+
+
+class SensitivitySweep(NamedTuple):
+    """Unity checks of several piping calculations over a grid of river levels and phreatic levels at the exit point.
+    The arrays of unity checks have the shape (phreatic levels, river levels, calculations) and the arrays of critical
+    river levels the shape (phreatic levels, calculations). Without phreatic levels, the grid has a single phreatic
+    level: the phreatic level at the exit point of every calculation. A calculation that already fails at the lowest
+    river level has that river level as critical river level, and is flagged in fails_at_lowest_river_level."""
+
+    river_levels: np.ndarray
+    phreatic_levels: Optional[np.ndarray]
+    unity_checks: Dict[str, np.ndarray]
+    critical_river_levels: Dict[str, np.ndarray]
+    fails_at_lowest_river_level: Dict[str, np.ndarray]
+
+
+def calculate_sensitivity_sweep(
+    arrays: PipingCalculationArrays, river_levels: np.ndarray, phreatic_levels: Optional[np.ndarray] = None
+) -> SensitivitySweep:
+    """Evaluate the unity checks of uplift, heave and Sellmeijer of all the calculations for all the combinations of
+    river levels and phreatic levels at once, and interpolate the critical river level at which every unity check
+    reaches 1. The effective stress of the cover layer is that of the calculations, it is not updated with the phreatic
+    level.
+
+    :param arrays: the deterministic calculations, e.g. one per exit point, aquifer and scenario
+    :param river_levels: increasing river levels in m NAP
+    :param phreatic_levels: phreatic levels at the exit points in m NAP, the phreatic level of every calculation when
+        not given
+    """
+    river_levels = np.asarray(river_levels, dtype=float)
+    river_level_grid = river_levels[np.newaxis, :, np.newaxis]
+    h_exit = None if phreatic_levels is None else np.asarray(phreatic_levels, dtype=float)[:, np.newaxis, np.newaxis]
+    limit_states = arrays.calc_limit_states(river_level_grid, h_exit=h_exit)
+
+    shape = (1 if h_exit is None else len(h_exit), len(river_levels), arrays.number_of_calculations)
+    unity_checks = {
+        mechanism: np.broadcast_to(limit_states[f"uc_{mechanism}"], shape)
+        for mechanism in ["uplift", "heave", "sellmeijer"]
+    }
+    unity_checks["piping"] = np.maximum.reduce(list(unity_checks.values()))
+    critical_river_levels, fails_at_lowest_river_level = {}, {}
+    for mechanism in MECHANISMS:
+        critical_river_levels[mechanism], fails_at_lowest_river_level[mechanism] = get_critical_river_levels(
+            river_levels, unity_checks[mechanism]
+        )
+    return SensitivitySweep(
+        river_levels, phreatic_levels, unity_checks, critical_river_levels, fails_at_lowest_river_level
+    )
+
+
+def get_critical_river_levels(river_levels: np.ndarray, unity_checks: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Interpolate the lowest river level at which the unity checks drop below 1, along the axis of the river levels.
+    The interpolation is linear in the load ratio 1 / unity check, which is linear in the river level for uplift, heave
+    and Sellmeijer. The critical river level is the lowest river level when the unity check is already below 1 at the
+    lowest river level, it is then at most the lowest river level. It is nan when the unity check stays above 1.
+
+    :param river_levels: increasing river levels of the second axis of the unity checks
+    :param unity_checks: unity checks with the shape (phreatic levels, river levels, calculations)
+    :return: the critical river levels and whether the unity check is already below 1 at the lowest river level, both
+        with the shape (phreatic levels, calculations)
+    """
+    with np.errstate(divide="ignore"):
+        load_ratio = 1 / unity_checks
+    exceeded = load_ratio >= 1
+    first = np.argmax(exceeded, axis=1)[:, np.newaxis, :]
+    previous = np.maximum(first - 1, 0)
+
+    load_ratio_before = np.take_along_axis(load_ratio, previous, axis=1)[:, 0, :]
+    load_ratio_after = np.take_along_axis(load_ratio, first, axis=1)[:, 0, :]
+    river_level_before, river_level_after = river_levels[previous[:, 0, :]], river_levels[first[:, 0, :]]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        slope = (river_level_after - river_level_before) / (load_ratio_after - load_ratio_before)
+        critical_river_levels = river_level_before + (1 - load_ratio_before) * slope
+
+    fails_at_lowest_river_level = exceeded[:, 0, :]
+    critical_river_levels = np.where(exceeded.any(axis=1), critical_river_levels, np.nan)
+    return np.where(fails_at_lowest_river_level, river_levels[0], critical_river_levels), fails_at_lowest_river_level
@@ -2,6 +2,9 @@ from cmath import nan
 from enum import Enum
 
 from app.ground_model.constants import LITHOLOGY_CODE_NAME_MAPPING
+from app.piping_tool.probabilistic import DETERMINISTIC
+from app.piping_tool.probabilistic import LOGNORMAL
+from app.piping_tool.probabilistic import NORMAL
 from viktor import Color
 from viktor.parametrization import OptionListElement
 from viktor.views import MapLegend
@@ -28,6 +31,30 @@ LEAKAGE_LENGTH_OPTIONS = [
 
 SPATIAL_RESOLUTION_SEGMENT_CHAINAGE = 10
 
+STOCHASTIC_VARIABLE_OPTIONS = [
+    OptionListElement(label="Rivierpeil [m NAP]", value="river_level"),
+    OptionListElement(label="d70 aquifer [mm]", value="d_70"),
+    OptionListElement(label="Doorlatendheid aquifer [m/d]", value="horizontal_permeability"),
+    OptionListElement(label="Dikte deklaag [m]", value="cover_layer_thickness"),
+    OptionListElement(label="Volumegewicht deklaag [kN/m3]", value="volumetric_weight"),
+    OptionListElement(label="Leklengte achterland [m]", value="leakage_length_hinterland"),
+]
+DISTRIBUTION_OPTIONS = [
+    OptionListElement(label="Normaal", value=NORMAL),
+    OptionListElement(label="Lognormaal", value=LOGNORMAL),
+    OptionListElement(label="Deterministisch", value=DETERMINISTIC),
+]
+# The spread is the standard deviation of a normal distribution and the coefficient of variation of a lognormal one
+DEFAULT_STOCHASTIC_VARIABLES = [
+    {"variable": "river_level", "distribution": NORMAL, "spread": 0.3},
+    {"variable": "d_70", "distribution": LOGNORMAL, "spread": 0.12},
+    {"variable": "horizontal_permeability", "distribution": LOGNORMAL, "spread": 0.5},
+    {"variable": "cover_layer_thickness", "distribution": LOGNORMAL, "spread": 0.1},
+    {"variable": "volumetric_weight", "distribution": NORMAL, "spread": 0.5},
+    {"variable": "leakage_length_hinterland", "distribution": LOGNORMAL, "spread": 0.5},
+]
+DEFAULT_NUMBER_OF_SAMPLES = 10000
+
 PIPING_LEGEND = MapLegend(
     [(Color.red(), "Voldoet niet"), (Color.from_hex("#FFC300"), "uc niet berekend"), (Color.green(), "Voldoet")]
 )
@@ -54,7 +81,7 @@ DEFAULT_PIPING_ERROR_RESULTS = {
     "KritiekVervalPipingSellmeijer [m]": 9999,
     "GereduceerdOptredendVerval [m]": 9999,
     "uc_sellmeijer": nan,
-    "KritiekStijghoogteVerschilOpbarsten [m]": "nan",
+    "KritiekStijghoogteVerschilOpbarsten [m]": nan,
     "StijghoogteWaterVoerendPakketBijUittredepunt [m NAP]": 9999,
     "KritiekeGradientHeave": 9999,
     "uc_opbarsten": nan,
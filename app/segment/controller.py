@@ -1,11 +1,13 @@
 from copy import deepcopy
 from io import BytesIO
+from pathlib import Path
 from typing import Dict
 from typing import List
 from typing import Optional
 from typing import Tuple
 
 import geopandas as gpd
+import pyarrow as pa
 from munch import Munch
 from munch import munchify
 from munch import unmunchify
@@ -21,6 +23,7 @@ from app.lib.constants import FUTURE_EXIT_POINT_COLOR
 from app.lib.constants import LEGEND_LIST_EXIT_POINT_CREATION
 from app.lib.constants import LOWEST_POINT_COLOR
 from app.lib.constants import WET_DITCH_COLOR
+from app.lib.rd_wgs_converter import rd_to_geo_points
 from app.lib.shapely_helper_functions import check_if_point_in_polygons
 from app.lib.shapely_helper_functions import convert_linestring_to_geo_polyline
 from app.lib.shapely_helper_functions import get_all_exit_point_entities_within_polygon
@@ -61,6 +64,9 @@ from ..ground_model.model import convert_soil_layout_to_input_table
 from ..ground_model.model import get_aquifer_effective_properties
 from ..ground_model.model import get_soil_layer_from_soil_type
 from ..ground_model.tno_model import get_tno_soil_layout_at_distance
+from ..lib.d_geoflow.batch_export import generate_geolib_model_files
+from ..lib.d_geoflow.batch_export import get_exit_point_model_inputs
+from ..lib.d_geoflow.batch_export import write_zip
 from ..lib.helper_read_files import entry_line_to_params
 from ..lib.map_view_helper_functions import add_all_leakage_points_to_map_features
 from ..lib.map_view_helper_functions import add_cpts_to_mapfeatures
@@ -74,20 +80,27 @@ from ..lib.map_view_helper_functions import add_intersected_segment_ditches_to_m
 from ..lib.map_view_helper_functions import add_segment_trajectory_to_map_features
 from ..lib.shapely_helper_functions import convert_shapely_polgon_to_geopolygon
 from ..lib.shapely_helper_functions import create_polygon_from_linestring_offset
+from ..piping_tool.piping_result_table import filter_scenario
+from ..piping_tool.sensitivity import calculate_sensitivity_sweep
 from ..segment.parametrization import SegmentParametrization
 from ..segment.segmentAPI import SegmentAPI
 from .constants import PIPING_LEGEND
 from .constants import SPATIAL_RESOLUTION_SEGMENT_CHAINAGE
 from .output_excel_builder import PipingExcelBuilder
+from .output_excel_builder import write_piping_workbooks
 from .param_parser_functions import Scenario
+from .param_parser_functions import get_level_range
 from .param_parser_functions import get_materials_tables
 from .param_parser_functions import get_representative_soil_layouts
+from .param_parser_functions import get_segment_ditches
 from .param_parser_functions import get_selected_exit_point_params
 from .param_parser_functions import get_soil_scenario
+from .param_parser_functions import get_stochastic_distributions
 from .segment_model import Segment
 from .segment_visualization_functions import visualize_exit_point_soil_layouts
 from .segment_visualization_functions import visualize_leakage_point_layouts
 from .segment_visualization_functions import visualize_representative_layouts
+from .segment_visualization_functions import visualize_sensitivity_sweep
 
 
 class Controller(ViktorController):  # pylint: disable=too-many-public-methods
@@ -180,7 +193,7 @@ class Controller(ViktorController):  # pylint: disable=too-many-public-methods
             bore_folder=bore_folder,
             chainage_step=SPATIAL_RESOLUTION_SEGMENT_CHAINAGE,
         )
-        return PlotlyResult(fig.to_dict())
+        return PlotlyResult(fig.to_json())
 
     @PlotlyView("Dijkvak", duration_guess=4)
     def visualize_representative_layout(self, params: Munch, entity_id: int, **kwargs):
@@ -201,6 +214,35 @@ class Controller(ViktorController):  # pylint: disable=too-many-public-methods
             )
         )
 
+    @PlotlyView("Gevoeligheid rivierpeil", duration_guess=10)
+    def visualize_sensitivity_sweep(self, params: Munch, entity_id: int, **kwargs) -> PlotlyResult:
+        """Visualise the unity checks of piping of all exit points as a function of the river level, and the critical
+        river level as a function of the phreatic level at the exit point. All the levels are evaluated at once on the
+        arrays of the piping calculations."""
+        sensitivity_params = params.calculations.sensitivity
+        river_levels = get_level_range(
+            sensitivity_params.river_level_min,
+            sensitivity_params.river_level_max,
+            sensitivity_params.river_level_step,
+            "rivierpeil",
+        )
+        exit_point_list = self.get_api(entity_id).get_all_children_exit_point_entities()
+        rows, arrays = self.get_segment(entity_id, params).get_piping_calculation_arrays(exit_point_list)
+        if not rows:
+            raise UserException("Er zijn geen uittredepunten om te berekenen")
+
+        phreatic_level_sweep = None
+        if sensitivity_params.vary_phreatic_level:
+            phreatic_levels = get_level_range(
+                sensitivity_params.phreatic_level_min,
+                sensitivity_params.phreatic_level_max,
+                sensitivity_params.phreatic_level_step,
+                "freatisch niveau",
+            )
+            phreatic_level_sweep = calculate_sensitivity_sweep(arrays, river_levels, phreatic_levels)
+        sweep = calculate_sensitivity_sweep(arrays, river_levels)
+        return PlotlyResult(visualize_sensitivity_sweep(rows, sweep, phreatic_level_sweep))
+
     def adjust_segment_polygon_by_chainage(self, params: Munch, entity_id: int, **kwargs) -> SetParamsResult:
         """
         Creates a new segment polygon based on the start and end chainage values
@@ -493,10 +535,11 @@ class Controller(ViktorController):  # pylint: disable=too-many-public-methods
             )
 
             # Add future exit points
-            for point in this_segment.get_all_draft_exit_point_locations().geoms:
-                map_features.append(
-                    MapPoint.from_geo_point(GeoPoint.from_rd((point.x, point.y)), color=FUTURE_EXIT_POINT_COLOR)
-                )
+            draft_exit_points = [
+                (point.x, point.y) for point in this_segment.get_all_draft_exit_point_locations().geoms
+            ]
+            for geo_point in rd_to_geo_points(draft_exit_points):
+                map_features.append(MapPoint.from_geo_point(geo_point, color=FUTURE_EXIT_POINT_COLOR))
 
             # Add already saved exit points
             if params.exit_point_creation.general.show_existing_exit_points:
@@ -828,15 +871,15 @@ class Controller(ViktorController):  # pylint: disable=too-many-public-methods
     def fill_closest_cpt(self, params: Munch, entity_id: int, **kwargs) -> SetParamsResult:
         """Fill the option Field with the closest CPT to the selected exit point"""
         exit_point = get_selected_exit_point_params(params).exit_point_data
-        cpt = self.get_api(entity_id).closest_cpt_to_RD_coordinates(exit_point.x_coordinate, exit_point.y_coordinate)
-        return SetParamsResult({"selected_cpt_id": cpt.id})
+        [cpt_id] = self.get_api(entity_id).closest_cpt_ids_to_RD_coordinates(
+            [(exit_point.x_coordinate, exit_point.y_coordinate)]
+        )
+        return SetParamsResult({"selected_cpt_id": cpt_id})
 
     def download_piping_results(self, params: Munch, entity_id: int, **kwargs) -> DownloadResult:
         """Return an Excel sheet with the intermediate results of all piping calculation. Each row corresponds to a
         combination (ExitPoint, aquifer)."""
 
-        excel_files = {}
-
         segment_name = self.get_api(entity_id).segment_name()
 
         scenarios = self.get_segment(entity_id, params).get_all_scenarios(
@@ -845,24 +888,101 @@ class Controller(ViktorController):  # pylint: disable=too-many-public-methods
         exit_point_list = self.get_api(entity_id).get_all_children_exit_point_entities()
         segment = self.get_segment(entity_id, params)
 
-        all_res_serialized = segment.get_serialized_piping_results(exit_point_list)
-        for scenario in scenarios:
-            result_file = self.generate_piping_results(params, all_res_serialized, scenario)
-
-            excel_files[f"piping_result_segment_{scenario.name_of_scenario}.xlsx"] = BytesIO(
-                result_file.getvalue_binary()
+        piping_results = segment.get_piping_result_table(exit_point_list)
+        builders = {
+            f"piping_result_segment_{scenario.name_of_scenario}.xlsx": self.get_piping_excel_builder(
+                params, piping_results, scenario
             )
+            for scenario in scenarios
+        }
+        excel_files = {file_name: BytesIO(content) for file_name, content in write_piping_workbooks(builders).items()}
 
         return DownloadResult(zipped_files=excel_files, file_name=f"piping_result_segment_{segment_name}.zip")
 
-    def generate_piping_results(self, params: Munch, all_res_serialized: List[dict], scenario: Scenario) -> File:
+    def download_failure_probabilities(self, params: Munch, entity_id: int, **kwargs) -> DownloadResult:
+        """Return an Excel sheet with the failure probabilities and reliability indices of uplift, heave, Sellmeijer and
+        piping from a Monte Carlo simulation. Each row corresponds to a combination (scenario, ExitPoint, aquifer)."""
+        probabilistic_params = params.calculations.probabilistic
+        if not probabilistic_params.number_of_samples:
+            raise UserException("Vul het aantal trekkingen in")
+        segment_name = self.get_api(entity_id).segment_name()
+        exit_point_list = self.get_api(entity_id).get_all_children_exit_point_entities()
+
+        failure_probabilities = self.get_segment(entity_id, params).get_failure_probability_table(
+            exit_point_list,
+            get_stochastic_distributions(params),
+            probabilistic_params.number_of_samples,
+            seed=probabilistic_params.seed,
+        )
+        excel_file = BytesIO()
+        failure_probabilities.to_pandas().to_excel(excel_file, index=False)
+        return DownloadResult(excel_file.getvalue(), f"faalkansen_segment_{segment_name}.xlsx")
+
+    def download_flox_models(self, params: Munch, entity_id: int, **kwargs) -> DownloadResult:
+        """Download the DGeoflow models of the selected exit points as .flox files in one zip"""
+        return self.download_geolib_models(params, entity_id, model_type="flox")
+
+    def download_stix_models(self, params: Munch, entity_id: int, **kwargs) -> DownloadResult:
+        """Download the DStability models of the selected exit points as .stix files in one zip"""
+        return self.download_geolib_models(params, entity_id, model_type="stix")
+
+    def download_geolib_models(self, params: Munch, entity_id: int, model_type: str) -> DownloadResult:
+        """Generate the models of the selected exit points, or of all exit points of the segment if none is selected.
+        The dike geometry, the AHN heights and the ditches are fetched once for all exit points, the models are
+        generated in a process pool and streamed into one zip."""
+        download_settings = params.calculations.downloable_result
+        if download_settings.models_scenario is None:
+            raise UserException("Selecteer een scenario")
+        if any(params.get(level) is None for level in ["polder_level", "river_level", "ditch_water_level"]):
+            raise UserException(
+                "Geen polderpeil, rivierpeil of waterstand voor slootbodem gevonden voor dit segment, onder "
+                "geohydrologie: algemeen"
+            )
+        scenario = get_soil_scenario(
+            scenario_name=download_settings.models_scenario,
+            soil_scenario_array=params.input_selection.soil_schematization.soil_scen_array,
+        )
+        detailed_1d_soil_layout, _ = get_representative_soil_layouts(params, scenario)
+
+        exit_point_entities = self.get_api(entity_id).get_all_children_exit_point_entities()
+        selected_exit_point_ids = download_settings.models_exit_points
+        if selected_exit_point_ids:
+            exit_point_entities = [
+                exit_point for exit_point in exit_point_entities if exit_point.id in selected_exit_point_ids
+            ]
+        if not exit_point_entities:
+            raise UserException("Geen uittredepunten gevonden voor dit dijkvak")
+
+        progress_message(f"Ophalen AHN voor {len(exit_point_entities)} uittredepunten")
+        dyke = self.get_api(entity_id).get_dyke()
+        model_inputs = get_exit_point_model_inputs(
+            [(exit_point.name, exit_point.last_saved_params) for exit_point in exit_point_entities],
+            detailed_1d_soil_layout,
+            dyke.get_base_trajectory(),
+            dyke.entry_line,
+            dyke.bathymetry_points,
+            params.polder_level,
+            params.river_level,
+            params.ditch_water_level,
+            get_segment_ditches(params),
+        )
+
+        progress_message(f"Genereer {len(model_inputs)} {model_type} modellen")
+        file = File()
+        write_zip(generate_geolib_model_files(model_type, model_inputs), Path(file.source))
+        segment_name = self.get_api(entity_id).segment_name()
+        return DownloadResult(file.getvalue_binary(), f"{model_type}_models_segment_{segment_name}.zip")
+
+    @staticmethod
+    def get_piping_excel_builder(params: Munch, piping_results: pa.Table, scenario: Scenario) -> PipingExcelBuilder:
+        """Return the Excel builder of the piping results of one scenario"""
+        return PipingExcelBuilder(filter_scenario(piping_results, scenario.name_of_scenario), params, scenario)
+
+    def generate_piping_results(self, params: Munch, piping_results: pa.Table, scenario: Scenario) -> File:
         """
         Generate piping results as a bytes file
         """
-
-        scenario_name = scenario.name_of_scenario
-        filtered_result = [e for e in all_res_serialized if e["scenario_name"] == scenario_name]
-        return PipingExcelBuilder(filtered_result, params, scenario).get_rendered_file()
+        return self.get_piping_excel_builder(params, piping_results, scenario).get_rendered_file()
 
     ####################################################################################################################
     #                                                   GENERIC FUNCTIONS                                              #
@@ -886,10 +1006,10 @@ class Controller(ViktorController):  # pylint: disable=too-many-public-methods
         exit_point_list = self.get_api(entity_id).get_all_children_exit_point_entities()
         segment = self.get_segment(entity_id, params)
 
-        all_res_serialized = segment.get_serialized_piping_results(exit_point_list)
+        piping_results = segment.get_piping_result_table(exit_point_list)
         if params.calculations.soil_profile.results_settings.composite_result_switch:
             return segment.get_map_features_for_combined_piping_results(
-                all_res_serialized, calculation_type=calculation_type
+                piping_results, calculation_type=calculation_type
             )
         else:
             if params.calculations.soil_profile.results_settings.scenario_selection is not None:
@@ -898,7 +1018,7 @@ class Controller(ViktorController):  # pylint: disable=too-many-public-methods
                     soil_scenario_array=params.input_selection.soil_schematization.soil_scen_array,
                 )
                 return segment.get_map_features_for_uncombined_piping_results(
-                    all_res_serialized, selected_scenario.name_of_scenario, calculation_type=calculation_type
+                    piping_results, selected_scenario.name_of_scenario, calculation_type=calculation_type
                 )
             raise UserException("Kies een scenario")
 
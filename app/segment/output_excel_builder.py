@@ -1,12 +1,22 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from copy import copy
+from functools import lru_cache
+from io import BytesIO
 from pathlib import Path
 from typing import Dict
 from typing import List
+from typing import NamedTuple
+from typing import Optional
 from typing import Union
 
+import pyarrow as pa
 from munch import Munch
 from numpy import inf
 from numpy import nan
-from pandas import DataFrame
+from openpyxl import Workbook
+from openpyxl import load_workbook
+from openpyxl.cell import WriteOnlyCell
 
 from app.piping_tool.constants import HeaveDataFrameColumns
 from app.piping_tool.constants import PipingDataFrameColumns
@@ -15,94 +25,128 @@ from app.piping_tool.constants import UpliftDataFrameColumns
 from app.segment.param_parser_functions import Scenario
 from app.segment.param_parser_functions import get_representative_soil_layouts
 from viktor import File
-from viktor.external.spreadsheet import DirectInputCell
-from viktor.external.spreadsheet import InputCellRange
-from viktor.external.spreadsheet import NamedInputCell
-from viktor.external.spreadsheet import render_spreadsheet
+
+PIPING_RESULTS_TEMPLATE = Path(__file__).parent.parent / "templates" / "piping_results.xlsx"
+
+SheetRows = Dict[str, List[list]]
+
+
+class TemplateSheet(NamedTuple):
+    """Layout of a sheet of the Excel template: its title, column widths and the styled header row"""
+
+    title: str
+    column_widths: Dict[str, float]
+    header_values: list
+    header_styles: list
+
+
+@lru_cache(maxsize=4)
+def get_template_sheets(template_file_path: str) -> List[TemplateSheet]:
+    """Read the layout of the sheets of the template once per process"""
+    template_sheets = []
+    for worksheet in load_workbook(template_file_path).worksheets:
+        header_row = next(worksheet.iter_rows(min_row=1, max_row=1), ())
+        template_sheets.append(
+            TemplateSheet(
+                title=worksheet.title,
+                column_widths={
+                    letter: dimension.width
+                    for letter, dimension in worksheet.column_dimensions.items()
+                    if dimension.customWidth
+                },
+                header_values=[cell.value for cell in header_row],
+                header_styles=[
+                    (copy(cell.font), copy(cell.fill), copy(cell.border), copy(cell.alignment), cell.number_format)
+                    for cell in header_row
+                ],
+            )
+        )
+    return template_sheets
+
+
+def write_piping_workbook(
+    template_file_path: str, sheet_rows: SheetRows, sheet_headers: Optional[Dict[str, list]] = None
+) -> bytes:
+    """Write the rows of every sheet below the styled header of the template, in an openpyxl write-only workbook.
+    The rows are appended in bulk instead of being rendered cell by cell, and the function is defined at module level
+    so that it can be sent to a worker process.
+
+    :param template_file_path: path of the Excel template
+    :param sheet_rows: data rows per sheet title
+    :param sheet_headers: header values per sheet title, sheets without header keep the header of the template
+    :return: content of the xlsx file
+    """
+    sheet_headers = sheet_headers or {}
+    workbook = Workbook(write_only=True)
+    for template_sheet in get_template_sheets(template_file_path):
+        worksheet = workbook.create_sheet(template_sheet.title)
+        for letter, width in template_sheet.column_widths.items():
+            worksheet.column_dimensions[letter].width = width
+
+        header_values = sheet_headers.get(template_sheet.title, template_sheet.header_values)
+        header_cells = []
+        for column, value in enumerate(header_values):
+            cell = WriteOnlyCell(worksheet, value=value)
+            # columns beyond the header of the template are written without style
+            if column < len(template_sheet.header_styles):
+                style = template_sheet.header_styles[column]
+                cell.font, cell.fill, cell.border, cell.alignment, cell.number_format = style
+            header_cells.append(cell)
+        worksheet.append(header_cells)
+        for row in sheet_rows.get(template_sheet.title, []):
+            worksheet.append(row)
+
+    output = BytesIO()
+    workbook.save(output)
+    return output.getvalue()
+
+
+def write_piping_workbooks(
+    builders: Dict[str, "PipingExcelBuilder"],
+    template_file_path: Union[str, Path] = PIPING_RESULTS_TEMPLATE,
+    max_workers: Optional[int] = None,
+) -> Dict[str, bytes]:
+    """Write the workbooks of several piping result builders in parallel in a process pool. Only the rows and headers
+    of the sheets are sent to the worker processes.
+
+    :param builders: dictionary linking the file names with the builder of the workbook
+    :param template_file_path: path of the Excel template
+    :param max_workers: number of worker processes, defaults to the number of CPUs
+    :return: dictionary linking the file names with the content of the xlsx files, in the order of the input
+    """
+    if not builders:
+        return {}
+    max_workers = min(max_workers or os.cpu_count() or 1, len(builders))
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            file_name: executor.submit(
+                write_piping_workbook, str(template_file_path), builder.get_sheet_rows(), builder.get_sheet_headers()
+            )
+            for file_name, builder in builders.items()
+        }
+        return {file_name: future.result() for file_name, future in futures.items()}
 
 
 class PipingExcelBuilder:
-    def __init__(self, results: List[Dict], params: Munch, scenario: Scenario):
-        self.template_file_path = Path(__file__).parent.parent / "templates" / "piping_results.xlsx"
+    def __init__(self, piping_results: pa.Table, params: Munch, scenario: Scenario):
+        """
+        :param piping_results: piping result table of the scenario
+        :param params: params of the segment
+        :param scenario: scenario of the results
+        """
+        self.template_file_path = PIPING_RESULTS_TEMPLATE
 
         self.params = params
         self.scenario = scenario
 
-        # Add exit point name to dataframe
-        def add_exit_point_name(row):
-            return row.name
-
-        self.sellmeijer_df = DataFrame.from_records(results, columns=[col.value for col in SellmeijerDataFrameColumns])
-        self.sellmeijer_df[PipingDataFrameColumns.EXIT_POINT.value] = self.sellmeijer_df[
-            PipingDataFrameColumns.EXIT_POINT.value
-        ].apply(add_exit_point_name)
-        self.sellmeijer_df = self.sellmeijer_df.replace(nan, "Nan")
-        self.sellmeijer_df = self.sellmeijer_df.replace(inf, "Nan")
-
-        self.uplift_df = DataFrame.from_records(results, columns=[col.value for col in UpliftDataFrameColumns])
-        self.uplift_df[PipingDataFrameColumns.EXIT_POINT.value] = self.uplift_df[
-            PipingDataFrameColumns.EXIT_POINT.value
-        ].apply(add_exit_point_name)
-        self.uplift_df = self.uplift_df.replace(nan, "Nan")
-        self.uplift_df = self.uplift_df.replace(inf, "Nan")
-
-        self.heave_df = DataFrame.from_records(results, columns=[col.value for col in HeaveDataFrameColumns])
-        self.heave_df[PipingDataFrameColumns.EXIT_POINT.value] = self.heave_df[
-            PipingDataFrameColumns.EXIT_POINT.value
-        ].apply(add_exit_point_name)
-        self.heave_df = self.heave_df.replace(nan, "Nan")
-        self.heave_df = self.heave_df.replace(inf, "Nan")
-
-    def get_input_cells(
-        self,
-    ) -> List[Union[InputCellRange, DirectInputCell, NamedInputCell]]:
-        """This method should return a list of InputCell objects for the SpreadsheetTemplate"""
-        headers_cells = [
-            InputCellRange("Opbarsten", "A", 1, data=[[name.value for name in UpliftDataFrameColumns]]),
-            InputCellRange("Heave", "A", 1, data=[[name.value for name in HeaveDataFrameColumns]]),
-            InputCellRange("Sellmeijer", "A", 1, data=[[name.value for name in SellmeijerDataFrameColumns]]),
-        ]
-
-        sellmeijer_cells = self.get_sellmeijer_table()
-        uplift_cells = self.get_uplift_table()
-        heave_cells = self.get_heave_table()
-        metadata_cells = self.get_metadata_cells()
-
-        return headers_cells + sellmeijer_cells + uplift_cells + heave_cells + metadata_cells
-
-    def get_metadata_cells(self) -> List[Union[InputCellRange, DirectInputCell, NamedInputCell]]:
-        """Returns the cells for the sheet Metadata"""
-        cells = []
-        _, rep_soil_layout = get_representative_soil_layouts(self.params, self.scenario)
-        for index, layer in enumerate(rep_soil_layout.serialize().get("layers"), 1):
-            cells.append(DirectInputCell("Metadata", "A", row=1 + index, value=layer["soil"].get("name")))
-            cells.append(DirectInputCell("Metadata", "B", row=1 + index, value=layer.get("top_of_layer")))
-            cells.append(DirectInputCell("Metadata", "C", row=1 + index, value=layer.get("bottom_of_layer")))
-        return cells
-
-    def get_sellmeijer_table(self) -> List[InputCellRange]:
-        """Fill the spreadsheet with the Sellmeijer results"""
-        data = self.get_piping_data(calculation_type="sellmeijer")
-        table = []
-        for index, row in enumerate(data):
-            table.append(InputCellRange("Sellmeijer", "A", index + 2, data=[row]))
-        return table
-
-    def get_uplift_table(self) -> List[InputCellRange]:
-        """Fill the spreadsheet with the Uplift results"""
-        data = self.get_piping_data(calculation_type="uplift")
-        table = []
-        for index, row in enumerate(data):
-            table.append(InputCellRange("Opbarsten", "A", index + 2, data=[row]))
-        return table
-
-    def get_heave_table(self) -> List[InputCellRange]:
-        """Fill the spreadsheet with the Heave results"""
-        data = self.get_piping_data(calculation_type="heave")
-        table = []
-        for index, row in enumerate(data):
-            table.append(InputCellRange("Heave", "A", index + 2, data=[row]))
-        return table
+        results_df = piping_results.to_pandas()
+        ditch_width_columns = [PipingDataFrameColumns.DITCH_SMALL_B.value, PipingDataFrameColumns.DITCH_LARGE_B.value]
+        results_df[ditch_width_columns] = results_df[ditch_width_columns].astype(object).fillna("-")
+        results_df = results_df.replace([nan, inf], "Nan")
+
+        self.sellmeijer_df = results_df[[col.value for col in SellmeijerDataFrameColumns]]
+        self.uplift_df = results_df[[col.value for col in UpliftDataFrameColumns]]
+        self.heave_df = results_df[[col.value for col in HeaveDataFrameColumns]]
 
     def get_piping_data(self, calculation_type: str) -> List[List]:
         """Return the data of the piping results to be used in the Excel Template. It's a rectangular list of lists
@@ -120,16 +164,32 @@ class PipingExcelBuilder:
         else:
             raise ValueError("Missing calculation type")
 
-        data = []
-        for _, row in df.iterrows():
-            data.append([row[name.value] for name in column_names])
+        return df[[name.value for name in column_names]].values.tolist()
 
-        return data
+    @staticmethod
+    def get_sheet_headers() -> Dict[str, list]:
+        """Returns the header row of the result sheets"""
+        return {
+            "Opbarsten": [name.value for name in UpliftDataFrameColumns],
+            "Heave": [name.value for name in HeaveDataFrameColumns],
+            "Sellmeijer": [name.value for name in SellmeijerDataFrameColumns],
+        }
 
-    def get_rendered_file(self) -> File:
-        """Returns the rendered template spreadsheet and the corresponding file_name"""
-
-        with open(self.template_file_path, "rb") as template:
-            template = render_spreadsheet(template, self.get_input_cells())
+    def get_sheet_rows(self) -> SheetRows:
+        """Returns the data rows of every sheet of the workbook. These are plain lists, such that the workbook can be
+        written in a worker process."""
+        _, rep_soil_layout = get_representative_soil_layouts(self.params, self.scenario)
+        return {
+            "Metadata": [
+                [layer["soil"].get("name"), layer.get("top_of_layer"), layer.get("bottom_of_layer")]
+                for layer in rep_soil_layout.serialize().get("layers")
+            ],
+            "Opbarsten": self.get_piping_data(calculation_type="uplift"),
+            "Heave": self.get_piping_data(calculation_type="heave"),
+            "Sellmeijer": self.get_piping_data(calculation_type="sellmeijer"),
+        }
 
-        return template
+    def get_rendered_file(self) -> File:
+        """Returns the template spreadsheet filled with the piping results"""
+        workbook = write_piping_workbook(str(self.template_file_path), self.get_sheet_rows(), self.get_sheet_headers())
+        return File.from_data(workbook)
@@ -3,11 +3,15 @@ from typing import List
 from typing import Optional
 from typing import Tuple
 
+import numpy as np
 from munch import Munch
 from munch import munchify
 
 from app.ground_model.model import build_simplified_1d_rep_soil_layout
 from app.ground_model.model import convert_input_table_to_soil_layout
+from app.piping_tool.probabilistic import COMMON_VARIABLES
+from app.piping_tool.probabilistic import LOGNORMAL
+from app.piping_tool.probabilistic import Distribution
 from viktor import UserException
 from viktor.geo import SoilLayout
 
@@ -167,3 +171,42 @@ def get_soil_scenario(scenario_name: str, soil_scenario_array: List[Munch]) -> M
         if scenario.name_of_scenario == scenario_name:
             return scenario
     raise ValueError
+
+
+def get_segment_ditches(params: Munch) -> List[dict]:
+    """Return the params of the wet and dry ditches selected for the segment, marked with whether they are wet"""
+    if not params.segment_dry_ditches and not params.segment_ditches:
+        return []
+    if params.segment_dry_ditches:
+        for ditch in params.segment_dry_ditches:
+            ditch["is_wet"] = False
+    if params.segment_ditches:
+        for ditch in params.segment_ditches:
+            ditch["is_wet"] = True
+    return params.segment_ditches + params.segment_dry_ditches
+
+
+def get_stochastic_distributions(params: Munch) -> Dict[str, Distribution]:
+    """Return the distributions of the stochastic variables of the probabilistic piping calculation. The variables that
+    are not in the table are deterministic. The river level in m NAP can be negative and is not lognormal."""
+    distributions = {}
+    for row in params.calculations.probabilistic.stochastic_variables:
+        if not row.variable or not row.distribution:
+            continue
+        if row.variable in distributions:
+            raise UserException(f"De stochast {row.variable} is meer dan eens gedefinieerd")
+        if row.spread is None or row.spread < 0:
+            raise UserException(f"De spreiding van de stochast {row.variable} moet positief zijn")
+        if row.variable in COMMON_VARIABLES and row.distribution == LOGNORMAL:
+            raise UserException(f"De stochast {row.variable} kan geen lognormale verdeling hebben")
+        distributions[row.variable] = Distribution(row.distribution, row.spread)
+    return distributions
+
+
+def get_level_range(minimum: Optional[float], maximum: Optional[float], step: Optional[float], name: str) -> np.ndarray:
+    """Return the levels from the minimum up to and including the maximum with the given step"""
+    if minimum is None or maximum is None or not step:
+        raise UserException(f"Vul het minimum, het maximum en de stap van het {name} in")
+    if step <= 0 or maximum <= minimum:
+        raise UserException(f"Het maximum van het {name} moet groter zijn dan het minimum en de stap positief")
+    return np.arange(minimum, maximum + step / 2, step)
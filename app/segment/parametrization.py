@@ -22,6 +22,7 @@ from viktor.parametrization import IsTrue
 from viktor.parametrization import LineBreak
 from viktor.parametrization import Lookup
 from viktor.parametrization import MapSelectInteraction
+from viktor.parametrization import MultiSelectField
 from viktor.parametrization import NumberField
 from viktor.parametrization import OptionField
 from viktor.parametrization import OptionListElement
@@ -36,8 +37,12 @@ from viktor.parametrization import Text
 from viktor.parametrization import TextField
 from viktor.parametrization import ToggleButton
 
+from .constants import DEFAULT_NUMBER_OF_SAMPLES
+from .constants import DEFAULT_STOCHASTIC_VARIABLES
+from .constants import DISTRIBUTION_OPTIONS
 from .constants import GEOHYDROLOGICAL_OPTIONS
 from .constants import LEAKAGE_LENGTH_OPTIONS
+from .constants import STOCHASTIC_VARIABLE_OPTIONS
 from .constants import TNO_LITHOCLASS_OPTIONS
 
 
@@ -69,6 +74,12 @@ def _get_cpt_options(params: Munch, entity_id: int, **kwargs) -> List[OptionList
     return []
 
 
+def _get_exit_point_options(entity_id: int, **kwargs) -> List[OptionListElement]:
+    """Return as options all the exit points of the segment"""
+    exit_points = API().get_entity(entity_id).children(entity_type_names=["ExitPoint"], include_params=False)
+    return [OptionListElement(label=exit_point.name, value=exit_point.id) for exit_point in exit_points]
+
+
 def _get_scenarios_list(params: Munch, **kwargs) -> Union[List[OptionListElement], str]:
     """Return as options all the scenarios created in the Input selection"""
     scenario_list = []
@@ -559,6 +570,7 @@ class SegmentParametrization(Parametrization):
             "visualize_uplift_results",
             "visualize_heave_results",
             "visualize_sellmeijer_results",
+            "visualize_sensitivity_sweep",
         ],
         previous_label="Stap 3: Genereren uittredepunt",
     )
@@ -651,5 +663,78 @@ class SegmentParametrization(Parametrization):
         ),
     )
 
+    calculations.probabilistic = Tab("Probabilistisch")
+    calculations.probabilistic.explanation = Text(
+        "De faalkansen van opbarsten, heave, Sellmeijer en piping worden per aquifer van elk uittredepunt geschat met "
+        "een Monte Carlo simulatie. Het gemiddelde van elke stochast is de deterministische waarde van de berekening. "
+        "De spreiding is de standaardafwijking van een normale verdeling en de variatiecoëfficiënt van een "
+        "lognormale verdeling. De schematiserings- en veiligheidsfactoren worden niet toegepast. Zonder positieve "
+        "deterministische waarde van een lognormale stochast is de faalkans van een berekening onbepaald."
+    )
+    calculations.probabilistic.number_of_samples = IntegerField(
+        "Aantal trekkingen", default=DEFAULT_NUMBER_OF_SAMPLES, min=1
+    )
+    calculations.probabilistic.seed = IntegerField(
+        "Seed", min=0, description="Optioneel, met dezelfde seed worden dezelfde trekkingen herhaald"
+    )
+    calculations.probabilistic.stochastic_variables = TableInput("Stochasten", default=DEFAULT_STOCHASTIC_VARIABLES)
+    calculations.probabilistic.stochastic_variables.variable = OptionField(
+        "Stochast", options=STOCHASTIC_VARIABLE_OPTIONS
+    )
+    calculations.probabilistic.stochastic_variables.distribution = OptionField(
+        "Verdeling", options=DISTRIBUTION_OPTIONS
+    )
+    calculations.probabilistic.stochastic_variables.spread = NumberField("Spreiding", min=0)
+    calculations.probabilistic.lb = LineBreak()
+    calculations.probabilistic.download_failure_probabilities = DownloadButton(
+        "Download faalkansen", "download_failure_probabilities"
+    )
+
+    calculations.sensitivity = Tab("Gevoeligheid")
+    calculations.sensitivity.explanation = Text(
+        "De unity checks van alle uittredepunten worden in één keer berekend voor een reeks rivierpeilen, en optioneel "
+        "voor een reeks freatische niveaus bij het uittredepunt. Het kritieke rivierpeil is het rivierpeil waarbij de "
+        "unity check van piping 1 wordt. Een berekening die al faalt bij het laagste rivierpeil heeft dat rivierpeil "
+        "als kritiek rivierpeil, gemarkeerd met een driehoek."
+    )
+    calculations.sensitivity.river_level_min = NumberField("Rivierpeil minimum", suffix="m NAP", default=0, flex=33)
+    calculations.sensitivity.river_level_max = NumberField("Rivierpeil maximum", suffix="m NAP", default=10, flex=33)
+    calculations.sensitivity.river_level_step = NumberField("Rivierpeil stap", suffix="m", default=0.1, min=0, flex=33)
+    calculations.sensitivity.vary_phreatic_level = ToggleButton("Varieer freatisch niveau", default=False)
+    calculations.sensitivity.lb = LineBreak()
+    calculations.sensitivity.phreatic_level_min = NumberField(
+        "Freatisch niveau minimum",
+        suffix="m NAP",
+        flex=33,
+        visible=IsTrue(Lookup("calculations.sensitivity.vary_phreatic_level")),
+    )
+    calculations.sensitivity.phreatic_level_max = NumberField(
+        "Freatisch niveau maximum",
+        suffix="m NAP",
+        flex=33,
+        visible=IsTrue(Lookup("calculations.sensitivity.vary_phreatic_level")),
+    )
+    calculations.sensitivity.phreatic_level_step = NumberField(
+        "Freatisch niveau stap",
+        suffix="m",
+        default=0.1,
+        min=0,
+        flex=33,
+        visible=IsTrue(Lookup("calculations.sensitivity.vary_phreatic_level")),
+    )
+
     calculations.downloable_result = Tab("Downloaden")
     calculations.downloable_result.export_results = DownloadButton("Export to Excel", "download_piping_results")
+    calculations.downloable_result.lb = LineBreak()
+    calculations.downloable_result.models_scenario = OptionField(
+        "Scenario voor D-Geoflow en D-Stability modellen", options=_get_scenarios_list
+    )
+    calculations.downloable_result.models_exit_points = MultiSelectField(
+        "Uittredepunten",
+        options=_get_exit_point_options,
+        description="The models of the selected exit points are downloaded, or of all exit points when none is "
+        "selected. The cross-section settings of every exit point are used.",
+    )  # TODO TRANSLATE
+    calculations.downloable_result.lb1 = LineBreak()
+    calculations.downloable_result.download_flox_models = DownloadButton("Download flox", "download_flox_models")
+    calculations.downloable_result.download_stix_models = DownloadButton("Download stix", "download_stix_models")
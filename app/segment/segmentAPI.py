@@ -1,5 +1,7 @@
 from typing import List
 from typing import Optional
+from typing import Sequence
+from typing import Tuple
 from typing import Union
 
 from viktor import UserException
@@ -14,8 +16,8 @@ from ..lib.api.api_helper import APIHelper
 from ..lib.helper_read_files import entry_line_to_params
 from ..lib.helper_read_files import process_ditch_shape_file
 from ..lib.shapely_helper_functions import convert_geo_polyline_to_linestring
-from ..lib.shapely_helper_functions import convert_geopolygon_to_shapely_polgon
 from .segment_model import Segment
+from .segment_model import create_segment
 
 
 class SegmentAPI(APIHelper):
@@ -97,29 +99,23 @@ class SegmentAPI(APIHelper):
     def get_borehole_folder_from_parent(self) -> Entity:
         return self._get_parent().last_saved_params.bore_folder
 
-    def closest_cpt_to_RD_coordinates(self, x: float, y: float) -> Entity:
+    def closest_cpt_ids_to_RD_coordinates(self, coordinates: Sequence[Tuple[float, float]]) -> List[int]:
+        """Return the id of the closest CPT for each of the provided RD coordinates, e.g. all exit points of the segment.
+        The CPT folder is only fetched once and all points are queried in one batch."""
         all_cpts = self.all_cpts
         folder_name = self._get_parent().last_saved_params.cpt_folder
-        cpt_id = CPTFolder(all_cpts, folder_name).closest_cpt_to_point(x, y).id
-        return self._get_entity(cpt_id)
+        return [cpt.id for cpt in CPTFolder(all_cpts, folder_name).closest_cpts_to_points(coordinates)]
 
     def get_segment_model(self, segment_params=None) -> Segment:
         dyke = self.get_dyke()
 
-        # find the segment trajectory trough the intersection of the dyke trajectory and the polygon
-        if segment_params.segment_polygon is None:
-            raise UserException(
-                "Geen traject voor het dijkvak: vul start en eind kilometrering, en click op 'Update traject'"
-            )
-        polygon = convert_geopolygon_to_shapely_polgon(segment_params.segment_polygon)
-        segment_trajectory = polygon.intersection(dyke.interpolated_trajectory())
-
         # find the entry line for this segment
         if not dyke.params.entry_line:
             raise UserException("Selecteer intredelijn voor de dijk.")
-        entry_line_geopolygon = entry_line_to_params(dyke.params.entry_line)
-        entry_line = polygon.intersection(convert_geo_polyline_to_linestring(entry_line_geopolygon))
-        return Segment(segment_params, segment_trajectory, dyke, entry_line)
+        entry_line = convert_geo_polyline_to_linestring(entry_line_to_params(dyke.params.entry_line))
+
+        # find the segment trajectory trough the intersection of the dyke trajectory and the polygon
+        return create_segment(segment_params, dyke, dyke.interpolated_trajectory(), entry_line)
 
     def get_parent_dike_params(self):
         return self._get_parent().last_saved_params
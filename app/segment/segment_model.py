@@ -1,10 +1,13 @@
-from copy import deepcopy
+from typing import Dict
+from typing import Iterator
 from typing import List
+from typing import NamedTuple
 from typing import Optional
 from typing import Tuple
 from typing import Union
 
 import numpy as np
+import pyarrow as pa
 from munch import Munch
 from munch import munchify
 from numpy import nan
@@ -18,7 +21,9 @@ from shapely.geometry import Polygon
 from shapely.ops import nearest_points
 from shapely.ops import unary_union
 
+from app.lib.rd_wgs_converter import rd_to_geo_points
 from app.lib.shapely_helper_functions import check_if_point_in_polygons
+from app.lib.shapely_helper_functions import convert_geopolygon_to_shapely_polgon
 from app.lib.shapely_helper_functions import extend_line
 from app.lib.shapely_helper_functions import extend_linestring
 from app.lib.shapely_helper_functions import find_direction
@@ -31,8 +36,6 @@ from viktor.api_v1 import Entity
 from viktor.api_v1 import EntityList
 from viktor.core import UserException
 from viktor.core import progress_message
-from viktor.geometry import GeoPoint
-from viktor.geometry import RDWGSConverter
 from viktor.views import MapEntityLink
 from viktor.views import MapFeature
 from viktor.views import MapLabel
@@ -47,6 +50,8 @@ from ..ditch.utils import get_ditch_points_data
 from ..dyke.dyke_model import LINE_SCALE
 from ..dyke.dyke_model import Dyke
 from ..exit_point.model import ExitPointProperties
+from ..ground_model.array_soil_layout import ArraySoilLayout
+from ..ground_model.array_soil_layout import as_array_soil_layout
 from ..ground_model.model import build_combined_rep_and_exit_point_layout
 from ..ground_model.tno_model import TNOGroundModel
 from ..ground_model.tno_model import get_longitudinal_soil_layout
@@ -55,6 +60,18 @@ from ..lib.ahn.ahn_helper_functions import get_xyz_df_from_multipoints
 from ..lib.plotly_2d_profile_helper_functions import get_visualisation_along_trajectory
 from ..lib.regis.regis_helper import get_longitudinal_regis_soil_layouts
 from ..piping_tool.constants import PipingDataFrameColumns
+from ..piping_tool.piping_arrays import PipingCalculationArrays
+from ..piping_tool.piping_result_table import EXIT_POINT_ID
+from ..piping_tool.piping_result_table import SCENARIO_NAME
+from ..piping_tool.piping_result_table import SCENARIO_WEIGHT
+from ..piping_tool.piping_result_table import X_COORDINATE
+from ..piping_tool.piping_result_table import Y_COORDINATE
+from ..piping_tool.piping_result_table import PipingResultTableBuilder
+from ..piping_tool.piping_result_table import filter_scenario
+from ..piping_tool.PipingCalculationUtilities import PipingCalculation
+from ..piping_tool.probabilistic import Distribution
+from ..piping_tool.probabilistic import calculate_failure_probabilities
+from ..piping_tool.probabilistic import get_failure_probability_table
 from .constants import DEFAULT_PIPING_ERROR_RESULTS
 from .constants import SPATIAL_RESOLUTION_SEGMENT_CHAINAGE
 from .param_parser_functions import Scenario
@@ -63,6 +80,29 @@ from .param_parser_functions import get_representative_soil_layouts
 from .param_parser_functions import get_soil_scenario
 
 TOL = 0.5  # meter tolerance to generate points along ditches lines
+UNCOMBINED_UNITY_CHECK_COLUMNS = ["uc_opbarsten", "uc_heave", "uc_sellmeijer"]
+WEIGHTED_UNITY_CHECK_COLUMNS = {"w_sellmeijer": "uc_sellmeijer", "w_uplift": "uc_opbarsten", "w_heave": "uc_heave"}
+EXIT_POINT_INFO_COLUMNS = [PipingDataFrameColumns.EXIT_POINT.value, EXIT_POINT_ID, X_COORDINATE, Y_COORDINATE]
+
+
+class PipingExitPoint(NamedTuple):
+    """Data of an exit point for its piping calculations, without the entity so that it can be sent to a worker
+    process"""
+
+    name: str
+    id: int
+    coordinates: Tuple[float, float]
+    classified_soil_layout: Optional[Munch]
+    ditch: Optional[Ditch]
+    ditch_error: bool  # the ditch at the exit point could not be schematized
+
+
+class SegmentPipingInput(NamedTuple):
+    """Scenarios with their simplified representative soil layout, hydraulic parameters and exit points of a segment"""
+
+    scenarios: List[Tuple[Scenario, ArraySoilLayout]]
+    piping_hydro_parameters: Munch
+    exit_points: List[PipingExitPoint]
 
 
 class Segment:
@@ -515,9 +555,15 @@ class Segment:
             regis_layouts=regis_soil_layouts,
         )
 
-    def get_ditch(self, coordinates: Tuple[float, float]) -> Optional[Ditch]:
-        # Get ditch if Exit point is in a ditch
-        segment_ditches_pol, segment_dry_ditches_pol = self.get_ditches_as_multipolygons
+    def get_ditch(
+        self,
+        coordinates: Tuple[float, float],
+        ditches_as_multipolygons: Optional[Tuple[MultiPolygon, MultiPolygon]] = None,
+    ) -> Optional[Ditch]:
+        # Get ditch if Exit point is in a ditch, the polygons of the ditches can be given when many points are checked
+        if ditches_as_multipolygons is None:
+            ditches_as_multipolygons = self.get_ditches_as_multipolygons
+        segment_ditches_pol, segment_dry_ditches_pol = ditches_as_multipolygons
         point = Point(coordinates)
         check_bool, type_ditch = check_if_point_in_polygons(segment_ditches_pol, segment_dry_ditches_pol, point)
         if check_bool is True:
@@ -607,10 +653,11 @@ class Segment:
         else:
             raise NotImplementedError
 
-    def get_serialized_piping_results(self, exit_point_list: Union[EntityList, List[Entity]]) -> List[dict]:
+    def get_piping_input(self, exit_point_list: Union[EntityList, List[Entity]]) -> SegmentPipingInput:
         """
-        Return all the piping results (Uplift, heave, Sellmeijer) for every aquifer of every exit point for every
-        scenarios in a serialized format easily convertible into a DataFrame
+        Collect everything that is needed for the piping calculations of the exit points from the params of the
+        segment and of the exit points. The ditches of the segment are converted into polygons once for all exit
+        points.
         :param exit_point_list: List of ExitPoint entities to iterate
         :return:
         """
@@ -624,104 +671,130 @@ class Segment:
             geohyromodel=self._params.geohydrology_method,
             scenario_name=scenario_index,
         )
-        result_list = []
-        for j, scenario in enumerate(scenarios, 0):
-            piping_hydro_parameters = munchify(get_piping_hydro_parameters(self._params))
-            for i, exit_point in enumerate(exit_point_list, 1):
-                progress_message(
-                    f"{scenario.name_of_scenario} \n\n{exit_point.name}\n\n{i + j * len(exit_point_list)}/{len(exit_point_list) * len(scenarios)}"
+        ditches_as_multipolygons = self.get_ditches_as_multipolygons
+        exit_points = []
+        for exit_point in exit_point_list:
+            exit_point_params = exit_point.last_saved_params
+            coordinates = (
+                exit_point_params.exit_point_data.x_coordinate,
+                exit_point_params.exit_point_data.y_coordinate,
+            )
+            try:
+                ditch, ditch_error = self.get_ditch(coordinates, ditches_as_multipolygons), False
+            except (DitchHeffError, DitchLargeBError, DitchIntersectionLines, DitchPolygonIntersectionError):
+                ditch, ditch_error = None, True
+            exit_points.append(
+                PipingExitPoint(
+                    name=exit_point.name,
+                    id=exit_point.id,
+                    coordinates=coordinates,
+                    classified_soil_layout=exit_point_params.get("classified_soil_layout"),
+                    ditch=ditch,
+                    ditch_error=ditch_error,
                 )
+            )
 
-                exit_point_params = exit_point.last_saved_params
-                coordinates = (
-                    exit_point_params.exit_point_data.x_coordinate,
-                    exit_point_params.exit_point_data.y_coordinate,
-                )
+        return SegmentPipingInput(
+            scenarios=[
+                (scenario, as_array_soil_layout(get_representative_soil_layouts(self._params, scenario)[1]))
+                for scenario in scenarios
+            ],
+            piping_hydro_parameters=munchify(get_piping_hydro_parameters(self._params)),
+            exit_points=exit_points,
+        )
 
-                _, rep_soil_layout = get_representative_soil_layouts(self._params, scenario)
-                soil_layout_piping = build_combined_rep_and_exit_point_layout(
-                    exit_point_params.get("classified_soil_layout"), rep_soil_layout
-                )
-                try:
-                    res_list = ExitPointProperties(
-                        soil_layout_piping=soil_layout_piping.serialize(),
-                        coordinates=coordinates,
-                        dyke=self._dyke,
-                        ditch=self.get_ditch(coordinates),
-                        leakage_lengths=scenario.leakage_lengths,
-                    ).get_exit_point_summary_piping_results(piping_hydro_parameters)
-                    for piping_calculation in res_list:
-                        piping_calculation[PipingDataFrameColumns.EXIT_POINT.value] = exit_point
-                        piping_calculation["scenario"] = scenario
-                        piping_calculation["scenario_name"] = scenario.name_of_scenario
-                        result_list.append(piping_calculation)
-                except (DitchHeffError, DitchLargeBError, DitchIntersectionLines, DitchPolygonIntersectionError):
-                    piping_calculation = deepcopy(
-                        DEFAULT_PIPING_ERROR_RESULTS
-                    )  # deepcopy necessary here otherwise piping_calculation is getting overwritten
-                    piping_calculation[PipingDataFrameColumns.EXIT_POINT.value] = exit_point
-                    piping_calculation["scenario"] = scenario
-                    piping_calculation["scenario_name"] = scenario.name_of_scenario
-                    result_list.append(piping_calculation)
-
-        return result_list
+    def get_piping_result_table(self, exit_point_list: Union[EntityList, List[Entity]]) -> pa.Table:
+        """
+        Return all the piping results (Uplift, heave, Sellmeijer) for every aquifer of every exit point for every
+        scenarios in a columnar Arrow table with the PIPING_RESULT_SCHEMA. The calculations write their results
+        directly into the columns of the table.
+        :param exit_point_list: List of ExitPoint entities to iterate
+        :return:
+        """
+        return calculate_piping_result_table(
+            self.get_piping_input(exit_point_list), self._dyke.interpolated_trajectory(), self._dyke.entry_line
+        )
+
+    def get_failure_probability_table(
+        self,
+        exit_point_list: Union[EntityList, List[Entity]],
+        distributions: Dict[str, Distribution],
+        number_of_samples: int,
+        seed: Optional[int] = None,
+    ) -> pa.Table:
+        """
+        Return the failure probabilities and reliability indices of uplift, heave, Sellmeijer and piping for every
+        aquifer of every exit point for every scenario, from a Monte Carlo simulation of all the calculations at once.
+        :param exit_point_list: List of ExitPoint entities to iterate
+        :param distributions: distribution of the stochastic variables around their deterministic value
+        :param number_of_samples: number of samples of every calculation
+        :param seed: seed of the random generator, to reproduce the results
+        :return:
+        """
+        rows, arrays = self.get_piping_calculation_arrays(exit_point_list)
+        progress_message(
+            f"Monte Carlo simulatie: {number_of_samples} trekkingen van {arrays.number_of_calculations} berekeningen"
+        )
+        failure_probabilities = calculate_failure_probabilities(arrays, distributions, number_of_samples, seed=seed)
+        return get_failure_probability_table(rows, failure_probabilities)
+
+    def get_piping_calculation_arrays(
+        self, exit_point_list: Union[EntityList, List[Entity]]
+    ) -> Tuple[List[dict], PipingCalculationArrays]:
+        """
+        Return the piping calculations of every aquifer of every exit point for every scenario as arrays, with the
+        description of every calculation. The limit states of all the calculations can then be evaluated at once for
+        other river levels, phreatic levels or sampled parameters.
+        :param exit_point_list: List of ExitPoint entities to iterate
+        :return:
+        """
+        rows, calculations = get_piping_calculations(
+            self.get_piping_input(exit_point_list), self._dyke.interpolated_trajectory(), self._dyke.entry_line
+        )
+        return rows, PipingCalculationArrays.from_calculations(calculations)
 
     def get_map_features_for_uncombined_piping_results(
         self,
-        serialized_piping_res: List[dict],
+        piping_results: pa.Table,
         scenario_name: str,
         calculation_type: Optional[str] = None,
     ) -> Tuple[List[MapFeature], List[MapLabel]]:
         """
         Build the map features and labels for the uncombined piping calculations
-        :param serialized_piping_res: Full piping results for all scenarios, all exit point and all aquifer
+        :param piping_results: Full piping result table for all scenarios, all exit point and all aquifer
         :param scenario_name: name of the scenario for which the piping result nust be filtered
         :param calculation_type: one of ["uplift", "heave", "sellmeijer"]
         """
-        map_features, map_labels = [], []
-
         # Filter the results for the selected scenario
-        df_res = DataFrame.from_records(
-            serialized_piping_res, columns=[col.value for col in PipingDataFrameColumns] + ["scenario_name"]
-        )
-        sorted_df = df_res[df_res["scenario_name"] == scenario_name]
-        # Build the markers for the MapView
-        description = ""
-        uc_list = []
-        for _, row in sorted_df.iterrows():  # iterrows() is code smell
-            exit_point = row[PipingDataFrameColumns.EXIT_POINT.value]
-            if row["aquifer"] == 1:
-                description = f"## {exit_point.name} \n\n " + self.get_description_uncombined_results(
-                    row, aquifer=1, calculation_type=calculation_type
+        sorted_df = filter_scenario(piping_results, scenario_name).to_pandas()
+
+        # Gather the descriptions and unity checks per exit point from the numpy columns, the results of the second
+        # aquifer are appended to the ones of the first aquifer of the same exit point
+        exit_point_rows, descriptions, uc_lists = [], [], []
+        unity_checks = sorted_df[UNCOMBINED_UNITY_CHECK_COLUMNS].to_numpy().tolist()
+        for index, (exit_point_name, aquifer, row_unity_checks) in enumerate(
+            zip(
+                sorted_df[PipingDataFrameColumns.EXIT_POINT.value].to_numpy(),
+                sorted_df[PipingDataFrameColumns.AQUIFER.value].to_numpy(),
+                unity_checks,
+            )
+        ):
+            row = dict(zip(UNCOMBINED_UNITY_CHECK_COLUMNS, row_unity_checks))
+            if aquifer == 1:
+                exit_point_rows.append(index)
+                descriptions.append(
+                    f"## {exit_point_name} \n\n "
+                    + self.get_description_uncombined_results(row, aquifer=1, calculation_type=calculation_type)
                 )
-                uc_list = self.get_uc_list_uncombined_results(row, calculation_type=calculation_type)
+                uc_lists.append(self.get_uc_list_uncombined_results(row, calculation_type=calculation_type))
             else:
-                map_features.pop()
-                map_labels.pop()
-                description += self.get_description_uncombined_results(
+                descriptions[-1] += self.get_description_uncombined_results(
                     row, aquifer=2, calculation_type=calculation_type
                 )
-                uc_list.extend(self.get_uc_list_uncombined_results(row, calculation_type=calculation_type))
+                uc_lists[-1].extend(self.get_uc_list_uncombined_results(row, calculation_type=calculation_type))
 
-            coordinates = (
-                exit_point.last_saved_params.exit_point_data.x_coordinate,
-                exit_point.last_saved_params.exit_point_data.y_coordinate,
-            )
-            map_features.append(
-                MapPoint.from_geo_point(
-                    GeoPoint.from_rd(coordinates),
-                    color=get_unity_check_color(uc_list),
-                    description=description,
-                    entity_links=[MapEntityLink("Na Uitredepunt", entity_id=exit_point.id)],
-                )
-            )
-            lat, lon = RDWGSConverter.from_rd_to_wgs(coordinates)
-            map_labels.append(MapLabel(lat, lon, scale=17, text=f"{exit_point.name[13:]}"))
-
-        return (
-            map_features,
-            map_labels,
-        )
+        exit_points = sorted_df.iloc[exit_point_rows][EXIT_POINT_INFO_COLUMNS]
+        return get_piping_result_map_features(exit_points, descriptions, uc_lists)
 
     @staticmethod
     def get_uc_list_uncombined_results(row, calculation_type: Optional[str] = None) -> List[float]:
@@ -752,117 +825,232 @@ class Segment:
         return description
 
     def get_map_features_for_combined_piping_results(
-        self, serialized_piping_res: List[dict], calculation_type: Optional[str] = None
+        self, piping_results: pa.Table, calculation_type: Optional[str] = None
     ) -> Tuple[List[MapFeature], List[MapLabel]]:
         """Build the map features and labels for the combined piping calculations
-        :param serialized_piping_res: Full piping results for all scenarios, all exit point and all aquifer
+        :param piping_results: Full piping result table for all scenarios, all exit point and all aquifer
         """
-        # Filter the results for the selected scenario
-        df_res = DataFrame.from_records(
-            serialized_piping_res, columns=[col.value for col in PipingDataFrameColumns] + ["scenario_name"]
-        )
-        df_res = df_res.replace("nan", nan)
-
-        # Add exit point name to dataframe
-        def add_exit_point_name(row):
-            return row.name
-
-        df_res["exit_point_name"] = df_res[PipingDataFrameColumns.EXIT_POINT.value].apply(add_exit_point_name)
-        unique_exit_point_entities = df_res.drop_duplicates(subset=["exit_point_name"])[
-            PipingDataFrameColumns.EXIT_POINT.value
-        ].to_list()
-        exit_point_mapping = {exit_point.name: exit_point for exit_point in unique_exit_point_entities}
-        sorted_df = df_res.sort_values(by=["exit_point_name"])
-
-        # Separate first and second aquifer in different dataframes
-        aq_1_df = sorted_df[sorted_df["aquifer"] == 1].sort_values(by=["scenario_name"])
-        aq_2_df = sorted_df[sorted_df["aquifer"] == 2].sort_values(by=["scenario_name"])
-        aq_1_df["w_sellmeijer"] = aq_1_df.apply(
-            lambda x: (x["scenario"].weight_of_scenario * x["uc_sellmeijer"]), axis=1
-        )
-        aq_1_df["w_uplift"] = aq_1_df.apply(lambda x: (x["scenario"].weight_of_scenario * x["uc_opbarsten"]), axis=1)
-        aq_1_df["w_heave"] = aq_1_df.apply(lambda x: (x["scenario"].weight_of_scenario * x["uc_heave"]), axis=1)
-
+        df_res = piping_results.to_pandas()
+        exit_point_name = PipingDataFrameColumns.EXIT_POINT.value
+        exit_points = df_res.drop_duplicates(exit_point_name).set_index(exit_point_name, drop=False)
+
+        # Weigh the unity checks of every scenario with column arithmetic
+        weights = df_res[SCENARIO_WEIGHT].to_numpy(dtype=float)
+        for weighted_column, uc_column in WEIGHTED_UNITY_CHECK_COLUMNS.items():
+            df_res[weighted_column] = weights * df_res[uc_column].to_numpy(dtype=float)
         if calculation_type is None:
-            final_aq_1 = (
-                aq_1_df.groupby("exit_point_name")["w_sellmeijer", "w_uplift", "w_heave"]
-                .sum()
-                .replace(0.0, nan)
-                .to_dict("index")
-            )
+            weighted_columns = list(WEIGHTED_UNITY_CHECK_COLUMNS)
         else:
-            final_aq_1 = (
-                (aq_1_df.groupby("exit_point_name")["w_" + calculation_type].sum().replace(0.0, nan))
-                .to_frame()
-                .to_dict("index")
-            )  # groupby returns a series when only one argument is provided
+            weighted_columns = ["w_" + calculation_type]
+
+        # Separate first and second aquifer and sum the weighted unity checks of all scenarios per exit point
+        aq_1_df = df_res[df_res[PipingDataFrameColumns.AQUIFER.value] == 1]
+        aq_2_df = df_res[df_res[PipingDataFrameColumns.AQUIFER.value] == 2]
+        final_aq_1 = aq_1_df.groupby(exit_point_name)[weighted_columns].sum().replace(0.0, nan)
 
         if len(aq_2_df) > 0:
-            aq_2_df["w_sellmeijer"] = aq_2_df.apply(
-                lambda x: (x["scenario"].weight_of_scenario * x["uc_sellmeijer"]), axis=1
+            final_aq_2 = aq_2_df.groupby(exit_point_name)[weighted_columns].sum()
+            if calculation_type is not None:
+                final_aq_2 = final_aq_2.replace(0.0, nan)
+            return make_marker_double_aquifer(final_aq_1, final_aq_2, exit_points, calculation_type)
+
+        return make_marker_single_aquifer(final_aq_1, exit_points, calculation_type)
+
+
+def create_segment(params: Munch, dyke: Dyke, dyke_trajectory: LineString, entry_line: LineString) -> Segment:
+    """Create the Segment from its params, its trajectory and entry line are the parts of the interpolated trajectory
+    and entry line of the dike within the polygon of the segment. The lines of the dike can be computed once for all
+    the segments of a dike."""
+    if params.segment_polygon is None:
+        raise UserException(
+            "Geen traject voor het dijkvak: vul start en eind kilometrering, en click op 'Update traject'"
+        )
+    polygon = convert_geopolygon_to_shapely_polgon(params.segment_polygon)
+    return Segment(params, polygon.intersection(dyke_trajectory), dyke, polygon.intersection(entry_line))
+
+
+def iterate_exit_point_properties(
+    piping_input: SegmentPipingInput, reference_line: LineString, entry_line: LineString
+) -> Iterator[Tuple[Scenario, PipingExitPoint, Optional[ExitPointProperties]]]:
+    """
+    Iterate over every exit point for every scenario of a segment, with the properties of the exit point from which
+    its piping calculations are made. The properties are None when the ditch of the exit point cannot be schematized.
+    :param piping_input: scenarios and exit points of the segment, see Segment.get_piping_input
+    :param reference_line: interpolated trajectory of the dike
+    :param entry_line: entry line of the dike
+    :return: the scenario, the exit point and its properties
+    """
+    for scenario, rep_soil_layout in piping_input.scenarios:
+        for exit_point in piping_input.exit_points:
+            if exit_point.ditch_error:
+                yield scenario, exit_point, None
+                continue
+            soil_layout_piping = build_combined_rep_and_exit_point_layout(
+                exit_point.classified_soil_layout, rep_soil_layout
             )
-            aq_2_df["w_uplift"] = aq_2_df.apply(
-                lambda x: (x["scenario"].weight_of_scenario * x["uc_opbarsten"]), axis=1
+            yield scenario, exit_point, ExitPointProperties(
+                soil_layout_piping=soil_layout_piping,
+                coordinates=exit_point.coordinates,
+                reference_line=reference_line,
+                entry_line=entry_line,
+                ditch=exit_point.ditch,
+                leakage_lengths=scenario.leakage_lengths,
             )
-            aq_2_df["w_heave"] = aq_2_df.apply(lambda x: (x["scenario"].weight_of_scenario * x["uc_heave"]), axis=1)
-            if calculation_type is None:
-                final_aq_2 = (
-                    aq_2_df.groupby("exit_point_name")["w_sellmeijer", "w_uplift", "w_heave"].sum().to_dict("index")
-                )
-            else:
-                final_aq_2 = (
-                    (aq_2_df.groupby("exit_point_name")["w_" + calculation_type].sum().replace(0.0, nan))
-                    .to_frame()
-                    .to_dict("index")
-                )
-            return make_marker_double_aquifer(final_aq_1, final_aq_2, exit_point_mapping, calculation_type)
 
-        return make_marker_single_aquifer(final_aq_1, exit_point_mapping, calculation_type)
+
+def get_piping_calculations(
+    piping_input: SegmentPipingInput, reference_line: LineString, entry_line: LineString
+) -> Tuple[List[dict], List[PipingCalculation]]:
+    """
+    Return the piping calculations of every aquifer of every exit point for every scenario of a segment, with the
+    description of every calculation in the columns of the piping result table. The exit points of which the ditch
+    cannot be schematized are left out, they only get the default error results in the piping result table.
+    :param piping_input: scenarios and exit points of the segment, see Segment.get_piping_input
+    :param reference_line: interpolated trajectory of the dike
+    :param entry_line: entry line of the dike
+    :return: the description and the calculation of every aquifer
+    """
+    rows, calculations = [], []
+    for scenario, exit_point, exit_point_properties in iterate_exit_point_properties(
+        piping_input, reference_line, entry_line
+    ):
+        if exit_point_properties is None:
+            continue
+        exit_point_calculations = exit_point_properties.get_piping_calculations(piping_input.piping_hydro_parameters)
+        try:
+            for calculation in exit_point_calculations:
+                calculation.validator_ditch()
+        except (DitchHeffError, DitchLargeBError, DitchIntersectionLines, DitchPolygonIntersectionError):
+            continue
+
+        for aquifer, calculation in enumerate(exit_point_calculations, 1):
+            rows.append(
+                {
+                    SCENARIO_NAME: scenario.name_of_scenario,
+                    SCENARIO_WEIGHT: scenario.weight_of_scenario,
+                    PipingDataFrameColumns.EXIT_POINT.value: exit_point.name,
+                    EXIT_POINT_ID: exit_point.id,
+                    X_COORDINATE: exit_point.coordinates[0],
+                    Y_COORDINATE: exit_point.coordinates[1],
+                    PipingDataFrameColumns.AQUIFER.value: aquifer,
+                }
+            )
+            calculations.append(calculation)
+    return rows, calculations
+
+
+def calculate_piping_result_table(
+    piping_input: SegmentPipingInput,
+    reference_line: LineString,
+    entry_line: LineString,
+    report_progress: bool = True,
+) -> pa.Table:
+    """
+    Calculate the piping results (Uplift, heave, Sellmeijer) for every aquifer of every exit point for every scenario
+    of a segment. This function is defined at module level so that it can be sent to a worker process.
+    :param piping_input: scenarios and exit points of the segment, see Segment.get_piping_input
+    :param reference_line: interpolated trajectory of the dike
+    :param entry_line: entry line of the dike
+    :param report_progress: show the progress of the calculations, only possible in the process of the job
+    :return: the results in an Arrow table with the PIPING_RESULT_SCHEMA
+    """
+    number_of_calculations = len(piping_input.exit_points) * len(piping_input.scenarios)
+    piping_results = PipingResultTableBuilder()
+    for i, (scenario, exit_point, exit_point_properties) in enumerate(
+        iterate_exit_point_properties(piping_input, reference_line, entry_line), 1
+    ):
+        if report_progress:
+            progress_message(f"{scenario.name_of_scenario} \n\n{exit_point.name}\n\n{i}/{number_of_calculations}")
+
+        piping_results.set_row_defaults(
+            {
+                PipingDataFrameColumns.EXIT_POINT.value: exit_point.name,
+                EXIT_POINT_ID: exit_point.id,
+                X_COORDINATE: exit_point.coordinates[0],
+                Y_COORDINATE: exit_point.coordinates[1],
+                SCENARIO_NAME: scenario.name_of_scenario,
+                SCENARIO_WEIGHT: scenario.weight_of_scenario,
+            }
+        )
+        if exit_point_properties is None:
+            piping_results.add_values(DEFAULT_PIPING_ERROR_RESULTS)
+            piping_results.end_row()
+            continue
+        try:
+            exit_point_properties.write_exit_point_summary_piping_results(
+                piping_input.piping_hydro_parameters, piping_results
+            )
+        except (DitchHeffError, DitchLargeBError, DitchIntersectionLines, DitchPolygonIntersectionError):
+            piping_results.discard_row()
+            piping_results.add_values(DEFAULT_PIPING_ERROR_RESULTS)
+            piping_results.end_row()
+
+    return piping_results.to_table()
 
 
-def make_marker_double_aquifer(
-    final_aq_1: DataFrame, final_aq_2: DataFrame, exit_point_mapping: dict, calculation_type: Optional[str] = None
+def get_piping_result_map_features(
+    exit_points: DataFrame, descriptions: List[str], uc_lists: List[List[float]]
 ) -> Tuple[List[MapFeature], List[MapLabel]]:
+    """Build the markers and labels of the piping results of the exit points, all the coordinates are converted to
+    WGS84 at once
+    :param exit_points: name, entity id and RD coordinates of the exit points, one row per marker
+    """
     map_features, map_labels = [], []
-    for key, aq_1, aq_2 in common_entries(final_aq_1, final_aq_2):
-        exit_point = exit_point_mapping[key]
-        coordinates = (
-            exit_point.last_saved_params.exit_point_data.x_coordinate,
-            exit_point.last_saved_params.exit_point_data.y_coordinate,
-        )
-        uc_list = list(aq_1.values()) + list(aq_2.values())
-
+    geo_points = rd_to_geo_points(exit_points[[X_COORDINATE, Y_COORDINATE]].to_numpy())
+    for exit_point_name, exit_point_id, description, uc_list, geo_point in zip(
+        exit_points[PipingDataFrameColumns.EXIT_POINT.value].tolist(),
+        exit_points[EXIT_POINT_ID].tolist(),
+        descriptions,
+        uc_lists,
+        geo_points,
+    ):
         map_features.append(
             MapPoint.from_geo_point(
-                GeoPoint.from_rd(coordinates),
+                geo_point,
                 color=get_unity_check_color(uc_list),
-                description=get_marker_description_double_aquifer(exit_point, aq_1, aq_2, calculation_type),
-                entity_links=[MapEntityLink("Na Uitredepunt", entity_id=exit_point.id)],
+                description=description,
+                entity_links=[MapEntityLink("Na Uitredepunt", entity_id=exit_point_id)],
             )
         )
-        lat, lon = RDWGSConverter.from_rd_to_wgs(coordinates)
-        map_labels.append(MapLabel(lat, lon, scale=17, text=f"{exit_point.name[13:]}"))
+        map_labels.append(MapLabel(geo_point.lat, geo_point.lon, scale=17, text=f"{exit_point_name[13:]}"))
     return (
         map_features,
         map_labels,
     )
 
 
+def make_marker_double_aquifer(
+    final_aq_1: DataFrame, final_aq_2: DataFrame, exit_points: DataFrame, calculation_type: Optional[str] = None
+) -> Tuple[List[MapFeature], List[MapLabel]]:
+    exit_point_names = final_aq_1.index.intersection(final_aq_2.index)
+    columns_1, columns_2 = final_aq_1.columns.to_list(), final_aq_2.columns.to_list()
+    descriptions, uc_lists = [], []
+    for exit_point_name, values_1, values_2 in zip(
+        exit_point_names,
+        final_aq_1.loc[exit_point_names].to_numpy().tolist(),
+        final_aq_2.loc[exit_point_names].to_numpy().tolist(),
+    ):
+        aq_1, aq_2 = dict(zip(columns_1, values_1)), dict(zip(columns_2, values_2))
+        descriptions.append(get_marker_description_double_aquifer(exit_point_name, aq_1, aq_2, calculation_type))
+        uc_lists.append(values_1 + values_2)
+    return get_piping_result_map_features(exit_points.loc[exit_point_names], descriptions, uc_lists)
+
+
 def get_marker_description_double_aquifer(
-    exit_point: Entity, aq_1: DataFrame, aq_2: DataFrame, calculation_type: Optional[str]
+    exit_point_name: str, aq_1: DataFrame, aq_2: DataFrame, calculation_type: Optional[str]
 ) -> str:
     if calculation_type is None:
-        description = f"## {exit_point.name} \n\n ### Aquifer 1 \n\n Opbarsten: {cut_off_float(aq_1['w_uplift'])} \\\n  Heave: {cut_off_float(aq_1['w_heave'])} \\\n Sellmeijer {cut_off_float(aq_1['w_sellmeijer'])} \n\n"
+        description = f"## {exit_point_name} \n\n ### Aquifer 1 \n\n Opbarsten: {cut_off_float(aq_1['w_uplift'])} \\\n  Heave: {cut_off_float(aq_1['w_heave'])} \\\n Sellmeijer {cut_off_float(aq_1['w_sellmeijer'])} \n\n"
         description += f"### Aquifer 2 \n\n Opbarsten: {cut_off_float(aq_2['w_uplift'])} \\\n  Heave: {cut_off_float(aq_2['w_heave'])} \\\n Sellmeijer {cut_off_float(aq_2['w_sellmeijer'])}"
     elif calculation_type == "uplift":
-        description = f"## {exit_point.name} \n\n ### Aquifer 1 \n\n Opbarsten: {cut_off_float(aq_1['w_uplift'])} \n\n"
+        description = f"## {exit_point_name} \n\n ### Aquifer 1 \n\n Opbarsten: {cut_off_float(aq_1['w_uplift'])} \n\n"
         description += f"### Aquifer 2 \n\n Opbarsten: {cut_off_float(aq_2['w_uplift'])}"
     elif calculation_type == "heave":
-        description = f"## {exit_point.name} \n\n ### Aquifer 1 \n\n Heave: {cut_off_float(aq_1['w_heave'])} \n\n"
+        description = f"## {exit_point_name} \n\n ### Aquifer 1 \n\n Heave: {cut_off_float(aq_1['w_heave'])} \n\n"
         description += f"### Aquifer 2 \n\n Heave: {cut_off_float(aq_2['w_heave'])}"
     elif calculation_type == "sellmeijer":
         description = (
-            f"## {exit_point.name} \n\n ### Aquifer 1 \n\n Sellmeijer {cut_off_float(aq_1['w_sellmeijer'])} \n\n"
+            f"## {exit_point_name} \n\n ### Aquifer 1 \n\n Sellmeijer {cut_off_float(aq_1['w_sellmeijer'])} \n\n"
         )
         description += f"### Aquifer 2 \n\n Sellmeijer {cut_off_float(aq_2['w_sellmeijer'])}"
     else:
@@ -871,45 +1059,31 @@ def get_marker_description_double_aquifer(
 
 
 def make_marker_single_aquifer(
-    final_aq_1: DataFrame, exit_point_mapping: dict, calculation_type: Optional[str] = None
+    final_aq_1: DataFrame, exit_points: DataFrame, calculation_type: Optional[str] = None
 ) -> Tuple[List[MapFeature], List[MapLabel]]:
-    map_features, map_labels = [], []
-    for key, aq_1 in common_entries(final_aq_1):
-        exit_point = exit_point_mapping[key]
-        coordinates = (
-            exit_point.last_saved_params.exit_point_data.x_coordinate,
-            exit_point.last_saved_params.exit_point_data.y_coordinate,
-        )
-        uc_list = list(aq_1.values())
-
-        map_features.append(
-            MapPoint.from_geo_point(
-                GeoPoint.from_rd(coordinates),
-                color=get_unity_check_color(uc_list),
-                description=get_marker_description_single_aquifer(exit_point, aq_1, calculation_type),
-                entity_links=[MapEntityLink("Na Uitredepunt", entity_id=exit_point.id)],
-            )
-        )
-        lat, lon = RDWGSConverter.from_rd_to_wgs(coordinates)
-        map_labels.append(MapLabel(lat, lon, scale=17, text=f"{exit_point.name[13:]}"))
-    return (
-        map_features,
-        map_labels,
-    )
+    columns = final_aq_1.columns.to_list()
+    descriptions, uc_lists = [], []
+    for exit_point_name, values in zip(final_aq_1.index, final_aq_1.to_numpy().tolist()):
+        aq_1 = dict(zip(columns, values))
+        descriptions.append(get_marker_description_single_aquifer(exit_point_name, aq_1, calculation_type))
+        uc_lists.append(values)
+    return get_piping_result_map_features(exit_points.loc[final_aq_1.index], descriptions, uc_lists)
 
 
-def get_marker_description_single_aquifer(exit_point: Entity, aq_1: DataFrame, calculation_type: Optional[str]) -> str:
+def get_marker_description_single_aquifer(
+    exit_point_name: str, aq_1: DataFrame, calculation_type: Optional[str]
+) -> str:
     if calculation_type is None:
-        description = f"## {exit_point.name} \n\n ### Aquifer 1 \n\n Opbarsten: {cut_off_float(aq_1['w_uplift'])} \\\n  Heave: {cut_off_float(aq_1['w_heave'])} \\\n Sellmeijer {cut_off_float(aq_1['w_sellmeijer'])} \n\n"
+        description = f"## {exit_point_name} \n\n ### Aquifer 1 \n\n Opbarsten: {cut_off_float(aq_1['w_uplift'])} \\\n  Heave: {cut_off_float(aq_1['w_heave'])} \\\n Sellmeijer {cut_off_float(aq_1['w_sellmeijer'])} \n\n"
     elif calculation_type == "uplift":
-        description = f"## {exit_point.name} \n\n ### Aquifer 1 \n\n Opbarsten: {cut_off_float(aq_1['w_uplift'])}"
+        description = f"## {exit_point_name} \n\n ### Aquifer 1 \n\n Opbarsten: {cut_off_float(aq_1['w_uplift'])}"
 
     elif calculation_type == "heave":
-        description = f"## {exit_point.name} \n\n ### Aquifer 1 \n\n Heave: {cut_off_float(aq_1['w_heave'])}"
+        description = f"## {exit_point_name} \n\n ### Aquifer 1 \n\n Heave: {cut_off_float(aq_1['w_heave'])}"
 
     elif calculation_type == "sellmeijer":
         description = (
-            f"## {exit_point.name} \n\n ### Aquifer 1 \n\n Sellmeijer {cut_off_float(aq_1['w_sellmeijer'])} \n\n"
+            f"## {exit_point_name} \n\n ### Aquifer 1 \n\n Sellmeijer {cut_off_float(aq_1['w_sellmeijer'])} \n\n"
         )
 
     else:
@@ -917,14 +1091,6 @@ def get_marker_description_single_aquifer(exit_point: Entity, aq_1: DataFrame, c
     return description
 
 
-def common_entries(*dcts):
-    """Make it easy to zip multiple dictionaries"""
-    if not dcts:
-        return
-    for i in set(dcts[0]).intersection(*dcts[1:]):
-        yield (i,) + tuple(d[i] for d in dcts)
-
-
 def cut_off_float(value: Union[float, str]):
     if isinstance(value, float):
         return round(value, 2)
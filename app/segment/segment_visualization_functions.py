@@ -1,5 +1,7 @@
+from typing import List
 from typing import Optional
 
+import numpy as np
 import plotly.graph_objects as go
 from munch import Munch
 from munch import munchify
@@ -9,6 +11,9 @@ from plotly.subplots import make_subplots
 from app.cpt.model import CPT
 from app.ground_model.constants import UNIQUE_TNO_SOIL_TYPES
 from app.ground_model.model import build_combined_rep_and_exit_point_layout
+from app.piping_tool.constants import PipingDataFrameColumns
+from app.piping_tool.piping_result_table import SCENARIO_NAME
+from app.piping_tool.sensitivity import SensitivitySweep
 from viktor import Color
 from viktor.geo import SoilLayout
 
@@ -96,8 +101,7 @@ def add_cpt_trace(fig: Figure, cpt: CPT):
     fig.add_trace(
         go.Scatter(
             name="Cone Resistance",
-            x=cpt.parsed_cpt.qc,
-            y=[el * 1e-3 for el in cpt.parsed_cpt.elevation],
+            **cpt.get_trace(cpt.measurement_arrays["qc"]),
             mode="lines",
             line=dict(color="mediumblue", width=1),
             legendgroup="Cone Resistance",
@@ -286,3 +290,81 @@ def add_trace_classified_layout(
             col=nb_columns,
             row=1,
         )
+
+
+def visualize_sensitivity_sweep(
+    rows: List[dict], sweep: SensitivitySweep, phreatic_level_sweep: Optional[SensitivitySweep] = None
+) -> str:
+    """Returns the Plotly heatmaps of the sensitivity of the piping calculations to the river level and the phreatic
+    level:
+    - the unity check of piping of every calculation as a function of the river level, with its critical river level.
+      The calculations that already fail at the lowest river level are marked at the lowest river level.
+    - the critical river level of piping of every calculation as a function of the phreatic level at the exit point.
+    """
+    labels = [
+        f"{row[PipingDataFrameColumns.EXIT_POINT.value]} - aquifer {row[PipingDataFrameColumns.AQUIFER.value]} - "
+        f"{row[SCENARIO_NAME]}"
+        for row in rows
+    ]
+    number_columns = 1 if phreatic_level_sweep is None else 2
+    fig = make_subplots(
+        rows=1,
+        cols=number_columns,
+        shared_yaxes=True,
+        horizontal_spacing=0.15,
+        subplot_titles=["Unity check piping", "Kritiek rivierpeil piping [m NAP]"][:number_columns],
+    )
+    fig.add_trace(
+        go.Heatmap(
+            x=sweep.river_levels,
+            y=labels,
+            z=sweep.unity_checks["piping"][0].T,
+            zmin=0,
+            zmid=1,
+            zmax=2,
+            colorscale=[[0, "red"], [0.5, "yellow"], [1, "green"]],
+            colorbar=dict(title="uc", x=1.02 if phreatic_level_sweep is None else 0.44),
+            hovertemplate="%{y}<br>Rivierpeil: %{x:.2f} m NAP<br>uc: %{z:.2f}<extra></extra>",
+        ),
+        row=1,
+        col=1,
+    )
+    fails_at_lowest_river_level = sweep.fails_at_lowest_river_level["piping"][0]
+    fig.add_trace(
+        go.Scatter(
+            x=sweep.critical_river_levels["piping"][0],
+            y=labels,
+            mode="markers",
+            marker=dict(
+                color="black",
+                symbol=np.where(fails_at_lowest_river_level, "triangle-left", "line-ns-open"),
+                size=12,
+            ),
+            name="Kritiek rivierpeil",
+            text=np.where(fails_at_lowest_river_level, "≤ ", ""),
+            hovertemplate="%{y}<br>Kritiek rivierpeil: %{text}%{x:.2f} m NAP<extra></extra>",
+        ),
+        row=1,
+        col=1,
+    )
+    fig.update_xaxes(title_text="Rivierpeil [m NAP]", row=1, col=1)
+
+    if phreatic_level_sweep is not None:
+        fig.add_trace(
+            go.Heatmap(
+                x=phreatic_level_sweep.phreatic_levels,
+                y=labels,
+                z=phreatic_level_sweep.critical_river_levels["piping"].T,
+                colorscale="Viridis",
+                colorbar=dict(title="m NAP"),
+                text=np.where(phreatic_level_sweep.fails_at_lowest_river_level["piping"].T, "≤ ", ""),
+                hovertemplate="%{y}<br>Freatisch niveau: %{x:.2f} m NAP<br>Kritiek rivierpeil: %{text}%{z:.2f} m NAP"
+                "<extra></extra>",
+            ),
+            row=1,
+            col=2,
+        )
+        fig.update_xaxes(title_text="Freatisch niveau uittredepunt [m NAP]", row=1, col=2)
+
+    fig.update_layout(template="plotly_white", showlegend=False)
+    return fig.to_json()
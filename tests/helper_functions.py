@@ -1,8 +1,13 @@
 import json
 import os
+import unittest
 from typing import List
 from typing import Union
 
+# The benchmarks time an implementation against the one it replaced and print the durations. They are skipped in the
+# regular test run, set the environment variable RUN_BENCHMARKS=1 to run them.
+benchmark = unittest.skipUnless(os.environ.get("RUN_BENCHMARKS"), "set RUN_BENCHMARKS=1 to run the benchmarks")
+
 
 def load_from_json(file_dir, json_files) -> Union[dict, List[dict]]:
     """Helper function that returns a list of dictionaries from the given list of json files"""
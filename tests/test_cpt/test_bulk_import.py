@@ -0,0 +1,19 @@
+import unittest
+from unittest.mock import patch
+
+from app.cpt.bulk_import import classify_cpt_files
+
+
+def classify_or_fail(file_content: bytes) -> dict:
+    if file_content == b"bad":
+        raise ValueError("Invalid CPT file")
+    return {"content": file_content.decode()}
+
+
+class TestClassifyCPTFiles(unittest.TestCase):
+    def test_bad_files_are_skipped(self):
+        files = {"CPT-1": b"good", "CPT-2": b"bad", "CPT-3": b"also good"}
+        with patch("app.cpt.bulk_import.classify_cpt_file_content", classify_or_fail):
+            cpt_params, errors = classify_cpt_files(files, max_workers=2)
+        assert cpt_params == {"CPT-1": {"content": "good"}, "CPT-3": {"content": "also good"}}
+        assert errors == {"CPT-2": "Invalid CPT file"}
@@ -0,0 +1,93 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+
+from app.cpt.cpt.cached_cpt_file import CachedCPTFile
+from app.cpt.cpt.cached_cpt_file import ParsedCPTCache
+from app.cpt.cpt.cached_cpt_file import get_file_hash
+
+
+class MockedCPTFile:
+    def __init__(self, file_content: str):
+        self.file_content = file_content
+        self.n_parse_calls = 0
+
+    def parse(self, additional_columns, verbose=False, return_gef_data_obj=False):
+        self.n_parse_calls += 1
+        return {
+            "headers": {"name": "CPT-1", "x_y_coordinates": (158000.0, 418000.0)},
+            "measurement_data": {
+                "elevation": [-1000.0, -1020.0, -1040.0],
+                "qc": [1.2345678901, None, 2.5],
+                "Rf": [0.015, 0.02, None],
+            },
+        }
+
+
+class TestParsedCPTCache(unittest.TestCase):
+    def setUp(self) -> None:
+        self.cache_directory = tempfile.TemporaryDirectory()
+        self.cache = ParsedCPTCache(self.cache_directory.name)
+
+    def tearDown(self) -> None:
+        self.cache_directory.cleanup()
+
+    def test_file_is_parsed_once(self):
+        cpt_file = MockedCPTFile("#GEFID= 1, 1, 0")
+        first = CachedCPTFile(cpt_file, self.cache).parse(additional_columns=["fs"])
+        second = CachedCPTFile(cpt_file, self.cache).parse(additional_columns=["fs"])
+        assert cpt_file.n_parse_calls == 1
+        assert first["headers"] == second["headers"]
+        assert second["measurement_data"]["qc"][1] is None
+        assert np.allclose(second["measurement_data"]["elevation"], first["measurement_data"]["elevation"])
+
+    def test_cache_hit_equals_cache_miss(self):
+        cpt_file = MockedCPTFile("#GEFID= 1, 1, 0")
+        miss = CachedCPTFile(cpt_file, self.cache).parse(additional_columns=["fs"])
+        hit = CachedCPTFile(cpt_file, self.cache).parse(additional_columns=["fs"])
+        assert cpt_file.n_parse_calls == 1
+        assert miss == hit
+        # the measurements keep their full precision
+        assert hit["measurement_data"]["qc"] == cpt_file.parse([])["measurement_data"]["qc"]
+
+    def test_measurement_arrays_are_float64(self):
+        cpt_file = MockedCPTFile("#GEFID= 1, 1, 0")
+        CachedCPTFile(cpt_file, self.cache).parse(additional_columns=[])
+        arrays = self.cache.load_measurement_arrays(get_file_hash(cpt_file.file_content, []))
+        assert arrays["qc"].dtype == np.float64
+        assert np.isnan(arrays["Rf"][2])
+
+    def test_failed_store_leaves_no_files(self):
+        cpt_dict = {"headers": {"date": object()}, "measurement_data": {"qc": [1.0]}}
+        with self.assertRaises(TypeError):
+            self.cache.store("file_hash", cpt_dict)
+        assert os.listdir(self.cache_directory.name) == []
+
+        with patch("app.cpt.cpt.cached_cpt_file.np.savez", side_effect=OSError):
+            with self.assertRaises(OSError):
+                self.cache.store("file_hash", MockedCPTFile("").parse([]))
+        assert not [name for name in os.listdir(self.cache_directory.name) if name.endswith(".tmp")]
+        assert self.cache.load("file_hash") is None
+
+    def test_least_recently_used_entries_are_evicted(self):
+        cache = ParsedCPTCache(self.cache_directory.name, max_entries=4, eviction_level=0.5)
+        cpt_dict = MockedCPTFile("").parse([])
+        for i, file_hash in enumerate(["a", "b", "c", "d"]):
+            cache.store(file_hash, cpt_dict)
+            # the entries are used one second apart, such that their order does not depend on the file system
+            os.utime(os.path.join(self.cache_directory.name, f"{file_hash}.npz"), (i, i))
+        with patch.object(cache, "evict", wraps=cache.evict) as evict:
+            cache.store("d", cpt_dict)  # overwriting an entry does not add one
+            evict.assert_not_called()
+            cache.store("e", cpt_dict)
+            evict.assert_called_once()
+        for file_hash in ["a", "b", "c"]:
+            assert cache.load(file_hash) is None
+        assert cache.load("d") is not None
+        assert cache.load("e") is not None
+
+    def test_hash_depends_on_columns(self):
+        assert get_file_hash("content", ["fs"]) != get_file_hash("content", ["fs", "u2"])
@@ -0,0 +1,42 @@
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+
+from app.cpt.cpt.cached_cpt_file import ParsedCPTCache
+from app.cpt.model import CPT
+
+
+class TestCPTModel(unittest.TestCase):
+    def test_filter_nones_from_measurement_data(self):
+        measurement_data = {
+            "elevation": [-1000, -1020, -1040, -1060],
+            "qc": [1.0, None, 2.0, 3.0],
+            "Rf": [0.01, 0.02, 0.03, None],
+        }
+        measurement_arrays = CPT.filter_nones_from_measurement_data(measurement_data)
+        np.testing.assert_array_equal(measurement_arrays["elevation"], [-1000, -1040])
+        np.testing.assert_array_equal(measurement_arrays["qc"], [1.0, 2.0])
+        np.testing.assert_array_equal(measurement_arrays["Rf"], [0.01, 0.03])
+
+    def test_filter_nones_from_params_dict(self):
+        raw_dict = {"measurement_data": {"elevation": [-1000, -1020], "qc": [None, 2.0]}}
+        filtered_dict = CPT.filter_nones_from_params_dict(raw_dict)
+        assert filtered_dict["measurement_data"] == {"elevation": [-1020.0], "qc": [2.0]}
+
+    def test_measurement_arrays_are_loaded_from_cache(self):
+        measurement_data = {"elevation": [-1000, -1020, -1040], "qc": [1.0, None, 2.0]}
+        with tempfile.TemporaryDirectory() as cache_directory:
+            cache = ParsedCPTCache(cache_directory)
+            cache.store("file_hash", {"headers": {}, "measurement_data": measurement_data})
+            with patch("app.cpt.model.DEFAULT_CPT_CACHE", cache):
+                with patch.object(cache, "load_measurement_arrays", wraps=cache.load_measurement_arrays) as load:
+                    params = {"measurement_data": measurement_data, "file_hash": "file_hash"}
+                    measurement_arrays = CPT.get_measurement_arrays(params)
+                    load.assert_called_once_with("file_hash")
+                # the params are used when the cached file does not match them
+                params = {"measurement_data": {"elevation": [-1000], "qc": [3.0]}, "file_hash": "file_hash"}
+                assert CPT.get_measurement_arrays(params)["qc"].tolist() == [3.0]
+        np.testing.assert_array_equal(measurement_arrays["elevation"], [-1000, -1040])
+        np.testing.assert_array_equal(measurement_arrays["qc"], [1.0, 2.0])
@@ -0,0 +1,40 @@
+import unittest
+
+import numpy as np
+from munch import munchify
+
+from app.cpt_folder.cpt_folder_model import CPTFolder
+from viktor import UserException
+
+
+class MockedCPTEntity:
+    def __init__(self, entity_id: int, x: float, y: float):
+        self.id = entity_id
+        self.last_saved_summary = munchify({"x_coordinate": {"value": x}, "y_coordinate": {"value": y}})
+
+
+class TestCPTFolder(unittest.TestCase):
+    def setUp(self) -> None:
+        rng = np.random.default_rng(0)
+        coordinates = rng.uniform(0, 1000, (2000, 2))
+        self.cpt_entities = [MockedCPTEntity(i, x, y) for i, (x, y) in enumerate(coordinates)]
+        self.coordinates = coordinates
+        self.folder = CPTFolder(self.cpt_entities, "cpt_folder")
+
+    def test_closest_cpts_to_points_matches_linear_scan(self):
+        points = np.random.default_rng(1).uniform(0, 1000, (500, 2))
+        closest_cpts = self.folder.closest_cpts_to_points(points)
+        for point, cpt in zip(points, closest_cpts):
+            expected_index = np.linalg.norm(self.coordinates - point, axis=1).argmin()
+            assert cpt.id == self.cpt_entities[expected_index].id
+
+    def test_index_is_rebuilt_for_a_moved_cpt(self):
+        self.assertEqual(self.folder.closest_cpts_to_points([self.coordinates[42]])[0].id, 42)
+        moved_entities = list(self.cpt_entities)
+        moved_entities[42] = MockedCPTEntity(42, -1000, -1000)
+        [closest_cpt] = CPTFolder(moved_entities, "cpt_folder").closest_cpts_to_points([self.coordinates[42]])
+        self.assertNotEqual(closest_cpt.id, 42)
+
+    def test_empty_folder_raises(self):
+        with self.assertRaises(UserException):
+            CPTFolder([], "cpt_folder").closest_cpts_to_points([(0, 0)])
@@ -0,0 +1,64 @@
+import time
+from unittest import TestCase
+
+from app.dyke.dyke_model import Dyke
+from app.dyke.piping_run import DIKE_PIPING_RESULT_SCHEMA
+from app.dyke.piping_run import SEGMENT_NAME
+from app.dyke.piping_run import WORKER_MEMORY
+from app.dyke.piping_run import filter_segment
+from app.dyke.piping_run import get_dike_piping_result_table
+from app.dyke.piping_run import get_max_workers
+from app.segment.segment_model import create_segment
+from tests.fixtures.mocked_files import DYKES_ENTITIES
+from tests.fixtures.mocked_files import EXIT_POINT_ENTITIES
+from tests.fixtures.mocked_files import SEGMENT_ENTITIES
+from tests.helper_functions import benchmark
+
+
+class TestDikePipingRun(TestCase):
+    def setUp(self) -> None:
+        dyke = Dyke(DYKES_ENTITIES[0].last_saved_params)
+        self.reference_line = dyke.interpolated_trajectory()
+        self.entry_line = dyke.entry_line
+        self.segment = create_segment(SEGMENT_ENTITIES[0].last_saved_params, dyke, self.reference_line, self.entry_line)
+
+    def test_dike_results_equal_segment_results(self):
+        segment_names = [f"dijkvak {i}" for i in range(1, 5)]
+        segments = [(name, self.segment, EXIT_POINT_ENTITIES) for name in segment_names]
+
+        piping_results = get_dike_piping_result_table(segments, self.reference_line, self.entry_line, max_workers=2)
+
+        self.assertEqual(piping_results.schema, DIKE_PIPING_RESULT_SCHEMA)
+        self.assertListEqual(list(dict.fromkeys(piping_results[SEGMENT_NAME].to_pylist())), segment_names)
+        segment_results = self.segment.get_piping_result_table(EXIT_POINT_ENTITIES)
+        self.assertGreater(segment_results.num_rows, 0)
+        for name in segment_names:
+            self.assertTrue(filter_segment(piping_results, name).equals(segment_results))
+
+    @benchmark
+    def test_dike_results_benchmark(self):
+        segments = [(f"dijkvak {i}", self.segment, EXIT_POINT_ENTITIES) for i in range(1, 5)]
+
+        start = time.perf_counter()
+        get_dike_piping_result_table(segments, self.reference_line, self.entry_line, max_workers=2)
+        duration = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _ in segments:
+            self.segment.get_piping_result_table(EXIT_POINT_ENTITIES)
+        sequential_duration = time.perf_counter() - start
+
+        print(f"Piping results of {len(segments)} segments: {duration:.3f} s, one by one: {sequential_duration:.3f} s")
+
+    def test_no_segments(self):
+        piping_results = get_dike_piping_result_table([], self.reference_line, self.entry_line)
+        self.assertEqual(piping_results.num_rows, 0)
+        self.assertEqual(piping_results.schema, DIKE_PIPING_RESULT_SCHEMA)
+
+    def test_max_workers_within_memory_budget(self):
+        piping_inputs = [self.segment.get_piping_input(EXIT_POINT_ENTITIES)] * 8
+        self.assertEqual(get_max_workers(piping_inputs, memory_budget=100 * WORKER_MEMORY, max_workers=4), 4)
+        self.assertEqual(get_max_workers(piping_inputs, memory_budget=100 * WORKER_MEMORY, max_workers=16), 8)
+        self.assertEqual(get_max_workers(piping_inputs, memory_budget=3.5 * WORKER_MEMORY, max_workers=16), 3)
+        # a single worker is used when even one segment does not fit in the budget
+        self.assertEqual(get_max_workers(piping_inputs, memory_budget=0), 1)
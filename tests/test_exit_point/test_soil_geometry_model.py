@@ -0,0 +1,100 @@
+from math import sin
+from math import sqrt
+from unittest import TestCase
+from unittest.mock import patch
+
+import pandas as pd
+from shapely.geometry import LineString
+from shapely.geometry import MultiPoint
+from shapely.geometry import Point
+from shapely.geometry import Polygon
+
+from app.exit_point.soil_geometry_model import MAX_ELEMENT_SIZE_FACTOR
+from app.exit_point.soil_geometry_model import SoilGeometry
+from viktor.geo import SoilLayout
+
+
+def get_layer(name: str, top: float, bottom: float) -> dict:
+    return {
+        "soil": {"name": name, "color": [0, 0, 0], "properties": {}},
+        "top_of_layer": top,
+        "bottom_of_layer": bottom,
+        "properties": {},
+    }
+
+
+SOIL_LAYOUT = SoilLayout.from_dict(
+    {"layers": [get_layer("klei", 8, 0), get_layer("veen", 0, -3), get_layer("zand", -3, -25)]}
+)
+
+
+def get_cross_section_data(*args) -> pd.DataFrame:
+    """A dike of 6 m high on a polder at 1 m, with AHN noise of a few centimetres, every 0.5 m over 150 m"""
+    distances = [0.5 * i for i in range(301)]
+    z = [1 + max(0.0, 6 - abs(distance - 75) / 4) + 0.02 * sin(7 * distance) for distance in distances]
+    return pd.DataFrame({"x": distances, "y": 0.0, "z": z, "distance_from_start": distances})
+
+
+def estimate_number_of_triangles(polygons: list, element_sizes: list) -> float:
+    """Number of equilateral triangles with the element size that cover the polygons"""
+    return sum(
+        Polygon([(point.x, point.y) for point in polygon.points]).area / (sqrt(3) / 4 * element_size**2)
+        for polygon, element_size in zip(polygons, element_sizes)
+    )
+
+
+@patch("app.exit_point.soil_geometry_model.get_all_point_coordinates_on_cross", side_effect=get_cross_section_data)
+class TestSoilGeometry(TestCase):
+    def get_soil_geometry(self, simplify_tolerance: float, elements_over_layer_thickness: float) -> SoilGeometry:
+        return SoilGeometry(
+            SOIL_LAYOUT,
+            Point(0, 0),
+            Point(150, 0),
+            MultiPoint(),
+            spatial_resolution=0.5,
+            element_size=0.5,
+            polder_level=0.5,
+            river_level=4,
+            ditch_water_level=0.5,
+            simplify_tolerance=simplify_tolerance,
+            elements_over_layer_thickness=elements_over_layer_thickness,
+        )
+
+    def test_simplified_soil_layout_2d(self, _):
+        soil_layout_2d = self.get_soil_geometry(0, 0).soil_layout_2d
+        simplified_soil_layout_2d = self.get_soil_geometry(0.05, 0).soil_layout_2d
+
+        number_of_points = sum(len(polygon.points) for layer in soil_layout_2d.layers for polygon in layer.polygons())
+        simplified_number_of_points = sum(
+            len(polygon.points) for layer in simplified_soil_layout_2d.layers for polygon in layer.polygons()
+        )
+        self.assertLess(simplified_number_of_points, number_of_points / 4)
+
+        # the simplified ground surface lies within the tolerance of every point of the original surface
+        top_profile = LineString([(point.x, point.y) for point in simplified_soil_layout_2d.top_profile.points])
+        for point in soil_layout_2d.top_profile.points:
+            self.assertLessEqual(top_profile.distance(Point(point.x, point.y)), 0.05 + 1e-9)
+
+        # adjacent layers share their boundary
+        layers = simplified_soil_layout_2d.layers
+        for upper_layer, lower_layer in zip(layers[1:], layers[:-1]):
+            self.assertListEqual(
+                [(point.x, point.y) for point in upper_layer.bottom_profile.points],
+                [(point.x, point.y) for point in lower_layer.top_profile.points],
+            )
+
+    def test_adaptive_element_size(self, _):
+        soil_geometry = self.get_soil_geometry(0.05, 4)
+        self.assertEqual(soil_geometry.get_element_size(1), 0.5)
+        self.assertEqual(soil_geometry.get_element_size(6), 1.5)
+        self.assertEqual(soil_geometry.get_element_size(22), MAX_ELEMENT_SIZE_FACTOR * 0.5)
+        self.assertEqual(self.get_soil_geometry(0.05, 0).get_element_size(22), 0.5)
+
+        polygons = [polygon for layer in soil_geometry.soil_layout_2d.layers for polygon in layer.polygons()]
+        element_sizes = [
+            soil_geometry.get_element_size(max(point.y for point in polygon.points) - min(p.y for p in polygon.points))
+            for polygon in polygons
+        ]
+        number_of_triangles = estimate_number_of_triangles(polygons, [0.5] * len(polygons))
+        adaptive_number_of_triangles = estimate_number_of_triangles(polygons, element_sizes)
+        self.assertLess(adaptive_number_of_triangles, number_of_triangles / 4)
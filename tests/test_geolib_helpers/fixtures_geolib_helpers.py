@@ -0,0 +1,86 @@
+import stat
+import sys
+from pathlib import Path
+from typing import List
+from typing import Optional
+
+from pydantic import FilePath
+
+from app.geolib_helpers.geolib.models.base_model import BaseModel
+from app.geolib_helpers.geolib.models.base_model_structure import BaseModelStructure
+from app.geolib_helpers.geolib.models.parsers import BaseParser
+from app.geolib_helpers.geolib.models.parsers import BaseParserProvider
+
+# Stand-in for a D-Series console: the input file holds the instruction, the canned output next to the console is
+# copied to the output file of the model
+FAKE_CONSOLE = """#!{python}
+import shutil
+import sys
+import time
+from pathlib import Path
+
+input_file = Path(sys.argv[-1])
+instruction = input_file.read_text()
+if instruction == "sleep":
+    time.sleep(30)
+elif instruction == "fail":
+    input_file.with_suffix(".err").write_text("Invalid geometry")
+    sys.exit(1)
+elif instruction == "corrupt":
+    input_file.with_suffix(".out").write_text("not a number")
+else:
+    shutil.copy(Path(__file__).parent / "canned_output.out", input_file.with_suffix(".out"))
+"""
+
+
+class FakeOutputStructure(BaseModelStructure):
+    factor_of_safety: float
+
+
+class FakeOutputParser(BaseParser):
+    @property
+    def suffix_list(self) -> List[str]:
+        return [".out"]
+
+    def parse(self, filename: FilePath) -> FakeOutputStructure:
+        return FakeOutputStructure(factor_of_safety=float(Path(filename).read_text()))
+
+
+class FakeInputParser(BaseParser):
+    @property
+    def suffix_list(self) -> List[str]:
+        return [".in"]
+
+    def parse(self, filename: FilePath):
+        raise NotImplementedError("The fake model only parses its output")
+
+
+class FakeParserProvider(BaseParserProvider):
+    input_parsers = [FakeInputParser()]
+    output_parsers = [FakeOutputParser()]
+    parser_name = "fake"
+
+
+class FakeModel(BaseModel):
+    instruction: str = ""
+    datastructure: Optional[FakeOutputStructure] = None
+
+    @property
+    def console_path(self) -> Path:
+        return Path("fake_console.py")
+
+    @property
+    def parser_provider_type(self):
+        return FakeParserProvider
+
+    def serialize(self, filename: FilePath):
+        Path(filename).write_text(self.instruction)
+        self.filename = filename
+
+
+def write_fake_console(folder: Path, factor_of_safety: float = 1.25):
+    """Write the fake console and its canned output into the console folder"""
+    console = folder / "fake_console.py"
+    console.write_text(FAKE_CONSOLE.format(python=sys.executable))
+    console.chmod(console.stat().st_mode | stat.S_IEXEC)
+    (folder / "canned_output.out").write_text(str(factor_of_safety))
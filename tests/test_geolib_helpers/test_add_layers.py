@@ -0,0 +1,68 @@
+import unittest
+from typing import List
+
+from geolib.soils import StorageParameters
+
+from app.geolib_helpers.geolib import DStabilityModel
+from app.geolib_helpers.geolib.geometry import Point
+from app.geolib_helpers.geolib.models.dgeoflow import DGeoflowModel
+from app.geolib_helpers.geolib.soils import Soil
+
+# codes that are not among the default soils of the models
+SOIL_CODES = ["Test clay", "Test sand"]
+
+
+def get_soil(code: str) -> Soil:
+    soil = Soil(name=code, code=code)
+    soil.storage_parameters = StorageParameters(horizontal_permeability=1e-5, vertical_permeability=1e-6)
+    return soil
+
+
+def get_polygons(n_layers: int) -> List[List[Point]]:
+    """Stacked layers of 1 m thick and 20 m wide"""
+    return [[Point(x=0, z=-i), Point(x=20, z=-i), Point(x=20, z=-i - 1), Point(x=0, z=-i - 1)] for i in range(n_layers)]
+
+
+class TestAddLayers(unittest.TestCase):
+    def get_models(self, model_type):
+        models = [model_type(), model_type()]
+        for model in models:
+            for code in SOIL_CODES:
+                model.add_soil(get_soil(code))
+        return models
+
+    def test_dgeoflow_add_layers_equals_add_layer(self):
+        polygons, soil_codes = get_polygons(6), SOIL_CODES * 3
+        model, bulk_model = self.get_models(DGeoflowModel)
+        layer_ids = []
+        for points, soil_code in zip(polygons, soil_codes):
+            layer_id = model.add_layer(points, soil_code=soil_code)
+            model.add_layeractivation(layer_id=layer_id)
+            model.add_meshproperties(element_size=0.5, layer_id=layer_id)
+            layer_ids.append(layer_id)
+
+        self.assertListEqual(bulk_model.add_layers(polygons, soil_codes, element_size=0.5), layer_ids)
+        self.assertEqual(bulk_model.datastructure, model.datastructure)
+        self.assertEqual(bulk_model.current_id, model.current_id)
+
+        # layers added afterwards are found by get_layer as well
+        layer_id = bulk_model.add_layer(get_polygons(7)[-1], soil_code="Test clay")
+        self.assertEqual(bulk_model.get_layer(-1, layer_id).LayerId, str(layer_id))
+        self.assertEqual(bulk_model.get_layer(-1, layer_ids[0]).LayerId, str(layer_ids[0]))
+        with self.assertRaises(ValueError):
+            bulk_model.get_layer(-1, layer_id + 1)
+
+    def test_dstability_add_layers_equals_add_layer(self):
+        polygons, soil_codes = get_polygons(4), SOIL_CODES * 2
+        model, bulk_model = self.get_models(DStabilityModel)
+        layer_ids = [model.add_layer(points, soil_code) for points, soil_code in zip(polygons, soil_codes)]
+
+        self.assertListEqual(bulk_model.add_layers(polygons, soil_codes), layer_ids)
+        self.assertEqual(bulk_model.datastructure, model.datastructure)
+
+    def test_unknown_soil_code(self):
+        model, _ = self.get_models(DGeoflowModel)
+        with self.assertRaisesRegex(ValueError, "Test peat"):
+            model.add_layers(get_polygons(2), ["Test clay", "Test peat"])
+        # nothing is added when a soil code is unknown
+        self.assertListEqual(model.datastructure.geometries[-1].Layers, [])
@@ -0,0 +1,61 @@
+import os
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from typing import List
+
+from app.geolib_helpers.geolib.models.base_model import BaseModelList
+from app.geolib_helpers.geolib.models.meta import MetaData
+from tests.test_geolib_helpers.fixtures_geolib_helpers import FakeModel
+from tests.test_geolib_helpers.fixtures_geolib_helpers import write_fake_console
+
+
+@unittest.skipIf(os.name == "nt", "the fake console is a Python script with a shebang")
+class TestBaseModelList(unittest.TestCase):
+    def setUp(self) -> None:
+        self.folder = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.folder)
+        write_fake_console(self.folder)
+        self.meta = MetaData(console_folder=self.folder)
+
+    def get_models(self, instructions: List[str]) -> BaseModelList:
+        models = [
+            FakeModel(filename=Path(f"model_{i}.in"), instruction=instruction)
+            for i, instruction in enumerate(instructions)
+        ]
+        return BaseModelList(models=models, meta=self.meta)
+
+    def test_execute(self):
+        progress = []
+        model_list = self.get_models(["run"] * 6)
+        result = model_list.execute(
+            self.folder / "calculations",
+            nprocesses=3,
+            progress_callback=lambda finished, total: progress.append((finished, total)),
+        )
+
+        self.assertListEqual(result.errors, [])
+        self.assertListEqual([model.filename.name for model in result.models], [f"model_{i}.out" for i in range(6)])
+        self.assertListEqual([model.datastructure.factor_of_safety for model in result.models], [1.25] * 6)
+        # every model is calculated in its own folder and the input models are not modified
+        self.assertEqual(len({model.filename.parent for model in result.models}), 6)
+        self.assertIsNone(model_list.models[0].datastructure)
+        self.assertListEqual(progress, [(i, 6) for i in range(1, 7)])
+
+    def test_execute_reports_failed_and_timed_out_models(self):
+        result = self.get_models(["run", "fail", "sleep"]).execute(self.folder / "calculations", timeout_in_seconds=2)
+
+        self.assertListEqual([model.filename.name for model in result.models], ["model_0.out"])
+        self.assertEqual(len(result.errors), 2)
+        self.assertIn("Invalid geometry", result.errors[0])
+        self.assertIn("timeout", result.errors[1])
+
+    def test_execute_reports_unexpected_exceptions(self):
+        """The output of the corrupt model cannot be parsed, which raises a ValueError in the worker"""
+        result = self.get_models(["run", "corrupt", "run"]).execute(self.folder / "calculations", nprocesses=2)
+
+        self.assertListEqual([model.filename.name for model in result.models], ["model_0.out", "model_2.out"])
+        self.assertEqual(len(result.errors), 1)
+        self.assertIn("model_1.in", result.errors[0])
+        self.assertIn("ValueError", result.errors[0])
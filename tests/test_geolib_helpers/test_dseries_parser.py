@@ -0,0 +1,196 @@
+import time
+import unittest
+from typing import Iterable
+from typing import List
+from typing import Tuple
+from typing import get_type_hints
+from unittest.mock import patch
+
+from app.geolib_helpers.geolib.models.base_model_structure import BaseModelStructure
+from app.geolib_helpers.geolib.models.dseries_parser import DSerieParser
+from app.geolib_helpers.geolib.models.dseries_parser import DSeriesRepeatedGroupedProperties
+from app.geolib_helpers.geolib.models.dseries_parser import DSeriesStructure
+from app.geolib_helpers.geolib.models.dseries_parser import make_key
+from app.geolib_helpers.geolib.models.dsettlement.internal import Depths
+from app.geolib_helpers.geolib.models.dsettlement.internal import Stresses
+from app.geolib_helpers.geolib.models.dsettlement.internal import TimeSettlementPerLoad
+from app.geolib_helpers.geolib.models.utils import get_args
+from app.geolib_helpers.geolib.models.utils import is_list
+from app.geolib_helpers.geolib.models.utils import is_union
+from tests.helper_functions import benchmark
+
+
+class SyntheticVertical(DSeriesRepeatedGroupedProperties):
+    depths: Depths
+    stresses: Stresses
+    time__settlement_per_load: TimeSettlementPerLoad
+
+
+class SyntheticResults(DSeriesRepeatedGroupedProperties):
+    vertical: List[SyntheticVertical]
+
+
+def get_synthetic_results_text(n_verticals: int, n_depths: int) -> str:
+    """Results of a D-Settlement output file with n_verticals verticals of n_depths depths"""
+    depths = [f"{-0.5 * i:.3f}" for i in range(n_depths)]
+    vertical = "\n".join(
+        [
+            "[VERTICAL]",
+            "[DEPTHS]",
+            str(n_depths),
+            *depths,
+            "[END OF DEPTHS]",
+            "[STRESSES]",
+            "[COLUMN INDICATION]",
+            "Depth",
+            "Initial stress",
+            "Final stress",
+            "[END OF COLUMN INDICATION]",
+            "[DATA]",
+            str(n_depths),
+            *[f"{depth} {10.0 * i:.3f} {12.5 * i:.3f}" for i, depth in enumerate(depths)],
+            "[END OF DATA]",
+            "[END OF STRESSES]",
+            "[TIME-SETTLEMENT PER LOAD]",
+            "3",
+            "1",
+            "0.000 0.000",
+            "10.000 0.120",
+            "100.000 0.250",
+            "[END OF TIME-SETTLEMENT PER LOAD]",
+            "[END OF VERTICAL]",
+        ]
+    )
+    return "\n".join([vertical] * n_verticals)
+
+
+def legacy_init(self, *args, **kwargs):
+    """DSeriesStructure.__init__ before the field parsers were cached per class"""
+    kwargs = {field: value for field, value in kwargs.items() if value is not None}
+    for field, fieldtype in get_type_hints(self).items():
+        if field in kwargs and isinstance(kwargs[field], str):
+            body = kwargs[field]
+            if is_union(fieldtype):
+                fieldtype, *_ = get_args(fieldtype)
+            if is_list(fieldtype):
+                fieldtype, *_ = get_args(fieldtype)
+            if hasattr(fieldtype, "is_parseable") and fieldtype.is_parseable():
+                kwargs[field] = fieldtype.parse_text(body)
+        elif (
+            field in kwargs
+            and isinstance(kwargs[field], list)
+            and len(kwargs[field]) > 0
+            and isinstance(kwargs[field][0], str)
+        ):
+            body = kwargs[field]
+            if is_union(fieldtype):
+                fieldtype, *_ = get_args(fieldtype)
+            if is_list(fieldtype):
+                fieldtype, *_ = get_args(fieldtype)
+                if hasattr(fieldtype, "is_parseable") and fieldtype.is_parseable():
+                    kwargs[field] = [fieldtype.parse_text(item) for item in body]
+            elif hasattr(fieldtype, "is_parseable") and fieldtype.is_parseable():
+                kwargs[field] = fieldtype.parse_text(body)
+    BaseModelStructure.__init__(self, **kwargs)
+
+
+def legacy_parse_group(
+    text_lines: str, loose_properties: bool = False, unique_keys: bool = False
+) -> Iterable[Tuple[str, str]]:
+    """DSerieParser.parse_group before the key lines were found in a single scan"""
+    currentkey = ""
+    data = ""
+    for i, line in enumerate(text_lines.split("\n")):
+        sline = line.strip()
+        if sline.startswith("[") and sline.endswith("]"):
+            key = make_key(sline[1:-1])
+            if currentkey == "":
+                currentkey = key
+                data = ""
+            elif currentkey == key and unique_keys:
+                raise ValueError(f"Can't parse duplicate key {key} at line {i} without first encountering and END OF.")
+            elif key == "end_of_" + currentkey:
+                yield currentkey, data.strip()
+                data = ""
+                currentkey = ""
+            else:
+                data += line + "\n"
+        else:
+            if currentkey:
+                data += line + "\n"
+            elif not currentkey and loose_properties:
+                yield (currentkey, line)
+
+
+GROUP_TEXTS = [
+    "",
+    "[GROUP A]\ndata\nmore_data\n[END OF GROUP A]",
+    "loose 1\n\n[GROUP A]\n  [GROUP B]  \n1 2\n[END OF GROUP B]\n[END OF GROUP A]\nloose 2\n",
+    "[GROUP A]\r\ndata\r\n[END OF GROUP A]\r\n[GROUP A]\r\n[END OF GROUP A]\r\n",
+    "[GROUP A]\ndata\n[GROUP A]\n[END OF GROUP A]\nloose",
+    "[GROUP A]\nunterminated\n[END OF GROUP B]\n",
+    "[]\nloose\n[GROUP A]\n[END OF GROUP A]",
+]
+
+
+class TestDSerieParser(unittest.TestCase):
+    def test_parse_group_equals_legacy_implementation(self):
+        for text in GROUP_TEXTS:
+            for loose_properties in [False, True]:
+                with self.subTest(text=text, loose_properties=loose_properties):
+                    self.assertListEqual(
+                        list(DSerieParser.parse_group(text, loose_properties=loose_properties)),
+                        list(legacy_parse_group(text, loose_properties=loose_properties)),
+                    )
+
+    def test_parse_group_duplicate_key(self):
+        with self.assertRaisesRegex(ValueError, "group_a at line 2"):
+            DSerieParser.parse_group_as_dict(GROUP_TEXTS[4])
+        self.assertListEqual(list(DSerieParser.parse_group(GROUP_TEXTS[4])), [("group_a", "data\n[GROUP A]")])
+
+    def test_numeric_tables_are_converted(self):
+        stresses = Stresses.parse_text(
+            "[COLUMN INDICATION]\nDepth\nInitial stress\n[END OF COLUMN INDICATION]\n"
+            "[DATA]\n2\n0.000 1.5E+01\n-1.000 2.000\n[END OF DATA]"
+        )
+        self.assertListEqual(
+            stresses.stresses, [{"depth": 0, "initial_stress": 15}, {"depth": -1, "initial_stress": 2}]
+        )
+
+        matrix = TimeSettlementPerLoad.parse_text("2\n1\n0.000 0.000\n10.000 0.120")
+        self.assertListEqual(matrix.timesettlementperload, [[0.0, 0.0], [10.0, 0.12]])
+
+
+class TestDSeriesStructure(unittest.TestCase):
+    def test_parsed_structures_equal_legacy_implementation(self):
+        text = get_synthetic_results_text(n_verticals=5, n_depths=20)
+
+        results = SyntheticResults.parse_text(text)
+        with patch.object(DSeriesStructure, "__init__", legacy_init):
+            legacy_results = SyntheticResults.parse_text(text)
+
+        self.assertEqual(len(results.vertical), 5)
+        self.assertIsInstance(results.vertical[0].stresses, Stresses)
+        self.assertEqual(results.vertical[0].stresses.stresses[2]["final_stress"], 25.0)
+        self.assertListEqual(results.vertical[0].depths.depths[:2], [0.0, -0.5])
+        self.assertEqual(results, legacy_results)
+
+    def test_more_fields_than_defined(self):
+        with self.assertRaises(ValueError):
+            SyntheticVertical(depths="1\n0.0", unknown_1="a", unknown_2="b", unknown_3="c")
+
+    @benchmark
+    def test_parse_benchmark(self):
+        text = get_synthetic_results_text(n_verticals=500, n_depths=50)
+
+        start = time.perf_counter()
+        results = SyntheticResults.parse_text(text)
+        duration = time.perf_counter() - start
+
+        with patch.object(DSeriesStructure, "__init__", legacy_init):
+            start = time.perf_counter()
+            SyntheticResults.parse_text(text)
+            legacy_duration = time.perf_counter() - start
+
+        print(f"Parsing {len(results.vertical)} verticals: {duration:.3f} s, before caching: {legacy_duration:.3f} s")
+        self.assertEqual(len(results.vertical), 500)
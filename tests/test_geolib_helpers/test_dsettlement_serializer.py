@@ -0,0 +1,92 @@
+import shutil
+import tempfile
+import time
+import unittest
+from datetime import datetime
+from pathlib import Path
+from unittest.mock import patch
+
+from geolib import __version__ as glversion
+from jinja2 import Environment
+from jinja2 import PackageLoader
+
+from app.geolib_helpers.geolib.models.dsettlement.dsettlement_model import DSettlementModel
+from app.geolib_helpers.geolib.models.dsettlement.internal import Curve
+from app.geolib_helpers.geolib.models.dsettlement.internal import Curves
+from app.geolib_helpers.geolib.models.dsettlement.internal import DSeriePoint
+from app.geolib_helpers.geolib.models.dsettlement.internal import Points
+from app.geolib_helpers.geolib.models.dsettlement.serializer import DSettlementInputSerializer
+from app.geolib_helpers.geolib.models.serializers import format_table
+from tests.helper_functions import benchmark
+
+TIMESTAMP = datetime(2022, 3, 1, 12, 30, 15)
+
+
+def get_dsettlement_structure(n_points: int) -> dict:
+    """Serializable D-Settlement structure with a geometry of n_points points connected by n_points - 1 curves"""
+    model = DSettlementModel()
+    geometry_data = model.datastructure.geometry_data
+    geometry_data.points = Points(
+        points=[DSeriePoint(id=i + 1, X=0.5 * i, Y=-(i % 7) / 3, Z=0.0) for i in range(n_points)]
+    )
+    geometry_data.curves = Curves(curves=[Curve(id=i + 1, points=[i + 1, i + 2]) for i in range(n_points - 1)])
+    return model.datastructure.dict()
+
+
+def legacy_render(ds: dict) -> str:
+    """The input file as rendered by the templates of GEOLib before the tables were formatted by a filter"""
+    environment = Environment(loader=PackageLoader("geolib.models.dsettlement"), trim_blocks=True)
+    return environment.get_template("input.sli.j2").render(dict(ds, timestamp=TIMESTAMP, glversion=glversion))
+
+
+@patch("app.geolib_helpers.geolib.models.dsettlement.serializer.datetime")
+class TestDSettlementInputSerializer(unittest.TestCase):
+    def setUp(self) -> None:
+        self.folder = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.folder)
+
+    def test_write_equals_legacy_renderer(self, datetime_mock):
+        datetime_mock.now.return_value = TIMESTAMP
+        for n_points in [0, 1, 25, 10000]:
+            with self.subTest(n_points=n_points):
+                ds = get_dsettlement_structure(n_points)
+                DSettlementInputSerializer(ds=ds).write(self.folder / "model.sli")
+                with open(self.folder / "legacy.sli", "w") as io:
+                    io.write(legacy_render(ds))
+                self.assertEqual((self.folder / "model.sli").read_bytes(), (self.folder / "legacy.sli").read_bytes())
+
+    @benchmark
+    def test_write_benchmark(self, datetime_mock):
+        datetime_mock.now.return_value = TIMESTAMP
+        ds = get_dsettlement_structure(n_points=10000)
+
+        start = time.perf_counter()
+        DSettlementInputSerializer(ds=ds).write(self.folder / "model.sli")
+        duration = time.perf_counter() - start
+
+        start = time.perf_counter()
+        with open(self.folder / "legacy.sli", "w") as io:
+            io.write(legacy_render(ds))
+        legacy_duration = time.perf_counter() - start
+
+        print(f"Writing 10000 points: {duration:.3f} s, legacy renderer: {legacy_duration:.3f} s")
+
+    def test_curve_with_more_than_two_points_equals_legacy_renderer(self, datetime_mock):
+        datetime_mock.now.return_value = TIMESTAMP
+        ds = get_dsettlement_structure(4)
+        ds["geometry_data"]["curves"]["curves"].append({"id": 4, "points": [1, 3, 4]})
+        DSettlementInputSerializer(ds=ds).write(self.folder / "model.sli")
+        self.assertEqual((self.folder / "model.sli").read_text(), legacy_render(ds))
+
+
+class TestFormatTable(unittest.TestCase):
+    def test_integers_keep_their_type(self):
+        rows = [{"id": 1, "X": 0.5}, {"id": 12345678901234567, "X": -1.25}]
+        self.assertEqual(format_table(rows, "%s%8.2f", "id", "X"), "1    0.50\n12345678901234567   -1.25\n")
+
+    def test_list_items(self):
+        rows = [{"id": 1, "points": [1, 2]}, {"id": 2, "points": [2, 5, 3]}]
+        self.assertEqual(format_table(rows, "%3d%3d%3d", "id", "points.0", "points.1"), "  1  1  2\n  2  2  5\n")
+
+    def test_no_rows(self):
+        self.assertEqual(format_table([], "%8d", "id"), "")
@@ -0,0 +1,58 @@
+import json
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from zipfile import ZIP_DEFLATED
+from zipfile import ZIP_STORED
+from zipfile import ZipFile
+
+from app.geolib_helpers.geolib import DStabilityModel
+from app.geolib_helpers.geolib.models.dgeoflow import DGeoflowModel
+from app.geolib_helpers.geolib.models.dgeoflow.serializer import DGeoflowInputSerializer
+from app.geolib_helpers.geolib.models.dstability.serializer import DStabilityInputSerializer
+
+
+def get_expected_files(serialized_datastructure: dict) -> dict:
+    """Flattens the folders of the serialized datastructure into paths in the archive"""
+    expected_files = {}
+    for filename, data in serialized_datastructure.items():
+        if isinstance(data, dict):
+            expected_files.update({f"{filename}/{ffilename}": fdata for ffilename, fdata in data.items()})
+        else:
+            expected_files[filename] = data
+    return expected_files
+
+
+class TestZipSerializer(unittest.TestCase):
+    def setUp(self) -> None:
+        self.folder = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.folder)
+
+    def assert_archive_holds_files(self, file_path: Path, expected_files: dict):
+        with ZipFile(file_path) as zip:
+            self.assertListEqual(sorted(zip.namelist()), sorted(expected_files))
+            for filename, data in expected_files.items():
+                self.assertEqual(json.loads(zip.read(filename)), json.loads(data), filename)
+
+    def test_serialize_stix(self):
+        model = DStabilityModel()
+        model.add_stage("Stage 2", "")
+        expected_files = get_expected_files(DStabilityInputSerializer(ds=model.datastructure).serialize())
+
+        model.serialize(self.folder / "model.stix")
+        self.assert_archive_holds_files(self.folder / "model.stix", expected_files)
+        with ZipFile(self.folder / "model.stix") as zip:
+            self.assertSetEqual({zfile.compress_type for zfile in zip.filelist}, {ZIP_DEFLATED})
+
+        model.serialize(self.folder / "stored.stix", compression=ZIP_STORED)
+        self.assert_archive_holds_files(self.folder / "stored.stix", expected_files)
+        with ZipFile(self.folder / "stored.stix") as zip:
+            self.assertSetEqual({zfile.compress_type for zfile in zip.filelist}, {ZIP_STORED})
+
+    def test_serialize_flox(self):
+        model = DGeoflowModel()
+        expected_files = get_expected_files(DGeoflowInputSerializer(ds=model.datastructure).serialize())
+
+        model.serialize(self.folder / "model.flox", compresslevel=1)
+        self.assert_archive_holds_files(self.folder / "model.flox", expected_files)
@@ -0,0 +1,113 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from functools import partial
+from pathlib import Path
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.geolib_helpers.geolib import DStabilityModel
+from app.geolib_helpers.geolib.models.base_model import RemoteJobClient
+from app.geolib_helpers.geolib.models.dgeoflow import DGeoflowModel
+from app.geolib_helpers.geolib.models.dsettlement.dsettlement_model import DSettlementModel
+from app.geolib_helpers.geolib.models.meta import MetaData
+from app.geolib_helpers.geolib.service.jobs import JobQueue
+from app.geolib_helpers.geolib.service.jobs import calculate_model
+from app.geolib_helpers.geolib.service.jobs import create_job_router
+from tests.test_geolib_helpers.fixtures_geolib_helpers import FakeModel
+from tests.test_geolib_helpers.fixtures_geolib_helpers import write_fake_console
+
+
+@unittest.skipIf(os.name == "nt", "the fake console is a Python script with a shebang")
+class TestJobService(unittest.TestCase):
+    def setUp(self) -> None:
+        self.folder = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.folder)
+        write_fake_console(self.folder)
+        settings = MetaData(console_folder=self.folder, calculation_folder=self.folder / "calculations")
+
+        self.calculated_models = []
+        self.job_queue = JobQueue(partial(self.calculate, settings=settings), n_workers=2, max_queued_jobs=3)
+        app = FastAPI()
+        app.include_router(create_job_router({"fakemodel": FakeModel}, lambda: self.job_queue))
+        app.add_event_handler("startup", self.job_queue.start)
+        app.add_event_handler("shutdown", self.job_queue.stop)
+        self.client = TestClient(app)
+        self.client.__enter__()
+        self.addCleanup(self.client.__exit__, None, None, None)
+
+    def calculate(self, model: FakeModel, settings: MetaData) -> FakeModel:
+        self.calculated_models.append(model.instruction)
+        return calculate_model(model, settings)
+
+    def test_submit_and_poll_job(self):
+        model = FakeModel(filename=Path("model.in"), instruction="run")
+        response = self.client.post("/jobs/fakemodel", data=model.json())
+        self.assertEqual(response.status_code, 202)
+        job_id = response.json()["job_id"]
+
+        job = self.client.get(f"/jobs/{job_id}", params={"wait": 10}).json()
+        self.assertEqual(job["status"], "finished")
+        self.assertEqual(job["model"]["datastructure"]["factor_of_safety"], 1.25)
+
+        # an identical model is answered from the cache, also when its metadata differs
+        model.meta.project = "another project"
+        job = self.client.post("/jobs/fakemodel", data=model.json()).json()
+        self.assertEqual(job["status"], "finished")
+        self.assertListEqual(self.calculated_models, ["run"])
+
+        self.assertEqual(self.client.get("/jobs/unknown").status_code, 404)
+
+    def test_failed_job(self):
+        model = FakeModel(filename=Path("model.in"), instruction="fail")
+        job_id = self.client.post("/jobs/fakemodel", data=model.json()).json()["job_id"]
+
+        job = self.client.get(f"/jobs/{job_id}", params={"wait": 10}).json()
+        self.assertEqual(job["status"], "failed")
+        self.assertIn("Invalid geometry", job["message"])
+
+    def test_full_queue_refuses_batch(self):
+        models = [FakeModel(filename=Path(f"model_{i}.in"), instruction=f"run {i}") for i in range(6)]
+        response = self.client.post("/jobs/fakemodels", data="[" + ",".join(model.json() for model in models) + "]")
+        self.assertEqual(response.status_code, 503)
+        self.assertListEqual(self.calculated_models, [])
+
+    def test_identical_models_share_a_job(self):
+        """The batch holds 4 models of which only 3 are distinct, such that it fits in the queue of 3 jobs"""
+        instructions = ["run 0", "run 1", "run 0", "run 2"]
+        models = [FakeModel(filename=Path(f"model_{i}.in"), instruction=text) for i, text in enumerate(instructions)]
+        response = self.client.post("/jobs/fakemodels", data="[" + ",".join(model.json() for model in models) + "]")
+        self.assertEqual(response.status_code, 202)
+        job_ids = [job["job_id"] for job in response.json()]
+        self.assertEqual(job_ids[0], job_ids[2])
+        self.assertEqual(len(set(job_ids)), 3)
+
+        for job_id in job_ids:
+            self.assertEqual(self.client.get(f"/jobs/{job_id}", params={"wait": 10}).json()["status"], "finished")
+        self.assertListEqual(sorted(self.calculated_models), ["run 0", "run 1", "run 2"])
+
+    def test_remote_job_client(self):
+        instructions = ["run 0", "fail", "run 1", "run 0", "run 2"]
+        models = [FakeModel(filename=Path(f"model_{i}.in"), instruction=text) for i, text in enumerate(instructions)]
+        client = RemoteJobClient(
+            "http://testserver/", "test", "test", batch_size=2, poll_interval=0.1, session=self.client
+        )
+
+        output_models, errors = client.execute(models)
+
+        self.assertListEqual([model.instruction for model in output_models], ["run 0", "run 1", "run 0", "run 2"])
+        self.assertListEqual([model.datastructure.factor_of_safety for model in output_models], [1.25] * 4)
+        self.assertEqual(len(errors), 1)
+        self.assertIn("Invalid geometry", errors[0])
+        # the identical models are submitted once
+        self.assertListEqual(sorted(self.calculated_models), ["fail", "run 0", "run 1", "run 2"])
+
+    def test_models_are_rebuilt_from_the_job_response(self):
+        # the remote client rebuilds the calculated models with model.__class__(**job["model"])
+        for model in [DStabilityModel(), DGeoflowModel(), DSettlementModel()]:
+            rebuilt_model = model.__class__(**json.loads(model.json()))
+            self.assertIs(type(rebuilt_model.datastructure), type(model.datastructure))
+            self.assertEqual(rebuilt_model.datastructure, model.datastructure)
@@ -0,0 +1,104 @@
+from unittest import TestCase
+
+import numpy as np
+from munch import munchify
+
+from app.ground_model.array_soil_layout import ArraySoilLayout
+from app.ground_model.model import build_combined_rep_and_exit_point_layout
+from app.ground_model.model import build_simplified_1d_rep_array_layout
+from app.ground_model.model import group_layers
+from viktor.geo import SoilLayout
+
+
+def get_layer(name: str, top: float, bottom: float, aquifer: bool, permeability: float) -> dict:
+    return {
+        "soil": {"name": name, "color": [0, 0, 0], "properties": {}},
+        "top_of_layer": top,
+        "bottom_of_layer": bottom,
+        "properties": {
+            "aquifer": aquifer,
+            "gamma_dry": 15,
+            "gamma_wet": 18,
+            "vertical_permeability": permeability,
+            "horizontal_permeability": permeability,
+            "grain_size_d70": 0.2 if aquifer else None,
+        },
+    }
+
+
+SOIL_LAYOUT = {
+    "layers": [
+        get_layer("klei", 2, 0, False, 0.01),
+        get_layer("veen", 0, -3, False, 0.02),
+        get_layer("zand", -3, -10, True, 10),
+        get_layer("klei", -10, -12, False, 0.01),
+        get_layer("zand", -12, -20, True, 20),
+    ]
+}
+AQUIFER_PARAMS = munchify(
+    {
+        "first_aquifer": {"permeability": 12, "d70": 0.2},
+        "second_aquifer": {"permeability": 25, "d70": 0.3, "is_second_aquifer": True},
+    }
+)
+
+
+class TestArraySoilLayout(TestCase):
+    def setUp(self) -> None:
+        self.layout = ArraySoilLayout.from_dict(SOIL_LAYOUT)
+
+    def test_from_dict(self):
+        self.assertEqual(self.layout.number_of_layers, 5)
+        self.assertEqual(len(self.layout.soils), 3)
+        self.assertListEqual(self.layout.soil_names, ["klei", "veen", "zand", "klei", "zand"])
+        self.assertListEqual(self.layout.aquifer.tolist(), [False, False, True, False, True])
+        with self.assertRaises(ValueError):
+            self.layout.top_of_layer[0] = 5
+
+    def test_cut_at_z(self):
+        cut_layout = self.layout.cut_at_z(-1)
+        self.assertListEqual(cut_layout.top_of_layer.tolist(), [-1, -3, -10, -12])
+        self.assertTrue(np.shares_memory(cut_layout.bottom_of_layer, self.layout.bottom_of_layer))
+        # the original layout is not modified
+        self.assertEqual(self.layout.top_of_layer[1], 0)
+
+        self.assertEqual(self.layout.cut_at_z(4).top_of_layer[0], 4)
+        self.assertEqual(self.layout.cut_at_z(-15).soil_names, ["zand"])
+        self.assertIs(self.layout.cut_at_z(np.nan), self.layout)
+
+    def test_group_slices_match_group_layers(self):
+        grouped_layers = group_layers(SoilLayout.from_dict(SOIL_LAYOUT))
+        for group, layers in self.layout.get_layer_groups().items():
+            self.assertListEqual(
+                layers.top_of_layer.tolist(), [layer.top_of_layer for layer in grouped_layers[group]], group
+            )
+
+    def test_serialize_layers_per_aquifer(self):
+        layers_per_aquifer = self.layout.serialize_layers_per_aquifer()
+        self.assertEqual(len(layers_per_aquifer), 2)
+        for aquifer_index, layers in zip([2, 4], layers_per_aquifer):
+            aquifers = [layer["properties"]["aquifer"] for layer in layers]
+            self.assertListEqual(aquifers, [i == aquifer_index for i in range(5)])
+        # the shared properties of the layout are left untouched
+        self.assertTrue(self.layout.properties[2]["aquifer"])
+
+    def test_build_simplified_and_combined_layout(self):
+        rep_layout = build_simplified_1d_rep_array_layout(self.layout, AQUIFER_PARAMS)
+        self.assertListEqual(rep_layout.top_of_layer.tolist(), [2, -3, -10, -12])
+        self.assertListEqual(rep_layout.bottom_of_layer.tolist(), [-3, -10, -12, -20])
+        self.assertAlmostEqual(rep_layout.properties[0]["vertical_permeability"], 0.015)
+        self.assertEqual(rep_layout.properties[3]["horizontal_permeability"], 25)
+
+        exit_point_layout = {"layers": [get_layer("klei", 1, -1, False, 0.01), get_layer("zand", -1, -5, True, 10)]}
+        combined_layout = build_combined_rep_and_exit_point_layout(munchify(exit_point_layout), rep_layout)
+        # the cover of the exit point is thinner than the representative cover: only the first aquifer is extended
+        self.assertListEqual(combined_layout.top_of_layer.tolist(), [1, -1, -10, -12])
+        self.assertListEqual(combined_layout.bottom_of_layer.tolist(), [-1, -10, -12, -20])
+        self.assertEqual(combined_layout.soil_names[0], "cover_layer")
+
+        exit_point_layout = {"layers": [get_layer("klei", 1, -5, False, 0.01), get_layer("zand", -5, -9, True, 10)]}
+        combined_layout = build_combined_rep_and_exit_point_layout(munchify(exit_point_layout), rep_layout)
+        # the cover of the exit point is thicker: all the layers below are lowered
+        self.assertListEqual(combined_layout.top_of_layer.tolist(), [1, -5, -12, -14])
+        self.assertListEqual(combined_layout.bottom_of_layer.tolist(), [-5, -12, -14, -22])
+        self.assertListEqual(rep_layout.top_of_layer.tolist(), [2, -3, -10, -12])
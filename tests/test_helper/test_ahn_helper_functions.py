@@ -3,9 +3,15 @@ from unittest.mock import MagicMock
 
 import numpy as np
 import pandas as pd
+from rasterio.io import MemoryFile
+from rasterio.transform import from_origin
 
 import app
+from app.lib.ahn.ahn_helper_functions import check_limits
+from app.lib.ahn.ahn_helper_functions import cluster_points
 from app.lib.ahn.ahn_helper_functions import fetch_ahn_z_values
+from app.lib.ahn.ahn_helper_functions import get_z_values
+from app.lib.ahn.ahn_helper_functions import read_geotiff
 from app.lib.shapely_helper_functions import get_unity_check_color
 from app.lib.shapely_helper_functions import intersect_soil_layout_table_with_z
 from viktor import Color
@@ -30,20 +36,20 @@ class TestAHNHelperFunctions(unittest.TestCase):
 
         z = -2
         soil_layout_table_mod = intersect_soil_layout_table_with_z(soil_layout, z)
-        assert soil_layout_table_mod.layers[0].top_of_layer == z
-        assert soil_layout_table_mod.layers[0].soil.name == "Zand grof"
+        assert soil_layout_table_mod.top_of_layer[0] == z
+        assert soil_layout_table_mod.soil_names[0] == "Zand grof"
 
         z = -6
         soil_layout_table_mod = intersect_soil_layout_table_with_z(soil_layout, z)
 
-        assert soil_layout_table_mod.layers[0].top_of_layer == z
-        assert soil_layout_table_mod.layers[0].soil.name == "Zand grof"
+        assert soil_layout_table_mod.top_of_layer[0] == z
+        assert soil_layout_table_mod.soil_names[0] == "Zand grof"
 
         z = -8.5
         soil_layout_table_mod = intersect_soil_layout_table_with_z(soil_layout, z)
 
-        assert soil_layout_table_mod.layers[0].top_of_layer == z
-        assert soil_layout_table_mod.layers[0].soil.name == "clay"
+        assert soil_layout_table_mod.top_of_layer[0] == z
+        assert soil_layout_table_mod.soil_names[0] == "clay"
 
     def test_get_unity_check_color(self):
         unity_checks_1 = [0.5, 1.1]
@@ -69,7 +75,7 @@ class TestAHNHelperFunctions(unittest.TestCase):
                 [2.808, 2.802, 2.818, 2.812, 2.806, 2.829],
             ]
         )
-        app.lib.ahn.ahn_helper_functions.request_data = MagicMock(return_value=img_array)
+        app.lib.ahn.ahn_helper_functions.request_data = MagicMock(return_value=(img_array, None))
 
         data_points = pd.DataFrame(
             {"x": [158014.2294224724, 158015.10290132507], "y": [418222.5674693175, 418223.5674693175]}
@@ -90,10 +96,86 @@ class TestAHNHelperFunctions(unittest.TestCase):
                 [2.474, 2.438, 2.47, 2.507],
             ]
         )
-        app.lib.ahn.ahn_helper_functions.request_data = MagicMock(return_value=img_array)
+        app.lib.ahn.ahn_helper_functions.request_data = MagicMock(return_value=(img_array, None))
 
         point = (82194.68, 437740.98)
         z = 2.435
         data_points = pd.DataFrame({"x": [point[0]], "y": [point[1]]})
         res = fetch_ahn_z_values(data_points)
         assert np.isclose(res["z"][0], z)
+
+    def test_read_geotiff(self):
+        """
+        Check that a synthetic GeoTIFF is decoded into a float32 array with nodata set to NaN and that the points are
+        sampled with the transform of the file.
+        """
+        nodata = 3.4028235e38
+        values = np.array([[1.0, 2.0, 3.0], [4.0, nodata, 6.0]], dtype="float32")
+        transform = from_origin(1000.0, 2000.0, 0.5, 0.5)
+        with MemoryFile() as memory_file:
+            with memory_file.open(
+                driver="GTiff",
+                width=3,
+                height=2,
+                count=1,
+                dtype="float32",
+                crs="EPSG:28992",
+                transform=transform,
+                nodata=nodata,
+            ) as dataset:
+                dataset.write(values, 1)
+            content = memory_file.read()
+
+        img_array, img_transform = read_geotiff(content)
+        assert img_array.dtype == np.float32
+        assert img_transform == transform
+        assert np.isnan(img_array[1, 1])
+
+        bbox = [1000.0, 1999.0, 1001.5, 2000.0]
+        data_points = pd.DataFrame({"x": [1000.2, 1001.3, 1000.7, 1002.0], "y": [1999.9, 1999.9, 1999.2, 1999.9]})
+        z_values = get_z_values(data_points, bbox, img_array, 0.5, transform=img_transform)
+        assert np.allclose(z_values[:2], [1.0, 3.0])
+        assert np.isnan(z_values[2])  # nodata
+        assert np.isnan(z_values[3])  # outside the image
+
+    def test_fetch_ahn_z_values_uses_transform(self):
+        """
+        Check that the points are located in the downloaded image with the transform of the GeoTIFF, not with the grid
+        of the requested bbox.
+        """
+        img_array = np.array([[1.0, 2.0], [3.0, 4.0]])
+        # the image starts half a metre to the right of the bbox, the point lies in the first column of the image
+        transform = from_origin(100.0, 200.5, 0.5, 0.5)
+        app.lib.ahn.ahn_helper_functions.request_data = MagicMock(return_value=(img_array, transform))
+
+        data_points = pd.DataFrame({"x": [100.1], "y": [199.9]})
+        res = fetch_ahn_z_values(data_points, skip_clustering=True)
+        assert np.isclose(res["z"][0], 3.0)
+
+    def test_get_z_values_bilinear(self):
+        """
+        Check that bilinear interpolation returns the cell value at cell centres and interpolates in between.
+        """
+        img_array = np.array([[0.0, 1.0], [2.0, 3.0]])
+        bbox = [0.0, 0.0, 2.0, 2.0]
+        data_points = pd.DataFrame({"x": [0.5, 1.5, 1.0], "y": [1.5, 0.5, 1.0]})
+        z_values = get_z_values(data_points, bbox, img_array, 1.0, interpolation="bilinear")
+        assert np.allclose(z_values, [0.0, 3.0, 1.5])
+
+    def test_cluster_points(self):
+        """
+        Check that the clustering respects the bbox limits, covers all points and is deterministic.
+        """
+        rng = np.random.default_rng(0)
+        data_points = pd.DataFrame({"x": rng.uniform(150000, 158000, 5000), "y": rng.uniform(410000, 413000, 5000)})
+        df_clustered, dict_cluster_bbox = cluster_points(data_points, 0.5)
+        assert all(check_limits(dict_cluster_bbox, (2000, 2000)))
+        for cluster, bbox in dict_cluster_bbox.items():
+            df_cluster = df_clustered.loc[df_clustered["cluster"] == cluster]
+            assert (df_cluster["x"] > bbox[0]).all() and (df_cluster["x"] < bbox[2]).all()
+            assert (df_cluster["y"] > bbox[1]).all() and (df_cluster["y"] < bbox[3]).all()
+
+        shuffled_points = data_points.sample(frac=1, random_state=1)
+        df_clustered_shuffled, dict_cluster_bbox_shuffled = cluster_points(shuffled_points, 0.5)
+        assert dict_cluster_bbox_shuffled == dict_cluster_bbox
+        assert (df_clustered_shuffled["cluster"].sort_index() == df_clustered["cluster"]).all()
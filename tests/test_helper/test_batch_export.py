@@ -0,0 +1,150 @@
+import time
+from io import BytesIO
+from typing import Tuple
+from unittest import TestCase
+from unittest.mock import MagicMock
+from unittest.mock import patch
+from zipfile import ZipFile
+
+import numpy as np
+import pandas as pd
+from munch import munchify
+from rasterio.transform import Affine
+from rasterio.transform import from_origin
+from shapely.geometry import MultiPoint
+from shapely.geometry import Point
+from shapely.geometry import Polygon
+from shapely.ops import nearest_points
+
+from app.dyke.dyke_model import Dyke
+from app.exit_point.soil_geometry_model import get_all_point_coordinates_on_cross
+from app.lib.d_geoflow.batch_export import DitchIndex
+from app.lib.d_geoflow.batch_export import generate_geolib_model_files
+from app.lib.d_geoflow.batch_export import get_exit_point_model_inputs
+from app.lib.d_geoflow.batch_export import serialize_geolib_model
+from app.lib.d_geoflow.batch_export import write_zip
+from tests.fixtures.mocked_files import DYKES_ENTITIES
+from tests.fixtures.mocked_files import EXIT_POINT_ENTITIES
+from tests.fixtures.mocked_files import SEGMENT_ENTITIES
+from tests.helper_functions import benchmark
+from tests.test_segment.fixtures_segment import DETAILED_REP_SOIL_LAYOUT_1
+from viktor.geo import SoilLayout
+
+SEGMENT_PARAMS = SEGMENT_ENTITIES[0].last_saved_params
+
+
+def fake_ahn_tile(bbox, coverage: str = "ahn3_05m_dtm", resolution: float = 0.5) -> Tuple[np.ndarray, Affine]:
+    """AHN tile of the bbox with a smooth synthetic terrain between 0 and 3 m, evaluated at the cell centres"""
+    x = bbox[0] + (np.arange(int((bbox[2] - bbox[0]) / resolution)) + 0.5) * resolution
+    y = bbox[3] - (np.arange(int((bbox[3] - bbox[1]) / resolution)) + 0.5) * resolution
+    img_array = (1.5 + np.sin(x / 25)[np.newaxis, :] + 0.5 * np.cos(y / 40)[:, np.newaxis]).astype("float32")
+    return img_array, from_origin(bbox[0], bbox[3], resolution, resolution)
+
+
+def get_exit_points(dyke: Dyke, n_exit_points: int) -> list:
+    """Exit points every 25 m along the dike, at the same distance and side of the dike as the exit point fixture"""
+    base_trajectory = dyke.get_base_trajectory()
+    exit_point_data = EXIT_POINT_ENTITIES[0].last_saved_params.exit_point_data
+    exit_point = Point(exit_point_data.x_coordinate, exit_point_data.y_coordinate)
+    projection = nearest_points(base_trajectory, exit_point)[0]
+    dx, dy = exit_point.x - projection.x, exit_point.y - projection.y
+
+    exit_points = []
+    for i in range(n_exit_points):
+        point = base_trajectory.interpolate(100 + 25 * i)
+        params = {
+            "exit_point_data": {"x_coordinate": point.x + dx, "y_coordinate": point.y + dy},
+            "spatial_resolution": 0.5,
+            "cross_section": {
+                "extension_river_side": 0,
+                "extension_exit_point_side": 30,
+                "element_size": 1,
+                "elements_over_layer_thickness": 4,
+                "simplify_tolerance": 0.05,
+            },
+            "visualisation": {"river_to_the_right": i % 2 == 0},
+        }
+        exit_points.append((f"Uittredepunt {i + 1}", munchify(params)))
+    return exit_points
+
+
+@patch("app.lib.ahn.ahn_helper_functions.request_data", side_effect=fake_ahn_tile)
+class TestBatchExport(TestCase):
+    def setUp(self) -> None:
+        self.dyke = Dyke(DYKES_ENTITIES[0].last_saved_params)
+        self.base_trajectory = self.dyke.get_base_trajectory()
+        self.entry_line = self.dyke.entry_line
+        self.ditch_data = SEGMENT_PARAMS.segment_ditches
+
+    def get_model_inputs(self, n_exit_points: int) -> list:
+        return get_exit_point_model_inputs(
+            get_exit_points(self.dyke, n_exit_points),
+            SoilLayout.from_dict(DETAILED_REP_SOIL_LAYOUT_1),
+            self.base_trajectory,
+            self.entry_line,
+            MultiPoint(),
+            SEGMENT_PARAMS.polder_level,
+            SEGMENT_PARAMS.river_level,
+            SEGMENT_PARAMS.ditch_water_level,
+            self.ditch_data,
+        )
+
+    def test_cross_sections_data_equal_single_fetch(self, request_data_mock: MagicMock):
+        model_inputs = self.get_model_inputs(n_exit_points=6)
+        self.assertEqual(request_data_mock.call_count, 1)
+
+        for model_input in model_inputs:
+            soil_geometry = model_input.soil_geometry
+            pd.testing.assert_frame_equal(
+                soil_geometry.cross_section_data, get_all_point_coordinates_on_cross(*soil_geometry.cross_section_line)
+            )
+        self.assertEqual(request_data_mock.call_count, 1 + len(model_inputs))
+
+    def test_ditch_index(self, _):
+        ditch_index = DitchIndex(self.ditch_data)
+        for model_input in self.get_model_inputs(n_exit_points=40):
+            trajectory = model_input.soil_geometry.trajectory
+            self.assertListEqual(
+                model_input.ditch_data,
+                [ditch for ditch in self.ditch_data if Polygon(ditch["ditch_polygon"]).intersects(trajectory)],
+            )
+            self.assertListEqual(ditch_index.query(trajectory), model_input.ditch_data)
+        self.assertListEqual(DitchIndex([]).query(self.base_trajectory), [])
+
+    def test_batch_export(self, request_data_mock: MagicMock):
+        model_inputs = self.get_model_inputs(n_exit_points=8)
+        for model_type in ["flox", "stix"]:
+            with self.subTest(model_type=model_type):
+                output = BytesIO()
+                write_zip(generate_geolib_model_files(model_type, model_inputs, max_workers=4), output)
+                with ZipFile(output) as zip_file:
+                    self.assertListEqual(
+                        zip_file.namelist(), [f"{model_input.name}.{model_type}" for model_input in model_inputs]
+                    )
+                    model_file = ZipFile(BytesIO(zip_file.read(zip_file.namelist()[0])))
+                    expected_model_file = ZipFile(BytesIO(serialize_geolib_model(model_type, model_inputs[0])))
+                    self.assertListEqual(model_file.namelist(), expected_model_file.namelist())
+        # the AHN tiles are only fetched once, before the models are generated
+        self.assertEqual(request_data_mock.call_count, 1)
+
+    @benchmark
+    def test_batch_export_benchmark(self, _):
+        model_inputs = self.get_model_inputs(n_exit_points=8)
+        for model_type in ["flox", "stix"]:
+            start = time.perf_counter()
+            write_zip(generate_geolib_model_files(model_type, model_inputs, max_workers=4), BytesIO())
+            duration = time.perf_counter() - start
+
+            start = time.perf_counter()
+            for model_input in model_inputs:
+                serialize_geolib_model(model_type, model_input)
+            sequential_duration = time.perf_counter() - start
+
+            print(
+                f"Exporting {len(model_inputs)} {model_type} models: {duration:.3f} s, "
+                f"one by one: {sequential_duration:.3f} s"
+            )
+
+    def test_unknown_model_type(self, _):
+        with self.assertRaises(ValueError):
+            list(generate_geolib_model_files("sli", []))
@@ -3,6 +3,8 @@ from math import sqrt
 
 import numpy as np
 
+from app.lib.plotly_downsampling_helper_functions import downsample_trace
+from app.lib.plotly_downsampling_helper_functions import min_max_downsample_indices
 from app.lib.shapely_helper_functions import WaterDirection
 from app.lib.shapely_helper_functions import get_unit_vector
 from app.lib.shapely_helper_functions import rotate_90_deg
@@ -38,3 +40,21 @@ class TestCoordinateTransformations(unittest.TestCase):
         end_point = np.array((8, 7))
         unit_vector = get_unit_vector(start_point, end_point)
         np.testing.assert_allclose(unit_vector, np.array([sqrt(2) / 2, sqrt(2) / 2]))
+
+
+class TestTraceDownsampling(unittest.TestCase):
+    def test_short_trace_is_not_decimated(self):
+        values = np.arange(10.0)
+        np.testing.assert_array_equal(min_max_downsample_indices(values, 100), np.arange(10))
+
+    def test_decimated_trace_keeps_extremes(self):
+        values = np.sin(np.linspace(0, 50, 30000))
+        values[12345] = 10.0  # peak
+        positions = -np.arange(30000.0)
+        decimated_values, decimated_positions = downsample_trace(values, positions, 1000)
+
+        assert len(decimated_values) <= 1002
+        assert decimated_values.max() == 10.0
+        assert decimated_values.min() == values.min()
+        assert decimated_positions[0] == positions[0] and decimated_positions[-1] == positions[-1]
+        assert np.all(np.diff(decimated_positions) < 0)  # order is preserved
@@ -0,0 +1,64 @@
+from unittest import TestCase
+
+import numpy as np
+from matplotlib import cm
+from matplotlib.colors import Normalize
+from matplotlib.colors import rgb2hex
+
+from app.lib.map_view_helper_functions import LEAKAGE_MAP_FEATURES_CACHE
+from app.lib.map_view_helper_functions import add_all_leakage_points_to_map_features
+from app.lib.map_view_helper_functions import get_leakage_points_wgs_coordinates
+from app.lib.shapely_helper_functions import get_values_hex_colors
+from viktor.geometry import RDWGSConverter
+
+
+def get_leakage_point_properties(n_points: int) -> list:
+    rng = np.random.default_rng(0)
+    return [
+        dict(
+            x=120000 + 25 * (i % 100),
+            y=440000 + 25 * (i // 100),
+            ll=None if i % 50 == 0 else float(rng.uniform(10, 500)),
+            cover_layer_d=2.0,
+            cover_layer_k=1e-3,
+            first_aquifer_d=20.0,
+            first_aquifer_k=10.0,
+        )
+        for i in range(n_points)
+    ]
+
+
+class TestLeakageMapFeatures(TestCase):
+    def setUp(self) -> None:
+        LEAKAGE_MAP_FEATURES_CACHE.clear()
+
+    def test_get_values_hex_colors(self):
+        values = np.array([-5, 0, 12.5, 33.3, 50, 99.9, 100, 150])
+        norm = Normalize(vmin=0, vmax=100)
+        expected_colors = [rgb2hex(cm.viridis(norm(value))) for value in values]
+        self.assertListEqual(get_values_hex_colors(values, vmin=0, vmax=100), expected_colors)
+
+    def test_add_all_leakage_points_to_map_features(self):
+        leakage_point_properties = get_leakage_point_properties(20000)
+        map_features, map_labels = [], []
+        legend = add_all_leakage_points_to_map_features(map_features, map_labels, leakage_point_properties)
+
+        self.assertEqual(len(map_features), 20000)
+        self.assertEqual(len(map_labels), 20000)
+        self.assertIsNotNone(legend)
+
+        # the same leakage table is served from the cache
+        cached_map_features = []
+        add_all_leakage_points_to_map_features(cached_map_features, [], leakage_point_properties)
+        self.assertEqual(len(LEAKAGE_MAP_FEATURES_CACHE), 1)
+        self.assertIs(cached_map_features[0], map_features[0])
+
+    def test_get_leakage_points_wgs_coordinates(self):
+        points = np.array([(120000.0, 440000.0), (155000.0, 463000.0)])
+        wgs_coordinates = get_leakage_points_wgs_coordinates(points, voxel_size=25)
+
+        self.assertEqual(wgs_coordinates.shape, (2, 5, 2))
+        for point, point_wgs_coordinates in zip(points, wgs_coordinates):
+            offsets = [(0, 0), (12.5, 12.5), (12.5, -12.5), (-12.5, -12.5), (-12.5, 12.5)]
+            expected = [RDWGSConverter.from_rd_to_wgs(point + offset) for offset in offsets]
+            np.testing.assert_allclose(point_wgs_coordinates, expected, rtol=0, atol=1e-9)
@@ -0,0 +1,50 @@
+import json
+from pathlib import Path
+from unittest import TestCase
+from unittest.mock import patch
+
+from shapely.geometry import LineString
+
+from app.ground_model.constants import UNIQUE_TNO_SOIL_TYPES
+from app.ground_model.model import classify_tno_soil_model
+from app.lib.plotly_2d_profile_helper_functions import get_visualisation_along_trajectory
+from tests.fixtures.mocked_files import DYKES_ENTITIES
+from viktor.geo import SoilLayout
+
+SOIL_LAYOUT_FIXTURE = Path(__file__).parent.parent / "test_ground_model" / "soil_layout_fixtures.json"
+
+
+class TestVisualisationAlongTrajectory(TestCase):
+    def setUp(self) -> None:
+        with open(SOIL_LAYOUT_FIXTURE, "r") as json_file:
+            self.soil_layout = SoilLayout.from_dict(json.load(json_file))
+        self.materials = DYKES_ENTITIES[0].last_saved_params.models.materials
+        self.chainage_step = 25
+        # 10 km trajectory with a soil layout every 25 m
+        self.trajectory = LineString([(x, 0) for x in range(0, 10000 + self.chainage_step, self.chainage_step)])
+        self.min_max_permeabilities = dict(min_perm_v=0, max_perm_v=10, min_perm_h=0, max_perm_h=10)
+
+    def test_trace_count_and_payload_are_bounded(self):
+        longitudinal_soil_layout = [self.soil_layout] * len(self.trajectory.coords)
+        with patch(
+            "app.lib.plotly_2d_profile_helper_functions.classify_tno_soil_model", wraps=classify_tno_soil_model
+        ) as classify_mock:
+            fig = get_visualisation_along_trajectory(
+                self.trajectory,
+                longitudinal_soil_layout,
+                self.materials.classification_table,
+                self.materials.table,
+                self.chainage_step,
+                self.min_max_permeabilities,
+            )
+
+        # one trace per legend category, independent of the length of the trajectory
+        max_n_traces = 3 * len(UNIQUE_TNO_SOIL_TYPES) + len(self.materials.table)
+        self.assertLessEqual(len(fig.data), max_n_traces)
+        # identical soil layouts are classified only once
+        self.assertEqual(classify_mock.call_count, 1)
+
+        n_bars = len(longitudinal_soil_layout) * len(self.soil_layout.layers)
+        tno_bars = sum(len(trace.x) for trace in fig.data if trace.legendgroup == "TNO")
+        self.assertEqual(tno_bars, n_bars)
+        self.assertLess(len(fig.to_json()), 10_000_000)
@@ -0,0 +1,67 @@
+import time
+from unittest import TestCase
+
+import numpy as np
+
+from app.lib.rd_wgs_converter import from_rd_to_wgs
+from app.lib.rd_wgs_converter import from_wgs_to_rd
+from app.lib.rd_wgs_converter import geo_points_to_rd
+from app.lib.rd_wgs_converter import rd_to_geo_points
+from viktor.geometry import GeoPoint
+from tests.helper_functions import benchmark
+from viktor.geometry import RDWGSConverter
+
+
+def get_random_rd_points(n_points: int) -> np.ndarray:
+    """Random RD coordinates within the Netherlands"""
+    rng = np.random.default_rng(0)
+    return np.column_stack([rng.uniform(10000, 280000, n_points), rng.uniform(300000, 620000, n_points)])
+
+
+class TestRDWGSConverter(TestCase):
+    def test_from_rd_to_wgs_matches_scalar_implementation(self):
+        rd_points = get_random_rd_points(1000)
+        lat, lon = from_rd_to_wgs(rd_points[:, 0], rd_points[:, 1])
+        expected = np.array([RDWGSConverter.from_rd_to_wgs(tuple(point)) for point in rd_points])
+        np.testing.assert_allclose(np.column_stack([lat, lon]), expected, rtol=0, atol=1e-10)
+
+    def test_from_wgs_to_rd_matches_scalar_implementation(self):
+        rd_points = get_random_rd_points(1000)
+        wgs_points = np.array([RDWGSConverter.from_rd_to_wgs(tuple(point)) for point in rd_points])
+        x, y = from_wgs_to_rd(wgs_points[:, 0], wgs_points[:, 1])
+        expected = np.array([RDWGSConverter.from_wgs_to_rd(tuple(point)) for point in wgs_points])
+        np.testing.assert_allclose(np.column_stack([x, y]), expected, rtol=0, atol=1e-6)
+
+    def test_keeps_input_shape(self):
+        rd_points = get_random_rd_points(12).reshape(3, 4, 2)
+        lat, lon = from_rd_to_wgs(rd_points[..., 0], rd_points[..., 1])
+        self.assertEqual(lat.shape, (3, 4))
+        self.assertEqual(lon.shape, (3, 4))
+
+    def test_geo_points_round_trip(self):
+        rd_points = [(125694.68, 441831.19, 1.5), (155000.0, 463000.0, 0.0)]
+        geo_points = rd_to_geo_points(rd_points)
+        for point, geo_point in zip(rd_points, geo_points):
+            expected = GeoPoint.from_rd(point[:2])
+            self.assertAlmostEqual(geo_point.lat, expected.lat, places=10)
+            self.assertAlmostEqual(geo_point.lon, expected.lon, places=10)
+        for point, rd_point in zip(rd_points, geo_points_to_rd(geo_points)):
+            np.testing.assert_allclose(rd_point, point[:2], atol=0.5)
+        self.assertListEqual(rd_to_geo_points([]), [])
+
+    @benchmark
+    def test_benchmark_100000_points(self):
+        rd_points = get_random_rd_points(100000)
+
+        start = time.perf_counter()
+        lat, lon = from_rd_to_wgs(rd_points[:, 0], rd_points[:, 1])
+        vectorized_duration = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for point in rd_points:
+            RDWGSConverter.from_rd_to_wgs(tuple(point))
+        scalar_duration = time.perf_counter() - start
+
+        print(f"RD to WGS84 of 100 000 points: vectorized {vectorized_duration:.3f} s, scalar {scalar_duration:.3f} s")
+        self.assertEqual(lat.shape, (100000,))
+        self.assertLess(vectorized_duration, scalar_duration)
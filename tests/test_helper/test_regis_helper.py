@@ -0,0 +1,104 @@
+import os
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+import numpy as np
+import xarray
+from shapely.geometry import LineString
+from shapely.geometry import Polygon
+
+from app.lib.regis.regis_helper import get_longitudinal_regis_soil_layouts
+from app.lib.regis.regis_helper import get_regis_dataset
+from app.lib.regis.regis_helper import get_regis_soil_layouts
+from app.lib.regis.regis_helper import get_regis_soil_layouts_in_region
+
+LAYER_CODES = [b"HLc", b"KRz1", b"KRk1", b"KRz2"]
+X = [100000.0, 100100.0, 100200.0]
+Y = [400000.0, 400100.0]
+POLYGON = Polygon([(100000, 400000), (100200, 400000), (100200, 400100), (100000, 400100)])
+
+
+def write_regis_fixture(file_path: Path) -> None:
+    """Write a small REGIS subset: 4 formations on a grid of 3 x 2 points, the Holocene is absent at (100200, 400100)
+    and the second sand layer lies below the bottom of the queries"""
+    top = np.empty((len(LAYER_CODES), len(Y), len(X)))
+    top[0], top[1], top[2], top[3] = 1.0, -2.0, -10.0, -40.0
+    top[0, 1, 2] = np.nan
+    dataset = xarray.Dataset(
+        {"top": (("layer", "y", "x"), top)}, coords={"layer": np.array(LAYER_CODES), "y": Y, "x": X}
+    )
+    dataset.to_netcdf(file_path)
+
+
+class TestRegisHelper(unittest.TestCase):
+    def setUp(self) -> None:
+        self.cache_dir = Path(tempfile.mkdtemp())
+        self.fixture_path = self.cache_dir / "fixture.nc"
+        write_regis_fixture(self.fixture_path)
+        self.addCleanup(shutil.rmtree, self.cache_dir)
+
+        cache_dir_patch = patch("app.lib.regis.regis_helper.REGIS_CACHE_DIR", self.cache_dir / "regis_cache")
+        download_patch = patch("app.lib.regis.regis_helper.save_regis_data_from_url", side_effect=self.copy_fixture)
+        cache_dir_patch.start()
+        self.download_mock = download_patch.start()
+        self.addCleanup(cache_dir_patch.stop)
+        self.addCleanup(download_patch.stop)
+
+    def copy_fixture(self, url: str, file_path: Path) -> None:
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copy(self.fixture_path, file_path)
+
+    def test_get_regis_dataset_is_cached(self):
+        for _ in range(2):
+            ds = get_regis_dataset(x_min=100000, y_min=400000, x_max=100200, y_max=400100, bottom_level_query=-30)
+        self.download_mock.assert_called_once()
+        self.assertListEqual([code.decode() for code in ds["layer"].values], ["HLc", "KRz1", "KRk1"])
+
+        # another boundary box is another subset
+        get_regis_dataset(x_min=100000, y_min=400000, x_max=100300, y_max=400100, bottom_level_query=-30)
+        self.assertEqual(self.download_mock.call_count, 2)
+
+    def test_least_recently_used_subsets_are_evicted(self):
+        with patch("app.lib.regis.regis_helper.REGIS_CACHE_MAX_FILES", 2):
+            for x_max in [100200, 100300, 100400]:
+                get_regis_dataset(x_min=100000, y_min=400000, x_max=x_max, y_max=400100, bottom_level_query=-30)
+                # the subsets are used in order, such that their order does not depend on the file system
+                os.utime(max((self.cache_dir / "regis_cache").glob("*.nc"), key=os.path.getmtime), (x_max, x_max))
+        self.assertEqual(len(list((self.cache_dir / "regis_cache").glob("*.nc"))), 2)
+        # the first subset is downloaded again
+        get_regis_dataset(x_min=100000, y_min=400000, x_max=100200, y_max=400100, bottom_level_query=-30)
+        self.assertEqual(self.download_mock.call_count, 4)
+
+    def test_get_regis_soil_layouts_in_region(self):
+        soil_layouts = get_regis_soil_layouts_in_region(POLYGON, bottom_level_query=-30)
+        self.assertEqual(len(soil_layouts), 6)
+
+        soil_layout = soil_layouts[(100000.0, 400000.0)]
+        self.assertListEqual([layer.top_of_layer for layer in soil_layout.layers], [1, -2, -10])
+        self.assertListEqual([layer.bottom_of_layer for layer in soil_layout.layers], [-2, -10, -30])
+        self.assertEqual(soil_layout.layers[0].soil.name, "Holocene afzettingen,complexe eenheid")
+        self.assertEqual(soil_layout.layers[1].soil.name, "Fm. van Kreftenheye, 1e zandige eenheid")
+        self.assertEqual(len(soil_layouts[(100200.0, 400100.0)].layers), 2)
+
+    def test_get_longitudinal_regis_soil_layouts(self):
+        trajectory = LineString([(100010, 400010), (100190, 400090)])
+        soil_layouts = get_longitudinal_regis_soil_layouts(POLYGON, trajectory, bottom_level_query=-30)
+        # the closest grid points are (100000, 400000) and (100200, 400100)
+        self.assertListEqual([len(soil_layout.layers) for soil_layout in soil_layouts], [3, 2])
+        self.assertEqual(soil_layouts[1].layers[0].top_of_layer, -2)
+
+    def test_consecutive_formations_with_the_same_name_are_merged(self):
+        top = xarray.DataArray(
+            [[5.0, np.nan], [0.0, 0.0], [-3.0, -3.0]],
+            dims=("layer", "point"),
+            coords={"layer": ["KRz1", "KRz1", "KRk1"]},
+        )
+        soil_layouts = get_regis_soil_layouts(top, bottom_level_query=-20)
+        for soil_layout, top_of_layer in zip(soil_layouts, [5, 0]):
+            self.assertListEqual(
+                [(layer.top_of_layer, layer.bottom_of_layer) for layer in soil_layout.layers],
+                [(top_of_layer, -3), (-3, -20)],
+            )
@@ -0,0 +1,62 @@
+from unittest import TestCase
+
+from munch import munchify
+
+from app.piping_tool.constants import PipingDataFrameColumns
+from app.piping_tool.piping_result_table import PIPING_RESULT_SCHEMA
+from app.piping_tool.piping_result_table import SCENARIO_NAME
+from app.piping_tool.piping_result_table import PipingResultTableBuilder
+from app.piping_tool.piping_result_table import filter_scenario
+from app.piping_tool.PipingCalculationUtilities import PipingCalculation
+from tests.test_piping_tool.parameters import PIPING_PARAMETERS
+
+
+class TestPipingResultTable(TestCase):
+    def test_rows_are_completed_with_defaults(self):
+        piping_results = PipingResultTableBuilder()
+        for scenario_name in ["scenario 1", "scenario 2"]:
+            piping_results.set_row_defaults({SCENARIO_NAME: scenario_name, "Uittredepunt": "Uittredepunt 1"})
+            for aquifer in [1, 2]:
+                piping_results.add(PipingDataFrameColumns.AQUIFER, aquifer)
+                piping_results.add(PipingDataFrameColumns.UPLIFT_UNITY_CHECK, float("nan"))
+                piping_results.add(PipingDataFrameColumns.HEAVE_UNITY_CHECK, 0.5)
+                piping_results.add(PipingDataFrameColumns.HEAVE_UNITY_CHECK, 1.5)
+                piping_results.end_row()
+        # a row that is not closed is not part of the table
+        piping_results.add(PipingDataFrameColumns.AQUIFER, 3)
+
+        table = piping_results.to_table()
+        self.assertEqual(table.schema, PIPING_RESULT_SCHEMA)
+        self.assertEqual(table.num_rows, 4)
+        self.assertListEqual(table["aquifer"].to_pylist(), [1, 2, 1, 2])
+        self.assertListEqual(table["uc_heave"].to_pylist(), [1.5] * 4)
+        self.assertEqual(table["uc_opbarsten"].null_count, 4)
+        self.assertEqual(table["uc_sellmeijer"].null_count, 4)
+        self.assertListEqual(filter_scenario(table, "scenario 2")["Uittredepunt"].to_pylist(), ["Uittredepunt 1"] * 2)
+
+    def test_discard_row(self):
+        piping_results = PipingResultTableBuilder()
+        piping_results.add(PipingDataFrameColumns.HEAVE_UNITY_CHECK, 0.5)
+        piping_results.discard_row()
+        piping_results.add_values({"aquifer": 1, "Sloot": "-"})
+        piping_results.end_row()
+
+        table = piping_results.to_table()
+        self.assertEqual(table.num_rows, 1)
+        self.assertListEqual(table["Sloot"].to_pylist(), ["-"])
+        self.assertListEqual(table["uc_heave"].to_pylist(), [None])
+
+    def test_write_piping_summary_results(self):
+        piping_results = PipingResultTableBuilder()
+        PipingCalculation.from_parameter_set(munchify(PIPING_PARAMETERS["case_1"])).write_piping_summary_results(
+            piping_results
+        )
+        piping_results.end_row()
+        row = {column: values[0] for column, values in piping_results.to_table().to_pydict().items()}
+
+        piping_calculation = PipingCalculation.from_parameter_set(munchify(PIPING_PARAMETERS["case_1"]))
+        self.assertEqual(row["Sloot"], "Nee")
+        self.assertIsNone(row["Sloot_b"])
+        self.assertAlmostEqual(row["uc_opbarsten"], piping_calculation.uplift_unity_check)
+        self.assertAlmostEqual(row["uc_heave"], piping_calculation.heave_unity_check)
+        self.assertAlmostEqual(row["uc_sellmeijer"], piping_calculation.backward_erosion_unity_check)
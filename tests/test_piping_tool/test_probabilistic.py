@@ -0,0 +1,139 @@
+from unittest import TestCase
+
+import numpy as np
+from munch import munchify
+from scipy.stats import norm
+
+from app.piping_tool.constants import M_P
+from app.piping_tool.piping_arrays import PipingCalculationArrays
+from app.piping_tool.PipingCalculationUtilities import PipingCalculation
+from app.piping_tool.PipingCalculationUtilities import calc_reduced_head_difference
+from app.piping_tool.probabilistic import LOGNORMAL
+from app.piping_tool.probabilistic import MECHANISMS
+from app.piping_tool.probabilistic import NORMAL
+from app.piping_tool.probabilistic import Distribution
+from app.piping_tool.probabilistic import calculate_failure_probabilities
+from app.piping_tool.probabilistic import get_failure_probability_table
+from tests.test_piping_tool.parameters import PIPING_PARAMETERS
+from viktor import UserException
+
+
+class TestProbabilisticPiping(TestCase):
+    def setUp(self) -> None:
+        self.calculations = [
+            PipingCalculation.from_parameter_set(munchify(PIPING_PARAMETERS[case])) for case in ["case_1", "case_2"]
+        ]
+        self.arrays = PipingCalculationArrays.from_calculations(self.calculations)
+
+    def test_limit_states_equal_deterministic_calculation(self):
+        limit_states = self.arrays.calc_limit_states(self.arrays.river_level)
+        for i, calculation in enumerate(self.calculations):
+            self.assertAlmostEqual(limit_states["phi_exit"][i], calculation.calc_phi_exit)
+            self.assertAlmostEqual(limit_states["z_uplift"][i], calculation.uplift_limit_state)
+            self.assertAlmostEqual(limit_states["z_heave"][i], calculation.heave_limit_state)
+            self.assertAlmostEqual(
+                limit_states["z_sellmeijer"][i],
+                M_P * calculation.calc_critical_head_difference_sellmeijer - calculation.calc_reduced_head_difference,
+            )
+            self.assertAlmostEqual(limit_states["uc_uplift"][i], calculation.uplift_unity_check)
+            self.assertAlmostEqual(limit_states["uc_heave"][i], calculation.heave_unity_check)
+            self.assertAlmostEqual(limit_states["uc_sellmeijer"][i], calculation.backward_erosion_unity_check)
+
+    def test_deterministic_probabilities(self):
+        """Without spread every sample equals the deterministic calculation, of which the factors are all 1"""
+        failure_probabilities = calculate_failure_probabilities(self.arrays, {}, number_of_samples=10, seed=1)
+        limit_states = self.arrays.calc_limit_states(self.arrays.river_level)
+        for mechanism in ["uplift", "heave", "sellmeijer"]:
+            np.testing.assert_array_equal(
+                failure_probabilities[mechanism], (limit_states[f"z_{mechanism}"] < 0).astype(float)
+            )
+
+    def test_normal_river_level(self):
+        """The limit states of uplift and Sellmeijer are linear in the river level, such that their failure probability
+        for a normal river level is known exactly"""
+        river_level_std = 2.0
+        failure_probabilities = calculate_failure_probabilities(
+            self.arrays, {"river_level": Distribution(NORMAL, river_level_std)}, number_of_samples=100_000, seed=42
+        )
+        calculation = self.calculations[0]  # geohydrologic model 1
+        self.assertAlmostEqual(
+            failure_probabilities["uplift"][0],
+            norm.cdf(-calculation.uplift_limit_state / (calculation.damping_factor * river_level_std)),
+            delta=0.01,
+        )
+        self.assertAlmostEqual(
+            failure_probabilities["sellmeijer"][0],
+            norm.cdf(
+                (calculation.calc_reduced_head_difference - M_P * calculation.calc_critical_head_difference_sellmeijer)
+                / river_level_std
+            ),
+            delta=0.01,
+        )
+
+    def test_seed_reproduces_results(self):
+        distributions = {
+            "river_level": Distribution(NORMAL, 0.3),
+            "d_70": Distribution(LOGNORMAL, 0.12),
+            "horizontal_permeability": Distribution(LOGNORMAL, 0.5),
+            "cover_layer_thickness": Distribution(LOGNORMAL, 0.1),
+            "volumetric_weight": Distribution(NORMAL, 0.5),
+            "leakage_length_hinterland": Distribution(LOGNORMAL, 0.5),
+        }
+        failure_probabilities = calculate_failure_probabilities(
+            self.arrays, distributions, number_of_samples=100_000, seed=3, chunk_size=10_000
+        )
+        other_failure_probabilities = calculate_failure_probabilities(
+            self.arrays, distributions, number_of_samples=100_000, seed=3, chunk_size=10_000
+        )
+        for mechanism in MECHANISMS:
+            np.testing.assert_array_equal(failure_probabilities[mechanism], other_failure_probabilities[mechanism])
+            self.assertTrue(np.all((0 <= failure_probabilities[mechanism]) & (failure_probabilities[mechanism] <= 1)))
+        np.testing.assert_array_less(failure_probabilities["piping"], failure_probabilities["uplift"] + 1e-12)
+
+    def test_invalid_geohydrologic_model(self):
+        calculation = PipingCalculation.from_parameter_set(munchify(PIPING_PARAMETERS["case_1"]))
+        calculation.geohydrologic_model = "3"
+        with self.assertRaises(UserException):
+            PipingCalculationArrays.from_calculations([calculation])
+        calculation.geohydrologic_model, calculation.damping_factor = "1", 1.5
+        with self.assertRaises(ValueError):
+            PipingCalculationArrays.from_calculations([calculation])
+
+    def test_unknown_variable(self):
+        with self.assertRaises(ValueError):
+            calculate_failure_probabilities(self.arrays, {"polder_level": Distribution(NORMAL, 0.1)}, 10)
+
+    def test_lognormal_non_positive_mean(self):
+        with self.assertRaises(ValueError):
+            Distribution(LOGNORMAL, 0.1).sample(np.array([1.0, 0.0]), np.zeros((3, 2)))
+        with self.assertRaises(ValueError):
+            calculate_failure_probabilities(self.arrays, {"river_level": Distribution(LOGNORMAL, 0.1)}, 10)
+
+    def test_nan_limit_states(self):
+        """A calculation without a positive d70 has no Sellmeijer limit state, its failure probability is unknown"""
+        arrays = self.arrays._replace(d_70=np.array([0.0, self.arrays.d_70[1]]))
+        failure_probabilities = calculate_failure_probabilities(
+            arrays, {"d_70": Distribution(LOGNORMAL, 0.12)}, number_of_samples=100, seed=1
+        )
+        for mechanism in ["sellmeijer", "piping"]:
+            self.assertTrue(np.isnan(failure_probabilities[mechanism][0]))
+        for mechanism in MECHANISMS:
+            self.assertFalse(np.isnan(failure_probabilities[mechanism][1]))
+        self.assertFalse(np.isnan(failure_probabilities["uplift"]).any())
+        self.assertFalse(np.isnan(failure_probabilities["heave"]).any())
+
+        table = get_failure_probability_table([{"case": "case_1"}, {"case": "case_2"}], failure_probabilities)
+        self.assertTrue(np.isnan(table["beta_sellmeijer"].to_numpy()[0]))
+
+    def test_reduced_head_difference_of_nan(self):
+        self.assertEqual(calc_reduced_head_difference(np.nan, 1.0, 2.0), 0.01)
+        np.testing.assert_array_equal(calc_reduced_head_difference(np.array([np.nan, 3.0]), 1.0, 0.0), [0.01, 2.0])
+
+    def test_failure_probability_table(self):
+        failure_probabilities = calculate_failure_probabilities(self.arrays, {}, number_of_samples=10)
+        table = get_failure_probability_table([{"case": "case_1"}, {"case": "case_2"}], failure_probabilities)
+        self.assertListEqual(
+            table.column_names,
+            ["case"] + [f"{prefix}_{mechanism}" for mechanism in MECHANISMS for prefix in ["p", "beta"]],
+        )
+        self.assertEqual(table.num_rows, 2)
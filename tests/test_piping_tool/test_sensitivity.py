@@ -0,0 +1,101 @@
+import time
+from unittest import TestCase
+
+import numpy as np
+from munch import munchify
+
+from app.piping_tool.piping_arrays import PipingCalculationArrays
+from app.piping_tool.PipingCalculationUtilities import PipingCalculation
+from app.piping_tool.sensitivity import MECHANISMS
+from app.piping_tool.sensitivity import calculate_sensitivity_sweep
+from app.piping_tool.sensitivity import get_critical_river_levels
+from tests.helper_functions import benchmark
+from tests.test_piping_tool.parameters import PIPING_PARAMETERS
+
+
+class TestSensitivitySweep(TestCase):
+    def setUp(self) -> None:
+        self.calculations = [
+            PipingCalculation.from_parameter_set(munchify(PIPING_PARAMETERS[case])) for case in ["case_1", "case_2"]
+        ]
+        self.arrays = PipingCalculationArrays.from_calculations(self.calculations)
+        self.river_levels = np.arange(0, 10.01, 0.5)
+
+    def test_unity_checks_equal_deterministic_calculation(self):
+        sweep = calculate_sensitivity_sweep(self.arrays, self.river_levels)
+        river_level_index = int(np.argmin(abs(self.river_levels - PIPING_PARAMETERS["case_1"]["river_level"])))
+        for i, calculation in enumerate(self.calculations):
+            unity_checks = {
+                mechanism: values[0, river_level_index, i] for mechanism, values in sweep.unity_checks.items()
+            }
+            self.assertAlmostEqual(unity_checks["uplift"], calculation.uplift_unity_check)
+            self.assertAlmostEqual(unity_checks["heave"], calculation.heave_unity_check)
+            self.assertAlmostEqual(unity_checks["sellmeijer"], calculation.backward_erosion_unity_check)
+
+    @benchmark
+    def test_sensitivity_sweep_benchmark(self):
+        arrays = PipingCalculationArrays.from_calculations(self.calculations * 500)
+
+        start = time.perf_counter()
+        calculate_sensitivity_sweep(arrays, self.river_levels)
+        duration = time.perf_counter() - start
+
+        print(
+            f"Sensitivity sweep of {arrays.number_of_calculations} calculations at {len(self.river_levels)} river "
+            f"levels: {duration:.4f} s"
+        )
+
+    def test_critical_river_levels(self):
+        """The load ratio is linear in the river level, such that the unity check at the critical river level is 1"""
+        sweep = calculate_sensitivity_sweep(self.arrays, self.river_levels)
+
+        for mechanism in ["uplift", "heave", "sellmeijer"]:
+            critical_river_levels = sweep.critical_river_levels[mechanism][0]
+            self.assertFalse(np.isnan(critical_river_levels).any())
+            self.assertFalse(sweep.fails_at_lowest_river_level[mechanism].any())
+            unity_checks = self.arrays.calc_limit_states(critical_river_levels)[f"uc_{mechanism}"]
+            np.testing.assert_allclose(unity_checks, 1)
+        # piping occurs once all mechanisms fail, the governing mechanism may change within a step of the river levels
+        np.testing.assert_allclose(
+            sweep.critical_river_levels["piping"][0],
+            np.max([sweep.critical_river_levels[mechanism][0] for mechanism in ["uplift", "heave", "sellmeijer"]], 0),
+            atol=0.5,
+        )
+
+    def test_phreatic_levels(self):
+        h_exit = self.calculations[0].calc_h_exit
+        phreatic_levels = np.array([h_exit - 2, h_exit - 1, h_exit])
+        sweep = calculate_sensitivity_sweep(self.arrays, self.river_levels, phreatic_levels)
+        for mechanism in MECHANISMS:
+            self.assertEqual(sweep.unity_checks[mechanism].shape, (3, len(self.river_levels), 2))
+            self.assertEqual(sweep.critical_river_levels[mechanism].shape, (3, 2))
+            self.assertEqual(sweep.fails_at_lowest_river_level[mechanism].shape, (3, 2))
+
+        unity_checks = calculate_sensitivity_sweep(self.arrays, self.river_levels).unity_checks["piping"]
+        np.testing.assert_allclose(sweep.unity_checks["piping"][2, :, 0], unity_checks[0, :, 0])
+        # a lower phreatic level at the exit point lowers the critical river level
+        self.assertTrue(np.all(np.diff(sweep.critical_river_levels["sellmeijer"], axis=0) > 0))
+
+    def test_no_crossing(self):
+        unity_checks = np.array([[[2.0, 0.5], [1.5, 0.4], [1.2, 0.3]]])
+        critical_river_levels, fails_at_lowest_river_level = get_critical_river_levels(
+            np.array([1.0, 2.0, 3.0]), unity_checks
+        )
+        # the first unity check stays above 1, the second is already below 1 at the lowest river level
+        self.assertTrue(np.isnan(critical_river_levels[0, 0]))
+        self.assertEqual(critical_river_levels[0, 1], 1.0)
+        np.testing.assert_array_equal(fails_at_lowest_river_level, [[False, True]])
+
+        critical_river_levels, fails_at_lowest_river_level = get_critical_river_levels(
+            np.array([1.0, 2.0]), np.array([[[2.0], [0.5]]])
+        )
+        # the load ratio goes from 0.5 to 2
+        np.testing.assert_allclose(critical_river_levels, [[1 + 0.5 / 1.5]])
+        self.assertFalse(fails_at_lowest_river_level.any())
+
+    def test_fails_at_lowest_river_level(self):
+        h_exit = self.calculations[0].calc_h_exit
+        sweep = calculate_sensitivity_sweep(self.arrays, np.array([100.0, 110.0]), np.array([h_exit]))
+        for mechanism in MECHANISMS:
+            self.assertTrue(sweep.fails_at_lowest_river_level[mechanism].all())
+            np.testing.assert_array_equal(sweep.critical_river_levels[mechanism], 100.0)
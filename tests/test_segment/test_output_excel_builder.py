@@ -0,0 +1,74 @@
+from io import BytesIO
+from unittest import TestCase
+
+from munch import Munch
+from openpyxl import load_workbook
+
+from app.piping_tool.piping_result_table import PipingResultTableBuilder
+from app.segment.output_excel_builder import PIPING_RESULTS_TEMPLATE
+from app.segment.output_excel_builder import PipingExcelBuilder
+from app.segment.output_excel_builder import write_piping_workbook
+from app.segment.output_excel_builder import write_piping_workbooks
+
+SHEET_TITLES = ["Metadata", "Opbarsten", "Heave", "Sellmeijer"]
+
+
+class FakeExcelBuilder:
+    def __init__(self, n_rows: int):
+        self.n_rows = n_rows
+
+    def get_sheet_headers(self):
+        return {"Sellmeijer": ["exit_point", "uc_sellmeijer"]}
+
+    def get_sheet_rows(self):
+        return {
+            "Metadata": [["zand", 0.0, -5.0]],
+            "Sellmeijer": [[f"exit_point_{i}", i / self.n_rows] for i in range(self.n_rows)],
+        }
+
+
+class TestOutputExcelBuilder(TestCase):
+    def test_write_piping_workbook(self):
+        builder = FakeExcelBuilder(n_rows=10)
+        sheet_rows, sheet_headers = builder.get_sheet_rows(), builder.get_sheet_headers()
+        content = write_piping_workbook(str(PIPING_RESULTS_TEMPLATE), sheet_rows, sheet_headers)
+
+        workbook = load_workbook(BytesIO(content))
+        self.assertListEqual(workbook.sheetnames, SHEET_TITLES)
+        sellmeijer_rows = list(workbook["Sellmeijer"].values)
+        self.assertEqual(sellmeijer_rows[0], ("exit_point", "uc_sellmeijer"))
+        self.assertEqual(len(sellmeijer_rows), 11)
+        self.assertEqual(sellmeijer_rows[-1], ("exit_point_9", 0.9))
+        # sheets without rows only contain the header of the template
+        template_header = next(load_workbook(PIPING_RESULTS_TEMPLATE)["Heave"].values)
+        self.assertListEqual(list(workbook["Heave"].values), [template_header])
+
+    def test_piping_data_from_result_table(self):
+        piping_results = PipingResultTableBuilder()
+        piping_results.add_values({"Uittredepunt": "Uittredepunt 1", "aquifer": 1, "Sloot": "Nee"})
+        piping_results.add_values({"uc_sellmeijer": float("nan"), "uc_opbarsten": float("inf"), "uc_heave": 0.5})
+        piping_results.end_row()
+
+        builder = PipingExcelBuilder(piping_results.to_table(), Munch(), scenario=None)
+        sellmeijer_row = builder.get_piping_data(calculation_type="sellmeijer")[0]
+        uplift_row = builder.get_piping_data(calculation_type="uplift")[0]
+        self.assertListEqual(sellmeijer_row[:3], ["Uittredepunt 1", 1, "Nee"])
+        self.assertEqual(sellmeijer_row[-1], "Nan")
+        self.assertListEqual(uplift_row[3:5], ["-", "-"])
+        self.assertEqual(uplift_row[-2], "Nan")
+        self.assertEqual(builder.get_piping_data(calculation_type="heave")[0][-2], 0.5)
+
+    def test_write_piping_workbooks_equals_single_workbooks(self):
+        builders = {f"scenario_{i}.xlsx": FakeExcelBuilder(n_rows=100 * (i + 1)) for i in range(4)}
+        workbooks = write_piping_workbooks(builders, max_workers=2)
+
+        self.assertListEqual(list(workbooks), list(builders))
+        for file_name, builder in builders.items():
+            expected_content = write_piping_workbook(
+                str(PIPING_RESULTS_TEMPLATE), builder.get_sheet_rows(), builder.get_sheet_headers()
+            )
+            workbook = load_workbook(BytesIO(workbooks[file_name]))
+            expected_workbook = load_workbook(BytesIO(expected_content))
+            self.assertListEqual(workbook.sheetnames, expected_workbook.sheetnames)
+            for sheet_name in SHEET_TITLES:
+                self.assertListEqual(list(workbook[sheet_name].values), list(expected_workbook[sheet_name].values))
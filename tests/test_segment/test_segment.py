@@ -174,7 +174,7 @@ class TestSegmentController(TestCase):
         """ """
         img_array = np.genfromtxt("./tests/fixtures/ahn_points.csv", delimiter=",")
 
-        app.lib.ahn.ahn_helper_functions.request_data = MagicMock(return_value=img_array)
+        app.lib.ahn.ahn_helper_functions.request_data = MagicMock(return_value=(img_array, None))
         # Act
         result = self.controller.create_exit_point_entities(self.params, self.entity_id)
 
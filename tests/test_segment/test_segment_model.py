@@ -0,0 +1,81 @@
+from unittest import TestCase
+from unittest.mock import patch
+
+import pyarrow as pa
+
+from app.piping_tool.piping_result_table import EXIT_POINT_ID
+from app.piping_tool.piping_result_table import SCENARIO_NAME
+from app.piping_tool.piping_result_table import SCENARIO_WEIGHT
+from app.piping_tool.piping_result_table import X_COORDINATE
+from app.piping_tool.piping_result_table import Y_COORDINATE
+from app.piping_tool.piping_result_table import PipingResultTableBuilder
+from app.segment.segment_model import Segment
+
+
+def get_piping_results(n_exit_points: int, weights: list, aquifers: tuple = (1,)) -> pa.Table:
+    """Piping result table of all exit points, scenarios and aquifers, with unity checks depending on the index of the
+    exit point and the scenario"""
+    piping_results = PipingResultTableBuilder()
+    for i in range(n_exit_points):
+        for j, weight in enumerate(weights):
+            piping_results.set_row_defaults(
+                {
+                    "Uittredepunt": f"Uittredepunt {i:04d}",
+                    EXIT_POINT_ID: i,
+                    X_COORDINATE: 155000.0 + i,
+                    Y_COORDINATE: 463000.0,
+                    SCENARIO_NAME: f"scenario {j}",
+                    SCENARIO_WEIGHT: weight,
+                }
+            )
+            for aquifer in aquifers:
+                piping_results.add_values(
+                    {
+                        "aquifer": aquifer,
+                        "uc_sellmeijer": (i + 1) * (j + 1) / aquifer,
+                        "uc_opbarsten": float("nan") if j == 0 else 0.5,
+                        "uc_heave": 2.0,
+                    }
+                )
+                piping_results.end_row()
+    return piping_results.to_table()
+
+
+@patch("app.segment.segment_model.get_piping_result_map_features")
+class TestPipingResultMapFeatures(TestCase):
+    def setUp(self) -> None:
+        self.segment = Segment.__new__(Segment)
+
+    def test_combined_results_single_aquifer(self, map_features_mock):
+        results = get_piping_results(n_exit_points=1000, weights=[0.25, 0.75])
+        self.segment.get_map_features_for_combined_piping_results(results)
+
+        exit_points, descriptions, uc_lists = map_features_mock.call_args[0]
+        self.assertEqual(len(exit_points), 1000)
+        self.assertEqual(exit_points["Uittredepunt"].iloc[3], "Uittredepunt 0003")
+        self.assertEqual(exit_points[EXIT_POINT_ID].iloc[3], 3)
+        # columns: weighted sellmeijer, uplift and heave
+        w_sellmeijer, w_uplift, w_heave = uc_lists[3]
+        self.assertAlmostEqual(w_sellmeijer, 0.25 * 4 + 0.75 * 8)
+        self.assertAlmostEqual(w_uplift, 0.75 * 0.5)
+        self.assertAlmostEqual(w_heave, 2.0)
+        self.assertIn("Sellmeijer 7.0", descriptions[3])
+
+    def test_combined_results_double_aquifer(self, map_features_mock):
+        results = get_piping_results(n_exit_points=10, weights=[0.5, 0.5], aquifers=(1, 2))
+        self.segment.get_map_features_for_combined_piping_results(results, calculation_type="sellmeijer")
+
+        exit_points, descriptions, uc_lists = map_features_mock.call_args[0]
+        self.assertEqual(len(exit_points), 10)
+        self.assertEqual(uc_lists[1], [0.5 * 2 + 0.5 * 4, (0.5 * 2 + 0.5 * 4) / 2])
+        self.assertIn("### Aquifer 2", descriptions[1])
+
+    def test_uncombined_results(self, map_features_mock):
+        results = get_piping_results(n_exit_points=10, weights=[0.5, 0.5], aquifers=(1, 2))
+        self.segment.get_map_features_for_uncombined_piping_results(results, "scenario 1")
+
+        exit_points, descriptions, uc_lists = map_features_mock.call_args[0]
+        self.assertEqual(len(exit_points), 10)
+        self.assertEqual(uc_lists[0], [0.5, 2.0, 2.0, 0.5, 2.0, 1.0])
+        self.assertIn("### Aquifer 1", descriptions[0])
+        self.assertIn("### Aquifer 2", descriptions[0])